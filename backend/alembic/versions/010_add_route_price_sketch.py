@@ -0,0 +1,40 @@
+"""add route_price_sketch table
+
+Revision ID: 010_add_route_price_sketch
+Revises: 009_add_alert_table
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '010_add_route_price_sketch'
+down_revision: Union[str, None] = '009_add_alert_table'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Create route_price_sketch table (t-digest of posted price_per_kg per route)
+    op.create_table(
+        'route_price_sketch',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('origin_city_id', sa.Integer(), nullable=False),
+        sa.Column('destination_city_id', sa.Integer(), nullable=False),
+        sa.Column('digest', sa.JSON(), nullable=False, comment='Serialized t-digest of card price_per_kg (USD)'),
+        sa.Column('sample_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), onupdate=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(['origin_city_id'], ['city.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['destination_city_id'], ['city.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('origin_city_id', 'destination_city_id', name='uq_route_price_sketch_cities')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('route_price_sketch')
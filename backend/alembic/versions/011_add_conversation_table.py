@@ -0,0 +1,70 @@
+"""add conversation table
+
+Revision ID: 011_add_conversation_table
+Revises: 010_add_route_price_sketch
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '011_add_conversation_table'
+down_revision: Union[str, None] = '010_add_route_price_sketch'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Create conversation table (one row per user pair, user_a_id < user_b_id)
+    op.create_table(
+        'conversation',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_a_id', sa.Integer(), nullable=False),
+        sa.Column('user_b_id', sa.Integer(), nullable=False),
+        sa.Column('last_message_id', sa.Integer(), nullable=True),
+        sa.Column('last_message_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('unread_a', sa.Integer(), nullable=False, server_default='0', comment='پیام‌های خوانده نشده user_a (ارسالی از user_b)'),
+        sa.Column('unread_b', sa.Integer(), nullable=False, server_default='0', comment='پیام‌های خوانده نشده user_b (ارسالی از user_a)'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), onupdate=sa.func.now(), nullable=False),
+        sa.CheckConstraint('user_a_id < user_b_id', name='check_conversation_user_order'),
+        sa.ForeignKeyConstraint(['user_a_id'], ['user.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_b_id'], ['user.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['last_message_id'], ['message.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_a_id', 'user_b_id', name='uq_conversation_users')
+    )
+    op.create_index('ix_conversation_user_a_last', 'conversation', ['user_a_id', 'last_message_at'])
+    op.create_index('ix_conversation_user_b_last', 'conversation', ['user_b_id', 'last_message_at'])
+    
+    # Backfill from existing messages
+    op.execute("""
+        INSERT INTO conversation (user_a_id, user_b_id, last_message_id, last_message_at, unread_a, unread_b)
+        SELECT DISTINCT ON (pair.user_a_id, pair.user_b_id)
+            pair.user_a_id,
+            pair.user_b_id,
+            pair.id,
+            pair.created_at,
+            count(*) FILTER (WHERE NOT pair.is_read AND pair.receiver_id = pair.user_a_id)
+                OVER (PARTITION BY pair.user_a_id, pair.user_b_id),
+            count(*) FILTER (WHERE NOT pair.is_read AND pair.receiver_id = pair.user_b_id)
+                OVER (PARTITION BY pair.user_a_id, pair.user_b_id)
+        FROM (
+            SELECT
+                id, receiver_id, is_read, created_at,
+                LEAST(sender_id, receiver_id) AS user_a_id,
+                GREATEST(sender_id, receiver_id) AS user_b_id
+            FROM message
+        ) AS pair
+        ORDER BY pair.user_a_id, pair.user_b_id, pair.created_at DESC, pair.id DESC
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversation_user_b_last', table_name='conversation')
+    op.drop_index('ix_conversation_user_a_last', table_name='conversation')
+    op.drop_table('conversation')
@@ -0,0 +1,40 @@
+"""add message conversation pair index
+
+Revision ID: 012_add_message_pair_index
+Revises: 011_add_conversation_table
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '012_add_message_pair_index'
+down_revision: Union[str, None] = '011_add_conversation_table'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Both directions of a conversation share one (least, greatest) key, so
+    # a conversation page is a single ordered index range scan.
+    # CONCURRENTLY keeps the message table writable while the index builds.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_message_pair_created',
+            'message',
+            [
+                sa.text('least(sender_id, receiver_id)'),
+                sa.text('greatest(sender_id, receiver_id)'),
+                'created_at',
+            ],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_message_pair_created', table_name='message', postgresql_concurrently=True)
@@ -0,0 +1,221 @@
+"""partition message table by month with an archive tier
+
+Revision ID: 013_partition_message_table
+Revises: 012_add_message_pair_index
+Create Date: 2026-10-19
+
+The existing table is repartitioned online:
+
+1. A monthly range-partitioned copy (message_partitioned) and the archive
+   parent (message_archive) are created, and a row trigger mirrors every
+   write on message into the copy.
+2. Existing rows are copied in id ranges, each range in its own autocommit
+   transaction. Rows deleted while their range was being copied are removed
+   afterwards.
+3. The tables are swapped in one short transaction.
+
+Tuning (alembic -x):
+    message_chunk_size   rows per copy transaction (default 10000)
+    message_chunk_pause  seconds to sleep between chunks (default 0)
+
+Months older than MESSAGE_HOT_MONTHS are moved to message_archive later by
+app/services/message_partition_service.py, not by this migration.
+"""
+import time
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '013_partition_message_table'
+down_revision: Union[str, None] = '012_add_message_pair_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+DEFAULT_CHUNK_SIZE = 10000
+
+# swap waits up to SWAP_ATTEMPTS * SWAP_LOCK_TIMEOUT for the table lock
+SWAP_ATTEMPTS = 60
+SWAP_LOCK_TIMEOUT = '5s'
+
+COLUMNS = ('sender_id', 'receiver_id', 'body', 'is_read', 'read_at', 'status', 'created_at', 'updated_at')
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_parent_constraints(table: str) -> None:
+    op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)')
+    for column in ('sender_id', 'receiver_id'):
+        op.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey '
+            f'FOREIGN KEY ({column}) REFERENCES "user" (id) ON DELETE CASCADE'
+        )
+    op.execute(
+        f'CREATE INDEX ix_{table}_pair_created ON {table} '
+        f'(least(sender_id, receiver_id), greatest(sender_id, receiver_id), created_at)'
+    )
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    options = context.get_x_argument(as_dictionary=True)
+    chunk_size = int(options.get('message_chunk_size', DEFAULT_CHUNK_SIZE))
+    chunk_pause = float(options.get('message_chunk_pause', 0))
+
+    # 1. Partitioned copy, archive parent, monthly partitions and sync trigger
+    op.execute(
+        'CREATE TABLE message_partitioned '
+        '(LIKE message INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) '
+        'PARTITION BY RANGE (created_at)'
+    )
+    _create_parent_constraints('message_partitioned')
+    op.execute('CREATE INDEX ix_message_partitioned_receiver_created ON message_partitioned (receiver_id, created_at)')
+    op.execute('CREATE INDEX ix_message_partitioned_sender_created ON message_partitioned (sender_id, created_at)')
+    # replaces ix_message_is_read: only unread rows, keyed for mark_as_read
+    op.execute(
+        'CREATE INDEX ix_message_partitioned_unread ON message_partitioned (receiver_id, sender_id) '
+        'WHERE NOT is_read'
+    )
+
+    op.execute(
+        'CREATE TABLE message_archive '
+        '(LIKE message_partitioned INCLUDING CONSTRAINTS INCLUDING STORAGE) '
+        'PARTITION BY RANGE (created_at)'
+    )
+    _create_parent_constraints('message_archive')
+
+    first, last = bind.execute(sa.text(
+        "SELECT date_trunc('month', min(created_at) AT TIME ZONE 'UTC'), "
+        "date_trunc('month', max(created_at) AT TIME ZONE 'UTC') FROM message"
+    )).one()
+    current = datetime.now(timezone.utc).date().replace(day=1)
+    month = first.date() if first else current
+    horizon = max(_add_months(current, MONTHS_AHEAD), last.date() if last else current)
+    while month <= horizon:
+        next_month = _add_months(month, 1)
+        op.execute(
+            f'CREATE TABLE message_p{month:%Y%m} PARTITION OF message_partitioned '
+            f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{next_month:%Y-%m-%d} 00:00:00+00')"
+        )
+        month = next_month
+
+    updates = ', '.join(f'{column} = EXCLUDED.{column}' for column in COLUMNS)
+    op.execute(f"""
+        CREATE FUNCTION message_repartition_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                DELETE FROM message_partitioned WHERE id = OLD.id AND created_at = OLD.created_at;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                INSERT INTO message_partitioned SELECT NEW.*
+                ON CONFLICT (id, created_at) DO UPDATE SET {updates};
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute(
+        'CREATE TRIGGER message_repartition_sync AFTER INSERT OR UPDATE OR DELETE ON message '
+        'FOR EACH ROW EXECUTE FUNCTION message_repartition_sync()'
+    )
+
+    # 2. Copy existing rows in chunks; writes from here on go through the trigger
+    with op.get_context().autocommit_block():
+        low, high = bind.execute(sa.text('SELECT min(id), max(id) FROM message')).one()
+        start = (low or 1) - 1
+        while high is not None and start < high:
+            end = start + chunk_size
+            bind.execute(
+                sa.text(
+                    'INSERT INTO message_partitioned SELECT * FROM message '
+                    'WHERE id > :start AND id <= :end ON CONFLICT DO NOTHING'
+                ),
+                {'start': start, 'end': end}
+            )
+            # rows deleted after the copy read them but before it committed
+            bind.execute(
+                sa.text(
+                    'DELETE FROM message_partitioned p WHERE p.id > :start AND p.id <= :end '
+                    'AND NOT EXISTS (SELECT 1 FROM message m WHERE m.id = p.id)'
+                ),
+                {'start': start, 'end': end}
+            )
+            start = end
+            if chunk_pause:
+                time.sleep(chunk_pause)
+
+    # 3. Swap (message, then conversation: same lock order as send_message)
+    op.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'")
+    op.execute(f"""
+        DO $$
+        BEGIN
+            FOR attempt IN 1..{SWAP_ATTEMPTS} LOOP
+                BEGIN
+                    LOCK TABLE message IN ACCESS EXCLUSIVE MODE;
+                    RETURN;
+                EXCEPTION WHEN lock_not_available THEN
+                    RAISE NOTICE 'message lock attempt % timed out', attempt;
+                END;
+            END LOOP;
+            RAISE EXCEPTION 'could not lock message for the partition swap';
+        END
+        $$
+    """)
+    op.execute('DROP TRIGGER message_repartition_sync ON message')
+    op.execute('DROP FUNCTION message_repartition_sync()')
+    # a foreign key cannot reference message.id alone once created_at is part of the key
+    op.execute('ALTER TABLE conversation DROP CONSTRAINT IF EXISTS conversation_last_message_id_fkey')
+    op.execute('ALTER TABLE message RENAME TO message_legacy')
+    op.execute('ALTER TABLE message_partitioned RENAME TO message')
+    op.execute('ALTER SEQUENCE message_id_seq OWNED BY message.id')
+    op.execute('DROP TABLE message_legacy')
+
+    # renaming the constraint also renames its index
+    op.execute('ALTER TABLE message RENAME CONSTRAINT message_partitioned_pkey TO message_pkey')
+    for column in ('sender_id', 'receiver_id'):
+        op.execute(
+            f'ALTER TABLE message RENAME CONSTRAINT message_partitioned_{column}_fkey TO message_{column}_fkey'
+        )
+    for suffix in ('receiver_created', 'sender_created', 'unread', 'pair_created'):
+        op.execute(f'ALTER INDEX ix_message_partitioned_{suffix} RENAME TO ix_message_{suffix}')
+
+
+def downgrade() -> None:
+    # Not online: rebuilds a plain table from both tiers under the migration lock
+    op.execute(
+        'CREATE TABLE message_unpartitioned '
+        '(LIKE message INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)'
+    )
+    op.execute('INSERT INTO message_unpartitioned SELECT * FROM message_archive')
+    op.execute('INSERT INTO message_unpartitioned SELECT * FROM message')
+    op.execute('ALTER SEQUENCE message_id_seq OWNED BY message_unpartitioned.id')
+    op.execute('DROP TABLE message_archive')
+    op.execute('DROP TABLE message')
+    op.execute('ALTER TABLE message_unpartitioned RENAME TO message')
+
+    op.create_primary_key('message_pkey', 'message', ['id'])
+    op.create_foreign_key('message_sender_id_fkey', 'message', 'user', ['sender_id'], ['id'], ondelete='CASCADE')
+    op.create_foreign_key('message_receiver_id_fkey', 'message', 'user', ['receiver_id'], ['id'], ondelete='CASCADE')
+    op.create_index('ix_message_receiver_created', 'message', ['receiver_id', 'created_at'])
+    op.create_index('ix_message_sender_created', 'message', ['sender_id', 'created_at'])
+    op.create_index('ix_message_is_read', 'message', ['is_read'])
+    op.create_index(
+        'ix_message_pair_created',
+        'message',
+        [
+            sa.text('least(sender_id, receiver_id)'),
+            sa.text('greatest(sender_id, receiver_id)'),
+            'created_at',
+        ],
+    )
+    op.create_foreign_key(
+        'conversation_last_message_id_fkey', 'conversation', 'message',
+        ['last_message_id'], ['id'], ondelete='SET NULL'
+    )
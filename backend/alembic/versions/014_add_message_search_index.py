@@ -0,0 +1,77 @@
+"""add message full-text search index
+
+Revision ID: 014_add_message_search_index
+Revises: 013_partition_message_table
+Create Date: 2026-10-19
+
+A GIN index over the normalized body (see app/utils/text_search.py) on both
+message tiers. A partitioned index cannot be built CONCURRENTLY, so the
+parent index is created ON ONLY the parent (invalid), each partition is
+indexed CONCURRENTLY and attached; the parent index becomes valid once every
+partition is attached. Partitions created later inherit the index.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '014_add_message_search_index'
+down_revision: Union[str, None] = '013_partition_message_table'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# same key as MessagePartitionService: no detach/attach while indexing
+PARTITION_LOCK_KEY = 7_340_001
+
+# Arabic → Persian letters, zero-width non-joiner → space, Persian/Arabic digits → ASCII
+_REPLACE = {
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه',
+    'أ': 'ا', 'إ': 'ا', 'ٱ': 'ا', 'ؤ': 'و',
+    '‌': ' ',
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},
+}
+# harakat, superscript alef and tatweel are removed
+_REMOVE = ''.join(chr(code) for code in range(0x064B, 0x0660)) + 'ٰـ'
+
+SEARCH_EXPRESSION = (
+    "to_tsvector('simple', translate(lower(body), "
+    f"'{''.join(_REPLACE) + _REMOVE}', '{''.join(_REPLACE.values())}'))"
+)
+
+INDEXES = (
+    ('message', 'ix_message_body_search'),
+    ('message_archive', 'ix_message_archive_body_search'),
+)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        bind.execute(sa.text('SELECT pg_advisory_lock(:key)'), {'key': PARTITION_LOCK_KEY})
+        try:
+            for parent, index in INDEXES:
+                op.execute(f'CREATE INDEX IF NOT EXISTS {index} ON ONLY {parent} USING gin ({SEARCH_EXPRESSION})')
+                partitions = bind.execute(
+                    sa.text(
+                        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+                        'WHERE i.inhparent = CAST(:parent AS regclass) ORDER BY c.relname'
+                    ),
+                    {'parent': parent}
+                ).scalars().all()
+                for partition in partitions:
+                    partition_index = f'{partition}_body_search_idx'
+                    op.execute(
+                        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} '
+                        f'ON {partition} USING gin ({SEARCH_EXPRESSION})'
+                    )
+                    op.execute(f'ALTER INDEX {index} ATTACH PARTITION {partition_index}')
+        finally:
+            bind.execute(sa.text('SELECT pg_advisory_unlock(:key)'), {'key': PARTITION_LOCK_KEY})
+
+
+def downgrade() -> None:
+    for _, index in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {index}')
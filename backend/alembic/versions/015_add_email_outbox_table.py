@@ -0,0 +1,54 @@
+"""add email outbox table
+
+Revision ID: 015_add_email_outbox_table
+Revises: 014_add_message_search_index
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '015_add_email_outbox_table'
+down_revision: Union[str, None] = '014_add_message_search_index'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Create email_outbox table (written in the request transaction, drained by scripts/email_worker.py)
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('to_email', sa.String(255), nullable=False),
+        sa.Column('subject', sa.Text(), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('kind', sa.String(50), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), onupdate=sa.func.now(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    # Create indexes
+    op.create_index(
+        'ix_email_outbox_pending', 'email_outbox', ['next_attempt_at'],
+        postgresql_where=sa.text("status = 'pending'")
+    )
+    op.create_index('ix_email_outbox_status_updated', 'email_outbox', ['status', 'updated_at'])
+
+
+def downgrade() -> None:
+    # Drop indexes
+    op.drop_index('ix_email_outbox_status_updated', table_name='email_outbox')
+    op.drop_index('ix_email_outbox_pending', table_name='email_outbox')
+
+    # Drop table
+    op.drop_table('email_outbox')
@@ -0,0 +1,37 @@
+"""add alert_id to email outbox
+
+Revision ID: 016_add_email_outbox_alert_id
+Revises: 015_add_email_outbox_table
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '016_add_email_outbox_alert_id'
+down_revision: Union[str, None] = '015_add_email_outbox_table'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Link immediate alert emails to their alert (per-recipient delivery status)
+    op.add_column('email_outbox', sa.Column('alert_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_email_outbox_alert_id', 'email_outbox', 'alert',
+        ['alert_id'], ['id'], ondelete='SET NULL'
+    )
+    op.create_index(
+        'ix_email_outbox_alert', 'email_outbox', ['alert_id'],
+        postgresql_where=sa.text('alert_id IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_email_outbox_alert', table_name='email_outbox')
+    op.drop_constraint('fk_email_outbox_alert_id', 'email_outbox', type_='foreignkey')
+    op.drop_column('email_outbox', 'alert_id')
@@ -0,0 +1,42 @@
+"""add alert fingerprint and occurrence counter
+
+Revision ID: 017_add_alert_fingerprint
+Revises: 016_add_email_outbox_alert_id
+Create Date: 2026-10-19
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '017_add_alert_fingerprint'
+down_revision: Union[str, None] = '016_add_email_outbox_alert_id'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Repeated alerts are coalesced into one row per fingerprint
+    op.add_column('alert', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    op.add_column('alert', sa.Column('occurrences', sa.Integer(), server_default='1', nullable=False))
+    op.add_column(
+        'alert',
+        sa.Column('last_seen_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False)
+    )
+    op.add_column('alert', sa.Column('last_emailed_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE alert SET last_seen_at = created_at")
+    op.create_index(
+        'ix_alert_fingerprint_seen', 'alert', ['fingerprint', 'last_seen_at'],
+        postgresql_where=sa.text('fingerprint IS NOT NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_alert_fingerprint_seen', table_name='alert')
+    op.drop_column('alert', 'last_emailed_at')
+    op.drop_column('alert', 'last_seen_at')
+    op.drop_column('alert', 'occurrences')
+    op.drop_column('alert', 'fingerprint')
@@ -1,7 +1,9 @@
 """FastAPI dependencies for DB, auth, and rate limiting."""
 from typing import AsyncGenerator, Annotated, Optional, Dict
 from fastapi import Depends, HTTPException, status, Request, Header
+import redis.asyncio as redis
 from ..core.config import get_settings
+from ..core.redis_client import get_redis_client
 from ..core.security import decode_token
 from ..core.rate_limit import get_rate_limiter, check_rate_limit
 
@@ -21,21 +23,16 @@ DBSession = Annotated[AsyncSession, Depends(get_db)]
 
 # ==================== Redis Dependencies ====================
 
-async def get_redis():
-    """دریافت Redis connection.
-    
-    TODO: پیاده‌سازی واقعی با aioredis
+async def get_redis() -> redis.Redis:
+    """دریافت Redis client مشترک (روی connection pool ساخته شده در startup).
     
     Returns:
-        Redis connection
+        Redis client
     """
-    # Placeholder - زمانی که Redis client setup شد
-    # from ..db.redis import redis_client
-    # return redis_client
-    return None
+    return get_redis_client()
 
 
-RedisClient = Annotated[None, Depends(get_redis)]
+RedisClient = Annotated[redis.Redis, Depends(get_redis)]
 
 
 # ==================== Authentication Dependencies ====================
@@ -1,12 +1,15 @@
 """Admin panel API router."""
-from datetime import datetime
-from typing import Optional
+import json
+from datetime import date, datetime
+from typing import Iterator, Optional
 from fastapi import APIRouter, HTTPException, Query, UploadFile, File, status
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 
 from ..deps import DBSession, AdminUser
 from ...services import admin_service
 from ...services import alert_service
+from ...services import pricing_grid_service
+from ...services.dynamic_pricing_service import dynamic_pricing_service
 from ...schemas.admin import (
     DashboardStats,
     ChartData,
@@ -17,6 +20,7 @@ from ...schemas.admin import (
     ReportResolveIn,
     SystemSettings,
     SystemSettingsUpdate,
+    RedisHealth,
     PaginatedUserAdmin,
     PaginatedCommunityAdmin,
     PaginatedCardAdmin,
@@ -29,7 +33,8 @@ from ...schemas.admin import (
     BackupUploadResponse,
 )
 from ...schemas.common import MessageResponse
-from ...schemas.alert import AlertList, AlertStats, AlertOut
+from ...schemas.alert import AlertList, AlertStats, AlertOut, AlertDeliveries
+from ...schemas.price import BatchPriceSuggestionIn, BatchPriceSuggestionOut, RoutePriceSuggestionOut
 
 
 router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
@@ -463,6 +468,19 @@ async def update_settings(
     return await admin_service.update_system_settings(data, admin["user_id"])
 
 
+@router.get(
+    "/system/redis",
+    response_model=RedisHealth,
+    summary="وضعیت Redis",
+    description="PING روی connection pool مشترک Redis و متریک‌های pool (همین worker)"
+)
+async def get_redis_health(
+    admin: AdminUser,
+) -> RedisHealth:
+    """وضعیت سلامت Redis و pool."""
+    return await admin_service.get_redis_health()
+
+
 # ==================== Backup Management ====================
 
 @router.get(
@@ -634,6 +652,27 @@ async def get_unread_alerts_count(
     return {"unread_count": count}
 
 
+@router.get(
+    "/alerts/{alert_id}/deliveries",
+    response_model=AlertDeliveries,
+    summary="وضعیت ارسال ایمیل هشدار",
+    description="وضعیت ایمیل هشدار برای هر ادمین (ارسال شده، در صف، ناموفق)"
+)
+async def get_alert_deliveries(
+    alert_id: int,
+    db: DBSession,
+    admin: AdminUser,
+) -> AlertDeliveries:
+    """وضعیت ارسال ایمیل هشدار به ادمین‌ها."""
+    deliveries = await alert_service.get_alert_deliveries(db, alert_id)
+    if deliveries is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="هشدار یافت نشد"
+        )
+    return deliveries
+
+
 @router.put(
     "/alerts/{alert_id}/read",
     response_model=MessageResponse,
@@ -670,6 +709,75 @@ async def mark_all_alerts_as_read(
     return MessageResponse(message=f"{count} هشدار به عنوان خوانده شده علامت‌گذاری شد")
 
 
+# ==================== Pricing ====================
+
+@router.post(
+    "/pricing/batch",
+    response_model=BatchPriceSuggestionOut,
+    summary="قیمت پیشنهادی دسته‌ای",
+    description="محاسبه قیمت پیشنهادی برای تعداد زیادی مسیر با چند کوئری گروهی (حداکثر 1000 مسیر)"
+)
+async def get_batch_price_suggestions(
+    data: BatchPriceSuggestionIn,
+    db: DBSession,
+    admin: AdminUser,
+) -> BatchPriceSuggestionOut:
+    """محاسبه قیمت پیشنهادی برای چند مسیر."""
+    routes = [(r.origin_city_id, r.destination_city_id) for r in data.routes]
+    suggestions = await dynamic_pricing_service.calculate_prices_batch(
+        db,
+        routes,
+        travel_date=data.travel_date,
+        weight=data.weight,
+        category_id=data.category_id,
+    )
+    return BatchPriceSuggestionOut(
+        items=[
+            RoutePriceSuggestionOut(
+                origin_city_id=origin,
+                destination_city_id=destination,
+                **suggestion.model_dump()
+            )
+            for (origin, destination), suggestion in zip(routes, suggestions)
+        ]
+    )
+
+
+@router.get(
+    "/pricing/heatmap",
+    summary="نقشه حرارتی قیمت",
+    description="""
+ماتریس قیمت پیشنهادی (مسیر × هفته) برای همه مسیرهای جدول route_price.
+
+خروجی به صورت NDJSON استریم می‌شود: خط اول شامل تاریخ هفته‌ها (`weeks`)
+و هر خط بعدی شامل `origin_city_id`، `destination_city_id` و آرایه `prices` است.
+    """
+)
+async def get_price_heatmap(
+    db: DBSession,
+    admin: AdminUser,
+    start_date: Optional[date] = Query(None, description="تاریخ هفته اول (پیش‌فرض: امروز)"),
+    weeks: int = Query(12, ge=1, le=52, description="تعداد هفته‌ها"),
+    origin_city_id: Optional[int] = Query(None, description="فیلتر شهر مبدأ"),
+    weight: Optional[float] = Query(None, ge=0, description="وزن بسته (کیلوگرم)"),
+) -> StreamingResponse:
+    """استریم ماتریس قیمت مسیر × هفته."""
+    grid = await pricing_grid_service.compute_price_grid(
+        db,
+        start_date=start_date or datetime.utcnow().date(),
+        weeks=weeks,
+        origin_city_id=origin_city_id,
+        weight=weight,
+    )
+    
+    def iter_lines() -> Iterator[str]:
+        yield json.dumps({"weeks": [week.isoformat() for week in grid.weeks]}) + "\n"
+        for row in grid.iter_rows():
+            yield json.dumps(row) + "\n"
+    
+    return StreamingResponse(iter_lines(), media_type="application/x-ndjson")
+
+
 # ==================== Seed Test Data ====================
 
 @router.post(
@@ -4,10 +4,11 @@ from datetime import datetime
 from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
 from ...api.deps import DBSession, CurrentUser, CurrentUserOptional
 from ...schemas.card import CardCreate, CardUpdate, CardFilter, CardOut, CardStatsOut
-from ...schemas.price import PriceSuggestionOut
+from ...schemas.price import PriceSuggestionOut, MarketPriceOut
 from ...utils.pagination import PaginatedResponse
 from ...services import card_service
 from ...services.dynamic_pricing_service import dynamic_pricing_service
+from ...services.market_price_service import market_price_service
 from ...repositories import card_view_repo
 
 router = APIRouter(prefix="/api/v1/cards", tags=["cards"])
@@ -142,6 +143,32 @@ async def get_price_suggestion(
     return suggestion
 
 
+@router.get(
+    "/market-price/",
+    status_code=status.HTTP_200_OK,
+    response_model=MarketPriceOut,
+    summary="قیمت بازار مسیر",
+    description="""
+توزیع قیمت به ازای هر کیلوگرم که کاربران واقعاً برای یک مسیر ثبت کرده‌اند.
+
+**Authentication**: اختیاری
+
+مقادیر p25، میانه و p75 از یک خلاصه کوانتایل (t-digest) به‌روزشونده
+محاسبه می‌شوند و نیازی به پیمایش کارت‌های قبلی نیست.
+اگر قیمتی ثبت نشده باشد، `sample_count` صفر و مقادیر null هستند.
+    """
+)
+async def get_market_price(
+    db: DBSession,
+    origin_city_id: int = Query(..., description="شناسه شهر مبدأ"),
+    destination_city_id: int = Query(..., description="شناسه شهر مقصد")
+) -> MarketPriceOut:
+    """دریافت توزیع قیمت بازار برای مسیر."""
+    return await market_price_service.get_market_price(
+        db, origin_city_id, destination_city_id
+    )
+
+
 @router.post(
     "/",
     status_code=status.HTTP_201_CREATED,
@@ -184,6 +211,7 @@ async def create_card(
             weight=data.weight,
             is_packed=data.is_packed,
             price_aed=data.price_aed,
+            price_per_kg=data.price_per_kg,
             currency=data.currency,
             description=data.description,
             product_classification_id=data.product_classification_id,
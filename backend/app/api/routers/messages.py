@@ -1,14 +1,23 @@
 """Message endpoints."""
-from typing import Annotated
+from typing import Annotated, Optional, Union
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from ...api.deps import DBSession, CurrentUser, MessageRateLimit
-from ...schemas.message import MessageCreate, MessageOut, ConversationOut
-from ...utils.pagination import PaginatedResponse
+from ...schemas.message import MessageCreate, MessageOut, ConversationOut, MarkReadRequest, MarkReadOut
+from ...utils.pagination import CursorPaginatedResponse, PaginatedResponse
 from ...services import message_service
 
 router = APIRouter(prefix="/api/v1/messages", tags=["messages"])
 
 
+def _check_cursor(before_id: Optional[int], after_id: Optional[int]) -> None:
+    """فقط یکی از before_id و after_id مجاز است."""
+    if before_id is not None and after_id is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="فقط یکی از before_id یا after_id را ارسال کنید"
+        )
+
+
 @router.post(
     "/",
     status_code=status.HTTP_201_CREATED,
@@ -25,8 +34,7 @@ router = APIRouter(prefix="/api/v1/messages", tags=["messages"])
 
 پس از ارسال موفق:
 - پیام ذخیره می‌شود
-- ایمیل notification به گیرنده ارسال می‌شود
-- رویداد message_send ثبت می‌شود
+- ایمیل notification به گیرنده و رویداد message_send پس از پاسخ در صف پس‌زمینه (با retry) انجام می‌شوند
 
 در صورت عدم کامیونیتی مشترک:
 - رویداد message_blocked ثبت می‌شود
@@ -72,20 +80,29 @@ async def send_message(
 **Authentication**: الزامی
 
 پیام‌ها به ترتیب جدیدترین نمایش داده می‌شوند.
+
+**Cursor**: با `before_id` (پیام‌های قدیمی‌تر، جدیدترین اول) یا `after_id`
+(پیام‌های جدیدتر، قدیمی‌ترین اول) به جای `page`، پاسخ بدون `total` و با
+`has_more`، `next_before_id` و `next_after_id` برمی‌گردد.
     """
 )
 async def get_inbox(
     current_user: CurrentUser,
     db: DBSession,
     page: Annotated[int, Query(ge=1)] = 1,
-    page_size: Annotated[int, Query(ge=1, le=100)] = 20
-) -> PaginatedResponse[MessageOut]:
+    page_size: Annotated[int, Query(ge=1, le=100)] = 20,
+    before_id: Annotated[Optional[int], Query(ge=1, description="پیام‌های قدیمی‌تر از این پیام")] = None,
+    after_id: Annotated[Optional[int], Query(ge=1, description="پیام‌های جدیدتر از این پیام")] = None
+) -> Union[PaginatedResponse[MessageOut], CursorPaginatedResponse[MessageOut]]:
     """دریافت پیام‌های دریافتی."""
+    _check_cursor(before_id, after_id)
     result = await message_service.get_inbox(
         db,
         current_user["user_id"],
         page,
-        page_size
+        page_size,
+        before_id=before_id,
+        after_id=after_id
     )
     return result
 
@@ -100,20 +117,29 @@ async def get_inbox(
 **Authentication**: الزامی
 
 پیام‌ها به ترتیب جدیدترین نمایش داده می‌شوند.
+
+**Cursor**: با `before_id` (پیام‌های قدیمی‌تر، جدیدترین اول) یا `after_id`
+(پیام‌های جدیدتر، قدیمی‌ترین اول) به جای `page`، پاسخ بدون `total` و با
+`has_more`، `next_before_id` و `next_after_id` برمی‌گردد.
     """
 )
 async def get_sent(
     current_user: CurrentUser,
     db: DBSession,
     page: Annotated[int, Query(ge=1)] = 1,
-    page_size: Annotated[int, Query(ge=1, le=100)] = 20
-) -> PaginatedResponse[MessageOut]:
+    page_size: Annotated[int, Query(ge=1, le=100)] = 20,
+    before_id: Annotated[Optional[int], Query(ge=1, description="پیام‌های قدیمی‌تر از این پیام")] = None,
+    after_id: Annotated[Optional[int], Query(ge=1, description="پیام‌های جدیدتر از این پیام")] = None
+) -> Union[PaginatedResponse[MessageOut], CursorPaginatedResponse[MessageOut]]:
     """دریافت پیام‌های ارسالی."""
+    _check_cursor(before_id, after_id)
     result = await message_service.get_sent(
         db,
         current_user["user_id"],
         page,
-        page_size
+        page_size,
+        before_id=before_id,
+        after_id=after_id
     )
     return result
 
@@ -132,21 +158,65 @@ async def get_sent(
 - آخرین پیام رد و بدل شده
 - تعداد پیام‌های خوانده نشده
 
-مکالمات به ترتیب آخرین پیام (جدیدترین) نمایش داده می‌شوند.
+مکالمات به ترتیب آخرین پیام (جدیدترین) نمایش داده می‌شوند (paginated).
     """
 )
 async def get_conversations_list(
     current_user: CurrentUser,
-    db: DBSession
-):
+    db: DBSession,
+    page: Annotated[int, Query(ge=1)] = 1,
+    page_size: Annotated[int, Query(ge=1, le=100)] = 20
+) -> PaginatedResponse[ConversationOut]:
     """دریافت لیست مکالمات."""
     result = await message_service.get_conversations(
         db,
-        current_user["user_id"]
+        current_user["user_id"],
+        page,
+        page_size
     )
     return result
 
 
+@router.get(
+    "/search",
+    status_code=status.HTTP_200_OK,
+    summary="جستجو در پیام‌ها",
+    description="""
+جستجوی متن در تمام پیام‌های ارسالی و دریافتی کاربر (همه مکالمات، شامل آرشیو).
+
+**Authentication**: الزامی
+
+- جستجوی full-text با GIN index؛ حروف عربی/فارسی، ارقام فارسی و اعراب یکسان‌سازی می‌شوند
+- نحو websearch: `"عبارت دقیق"`، `or` و `-کلمه`
+- نتایج به ترتیب ارتباط (مرتبط‌ترین اول) هستند
+
+**Cursor**: برای صفحه بعد `next_before_id` پاسخ را به عنوان `before_id` با
+همان `q` ارسال کنید.
+    """
+)
+async def search_messages(
+    current_user: CurrentUser,
+    db: DBSession,
+    q: Annotated[str, Query(min_length=1, max_length=200, description="عبارت جستجو")],
+    page_size: Annotated[int, Query(ge=1, le=100)] = 20,
+    before_id: Annotated[Optional[int], Query(ge=1, description="نتایج بعد از این پیام")] = None
+) -> CursorPaginatedResponse[MessageOut]:
+    """جستجو در پیام‌ها."""
+    try:
+        return await message_service.search_messages(
+            db,
+            current_user["user_id"],
+            q,
+            page_size,
+            before_id=before_id
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
 @router.get(
     "/unread-count",
     status_code=status.HTTP_200_OK,
@@ -183,6 +253,10 @@ async def get_unread_count(
 
 پیام‌ها شامل پیام‌های ارسالی و دریافتی به/از کاربر مشخص‌شده هستند.
 پیام‌ها به ترتیب جدیدترین نمایش داده می‌شوند.
+
+**Cursor**: با `before_id` (پیام‌های قدیمی‌تر، جدیدترین اول) یا `after_id`
+(پیام‌های جدیدتر، قدیمی‌ترین اول) به جای `page`، پاسخ بدون `total` و با
+`has_more`، `next_before_id` و `next_after_id` برمی‌گردد.
     """
 )
 async def get_conversation(
@@ -190,16 +264,21 @@ async def get_conversation(
     current_user: CurrentUser,
     db: DBSession,
     page: Annotated[int, Query(ge=1)] = 1,
-    page_size: Annotated[int, Query(ge=1, le=100)] = 20
-) -> PaginatedResponse[MessageOut]:
+    page_size: Annotated[int, Query(ge=1, le=100)] = 20,
+    before_id: Annotated[Optional[int], Query(ge=1, description="پیام‌های قدیمی‌تر از این پیام")] = None,
+    after_id: Annotated[Optional[int], Query(ge=1, description="پیام‌های جدیدتر از این پیام")] = None
+) -> Union[PaginatedResponse[MessageOut], CursorPaginatedResponse[MessageOut]]:
     """دریافت مکالمه با یک کاربر."""
+    _check_cursor(before_id, after_id)
     try:
         result = await message_service.get_conversation(
             db,
             current_user["user_id"],
             other_user_id,
             page,
-            page_size
+            page_size,
+            before_id=before_id,
+            after_id=after_id
         )
         return result
     except ValueError as e:
@@ -209,6 +288,39 @@ async def get_conversation(
         )
 
 
+@router.post(
+    "/mark-read",
+    status_code=status.HTTP_200_OK,
+    response_model=MarkReadOut,
+    summary="علامت‌گذاری دسته‌ای پیام‌ها به عنوان خوانده شده",
+    description="""
+علامت‌گذاری پیام‌های خوانده نشده چند مکالمه (یا همه مکالمات) با یک درخواست.
+
+**Authentication**: الزامی
+
+- `user_ids`: فرستنده‌ها؛ بدون آن همه مکالمات
+- `up_to_id`: فقط پیام‌هایی با id کوچک‌تر یا مساوی (پیام‌هایی که کاربر دیده است)
+
+پیام‌ها و شمارنده‌های خوانده نشده در یک دستور به‌روز می‌شوند و read receiptها
+با یک pipeline ارسال می‌شوند. کلاینت می‌تواند باز شدن مکالمات را جمع (debounce)
+و با یک درخواست ارسال کند.
+    """
+)
+async def mark_many_read(
+    data: MarkReadRequest,
+    current_user: CurrentUser,
+    db: DBSession
+) -> MarkReadOut:
+    """علامت‌گذاری دسته‌ای پیام‌ها به عنوان خوانده شده."""
+    counts = await message_service.mark_many_as_read(
+        db,
+        current_user["user_id"],
+        other_user_ids=data.user_ids,
+        up_to_id=data.up_to_id
+    )
+    return MarkReadOut(count=sum(counts.values()), conversations=counts)
+
+
 @router.post(
     "/mark-read/{other_user_id}",
     status_code=status.HTTP_200_OK,
@@ -0,0 +1,170 @@
+"""Realtime endpoints (Server-Sent Events)."""
+import asyncio
+import json
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from redis.exceptions import RedisError
+
+from ...api.deps import CurrentUser
+from ...core.config import get_settings
+from ...core.database import get_db_session
+from ...core.security import decode_token
+from ...repositories import user_repo
+from ...schemas.message import RealtimeTicketOut
+from ...services.realtime_service import realtime_hub
+from ...services.unread_counter_service import unread_counter_service
+from ...utils.logger import logger
+
+settings = get_settings()
+
+router = APIRouter(prefix="/api/v1/realtime", tags=["realtime"])
+
+# فاصله ارسال keep-alive تا proxyها اتصال بیکار را نبندند
+HEARTBEAT_SECONDS = 25
+
+# زمان انتظار مرورگر برای اتصال مجدد (میلی‌ثانیه)
+RETRY_MS = 5000
+
+
+def _sse(data: str) -> str:
+    """قالب یک رویداد SSE."""
+    return f"data: {data}\n\n"
+
+
+async def _resolve_user_id(ticket: Optional[str], authorization: Optional[str]) -> Optional[int]:
+    """شناسه کاربر از ticket یک‌بار مصرف یا هدر Authorization."""
+    if ticket:
+        try:
+            return await realtime_hub.redeem_ticket(ticket)
+        except RedisError as e:
+            logger.warning(f"Realtime ticket redeem failed: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Realtime temporarily unavailable"
+            )
+
+    if authorization and authorization.startswith("Bearer "):
+        payload = decode_token(authorization.removeprefix("Bearer "), settings.SECRET_KEY)
+        if payload and "user_id" in payload:
+            return payload["user_id"]
+    return None
+
+
+async def _authenticate(ticket: Optional[str], authorization: Optional[str]) -> tuple[int, int]:
+    """احراز هویت اتصال stream و خواندن unread_count اولیه.
+
+    نشست دیتابیس فقط برای همین بررسی باز می‌شود و در طول stream نگه داشته نمی‌شود.
+
+    Returns:
+        tuple از (user_id، تعداد پیام‌های خوانده نشده)
+
+    Raises:
+        HTTPException: 401/403 مانند get_current_user
+    """
+    user_id = await _resolve_user_id(ticket, authorization)
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    async with get_db_session() as db:
+        user = await user_repo.get_by_id(db, user_id)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="کاربر یافت نشد",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        if not user.email_verified or not user.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="حساب کاربری شما فعال نیست"
+            )
+        unread_count = await unread_counter_service.get_total(db, user.id)
+
+    return user.id, unread_count
+
+
+@router.post(
+    "/ticket",
+    response_model=RealtimeTicketOut,
+    status_code=status.HTTP_201_CREATED,
+    summary="ticket اتصال realtime",
+    description="""
+ساخت ticket یک‌بار مصرف برای `GET /events?ticket=...`.
+
+**Authentication**: الزامی
+
+ticket تا `REALTIME_TICKET_SECONDS` ثانیه و فقط برای یک اتصال معتبر است، پس
+access token در URL (و لاگ‌های دسترسی) قرار نمی‌گیرد. کلاینت برای هر اتصال
+مجدد ticket جدید می‌گیرد.
+    """
+)
+async def create_ticket(current_user: CurrentUser) -> RealtimeTicketOut:
+    """ساخت ticket stream برای کاربر فعلی."""
+    try:
+        ticket = await realtime_hub.issue_ticket(current_user["user_id"])
+    except RedisError as e:
+        logger.warning(f"Realtime ticket issue failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Realtime temporarily unavailable"
+        )
+    return RealtimeTicketOut(ticket=ticket, expires_in=settings.REALTIME_TICKET_SECONDS)
+
+
+@router.get(
+    "/events",
+    status_code=status.HTTP_200_OK,
+    summary="رویدادهای realtime (SSE)",
+    description="""
+اتصال Server-Sent Events برای دریافت لحظه‌ای رویدادهای پیام‌رسانی.
+
+**Authentication**: الزامی (`?ticket=<ticket>` از `POST /ticket` چون EventSource
+هدر نمی‌فرستد، یا هدر Authorization)
+
+هر رویداد یک خط `data:` با JSON به شکل `{"type": ..., "data": ...}` است:
+- `unread`: تعداد کل خوانده‌نشده‌ها (اولین رویداد پس از اتصال)
+- `message`: پیام جدید (برای گیرنده همراه با `unread_count`)
+- `read`: پیام‌های ارسالی توسط `reader_id` خوانده شدند
+- `resync`: رویدادهایی از دست رفته؛ داده‌ها را دوباره دریافت کنید
+
+رویدادها از طریق Redis pub/sub بین همه workerها پخش می‌شوند.
+    """
+)
+async def stream_events(
+    ticket: Optional[str] = Query(None, description="ticket یک‌بار مصرف از POST /ticket"),
+    authorization: Optional[str] = Header(None)
+) -> StreamingResponse:
+    """Stream رویدادهای کاربر."""
+    user_id, unread_count = await _authenticate(ticket, authorization)
+
+    async def event_stream() -> AsyncIterator[str]:
+        yield f"retry: {RETRY_MS}\n\n"
+        yield _sse(json.dumps({"type": "unread", "data": {"unread_count": unread_count}}))
+        try:
+            async with realtime_hub.subscribe(user_id) as queue:
+                while True:
+                    try:
+                        data = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield _sse(data)
+        except (RedisError, OSError) as e:
+            # Redis در دسترس نیست؛ مرورگر پس از RETRY_MS دوباره وصل می‌شود
+            logger.warning(f"Realtime stream for user {user_id} closed: {e}")
+
+    logger.debug(f"Realtime stream opened for user {user_id}")
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        }
+    )
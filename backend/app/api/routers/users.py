@@ -1,8 +1,7 @@
 """User management endpoints."""
 from typing import Tuple, Optional, Annotated
 from fastapi import APIRouter, HTTPException, status, Depends, Request, Query
-from sqlalchemy import select, delete as sql_delete
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select
 from ...api.deps import DBSession, CurrentUser
 from ...schemas.user import UserMeOut, UserUpdate, UserBasicOut
 from ...schemas.auth import AuthChangePasswordIn
@@ -10,9 +9,10 @@ from ...schemas.membership import RequestOut
 from ...schemas.card import CardOut
 from ...schemas.community import CommunityOut
 from ...services import user_service, community_service, card_service
-from ...repositories import membership_repo, community_repo
+from ...services.block_cache_service import block_cache
+from ...services.membership_cache_service import membership_cache
+from ...repositories import membership_repo, user_block_repo
 from ...utils.pagination import PaginatedResponse
-from ...models.user_block import UserBlock
 from ...models.user import User
 
 router = APIRouter(prefix="/api/v1/users", tags=["users"])
@@ -312,41 +312,7 @@ async def get_my_communities(
     """دریافت کامیونیتی‌های کاربر جاری."""
     user_id = current_user["user_id"]
     
-    # دریافت عضویت‌های کاربر
-    memberships = await membership_repo.get_user_memberships(db, user_id)
-    
-    # ساخت لیست کامیونیتی‌ها با اطلاعات کامل
-    communities = []
-    for membership in memberships:
-        community = membership.community
-        if community:
-            # بارگذاری relationها
-            await db.refresh(community, attribute_names=["owner", "avatar"])
-            
-            # محاسبه member_count
-            community.member_count = await community_repo.get_member_count(db, community.id)
-            
-            # تنظیم is_member و my_role
-            community.is_member = True
-            if membership.role:
-                community.my_role = membership.role.name
-            else:
-                community.my_role = "member"
-            
-            communities.append(community)
-    
-    # Pagination دستی (چون داده‌ها از حافظه هستند)
-    total = len(communities)
-    start = (page - 1) * page_size
-    end = start + page_size
-    paginated_communities = communities[start:end]
-    
-    return PaginatedResponse.create(
-        items=paginated_communities,
-        total=total,
-        page=page,
-        page_size=page_size
-    )
+    return await community_service.get_user_communities(db, user_id, page, page_size)
 
 
 @router.get(
@@ -365,13 +331,7 @@ async def get_blocked_users(
     db: DBSession
 ) -> list[UserBasicOut]:
     """دریافت لیست کاربران بلاک شده."""
-    query = (
-        select(UserBlock)
-        .where(UserBlock.blocker_id == current_user["user_id"])
-        .options(selectinload(UserBlock.blocked))
-    )
-    result = await db.execute(query)
-    blocks = result.scalars().all()
+    blocks = await user_block_repo.get_blocked_users(db, current_user["user_id"])
     
     return [UserBasicOut.model_validate(block.blocked) for block in blocks]
 
@@ -417,24 +377,16 @@ async def block_user(
         )
     
     # بررسی بلاک تکراری
-    existing_query = (
-        select(UserBlock)
-        .where(UserBlock.blocker_id == blocker_id)
-        .where(UserBlock.blocked_id == user_id)
-    )
-    existing_result = await db.execute(existing_query)
-    existing_block = existing_result.scalar_one_or_none()
-    
-    if existing_block:
+    if await user_block_repo.get_block(db, blocker_id, user_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="این کاربر قبلاً بلاک شده است"
         )
     
     # ایجاد بلاک جدید
-    new_block = UserBlock(blocker_id=blocker_id, blocked_id=user_id)
-    db.add(new_block)
+    await user_block_repo.create(db, blocker_id, user_id)
     await db.commit()
+    await block_cache.invalidate(blocker_id, user_id)
     
     return {"message": "کاربر با موفقیت بلاک شد"}
 
@@ -461,28 +413,16 @@ async def unblock_user(
     blocker_id = current_user["user_id"]
     
     # بررسی وجود بلاک
-    existing_query = (
-        select(UserBlock)
-        .where(UserBlock.blocker_id == blocker_id)
-        .where(UserBlock.blocked_id == user_id)
-    )
-    existing_result = await db.execute(existing_query)
-    existing_block = existing_result.scalar_one_or_none()
-    
-    if not existing_block:
+    if not await user_block_repo.get_block(db, blocker_id, user_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="این کاربر در لیست بلاک شما نیست"
         )
     
     # حذف بلاک
-    delete_stmt = (
-        sql_delete(UserBlock)
-        .where(UserBlock.blocker_id == blocker_id)
-        .where(UserBlock.blocked_id == user_id)
-    )
-    await db.execute(delete_stmt)
+    await user_block_repo.delete_block(db, blocker_id, user_id)
     await db.commit()
+    await block_cache.invalidate(blocker_id, user_id)
 
 
 @router.get(
@@ -495,6 +435,7 @@ async def unblock_user(
 **احراز هویت**: نیاز به JWT access token در هدر Authorization
 
 این endpoint برای بررسی امکان ارسال پیام قبل از ورود به صفحه گفتگو استفاده می‌شود.
+فیلد `is_blocked` نشان می‌دهد که یکی از دو کاربر دیگری را بلاک کرده است.
     """
 )
 async def check_shared_communities(
@@ -520,14 +461,17 @@ async def check_shared_communities(
     if current_user_id == user_id:
         return {
             "has_shared_community": True,
+            "is_blocked": False,
             "user_id": user_id
         }
     
-    # بررسی کامیونیتی مشترک
-    has_shared = await community_repo.check_common_membership(db, current_user_id, user_id)
+    # بررسی کامیونیتی مشترک و بلاک
+    has_shared = await membership_cache.has_common_community(db, current_user_id, user_id)
+    is_blocked = await block_cache.is_blocked_between(db, current_user_id, user_id)
     
     return {
         "has_shared_community": has_shared,
+        "is_blocked": is_blocked,
         "user_id": user_id
     }
 
@@ -568,48 +512,16 @@ async def get_user_communities(
             detail="کاربر یافت نشد"
         )
     
-    # دریافت عضویت‌های کاربر هدف
-    memberships = await membership_repo.get_user_memberships(db, user_id)
-    
-    # ساخت لیست کامیونیتی‌ها با اطلاعات کامل
-    communities = []
-    for membership in memberships:
-        community = membership.community
-        if community:
-            # بارگذاری relationها
-            await db.refresh(community, attribute_names=["owner", "avatar"])
-            
-            # محاسبه member_count
-            community.member_count = await community_repo.get_member_count(db, community.id)
-            
-            # بررسی عضویت و درخواست pending کاربر جاری
-            current_user_membership = await membership_repo.get_membership(db, current_user_id, community.id)
-            if current_user_membership:
-                community.is_member = True
-                if current_user_membership.role:
-                    community.my_role = current_user_membership.role.name
-                else:
-                    community.my_role = "member"
-            else:
-                community.is_member = False
-                community.my_role = None
-            
-            # بررسی درخواست pending
-            has_pending = await membership_repo.has_pending_request(db, current_user_id, community.id)
-            community.has_pending_request = has_pending
-            
-            communities.append(community)
+    # کامیونیتی‌های کاربر هدف با وضعیت عضویت کاربر جاری
+    result = await community_service.get_user_communities(
+        db, user_id, page, page_size, viewer_id=current_user_id
+    )
     
-    # Pagination دستی
-    total = len(communities)
-    start = (page - 1) * page_size
-    end = start + page_size
-    paginated_communities = communities[start:end]
+    # بررسی درخواست pending کاربر جاری
+    for community in result.items:
+        community.has_pending_request = await membership_repo.has_pending_request(
+            db, current_user_id, community.id
+        )
     
-    return PaginatedResponse.create(
-        items=paginated_communities,
-        total=total,
-        page=page,
-        page_size=page_size
-    )
+    return result
 
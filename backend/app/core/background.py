@@ -0,0 +1,142 @@
+"""In-process background job queue for post-commit side effects."""
+import asyncio
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from .config import get_settings
+from ..utils.logger import logger
+
+settings = get_settings()
+
+JobFunc = Callable[[], Awaitable[None]]
+
+
+@dataclass
+class _Job:
+    name: str
+    func: JobFunc
+    attempt: int = 0
+
+
+class BackgroundQueue:
+    """صف کارهای پس‌زمینه با concurrency محدود و retry.
+
+    کارها (مثل ایمیل notification و لاگ audit) پس از commit ثبت می‌شوند و
+    پاسخ درخواست منتظر آن‌ها نمی‌ماند. هر کار یک factory است که در هر تلاش
+    یک coroutine جدید می‌سازد؛ کار ناموفق با backoff نمایی دوباره در صف
+    قرار می‌گیرد. workerها در اولین submit روی event loop جاری ساخته می‌شوند.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_size: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        retry_base_seconds: float = 0.5
+    ):
+        """مقداردهی اولیه.
+
+        Args:
+            workers: حداکثر کارهای هم‌زمان
+            max_size: حداکثر کارهای در انتظار (کار اضافه دور ریخته می‌شود)
+            max_retries: تعداد تلاش مجدد پس از شکست
+            retry_base_seconds: تأخیر اولین تلاش مجدد (هر بار دو برابر)
+        """
+        self.workers = workers or settings.BACKGROUND_WORKERS
+        self.max_size = max_size or settings.BACKGROUND_QUEUE_SIZE
+        self.max_retries = settings.BACKGROUND_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._retry_handles: set[asyncio.TimerHandle] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def submit(self, name: str, func: JobFunc) -> bool:
+        """ثبت یک کار بدون انتظار.
+
+        Args:
+            name: نام کار برای لاگ
+            func: factory بدون آرگومان که coroutine کار را می‌سازد
+
+        Returns:
+            False اگر صف پر باشد و کار دور ریخته شود
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(_Job(name, func))
+        except asyncio.QueueFull:
+            logger.error(f"Background queue full, dropping job {name}")
+            return False
+        return True
+
+    async def join(self) -> None:
+        """انتظار تا اجرای همه کارهای صف (شامل retryها)."""
+        while self._queue is not None:
+            await self._queue.join()
+            if not self._retry_handles:
+                return
+            await asyncio.sleep(0.05)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """تخلیه صف تا timeout و توقف workerها (در shutdown)."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Background queue stopped with {self._queue.qsize()} pending jobs")
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        self._queue = None
+        self._loop = None
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        # event loop جدید (مثلاً در تست‌ها): صف و workerهای قبلی قابل استفاده نیستند
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._retry_handles = set()
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await job.func()
+            except Exception as e:
+                self._retry(job, e)
+            finally:
+                self._queue.task_done()
+
+    def _retry(self, job: _Job, error: Exception) -> None:
+        if job.attempt >= self.max_retries:
+            logger.error(f"Background job {job.name} failed after {job.attempt + 1} attempts: {error}")
+            return
+
+        job.attempt += 1
+        delay = self.retry_base_seconds * 2 ** (job.attempt - 1)
+        logger.warning(f"Background job {job.name} failed, retry {job.attempt} in {delay}s: {error}")
+
+        def requeue() -> None:
+            self._retry_handles.discard(handle)
+            try:
+                self._queue.put_nowait(job)
+            except asyncio.QueueFull:
+                logger.error(f"Background queue full, dropping retry of {job.name}")
+
+        handle = self._loop.call_later(delay, requeue)
+        self._retry_handles.add(handle)
+
+
+# Singleton instance
+background_queue = BackgroundQueue()
@@ -33,6 +33,12 @@ class Settings(BaseSettings):
     # DB/Redis (در گام‌های بعدی استفاده می‌شوند)
     DATABASE_URL: str = "postgresql+psycopg://postgres:postgres@db:5432/app"
     REDIS_URL: str = "redis://redis:6379/0"
+
+    # Redis connection pool مشترک (app/core/redis_client.py)
+    REDIS_MAX_CONNECTIONS: int = 50  # سقف اتصال‌های هر process
+    REDIS_POOL_TIMEOUT_SECONDS: float = 5.0  # انتظار برای اتصال آزاد وقتی pool پر است
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 5.0
+    REDIS_HEALTH_CHECK_INTERVAL_SECONDS: int = 30  # PING اتصال idle قبل از استفاده مجدد
     
     # PostgreSQL connection details (for pg_dump backup)
     POSTGRES_HOST: str = "db"
@@ -52,10 +58,67 @@ class Settings(BaseSettings):
     # Resend
     RESEND_API_KEY: Optional[str] = None
 
+    # SMTP connection pool (persistent sessions reused across emails)
+    EMAIL_SMTP_POOL_SIZE: int = 4
+    EMAIL_SMTP_IDLE_SECONDS: int = 60
+    EMAIL_SMTP_TIMEOUT_SECONDS: int = 30
+
+    # Email outbox worker (scripts/email_worker.py)
+    EMAIL_WORKER_BATCH_SIZE: int = 50
+    EMAIL_WORKER_CONCURRENCY: int = 8
+    EMAIL_WORKER_POLL_SECONDS: float = 2.0
+    EMAIL_WORKER_LEASE_SECONDS: int = 300
+    EMAIL_WORKER_REPORT_SECONDS: int = 60
+    EMAIL_MAX_ATTEMPTS: int = 8
+    EMAIL_RETRY_BASE_SECONDS: int = 30
+    EMAIL_RETRY_MAX_SECONDS: int = 60 * 60  # 1 hour
+    EMAIL_OUTBOX_RETENTION_DAYS: int = 7
+
+    # Admin alerts (coalescing repeated alerts by fingerprint)
+    ALERT_DEDUP_WINDOW_SECONDS: int = 10 * 60  # از آخرین تکرار
+    ALERT_EMAIL_INTERVAL_SECONDS: int = 30 * 60  # حداقل فاصله ایمیل فوری هر fingerprint
+
     # Rate limit
     MESSAGES_PER_DAY: int = 50
     API_RATE_LIMIT_PER_MINUTE: int = 100
 
+    # Messaging
+    UNREAD_COUNTER_RECONCILE_SECONDS: int = 600
+    REALTIME_TICKET_SECONDS: int = 30  # اعتبار ticket یک‌بار مصرف stream رویدادها
+
+    # Message notification emails (coalesced per receiver in Redis)
+    NOTIFICATION_COALESCE_SECONDS: int = 5 * 60  # بازه جمع کردن پیام‌ها از اولین پیام
+    NOTIFICATION_FLUSH_SECONDS: int = 30
+    NOTIFICATION_FLUSH_BATCH: int = 200  # گیرنده در هر دور flush
+
+    # Duplicate fan-out detection (SimHash of recent messages per sender)
+    MESSAGE_FINGERPRINT_MIN_CHARS: int = 40
+    MESSAGE_FINGERPRINT_HISTORY: int = 32
+    MESSAGE_FINGERPRINT_WINDOW_SECONDS: int = 60 * 60  # 1 hour
+    MESSAGE_FINGERPRINT_MAX_DISTANCE: int = 6
+    MESSAGE_FANOUT_FLAG_RECIPIENTS: int = 5
+    MESSAGE_FANOUT_BLOCK_RECIPIENTS: int = 10
+
+    # Message partitions (monthly; older months move to message_archive)
+    MESSAGE_HOT_MONTHS: int = 6
+    MESSAGE_PARTITION_MONTHS_AHEAD: int = 3
+    MESSAGE_PARTITION_MAINTENANCE_SECONDS: int = 60 * 60 * 6  # 6 hours
+    MESSAGE_ARCHIVE_TABLESPACE: Optional[str] = None
+
+    # Membership and block caches (per-worker TTL on top of Redis)
+    MEMBERSHIP_CACHE_LOCAL_TTL_SECONDS: int = 15
+    BLOCK_CACHE_LOCAL_TTL_SECONDS: int = 15
+
+    # Background jobs (post-commit notifications and audit logs)
+    BACKGROUND_WORKERS: int = 4
+    BACKGROUND_QUEUE_SIZE: int = 1000
+    BACKGROUND_MAX_RETRIES: int = 3
+
+    # Pricing
+    PRICE_SUGGESTION_CACHE_TTL_SECONDS: int = 300
+    ROUTE_PRICE_MATRIX_MAX_AGE_SECONDS: int = 600
+    MARKET_PRICE_FLUSH_SECONDS: int = 60
+
     class Config:
         env_file = ".env"
         extra = "ignore"
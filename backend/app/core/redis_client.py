@@ -0,0 +1,345 @@
+"""Shared Redis client - یک connection pool برای هر process.
+
+همه استفاده‌کنندگان Redis (کش‌های عضویت و بلاک، شمارنده پیام‌های خوانده نشده،
+fingerprint پیام‌ها، realtime و notification) از get_redis_client() استفاده
+می‌کنند و اتصال‌ها را از یک pool مشترک قرض می‌گیرند؛ هیچ عملیاتی اتصال TCP
+جدید باز نمی‌کند.
+
+- pool در startup (main.lifespan) با init_redis ساخته و در shutdown با
+  close_redis بسته می‌شود؛ اسکریپت‌ها و workerها با اولین استفاده lazy آن را
+  می‌سازند
+- حداکثر REDIS_MAX_CONNECTIONS اتصال؛ وقتی همه مشغول‌اند درخواست تا
+  REDIS_POOL_TIMEOUT_SECONDS منتظر اتصال آزاد می‌ماند
+- اتصال idle قبل از استفاده مجدد هر REDIS_HEALTH_CHECK_INTERVAL_SECONDS با
+  PING بررسی و در صورت قطع بودن دوباره وصل می‌شود
+- check_redis و redis_pool_stats برای health check و متریک‌های pool
+- hashهای نسخه‌دار (کش‌های عضویت و بلاک): پر کردن کش پس از miss فقط اگر
+  از زمان خواندن نسخه ابطالی رخ نداده باشد (store_hash_if_unchanged و
+  delete_and_bump_versions)؛ VersionedHashCache یک کش درون‌پردازه‌ای کوتاه‌مدت
+  را روی همین hashها قرار می‌دهد
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Generic, Optional, Sequence, TypeVar
+
+import redis.asyncio as redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from .config import get_settings
+from ..utils.cache import AsyncTTLCache
+from ..utils.logger import logger
+
+settings = get_settings()
+
+
+class MeteredConnectionPool(redis.BlockingConnectionPool):
+    """BlockingConnectionPool با شمارنده انتظار، timeout و بیشترین اتصال هم‌زمان."""
+
+    def __init__(self, **kwargs):
+        """مقداردهی اولیه."""
+        super().__init__(**kwargs)
+        self.waits = 0
+        self.timeouts = 0
+        self.peak_in_use = 0
+
+    async def get_connection(self, command_name, *keys, **options):
+        """قرض گرفتن اتصال (در صورت پر بودن pool منتظر می‌ماند)."""
+        if not self.can_get_connection():
+            self.waits += 1
+        try:
+            connection = await super().get_connection(command_name, *keys, **options)
+        except RedisConnectionError as e:
+            if isinstance(e.__cause__, asyncio.TimeoutError):
+                self.timeouts += 1
+            raise
+        self.peak_in_use = max(self.peak_in_use, len(self._in_use_connections))
+        return connection
+
+    def stats(self) -> dict[str, int]:
+        """وضعیت فعلی pool.
+
+        Returns:
+            dict با max_connections، in_use، idle، peak_in_use، waits و timeouts
+        """
+        return {
+            "max_connections": self.max_connections,
+            "in_use": len(self._in_use_connections),
+            "idle": len(self._available_connections),
+            "peak_in_use": self.peak_in_use,
+            "waits": self.waits,
+            "timeouts": self.timeouts,
+        }
+
+
+# پر کردن hash فقط اگر نسخه کلید از زمان خواندن تغییر نکرده باشد
+# KEYS: hash، نسخه | ARGV: نسخه خوانده شده، TTL، field1، value1، ...
+_STORE_IF_UNCHANGED_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+_pool: Optional[MeteredConnectionPool] = None
+_client: Optional[redis.Redis] = None
+
+
+def create_pool(url: Optional[str] = None) -> MeteredConnectionPool:
+    """ساخت connection pool با تنظیمات REDIS_*.
+
+    Args:
+        url: آدرس Redis (پیش‌فرض REDIS_URL)
+
+    Returns:
+        MeteredConnectionPool
+    """
+    return MeteredConnectionPool.from_url(
+        url or settings.REDIS_URL,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT_SECONDS,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+        retry_on_timeout=True,
+        decode_responses=True,
+    )
+
+
+def get_redis_client() -> redis.Redis:
+    """Redis client مشترک process (در صورت نبود، pool ساخته می‌شود).
+
+    Returns:
+        redis.Redis روی pool مشترک
+    """
+    global _pool, _client
+    if _client is None:
+        _pool = create_pool()
+        _client = redis.Redis(connection_pool=_pool)
+    return _client
+
+
+async def init_redis() -> None:
+    """ساخت pool در startup و بررسی دسترسی به Redis.
+
+    در دسترس نبودن Redis مانع startup نمی‌شود؛ سرویس‌ها در صورت خطا به
+    دیتابیس برمی‌گردند و pool با اولین درخواست موفق وصل می‌شود.
+    """
+    get_redis_client()
+    latency = await check_redis()
+    if latency is None:
+        logger.warning("Redis is not reachable; continuing without it")
+    else:
+        logger.info(
+            f"Redis pool ready (max {settings.REDIS_MAX_CONNECTIONS} connections, "
+            f"ping {latency:.1f} ms)"
+        )
+
+
+async def check_redis() -> Optional[float]:
+    """Health check: PING روی pool مشترک.
+
+    Returns:
+        زمان پاسخ به میلی‌ثانیه یا None اگر Redis در دسترس نباشد
+    """
+    started = time.perf_counter()
+    try:
+        await get_redis_client().ping()
+    except Exception as e:
+        logger.warning(f"Redis health check failed: {e}")
+        return None
+    return (time.perf_counter() - started) * 1000
+
+
+def redis_pool_stats() -> dict[str, int]:
+    """متریک‌های pool مشترک (صفر اگر هنوز ساخته نشده باشد).
+
+    Returns:
+        dict با max_connections، in_use، idle، peak_in_use، waits و timeouts
+    """
+    if _pool is None:
+        return {
+            "max_connections": settings.REDIS_MAX_CONNECTIONS,
+            "in_use": 0,
+            "idle": 0,
+            "peak_in_use": 0,
+            "waits": 0,
+            "timeouts": 0,
+        }
+    return _pool.stats()
+
+
+def version_key(key: str) -> str:
+    """کلید نسخه یک hash نسخه‌دار."""
+    return f"{key}:version"
+
+
+async def read_version(client: redis.Redis, key: str) -> str:
+    """نسخه فعلی hash (قبل از خواندن دیتابیس برای پر کردن کش).
+
+    Returns:
+        نسخه ("0" اگر هنوز ابطالی ثبت نشده باشد)
+    """
+    return await client.get(version_key(key)) or "0"
+
+
+async def store_hash_if_unchanged(
+    client: redis.Redis,
+    key: str,
+    version: str,
+    mapping: dict[str, str],
+    ttl: int
+) -> bool:
+    """جایگزینی اتمیک hash فقط اگر نسخه هنوز همان نسخه خوانده شده باشد.
+
+    اگر بین خواندن نسخه و این فراخوانی delete_and_bump_versions اجرا شده
+    باشد، داده خوانده شده از دیتابیس ممکن است قدیمی باشد و ذخیره نمی‌شود.
+
+    Args:
+        client: Redis client
+        key: کلید hash
+        version: نسخه خوانده شده با read_version
+        mapping: فیلدها (حداقل یک فیلد)
+        ttl: TTL کلید (ثانیه)
+
+    Returns:
+        True اگر ذخیره شد
+    """
+    fields = [item for pair in mapping.items() for item in pair]
+    stored = await client.eval(
+        _STORE_IF_UNCHANGED_SCRIPT, 2, key, version_key(key), version, ttl, *fields
+    )
+    return bool(stored)
+
+
+async def delete_and_bump_versions(client: redis.Redis, keys: Sequence[str], ttl: int) -> None:
+    """حذف hashها و افزایش نسخه آن‌ها (پر کردن‌های در حال اجرا ذخیره نمی‌شوند).
+
+    Args:
+        client: Redis client
+        keys: کلیدهای hash
+        ttl: TTL کلیدهای نسخه (باید از زمان یک بارگذاری از دیتابیس بیشتر باشد)
+    """
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.delete(*keys)
+        for key in keys:
+            pipe.incr(version_key(key))
+            pipe.expire(version_key(key), ttl)
+        await pipe.execute()
+
+
+async def close_redis() -> None:
+    """بستن client و همه اتصال‌های pool (در shutdown)."""
+    global _pool, _client
+    if _client is not None:
+        await _client.aclose()
+    if _pool is not None:
+        await _pool.disconnect()
+    _pool = None
+    _client = None
+
+
+T = TypeVar("T")
+
+
+class VersionedHashCache(Generic[T]):
+    """کش دو لایه مقدار هر شناسه روی hash نسخه‌دار Redis.
+
+    - درون‌پردازه‌ای: AsyncTTLCache با TTL کوتاه (هم‌زمانی بارگذاری‌ها یکی می‌شود)
+    - Redis: hash با کلید {key_prefix}:{id} مشترک بین workerها
+
+    پس از miss در Redis مقدار از دیتابیس خوانده و فقط اگر نسخه کلید از قبل از
+    خواندن تغییر نکرده باشد ذخیره می‌شود؛ invalidate (پس از commit) hash را حذف
+    و نسخه را افزایش می‌دهد. در صورت خطای Redis مستقیماً از دیتابیس خوانده
+    می‌شود. سایر workerها حداکثر به اندازه TTL محلی مقدار قدیمی را می‌بینند.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        key_prefix: str,
+        load: Callable[[Any, int], Awaitable[T]],
+        encode: Callable[[T], dict[str, str]],
+        decode: Callable[[dict[str, str]], T],
+        local_ttl_seconds: float,
+        redis_ttl: int,
+        client: Optional[redis.Redis] = None
+    ):
+        """مقداردهی اولیه.
+
+        Args:
+            name: نام کش در لاگ‌ها
+            key_prefix: پیشوند کلید Redis
+            load: خواندن مقدار از دیتابیس (db, id)
+            encode: تبدیل مقدار به فیلدهای hash (حداقل یک فیلد، حتی برای مقدار خالی)
+            decode: تبدیل فیلدهای hash به مقدار
+            local_ttl_seconds: TTL کش درون‌پردازه‌ای
+            redis_ttl: TTL hash و کلید نسخه در Redis
+            client: Redis client (پیش‌فرض client مشترک)
+        """
+        self._name = name
+        self._key_prefix = key_prefix
+        self._load_from_db = load
+        self._encode = encode
+        self._decode = decode
+        self._redis_ttl = redis_ttl
+        self._client = client
+        self._local: AsyncTTLCache[T] = AsyncTTLCache(ttl_seconds=local_ttl_seconds)
+
+    def key_for(self, item_id: int) -> str:
+        """نام کلید Redis یک شناسه."""
+        return f"{self._key_prefix}:{item_id}"
+
+    async def get(self, db, item_id: int) -> T:
+        """مقدار یک شناسه از کش محلی، Redis یا دیتابیس."""
+        return await self._local.get_or_compute(
+            item_id,
+            lambda: self._load(db, item_id),
+            tag=item_id
+        )
+
+    async def invalidate(self, *item_ids: int) -> None:
+        """باطل کردن مقدار شناسه‌ها (پس از commit تغییر)."""
+        for item_id in item_ids:
+            self._local.invalidate_tag(item_id)
+        if not item_ids:
+            return
+        try:
+            await delete_and_bump_versions(
+                self._get_client(), [self.key_for(item_id) for item_id in item_ids], self._redis_ttl
+            )
+        except Exception as e:
+            logger.warning(f"{self._name} cache invalidation failed for {list(item_ids)}: {e}")
+
+    async def _load(self, db, item_id: int) -> T:
+        key = self.key_for(item_id)
+        try:
+            fields = await self._get_client().hgetall(key)
+        except Exception as e:
+            logger.warning(f"{self._name} cache read failed, using database: {e}")
+            return await self._load_from_db(db, item_id)
+
+        if fields:
+            return self._decode(fields)
+
+        try:
+            version = await read_version(self._get_client(), key)
+        except Exception as e:
+            logger.warning(f"{self._name} cache version read failed, using database: {e}")
+            version = None
+
+        value = await self._load_from_db(db, item_id)
+        if version is None:
+            return value
+        try:
+            await store_hash_if_unchanged(
+                self._get_client(), key, version, self._encode(value), self._redis_ttl
+            )
+        except Exception as e:
+            logger.warning(f"{self._name} cache store failed for {item_id}: {e}")
+        return value
+
+    def _get_client(self) -> redis.Redis:
+        return self._client if self._client is not None else get_redis_client()
@@ -1,12 +1,21 @@
 """FastAPI application entry point."""
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from .core.config import get_settings
 from .core.rate_limit import init_rate_limiter
+from .core.background import background_queue
 from .core.database import close_db, get_db_session
+from .core.redis_client import close_redis, init_redis
+from .repositories.route_price_repo import route_price_matrix
+from .services.market_price_service import market_price_service
+from .services import notification_service
+from .services.message_partition_service import message_partition_service
+from .services.realtime_service import realtime_hub
+from .services.unread_counter_service import unread_counter_service
 from .utils.logger import logger
 from .utils.seed import run_startup_checks
 
@@ -23,6 +32,7 @@ async def lifespan(app: FastAPI):
     logger.info("Starting up Minila API...")
     init_rate_limiter(settings.REDIS_URL)
     logger.info("Rate limiter initialized")
+    await init_redis()
     
     # Run startup health checks and ensure admin exists
     try:
@@ -31,12 +41,39 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Startup checks failed: {e}")
     
+    # بارگذاری ماتریس قیمت مسیرها در حافظه
+    try:
+        async with get_db_session() as db:
+            await route_price_matrix.load(db)
+        logger.info("Route price matrix loaded")
+    except Exception as e:
+        logger.error(f"Route price matrix load failed: {e}")
+    
+    market_flush_task = asyncio.create_task(market_price_service.run_flush_loop())
+    unread_reconcile_task = asyncio.create_task(unread_counter_service.run_reconcile_loop())
+    partition_task = asyncio.create_task(message_partition_service.run_maintenance_loop())
+    notification_flush_task = asyncio.create_task(notification_service.run_flush_loop())
+    
     yield
     
     # Shutdown
     logger.info("Shutting down Minila API...")
+    for task in (market_flush_task, unread_reconcile_task, partition_task, notification_flush_task):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    try:
+        async with get_db_session() as db:
+            await market_price_service.flush(db)
+    except Exception as e:
+        logger.error(f"Final market price sketch flush failed: {e}")
+    
+    # تخلیه کارهای پس‌زمینه (ایمیل و لاگ پیام‌ها) قبل از بستن اتصال‌ها
+    await background_queue.stop()
+    await realtime_hub.close()
+    await close_redis()
     await close_db()
-    logger.info("Database connections closed")
+    logger.info("Redis and database connections closed")
 
 
 # ایجاد FastAPI app با metadata کامل
@@ -193,7 +230,7 @@ def root() -> dict[str, str]:
 
 # ==================== Router Registration ====================
 
-from .api.routers import auth, users, communities, cards, messages, locations, admin, reports
+from .api.routers import auth, users, communities, cards, messages, locations, admin, reports, realtime
 
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -203,6 +240,7 @@ app.include_router(messages.router)
 app.include_router(locations.router)
 app.include_router(admin.router)
 app.include_router(reports.router)
+app.include_router(realtime.router)
 
 logger.info("All routers registered successfully")
 
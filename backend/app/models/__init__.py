@@ -25,10 +25,11 @@ from .card import Card, CardCommunity
 from .card_view import CardView
 
 # Pricing models
-from .route_price import RoutePrice
+from .route_price import RoutePrice, RoutePriceSketch
 
-# Message model
+# Message models
 from .message import Message
+from .conversation import Conversation
 
 # Security models
 from .user_block import UserBlock
@@ -38,6 +39,9 @@ from .log import Log
 # Alert model
 from .alert import Alert
 
+# Email outbox model
+from .email_outbox import EmailOutbox
+
 
 __all__ = [
     # Base
@@ -67,12 +71,16 @@ __all__ = [
     "CardView",
     # Pricing
     "RoutePrice",
+    "RoutePriceSketch",
     # Message
     "Message",
+    "Conversation",
     # Security
     "UserBlock",
     "Report",
     "Log",
     # Alert
     "Alert",
+    # Email outbox
+    "EmailOutbox",
 ]
@@ -1,7 +1,9 @@
 """Alert model for admin notifications and monitoring."""
+from datetime import datetime
 from typing import Optional
-from sqlalchemy import String, Text, Boolean, Index, JSON
+from sqlalchemy import String, Text, Boolean, Index, JSON, Integer, DateTime, text
 from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
 from .base import BaseModel
 
 
@@ -13,6 +15,10 @@ class Alert(BaseModel):
         Index("ix_alert_type_created", "type", "created_at"),
         Index("ix_alert_priority_read", "priority", "is_read"),
         Index("ix_alert_created_at", "created_at"),
+        Index(
+            "ix_alert_fingerprint_seen", "fingerprint", "last_seen_at",
+            postgresql_where=text("fingerprint IS NOT NULL"),
+        ),
     )
     
     # نوع هشدار: error, security, report, user, card, membership
@@ -34,6 +40,16 @@ class Alert(BaseModel):
     # آیا ایمیل ارسال شده؟
     email_sent: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     
+    # تجمیع هشدارهای تکراری: hash نوع، الگوی عنوان و metadata کلیدی
+    fingerprint: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    occurrences: Mapped[int] = mapped_column(Integer, default=1, server_default="1", nullable=False)
+    last_seen_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    
+    # زمان آخرین ایمیل فوری (محدودیت ایمیل برای هر fingerprint)
+    last_emailed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    
     def __repr__(self) -> str:
         return f"<Alert(id={self.id}, type={self.type}, priority={self.priority})>"
 
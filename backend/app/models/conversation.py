@@ -0,0 +1,63 @@
+"""Conversation model."""
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import CheckConstraint, DateTime, ForeignKey, Index, Integer, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from .base import BaseModel
+
+
+class Conversation(BaseModel):
+    """مکالمه بین دو کاربر (خلاصه denormalized از جدول message).
+    
+    هر جفت کاربر یک ردیف دارد با user_a_id < user_b_id. ردیف هنگام ارسال
+    پیام و خواندن مکالمه در همان تراکنش به‌روز می‌شود تا لیست مکالمات و
+    تعداد خوانده‌نشده‌ها بدون پیمایش تاریخچه پیام‌ها خوانده شوند.
+    """
+    
+    __tablename__ = "conversation"
+    __table_args__ = (
+        CheckConstraint("user_a_id < user_b_id", name="check_conversation_user_order"),
+        UniqueConstraint("user_a_id", "user_b_id", name="uq_conversation_users"),
+        Index("ix_conversation_user_a_last", "user_a_id", "last_message_at"),
+        Index("ix_conversation_user_b_last", "user_b_id", "last_message_at"),
+    )
+    
+    # Foreign Keys (user_a_id همیشه کوچک‌تر است)
+    user_a_id: Mapped[int] = mapped_column(
+        ForeignKey("user.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    user_b_id: Mapped[int] = mapped_column(
+        ForeignKey("user.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    # بدون foreign key: کلید یکتای جدول partition شده message شامل created_at
+    # است؛ (last_message_id, last_message_at) پیام را در message یا message_archive مشخص می‌کند
+    last_message_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    
+    # Fields
+    last_message_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    unread_a: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False,
+        comment="پیام‌های خوانده نشده user_a (ارسالی از user_b)"
+    )
+    unread_b: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", nullable=False,
+        comment="پیام‌های خوانده نشده user_b (ارسالی از user_a)"
+    )
+    
+    # Relationships
+    last_message: Mapped[Optional["Message"]] = relationship(
+        "Message",
+        primaryjoin="foreign(Conversation.last_message_id) == Message.id",
+        lazy="select",
+        viewonly=True
+    )
+    
+    @staticmethod
+    def ordered_pair(user_id: int, other_user_id: int) -> tuple[int, int]:
+        """(user_a_id, user_b_id) برای دو کاربر."""
+        return (user_id, other_user_id) if user_id < other_user_id else (other_user_id, user_id)
+    
+    def __repr__(self) -> str:
+        return f"<Conversation(id={self.id}, user_a_id={self.user_a_id}, user_b_id={self.user_b_id})>"
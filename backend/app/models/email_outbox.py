@@ -0,0 +1,62 @@
+"""Email outbox model - صف پایدار ایمیل‌های خروجی."""
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text, text
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+from .base import BaseModel
+
+
+class EmailOutbox(BaseModel):
+    """ایمیل در صف ارسال.
+
+    در همان تراکنش درخواست ثبت می‌شود و worker ایمیل
+    (scripts/email_worker.py) آن را ارسال می‌کند.
+    """
+
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # فقط ردیف‌های در انتظار؛ ترتیب claim کردن worker
+        Index(
+            "ix_email_outbox_pending",
+            "next_attempt_at",
+            postgresql_where=text("status = 'pending'"),
+        ),
+        Index("ix_email_outbox_status_updated", "status", "updated_at"),
+        # وضعیت ارسال هر گیرنده یک هشدار
+        Index(
+            "ix_email_outbox_alert",
+            "alert_id",
+            postgresql_where=text("alert_id IS NOT NULL"),
+        ),
+    )
+
+    to_email: Mapped[str] = mapped_column(String(255), nullable=False)
+    subject: Mapped[str] = mapped_column(Text, nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+
+    # نوع ایمیل (نام template یا alert/digest) برای لاگ و آمار
+    kind: Mapped[str] = mapped_column(String(50), nullable=False)
+
+    # هشداری که این ایمیل برای آن ارسال شده (ایمیل فوری هشدار به هر ادمین)
+    alert_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("alert.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+
+    # وضعیت: pending, sent, dead
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")
+
+    # تعداد تلاش‌ها و زمان تلاش بعدی (برای ردیف claim شده: پایان lease)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False,
+    )
+
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    sent_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<EmailOutbox(id={self.id}, kind={self.kind}, status={self.status})>"
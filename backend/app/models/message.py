@@ -1,20 +1,34 @@
 """Message model."""
 from typing import Optional
 from datetime import datetime
-from sqlalchemy import CheckConstraint, ForeignKey, Index, String, Text
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from .base import BaseModel
+from sqlalchemy import (
+    Boolean, CheckConstraint, Column, DateTime, ForeignKey, Index, Integer, String, Table, Text, func
+)
+from sqlalchemy.orm import Mapped, aliased, mapped_column, relationship
+from .base import Base, BaseModel
+from ..utils.text_search import search_vector
 
 
 class Message(BaseModel):
-    """مدل پیام بین کاربران."""
+    """مدل پیام بین کاربران.
+    
+    در Postgres جدول message بر اساس created_at به صورت ماهانه partition
+    شده است (migration `013`) و فقط ماه‌های اخیر (tier داغ) را نگه می‌دارد؛
+    partitionهای قدیمی‌تر به message_archive منتقل می‌شوند.
+    """
     
     __tablename__ = "message"
     __table_args__ = (
         CheckConstraint("sender_id != receiver_id", name="check_sender_not_receiver"),
         Index("ix_message_receiver_created", "receiver_id", "created_at"),
         Index("ix_message_sender_created", "sender_id", "created_at"),
-        Index("ix_message_is_read", "is_read"),
+        # فقط پیام‌های خوانده نشده (برای mark_as_read)
+        Index(
+            "ix_message_unread",
+            "receiver_id",
+            "sender_id",
+            postgresql_where="NOT is_read",
+        ),
     )
     
     # Foreign Keys
@@ -48,3 +62,45 @@ class Message(BaseModel):
     def __repr__(self) -> str:
         return f"<Message(id={self.id}, sender_id={self.sender_id}, receiver_id={self.receiver_id})>"
 
+
+
+# هر دو جهت یک مکالمه کلید (least, greatest) یکسان دارند؛
+# صفحه مکالمه یک index range scan مرتب است
+Index(
+    "ix_message_pair_created",
+    func.least(Message.sender_id, Message.receiver_id),
+    func.greatest(Message.sender_id, Message.receiver_id),
+    Message.created_at,
+)
+
+# جستجوی متن پیام‌ها (GIN روی tsvector متن یکسان‌سازی شده)
+Index("ix_message_body_search", search_vector(Message.body), postgresql_using="gin")
+
+
+# tier سرد: partitionهای ماهانه قدیمی با همان ستون‌ها و فقط indexهای مکالمه و جستجو
+# (پیام‌های آرشیو شده فقط از صفحه‌بندی مکالمه، جستجو و آخرین پیام مکالمات خوانده می‌شوند)
+message_archive = Table(
+    "message_archive",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("sender_id", ForeignKey("user.id", ondelete="CASCADE"), nullable=False),
+    Column("receiver_id", ForeignKey("user.id", ondelete="CASCADE"), nullable=False),
+    Column("body", Text, nullable=False),
+    Column("is_read", Boolean, nullable=False),
+    Column("read_at", DateTime, nullable=True),
+    Column("status", String(20), nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+)
+
+Index(
+    "ix_message_archive_pair_created",
+    func.least(message_archive.c.sender_id, message_archive.c.receiver_id),
+    func.greatest(message_archive.c.sender_id, message_archive.c.receiver_id),
+    message_archive.c.created_at,
+)
+
+Index("ix_message_archive_body_search", search_vector(message_archive.c.body), postgresql_using="gin")
+
+# Message روی جدول آرشیو (نتایج نمونه‌های Message هستند؛ فقط برای خواندن)
+ArchivedMessage = aliased(Message, message_archive, name="archived_message", adapt_on_names=True)
@@ -1,7 +1,7 @@
 """RoutePrice model for storing base flight prices between cities."""
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Float, ForeignKey, Index, String, DateTime, UniqueConstraint
+from sqlalchemy import Float, ForeignKey, Index, Integer, JSON, String, DateTime, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .base import BaseModel
 
@@ -66,3 +66,37 @@ class RoutePrice(BaseModel):
     
     def __repr__(self) -> str:
         return f"<RoutePrice(origin={self.origin_city_id}, dest={self.destination_city_id}, price=${self.base_ticket_price_usd})>"
+
+
+class RoutePriceSketch(BaseModel):
+    """خلاصه کوانتایل (t-digest) قیمت‌های ثبت‌شده کاربران برای یک مسیر."""
+    
+    __tablename__ = "route_price_sketch"
+    __table_args__ = (
+        UniqueConstraint("origin_city_id", "destination_city_id", name="uq_route_price_sketch_cities"),
+    )
+    
+    # Foreign Keys
+    origin_city_id: Mapped[int] = mapped_column(
+        ForeignKey("city.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    destination_city_id: Mapped[int] = mapped_column(
+        ForeignKey("city.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    
+    # Serialized TDigest (app.utils.tdigest)
+    digest: Mapped[dict] = mapped_column(
+        JSON,
+        nullable=False,
+        comment="Serialized t-digest of card price_per_kg (USD)"
+    )
+    sample_count: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+    )
+    
+    def __repr__(self) -> str:
+        return f"<RoutePriceSketch(origin={self.origin_city_id}, dest={self.destination_city_id}, n={self.sample_count})>"
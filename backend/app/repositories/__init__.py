@@ -5,7 +5,8 @@ from . import (
     membership_repo,
     card_repo,
     message_repo,
-    admin_repo
+    admin_repo,
+    user_block_repo
 )
 
 __all__ = [
@@ -14,5 +15,6 @@ __all__ = [
     "membership_repo",
     "card_repo",
     "message_repo",
-    "admin_repo"
+    "admin_repo",
+    "user_block_repo"
 ]
@@ -9,7 +9,7 @@ from ..models.user import User
 from ..models.community import Community
 from ..models.membership import Membership, Request
 from ..models.card import Card
-from ..models.message import Message
+from ..models.message import Message, message_archive
 from ..models.report import Report
 from ..models.log import Log
 
@@ -49,7 +49,12 @@ async def get_dashboard_stats(db: AsyncSession) -> dict:
     cards_stats = cards_result.one()
     
     # آمار پیام‌ها
-    messages_count = await db.scalar(select(func.count(Message.id)))
+    messages_count = await db.scalar(
+        select(
+            select(func.count(Message.id)).scalar_subquery()
+            + select(func.count()).select_from(message_archive).scalar_subquery()
+        )
+    )
     
     # درخواست‌های در انتظار
     pending_requests = await db.scalar(
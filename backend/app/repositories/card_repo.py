@@ -1,5 +1,5 @@
 """Card repository برای دسترسی به دیتابیس."""
-from typing import Optional
+from typing import AsyncIterator, Optional
 from datetime import datetime
 from sqlalchemy import select, update, delete, func, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -379,3 +379,47 @@ async def get_by_owner_id(
     
     return cards, total
 
+
+async def stream_pricing_history(
+    db: AsyncSession,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = 5000
+) -> AsyncIterator[tuple]:
+    """استریم ستون‌های قیمت‌گذاری کارت‌ها به ترتیب زمان ایجاد (برای backtest).
+    
+    فقط ستون‌های لازم خوانده می‌شوند و ردیف‌ها به صورت دسته‌ای
+    (server-side cursor) دریافت می‌شوند تا حافظه ثابت بماند.
+    
+    Args:
+        db: Database session
+        since: حداقل زمان ایجاد
+        until: حداکثر زمان ایجاد (انحصاری)
+        batch_size: تعداد ردیف در هر fetch
+        
+    Yields:
+        (origin_city_id, destination_city_id, is_sender, created_at,
+        ticket_date_time, start_time_frame, end_time_frame, weight,
+        price_per_kg, currency)
+    """
+    query = select(
+        Card.origin_city_id,
+        Card.destination_city_id,
+        Card.is_sender,
+        Card.created_at,
+        Card.ticket_date_time,
+        Card.start_time_frame,
+        Card.end_time_frame,
+        Card.weight,
+        Card.price_per_kg,
+        Card.currency,
+    )
+    if since is not None:
+        query = query.where(Card.created_at >= since)
+    if until is not None:
+        query = query.where(Card.created_at < until)
+    query = query.order_by(Card.created_at, Card.id).execution_options(yield_per=batch_size)
+    
+    result = await db.stream(query)
+    async for row in result:
+        yield tuple(row)
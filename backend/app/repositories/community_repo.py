@@ -76,6 +76,34 @@ async def get_by_id(
     return result.scalar_one_or_none()
 
 
+async def get_by_ids(
+    db: AsyncSession,
+    community_ids: list[int]
+) -> list[Community]:
+    """دریافت چند کامیونیتی با ID (به ترتیب ID).
+    
+    Args:
+        db: Database session
+        community_ids: شناسه کامیونیتی‌ها
+        
+    Returns:
+        لیست کامیونیتی‌های موجود
+    """
+    if not community_ids:
+        return []
+    query = (
+        select(Community)
+        .where(Community.id.in_(community_ids))
+        .options(
+            selectinload(Community.avatar),
+            selectinload(Community.owner)
+        )
+        .order_by(Community.id)
+    )
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
 async def get_by_name(
     db: AsyncSession,
     name: str
@@ -323,6 +351,29 @@ async def get_member_count(db: AsyncSession, community_id: int) -> int:
     return result.scalar() or 0
 
 
+async def get_member_counts(db: AsyncSession, community_ids: list[int]) -> dict[int, int]:
+    """دریافت تعداد اعضای فعال چند کامیونیتی (یک کوئری GROUP BY).
+    
+    Args:
+        db: Database session
+        community_ids: شناسه کامیونیتی‌ها
+        
+    Returns:
+        dict از community_id به تعداد اعضای فعال
+    """
+    if not community_ids:
+        return {}
+    query = (
+        select(Membership.community_id, func.count(Membership.id))
+        .where(Membership.community_id.in_(community_ids))
+        .where(Membership.is_active == True)
+        .group_by(Membership.community_id)
+    )
+    result = await db.execute(query)
+    counts = dict(result.all())
+    return {community_id: counts.get(community_id, 0) for community_id in community_ids}
+
+
 async def get_managers_emails(
     db: AsyncSession,
     community_id: int
@@ -0,0 +1,205 @@
+"""EmailOutbox repository برای صف ایمیل‌های خروجی."""
+from datetime import datetime, timedelta
+from typing import Optional, Sequence
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.email_outbox import EmailOutbox
+
+PENDING = "pending"
+SENT = "sent"
+DEAD = "dead"
+
+
+async def enqueue(
+    db: AsyncSession,
+    to_email: str,
+    subject: str,
+    body: str,
+    kind: str,
+    alert_id: Optional[int] = None
+) -> EmailOutbox:
+    """افزودن ایمیل به outbox در تراکنش جاری (بدون commit).
+
+    Args:
+        db: Database session
+        to_email: آدرس گیرنده
+        subject: موضوع
+        body: متن
+        kind: نوع ایمیل (برای لاگ و آمار)
+        alert_id: هشدار مربوط (برای وضعیت ارسال هر گیرنده)
+
+    Returns:
+        EmailOutbox اضافه شده به session
+    """
+    entry = EmailOutbox(
+        to_email=to_email,
+        subject=subject,
+        body=body,
+        kind=kind,
+        alert_id=alert_id,
+        status=PENDING,
+        attempts=0,
+    )
+    db.add(entry)
+    return entry
+
+
+async def enqueue_many(
+    db: AsyncSession,
+    to_emails: Sequence[str],
+    subject: str,
+    body: str,
+    kind: str,
+    alert_id: Optional[int] = None
+) -> list[EmailOutbox]:
+    """افزودن یک ایمیل برای چند گیرنده (یک ردیف برای هر گیرنده، بدون commit).
+
+    Returns:
+        لیست EmailOutbox اضافه شده به session
+    """
+    entries = [
+        EmailOutbox(
+            to_email=to_email,
+            subject=subject,
+            body=body,
+            kind=kind,
+            alert_id=alert_id,
+            status=PENDING,
+            attempts=0,
+        )
+        for to_email in dict.fromkeys(to_emails)
+    ]
+    db.add_all(entries)
+    return entries
+
+
+async def claim_batch(db: AsyncSession, limit: int, lease_seconds: int) -> list[EmailOutbox]:
+    """claim کردن ایمیل‌های آماده ارسال (بدون commit).
+
+    ردیف‌ها با FOR UPDATE SKIP LOCKED انتخاب می‌شوند تا چند worker هم‌زمان
+    ردیف تکراری برندارند؛ attempts یکی زیاد و next_attempt_at به پایان lease
+    منتقل می‌شود. اگر worker قبل از ثبت نتیجه متوقف شود، ردیف پس از lease
+    دوباره claim می‌شود.
+
+    Args:
+        db: Database session
+        limit: حداکثر تعداد
+        lease_seconds: مدت lease
+
+    Returns:
+        لیست EmailOutbox claim شده
+    """
+    candidates = (
+        select(EmailOutbox.id)
+        .where(EmailOutbox.status == PENDING, EmailOutbox.next_attempt_at <= func.now())
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    query = (
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(candidates))
+        .values(
+            attempts=EmailOutbox.attempts + 1,
+            next_attempt_at=func.now() + timedelta(seconds=lease_seconds),
+        )
+        .returning(EmailOutbox)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+async def mark_sent(db: AsyncSession, ids: list[int]) -> None:
+    """علامت‌گذاری ایمیل‌ها به عنوان ارسال شده (بدون commit)."""
+    if not ids:
+        return
+    await db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(ids))
+        .values(status=SENT, sent_at=func.now(), last_error=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def mark_retry(db: AsyncSession, entry_id: int, error: str, delay_seconds: float) -> None:
+    """زمان‌بندی تلاش بعدی یک ایمیل ناموفق (بدون commit)."""
+    await db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id == entry_id)
+        .values(
+            next_attempt_at=func.now() + timedelta(seconds=delay_seconds),
+            last_error=error,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def mark_dead(db: AsyncSession, entry_id: int, error: str) -> None:
+    """انتقال ایمیل به dead letter (بدون commit)."""
+    await db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id == entry_id)
+        .values(status=DEAD, last_error=error)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def requeue_dead(db: AsyncSession) -> int:
+    """بازگرداندن dead letterها به صف با شمارنده تلاش صفر (بدون commit).
+
+    Returns:
+        تعداد ردیف‌های بازگردانده شده
+    """
+    result = await db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.status == DEAD)
+        .values(status=PENDING, attempts=0, next_attempt_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def purge_sent(db: AsyncSession, before: datetime) -> int:
+    """حذف ایمیل‌های ارسال شده قدیمی‌تر از before (بدون commit).
+
+    Returns:
+        تعداد ردیف‌های حذف شده
+    """
+    result = await db.execute(
+        delete(EmailOutbox)
+        .where(EmailOutbox.status == SENT, EmailOutbox.updated_at < before)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+async def count_by_status(db: AsyncSession) -> dict[str, int]:
+    """تعداد ایمیل‌ها به تفکیک وضعیت.
+
+    Returns:
+        dict وضعیت → تعداد (وضعیت‌های بدون ردیف صفر)
+    """
+    result = await db.execute(
+        select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status)
+    )
+    counts = {PENDING: 0, SENT: 0, DEAD: 0}
+    counts.update({status: count for status, count in result.all()})
+    return counts
+
+
+async def list_for_alert(db: AsyncSession, alert_id: int) -> list[EmailOutbox]:
+    """ایمیل‌های یک هشدار (یک ردیف برای هر گیرنده).
+
+    ایمیل‌های ارسال شده پس از EMAIL_OUTBOX_RETENTION_DAYS حذف می‌شوند.
+
+    Returns:
+        لیست EmailOutbox به ترتیب ثبت
+    """
+    result = await db.execute(
+        select(EmailOutbox)
+        .where(EmailOutbox.alert_id == alert_id)
+        .order_by(EmailOutbox.id)
+    )
+    return list(result.scalars().all())
@@ -34,6 +34,57 @@ async def get_user_memberships(
     return list(result.scalars().all())
 
 
+async def get_user_roles(
+    db: AsyncSession,
+    user_ids: list[int]
+) -> dict[int, dict[int, str]]:
+    """دریافت نقش کاربران در همه کامیونیتی‌هایشان (یک کوئری).
+    
+    Args:
+        db: Database session
+        user_ids: شناسه کاربران
+        
+    Returns:
+        dict از user_id به dict (community_id → نام نقش) برای عضویت‌های فعال
+    """
+    roles: dict[int, dict[int, str]] = {user_id: {} for user_id in user_ids}
+    if not user_ids:
+        return roles
+    
+    query = (
+        select(Membership.user_id, Membership.community_id, Role.name)
+        .join(Role, Membership.role_id == Role.id)
+        .where(Membership.user_id.in_(user_ids))
+        .where(Membership.is_active == True)
+    )
+    result = await db.execute(query)
+    for user_id, community_id, role_name in result.all():
+        roles[user_id][community_id] = role_name
+    return roles
+
+
+async def get_member_user_ids(
+    db: AsyncSession,
+    community_id: int
+) -> list[int]:
+    """دریافت شناسه همه اعضای فعال یک کامیونیتی.
+    
+    Args:
+        db: Database session
+        community_id: شناسه کامیونیتی
+        
+    Returns:
+        لیست user_id اعضا
+    """
+    query = (
+        select(Membership.user_id)
+        .where(Membership.community_id == community_id)
+        .where(Membership.is_active == True)
+    )
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
 async def get_membership(
     db: AsyncSession,
     user_id: int,
@@ -0,0 +1,148 @@
+"""Message partition repository - DDL partitionهای ماهانه message و message_archive.
+
+هر partition ماهانه message_pYYYYMM نام دارد و بازه [اول ماه، اول ماه بعد)
+به وقت UTC را پوشش می‌دهد. دستورات DDL پارامتر bind نمی‌پذیرند؛ نام‌ها و
+بازه‌ها فقط از تاریخ ساخته می‌شوند.
+"""
+import re
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+HOT_TABLE = "message"
+ARCHIVE_TABLE = "message_archive"
+
+PARTITION_PREFIX = "message_p"
+_PARTITION_NAME = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+
+
+def month_start(value: date) -> date:
+    """اول ماه یک تاریخ."""
+    return value.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    """اول ماه months ماه بعد (یا قبل با مقدار منفی)."""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    """نام partition یک ماه (message_pYYYYMM)."""
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """ماه یک partition از روی نام (None برای جدول‌های دیگر)."""
+    match = _PARTITION_NAME.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def _bounds(month: date) -> str:
+    return f"FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{add_months(month, 1):%Y-%m-%d} 00:00:00+00')"
+
+
+async def list_partitions(conn: AsyncConnection, parent: str) -> dict[date, bool]:
+    """partitionهای ماهانه یک جدول.
+
+    Args:
+        conn: اتصال دیتابیس
+        parent: message یا message_archive
+
+    Returns:
+        dict از ماه partition به اینکه detach آن نیمه‌کاره مانده است
+    """
+    result = await conn.execute(
+        text(
+            "SELECT c.relname, i.inhdetachpending "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:parent AS regclass)"
+        ),
+        {"parent": parent}
+    )
+    partitions = {}
+    for name, detach_pending in result.all():
+        month = partition_month(name)
+        if month is not None:
+            partitions[month] = detach_pending
+    return partitions
+
+
+async def list_detached(conn: AsyncConnection) -> list[date]:
+    """partitionهایی که از message جدا شده ولی هنوز به آرشیو متصل نشده‌اند."""
+    result = await conn.execute(
+        text(
+            "SELECT relname FROM pg_class "
+            "WHERE relkind = 'r' AND NOT relispartition AND relname LIKE :prefix"
+        ),
+        {"prefix": f"{PARTITION_PREFIX}%"}
+    )
+    months = (partition_month(name) for name in result.scalars().all())
+    return sorted(month for month in months if month is not None)
+
+
+async def create_partition(conn: AsyncConnection, month: date) -> None:
+    """ساخت partition یک ماه در message (indexهای parent خودکار ساخته می‌شوند)."""
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} "
+        f"PARTITION OF {HOT_TABLE} FOR VALUES {_bounds(month)}"
+    ))
+
+
+async def detach_partition(conn: AsyncConnection, month: date, finalize: bool = False) -> None:
+    """جدا کردن partition از message بدون قفل کردن جدول (خارج از تراکنش).
+
+    DETACH CONCURRENTLY یک CHECK معادل بازه partition اضافه می‌کند، پس
+    ATTACH بعدی به آرشیو جدول را scan نمی‌کند.
+
+    Args:
+        conn: اتصال AUTOCOMMIT
+        month: ماه partition
+        finalize: تکمیل detach نیمه‌کاره قبلی
+    """
+    mode = "FINALIZE" if finalize else "CONCURRENTLY"
+    await conn.execute(text(
+        f"ALTER TABLE {HOT_TABLE} DETACH PARTITION {partition_name(month)} {mode}"
+    ))
+
+
+async def attach_to_archive(conn: AsyncConnection, month: date, tablespace: Optional[str] = None) -> None:
+    """انتقال partition جدا شده به tier آرشیو (در یک تراکنش).
+
+    indexهای مخصوص tier داغ (inbox، ارسالی، خوانده نشده) حذف می‌شوند و فقط
+    primary key و indexهای مکالمه و جستجو می‌مانند. با tablespace، جدول و indexها به
+    فضای ذخیره‌سازی آرشیو (مثلاً روی فایل‌سیستم فشرده) منتقل و بازنویسی می‌شوند.
+    """
+    name = partition_name(month)
+    result = await conn.execute(
+        text(
+            "SELECT CAST(indexrelid AS regclass)::text FROM pg_index "
+            "WHERE indrelid = CAST(:name AS regclass) AND NOT indisprimary "
+            "AND pg_get_indexdef(indexrelid) NOT LIKE '%least(%' "
+            "AND pg_get_indexdef(indexrelid) NOT LIKE '%to_tsvector(%'"
+        ),
+        {"name": name}
+    )
+    for index_name in result.scalars().all():
+        await conn.execute(text(f"DROP INDEX {index_name}"))
+
+    if tablespace:
+        tablespace = conn.dialect.identifier_preparer.quote(tablespace)
+        await conn.execute(text(f"ALTER TABLE {name} SET TABLESPACE {tablespace}"))
+        result = await conn.execute(
+            text("SELECT CAST(indexrelid AS regclass)::text FROM pg_index WHERE indrelid = CAST(:name AS regclass)"),
+            {"name": name}
+        )
+        for index_name in result.scalars().all():
+            await conn.execute(text(f"ALTER INDEX {index_name} SET TABLESPACE {tablespace}"))
+
+    await conn.execute(text(
+        f"ALTER TABLE {ARCHIVE_TABLE} ATTACH PARTITION {name} FOR VALUES {_bounds(month)}"
+    ))
+
+
+async def freeze_partition(conn: AsyncConnection, month: date) -> None:
+    """VACUUM FREEZE یک partition آرشیو شده (خارج از تراکنش)."""
+    await conn.execute(text(f"VACUUM (FREEZE, ANALYZE) {partition_name(month)}"))
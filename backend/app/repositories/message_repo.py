@@ -1,10 +1,21 @@
 """Message repository برای دسترسی به دیتابیس."""
 from datetime import datetime
-from sqlalchemy import select, func, update
+from typing import Collection, Optional
+from sqlalchemy import select, func, update, case, and_, or_, tuple_, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from ..models.message import Message
+from sqlalchemy.orm import aliased, selectinload
+from ..models.message import ArchivedMessage, Message, message_archive
+from ..models.conversation import Conversation
 from ..utils.pagination import calculate_offset
+from ..utils.text_search import search_query, search_vector
+
+
+# پیام‌های هر دو tier (داغ و آرشیو)؛ فقط برای خواندن آخرین پیام مکالمات
+_all_messages = union_all(
+    select(*Message.__table__.c),
+    select(*(message_archive.c[column.name] for column in Message.__table__.c))
+).subquery("message_all")
 
 
 async def create(
@@ -34,10 +45,12 @@ async def create(
     await db.flush()
     await db.refresh(message)
     
-    # بازگرفتن پیام با relationshipها
+    await _touch_conversation(db, message)
+    
+    # بازگرفتن پیام با relationshipها (created_at فقط partition همین ماه را می‌خواند)
     query = (
         select(Message)
-        .where(Message.id == message.id)
+        .where(Message.id == message.id, Message.created_at == message.created_at)
         .options(
             selectinload(Message.sender),
             selectinload(Message.receiver)
@@ -47,6 +60,42 @@ async def create(
     return result.scalar_one()
 
 
+async def _touch_conversation(db: AsyncSession, message: Message) -> None:
+    """به‌روزرسانی ردیف conversation برای پیام جدید (در همان تراکنش).
+    
+    آخرین پیام جایگزین و شمارنده خوانده‌نشده گیرنده یک واحد اضافه می‌شود.
+    """
+    user_a_id, user_b_id = Conversation.ordered_pair(message.sender_id, message.receiver_id)
+    receiver_is_a = message.receiver_id == user_a_id
+    
+    stmt = pg_insert(Conversation).values(
+        user_a_id=user_a_id,
+        user_b_id=user_b_id,
+        last_message_id=message.id,
+        last_message_at=message.created_at,
+        unread_a=1 if receiver_is_a else 0,
+        unread_b=0 if receiver_is_a else 1,
+    )
+    unread_column = "unread_a" if receiver_is_a else "unread_b"
+    # پیامی که دیرتر commit شود نباید آخرین پیام جدیدتر را جایگزین کند
+    is_newer = stmt.excluded.last_message_at >= Conversation.last_message_at
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_conversation_users",
+        set_={
+            "last_message_id": case(
+                (is_newer, stmt.excluded.last_message_id),
+                else_=Conversation.last_message_id
+            ),
+            "last_message_at": func.greatest(
+                stmt.excluded.last_message_at, Conversation.last_message_at
+            ),
+            unread_column: getattr(Conversation, unread_column) + 1,
+            "updated_at": func.now(),
+        }
+    )
+    await db.execute(stmt)
+
+
 async def get_inbox(
     db: AsyncSession,
     user_id: int,
@@ -140,6 +189,9 @@ async def get_conversation(
 ) -> tuple[list[Message], int]:
     """دریافت تمام پیام‌های رد و بدل شده بین دو کاربر (conversation).
     
+    پیام‌های tier داغ (message) جدیدتر از همه پیام‌های آرشیو هستند؛ آرشیو
+    فقط وقتی خوانده می‌شود که صفحه از انتهای tier داغ عبور کند.
+    
     Args:
         db: Database session
         user_id: شناسه کاربر اول
@@ -150,110 +202,328 @@ async def get_conversation(
     Returns:
         tuple از (لیست پیام‌ها، تعداد کل)
     """
-    from sqlalchemy import or_, and_
-    
     # پیام‌هایی که بین این دو کاربر رد و بدل شده
-    condition = or_(
-        and_(Message.sender_id == user_id, Message.receiver_id == other_user_id),
-        and_(Message.sender_id == other_user_id, Message.receiver_id == user_id)
-    )
+    condition = _pair_condition(user_id, other_user_id)
+    archive_condition = _pair_condition(user_id, other_user_id, ArchivedMessage)
     
-    # Count total
-    count_query = select(func.count(Message.id)).where(condition)
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
+    # Count total (هر دو tier در یک کوئری؛ index-only روی index مکالمه)
+    count_query = select(
+        select(func.count()).select_from(Message).where(condition).scalar_subquery(),
+        select(func.count()).select_from(ArchivedMessage).where(archive_condition).scalar_subquery()
+    )
+    hot_total, archive_total = (await db.execute(count_query)).one()
+    total = hot_total + archive_total
     
     # Fetch messages
     offset = calculate_offset(page, page_size)
-    query = (
-        select(Message)
-        .where(condition)
-        .options(
-            selectinload(Message.sender),
-            selectinload(Message.receiver)
+    messages: list[Message] = []
+    if offset < hot_total:
+        query = (
+            _select_messages(Message)
+            .where(condition)
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(page_size)
+            .offset(offset)
         )
-        .order_by(Message.created_at.desc(), Message.id.desc())
-        .limit(page_size)
-        .offset(offset)
-    )
+        result = await db.execute(query)
+        messages = list(result.scalars().all())
     
-    result = await db.execute(query)
-    messages = list(result.scalars().all())
+    remaining = page_size - len(messages)
+    if remaining > 0 and archive_total:
+        query = (
+            _select_messages(ArchivedMessage)
+            .where(archive_condition)
+            .order_by(ArchivedMessage.created_at.desc(), ArchivedMessage.id.desc())
+            .limit(remaining)
+            .offset(max(offset - hot_total, 0))
+        )
+        result = await db.execute(query)
+        messages.extend(result.scalars().all())
     
     return messages, total
 
 
-async def get_conversations(
+async def get_inbox_by_cursor(
     db: AsyncSession,
-    user_id: int
-) -> list[dict]:
-    """دریافت لیست مکالمات کاربر با آخرین پیام و تعداد پیام‌های خوانده نشده.
+    user_id: int,
+    page_size: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None
+) -> tuple[list[Message], bool]:
+    """دریافت پیام‌های دریافتی قبل یا بعد از یک پیام (keyset روی ix_message_receiver_created).
     
     Args:
         db: Database session
         user_id: شناسه کاربر
+        page_size: تعداد آیتم در صفحه
+        before_id: پیام‌های قدیمی‌تر از این پیام (جدیدترین اول)
+        after_id: پیام‌های جدیدتر از این پیام (قدیمی‌ترین اول)
         
     Returns:
-        لیست dictionary شامل اطلاعات هر مکالمه
+        tuple از (لیست پیام‌ها، آیا پیام دیگری در همین جهت هست)
     """
-    from sqlalchemy import or_, and_
-    from ..models.user import User
+    return await _get_page_by_cursor(
+        db, Message.receiver_id == user_id, page_size, before_id, after_id
+    )
+
+
+async def get_sent_by_cursor(
+    db: AsyncSession,
+    user_id: int,
+    page_size: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None
+) -> tuple[list[Message], bool]:
+    """دریافت پیام‌های ارسالی قبل یا بعد از یک پیام (keyset روی ix_message_sender_created).
+    
+    Args:
+        db: Database session
+        user_id: شناسه کاربر
+        page_size: تعداد آیتم در صفحه
+        before_id: پیام‌های قدیمی‌تر از این پیام (جدیدترین اول)
+        after_id: پیام‌های جدیدتر از این پیام (قدیمی‌ترین اول)
+        
+    Returns:
+        tuple از (لیست پیام‌ها، آیا پیام دیگری در همین جهت هست)
+    """
+    return await _get_page_by_cursor(
+        db, Message.sender_id == user_id, page_size, before_id, after_id
+    )
+
+
+async def get_conversation_by_cursor(
+    db: AsyncSession,
+    user_id: int,
+    other_user_id: int,
+    page_size: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None
+) -> tuple[list[Message], bool]:
+    """دریافت پیام‌های یک مکالمه قبل یا بعد از یک پیام (keyset روی ix_message_pair_created).
+    
+    Args:
+        db: Database session
+        user_id: شناسه کاربر اول
+        other_user_id: شناسه کاربر دوم
+        page_size: تعداد آیتم در صفحه
+        before_id: پیام‌های قدیمی‌تر از این پیام (جدیدترین اول)
+        after_id: پیام‌های جدیدتر از این پیام (قدیمی‌ترین اول)
+        
+    Returns:
+        tuple از (لیست پیام‌ها، آیا پیام دیگری در همین جهت هست)
+    """
+    return await _get_page_by_cursor(
+        db,
+        _pair_condition(user_id, other_user_id),
+        page_size,
+        before_id,
+        after_id,
+        archive_condition=_pair_condition(user_id, other_user_id, ArchivedMessage)
+    )
+
+
+async def search(
+    db: AsyncSession,
+    user_id: int,
+    query_text: str,
+    page_size: int,
+    before_id: Optional[int] = None
+) -> tuple[list[Message], bool]:
+    """جستجوی متن پیام‌های ارسالی و دریافتی کاربر (مرتب بر اساس امتیاز).
     
-    # یافتن تمام کاربرانی که با آن‌ها پیام رد و بدل شده
-    # برای هر کاربر، آخرین پیام و تعداد پیام‌های خوانده نشده
+    هر tier با GIN index جستجو (ix_message_body_search) خوانده و نتایج بر
+    اساس (امتیاز، id) ادغام می‌شوند. cursor یک پیام است: امتیاز آن برای همین
+    عبارت در همان کوئری محاسبه و keyset روی (امتیاز، id) اعمال می‌شود.
     
-    # ابتدا تمام پیام‌های مرتبط با کاربر را پیدا می‌کنیم
-    messages_query = (
-        select(Message)
-        .where(
-            or_(
-                Message.sender_id == user_id,
-                Message.receiver_id == user_id
+    Args:
+        db: Database session
+        user_id: شناسه کاربر
+        query_text: عبارت جستجو (نحو websearch)
+        page_size: تعداد آیتم در صفحه
+        before_id: نتایج بعد از این پیام (کم‌امتیازتر)
+        
+    Returns:
+        tuple از (لیست پیام‌ها، آیا نتیجه دیگری هست)
+    """
+    tsquery = search_query(query_text)
+    tiers = (Message, ArchivedMessage)
+    
+    cursor_rank = None
+    if before_id is not None:
+        cursor_rank = func.coalesce(*(
+            select(func.ts_rank_cd(search_vector(entity.body), tsquery))
+            .where(entity.id == before_id)
+            .scalar_subquery()
+            for entity in tiers
+        ))
+    
+    # یک ردیف اضافه از هر tier برای تشخیص وجود صفحه بعد
+    ranked: list[tuple[float, Message]] = []
+    for entity in tiers:
+        rank = func.ts_rank_cd(search_vector(entity.body), tsquery)
+        query = (
+            select(entity, rank)
+            .options(selectinload(entity.sender), selectinload(entity.receiver))
+            .where(
+                search_vector(entity.body).op("@@")(tsquery),
+                or_(entity.sender_id == user_id, entity.receiver_id == user_id)
             )
+            .order_by(rank.desc(), entity.id.desc())
+            .limit(page_size + 1)
         )
-        .options(
-            selectinload(Message.sender),
-            selectinload(Message.receiver)
-        )
-        .order_by(Message.created_at.desc())
+        if cursor_rank is not None:
+            query = query.where(tuple_(rank, entity.id) < tuple_(cursor_rank, before_id))
+        result = await db.execute(query)
+        ranked.extend((row_rank, message) for message, row_rank in result.all())
+    
+    ranked.sort(key=lambda item: (item[0], item[1].id), reverse=True)
+    messages = [message for _, message in ranked]
+    return messages[:page_size], len(messages) > page_size
+
+
+def _pair_condition(user_id: int, other_user_id: int, entity=Message):
+    """شرط پیام‌های بین دو کاربر به شکل قابل استفاده با index مکالمه (least, greatest, created_at)."""
+    low, high = sorted((user_id, other_user_id))
+    return and_(
+        func.least(entity.sender_id, entity.receiver_id) == low,
+        func.greatest(entity.sender_id, entity.receiver_id) == high
     )
+
+
+def _select_messages(entity):
+    """select پیام‌ها (Message یا ArchivedMessage) با فرستنده و گیرنده."""
+    return select(entity).options(
+        selectinload(entity.sender),
+        selectinload(entity.receiver)
+    )
+
+
+async def _get_page_by_cursor(
+    db: AsyncSession,
+    condition,
+    page_size: int,
+    before_id: Optional[int],
+    after_id: Optional[int],
+    archive_condition=None
+) -> tuple[list[Message], bool]:
+    """یک صفحه keyset روی (created_at, id) نسبت به پیام cursor.
+    
+    created_at پیام cursor در همان کوئری (subquery روی primary key) خوانده
+    می‌شود؛ cursor ناموجود صفحه خالی برمی‌گرداند. شرط صریح روی created_at
+    باعث می‌شود Postgres partitionهای خارج از بازه را هنگام اجرا حذف کند.
+    
+    با archive_condition، اگر صفحه در tier داغ کامل نشود ادامه آن از
+    message_archive خوانده می‌شود (برای after_id ترتیب tierها برعکس است).
+    """
+    cursor_id = before_id if before_id is not None else after_id
+    cursor_created_at = select(Message.created_at).where(Message.id == cursor_id).scalar_subquery()
+    tiers = [(Message, condition)]
+    if archive_condition is not None:
+        cursor_created_at = func.coalesce(
+            cursor_created_at,
+            select(ArchivedMessage.created_at).where(ArchivedMessage.id == cursor_id).scalar_subquery()
+        )
+        tiers.append((ArchivedMessage, archive_condition))
+        if after_id is not None:
+            tiers.reverse()
+    cursor_key = tuple_(cursor_created_at, cursor_id)
+    
+    # یک ردیف اضافه برای تشخیص وجود صفحه بعد (بدون count)
+    messages: list[Message] = []
+    for entity, tier_condition in tiers:
+        key = tuple_(entity.created_at, entity.id)
+        query = _select_messages(entity).where(tier_condition)
+        if before_id is not None:
+            query = query.where(
+                entity.created_at <= cursor_created_at, key < cursor_key
+            ).order_by(entity.created_at.desc(), entity.id.desc())
+        else:
+            query = query.where(
+                entity.created_at >= cursor_created_at, key > cursor_key
+            ).order_by(entity.created_at.asc(), entity.id.asc())
+        
+        result = await db.execute(query.limit(page_size + 1 - len(messages)))
+        messages.extend(result.scalars().all())
+        if len(messages) > page_size:
+            break
     
-    result = await db.execute(messages_query)
-    all_messages = list(result.scalars().all())
+    return messages[:page_size], len(messages) > page_size
+
+
+async def get_conversations(
+    db: AsyncSession,
+    user_id: int,
+    page: int = 1,
+    page_size: int = 20,
+    exclude_user_ids: Collection[int] = ()
+) -> tuple[list[dict], int]:
+    """دریافت لیست مکالمات کاربر با آخرین پیام و تعداد پیام‌های خوانده نشده (paginated).
     
-    # گروه‌بندی پیام‌ها بر اساس کاربر مقابل
-    conversations = {}
+    از جدول conversation خوانده می‌شود (یک ردیف برای هر کاربر مقابل)،
+    پس هزینه مستقل از تعداد پیام‌های کاربر است.
     
-    for message in all_messages:
-        # تشخیص کاربر مقابل
-        other_user_id = message.receiver_id if message.sender_id == user_id else message.sender_id
-        other_user = message.receiver if message.sender_id == user_id else message.sender
+    Args:
+        db: Database session
+        user_id: شناسه کاربر
+        page: شماره صفحه
+        page_size: تعداد آیتم در صفحه
+        exclude_user_ids: کاربران مقابلی که مکالمه‌شان نمایش داده نمی‌شود (بلاک‌شده‌ها)
         
-        if other_user_id not in conversations:
-            conversations[other_user_id] = {
-                'user': other_user,
-                'last_message': message,
-                'unread_count': 0
-            }
-    
-    # محاسبه تعداد پیام‌های خوانده نشده برای هر مکالمه
-    for other_user_id in conversations.keys():
-        count_query = select(func.count(Message.id)).where(
+    Returns:
+        tuple از (لیست dictionary شامل user، last_message و unread_count، تعداد کل مکالمات)
+    """
+    from ..models.user import User
+    
+    condition = or_(
+        Conversation.user_a_id == user_id,
+        Conversation.user_b_id == user_id
+    )
+    is_user_a = Conversation.user_a_id == user_id
+    other_user_id = case((is_user_a, Conversation.user_b_id), else_=Conversation.user_a_id)
+    if exclude_user_ids:
+        condition = and_(condition, other_user_id.not_in(list(exclude_user_ids)))
+    
+    # Count total
+    count_query = select(func.count(Conversation.id)).where(condition)
+    total_result = await db.execute(count_query)
+    total = total_result.scalar() or 0
+    
+    # Fetch conversations (آخرین پیام ممکن است آرشیو شده باشد؛ created_at
+    # در شرط join فقط partition همان ماه را در هر tier می‌خواند)
+    last_message = aliased(Message, _all_messages, adapt_on_names=True)
+    other_user = aliased(User)
+    offset = calculate_offset(page, page_size)
+    query = (
+        select(
+            last_message,
+            other_user,
+            case((is_user_a, Conversation.unread_a), else_=Conversation.unread_b)
+        )
+        .join(
+            last_message,
             and_(
-                Message.sender_id == other_user_id,
-                Message.receiver_id == user_id,
-                Message.is_read == False
+                last_message.id == Conversation.last_message_id,
+                last_message.created_at == Conversation.last_message_at
             )
         )
-        count_result = await db.execute(count_query)
-        unread_count = count_result.scalar() or 0
-        conversations[other_user_id]['unread_count'] = unread_count
+        .join(other_user, other_user.id == other_user_id)
+        .where(condition)
+        .order_by(Conversation.last_message_at.desc(), Conversation.last_message_id.desc())
+        .limit(page_size)
+        .offset(offset)
+    )
     
-    # تبدیل به لیست و مرتب‌سازی بر اساس آخرین پیام
-    result_list = list(conversations.values())
-    result_list.sort(key=lambda x: x['last_message'].created_at, reverse=True)
+    result = await db.execute(query)
+    conversations = [
+        {
+            'user': user,
+            'last_message': message,
+            'unread_count': unread_count
+        }
+        for message, user, unread_count in result.all()
+    ]
     
-    return result_list
+    return conversations, total
 
 
 async def mark_as_read(
@@ -291,11 +561,91 @@ async def mark_as_read(
     )
     
     result = await db.execute(stmt)
+    
+    # صفر کردن شمارنده خوانده‌نشده کاربر در conversation (همان تراکنش)
+    user_a_id, user_b_id = Conversation.ordered_pair(user_id, other_user_id)
+    unread_column = Conversation.unread_a if user_id == user_a_id else Conversation.unread_b
+    await db.execute(
+        update(Conversation)
+        .where(
+            Conversation.user_a_id == user_a_id,
+            Conversation.user_b_id == user_b_id,
+            unread_column != 0
+        )
+        .values({unread_column: 0})
+    )
+    
     await db.commit()
     
     return result.rowcount or 0
 
 
+async def mark_many_as_read(
+    db: AsyncSession,
+    user_id: int,
+    other_user_ids: Optional[Collection[int]] = None,
+    up_to_id: Optional[int] = None
+) -> dict[int, int]:
+    """علامت‌گذاری پیام‌های خوانده نشده چند مکالمه در یک دستور SQL (بدون commit).
+    
+    UPDATE پیام‌ها و کم کردن شمارنده‌های conversation به اندازه همان ردیف‌ها
+    در یک دستور (CTEهای data-modifying) اجرا می‌شوند؛ پیام‌های جدیدتر از
+    up_to_id خوانده نشده می‌مانند و در شمارنده باقی می‌مانند.
+    
+    Args:
+        db: Database session
+        user_id: شناسه کاربر دریافت‌کننده (کاربر فعلی)
+        other_user_ids: فرستنده‌ها (None یعنی همه مکالمات)
+        up_to_id: فقط پیام‌هایی با id کوچک‌تر یا مساوی
+        
+    Returns:
+        dict از شناسه فرستنده به تعداد پیام‌های علامت‌گذاری شده
+    """
+    conditions = [Message.receiver_id == user_id, ~Message.is_read]
+    if other_user_ids is not None:
+        if not other_user_ids:
+            return {}
+        conditions.append(Message.sender_id.in_(other_user_ids))
+    if up_to_id is not None:
+        conditions.append(Message.id <= up_to_id)
+    
+    updated = (
+        update(Message)
+        .where(*conditions)
+        .values(is_read=True, read_at=datetime.utcnow(), status="delivered")
+        .returning(Message.sender_id)
+        .cte("updated")
+    )
+    counts = (
+        select(updated.c.sender_id, func.count().label("count"))
+        .group_by(updated.c.sender_id)
+        .cte("counts")
+    )
+    conversation_update = (
+        update(Conversation)
+        .where(
+            Conversation.user_a_id == func.least(user_id, counts.c.sender_id),
+            Conversation.user_b_id == func.greatest(user_id, counts.c.sender_id)
+        )
+        .values(
+            unread_a=case(
+                (Conversation.user_a_id == user_id, func.greatest(Conversation.unread_a - counts.c.count, 0)),
+                else_=Conversation.unread_a
+            ),
+            unread_b=case(
+                (Conversation.user_b_id == user_id, func.greatest(Conversation.unread_b - counts.c.count, 0)),
+                else_=Conversation.unread_b
+            )
+        )
+        .cte("conversation_update")
+    )
+    
+    result = await db.execute(
+        select(counts.c.sender_id, counts.c.count).add_cte(conversation_update)
+    )
+    return {sender_id: count for sender_id, count in result.all()}
+
+
 async def get_total_unread_count(
     db: AsyncSession,
     user_id: int
@@ -309,10 +659,56 @@ async def get_total_unread_count(
     Returns:
         تعداد کل پیام‌های خوانده نشده
     """
-    count_query = select(func.count(Message.id)).where(
-        Message.receiver_id == user_id,
-        Message.is_read == False
+    # جمع شمارنده‌های conversation (دو index scan روی ردیف‌های کاربر)
+    unread_as_a = (
+        select(func.coalesce(func.sum(Conversation.unread_a), 0))
+        .where(Conversation.user_a_id == user_id)
+        .scalar_subquery()
+    )
+    unread_as_b = (
+        select(func.coalesce(func.sum(Conversation.unread_b), 0))
+        .where(Conversation.user_b_id == user_id)
+        .scalar_subquery()
     )
-    result = await db.execute(count_query)
+    result = await db.execute(select(unread_as_a + unread_as_b))
     return result.scalar() or 0
 
+
+
+async def get_unread_counts_by_user(
+    db: AsyncSession,
+    user_ids: list[int]
+) -> dict[int, dict[int, int]]:
+    """دریافت تعداد خوانده نشده هر مکالمه برای چند کاربر (یک کوئری روی conversation).
+    
+    Args:
+        db: Database session
+        user_ids: شناسه کاربران
+        
+    Returns:
+        dict از user_id به dict (other_user_id → تعداد خوانده نشده)؛
+        کاربر بدون پیام خوانده نشده dict خالی دارد
+    """
+    counts: dict[int, dict[int, int]] = {user_id: {} for user_id in user_ids}
+    if not user_ids:
+        return counts
+    
+    result = await db.execute(
+        select(
+            Conversation.user_a_id,
+            Conversation.user_b_id,
+            Conversation.unread_a,
+            Conversation.unread_b
+        ).where(
+            or_(
+                and_(Conversation.user_a_id.in_(user_ids), Conversation.unread_a > 0),
+                and_(Conversation.user_b_id.in_(user_ids), Conversation.unread_b > 0),
+            )
+        )
+    )
+    for user_a_id, user_b_id, unread_a, unread_b in result.all():
+        if unread_a and user_a_id in counts:
+            counts[user_a_id][user_b_id] = unread_a
+        if unread_b and user_b_id in counts:
+            counts[user_b_id][user_a_id] = unread_b
+    return counts
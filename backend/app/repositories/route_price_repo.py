@@ -1,13 +1,20 @@
 """RoutePrice repository for data access."""
-from typing import Optional
-from datetime import datetime, timedelta
-from sqlalchemy import select, func, or_
+import asyncio
+import time
+from typing import Iterable, Optional
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, or_, and_, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.route_price import RoutePrice
+from app.core.config import get_settings
+from app.models.route_price import RoutePrice, RoutePriceSketch
 from app.models.card import Card
+from app.models.location import City
 from app.schemas.price import BasePriceResult
 
+settings = get_settings()
+
 
 # Constants for price estimation
 DEFAULT_PRICE_PER_KG = 1.5  # USD fallback
@@ -30,57 +37,187 @@ async def get_route_price(
     return result.scalar_one_or_none()
 
 
-async def get_base_price(
-    db: AsyncSession,
-    origin_city_id: int,
-    destination_city_id: int
-) -> BasePriceResult:
+class RoutePriceMatrix:
     """
-    Get base price with fallback logic:
-    1. Direct route from database
-    2. Reverse route from database
-    3. Average of same-origin routes
-    4. Default estimate
+    In-memory copy of the route_price table with precomputed fallbacks.
+    
+    Holds direct route prices plus per-origin-city and per-country-pair
+    running sums, so base price lookup is a handful of dict accesses.
+    Loaded at startup, updated in place on create/update (through
+    DynamicPricingService.update_route_price, which also drops cached
+    suggestions), and reloaded when older than max_age_seconds (picks up
+    writes from other workers).
     """
-    # Try direct route
-    route = await get_route_price(db, origin_city_id, destination_city_id)
-    if route:
-        return BasePriceResult(
-            price=route.price_per_kg_suggested,
-            ticket_price=route.base_ticket_price_usd,
-            source="database"
-        )
     
-    # Try reverse route
-    reverse_route = await get_route_price(db, destination_city_id, origin_city_id)
-    if reverse_route:
-        return BasePriceResult(
-            price=reverse_route.price_per_kg_suggested,
-            ticket_price=reverse_route.base_ticket_price_usd,
-            source="reverse"
+    def __init__(self, max_age_seconds: float):
+        self.max_age_seconds = max_age_seconds
+        self.loaded_at: Optional[float] = None
+        self._routes: dict[tuple[int, int], tuple[float, float]] = {}
+        self._city_country: dict[int, Optional[int]] = {}
+        self._origin_sums: dict[int, list[float]] = {}
+        self._country_pair_sums: dict[tuple[int, int], list[float]] = {}
+        self._lock = asyncio.Lock()
+    
+    @property
+    def is_stale(self) -> bool:
+        """True if never loaded or older than max_age_seconds."""
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age_seconds
+    
+    async def load(self, db: AsyncSession) -> None:
+        """(Re)load every route price and the city → country map."""
+        cities = await db.execute(select(City.id, City.country_id))
+        routes = await db.execute(
+            select(
+                RoutePrice.origin_city_id,
+                RoutePrice.destination_city_id,
+                RoutePrice.price_per_kg_suggested,
+                RoutePrice.base_ticket_price_usd
+            )
         )
+        
+        self._routes = {}
+        self._origin_sums = {}
+        self._country_pair_sums = {}
+        self._city_country = {city_id: country_id for city_id, country_id in cities.all()}
+        for origin, dest, price, ticket_price in routes.all():
+            self._put(origin, dest, price, ticket_price)
+        self.loaded_at = time.monotonic()
+    
+    async def ensure_loaded(self, db: AsyncSession) -> None:
+        """Load (once, even under concurrency) if missing or stale."""
+        if not self.is_stale:
+            return
+        async with self._lock:
+            if self.is_stale:
+                await self.load(db)
     
-    # Try average of routes from same origin
-    avg_result = await db.execute(
-        select(func.avg(RoutePrice.price_per_kg_suggested)).where(
-            RoutePrice.origin_city_id == origin_city_id
+    async def upsert(self, db: AsyncSession, route: RoutePrice) -> None:
+        """Apply a created/updated route without reloading the table."""
+        await self._country_of(db, route.origin_city_id)
+        await self._country_of(db, route.destination_city_id)
+        self._put(
+            route.origin_city_id,
+            route.destination_city_id,
+            route.price_per_kg_suggested,
+            route.base_ticket_price_usd
         )
-    )
-    avg_price = avg_result.scalar()
     
-    if avg_price:
-        return BasePriceResult(
-            price=float(avg_price),
-            ticket_price=None,
-            source="estimate"
+    async def lookup(
+        self,
+        db: AsyncSession,
+        origin_city_id: int,
+        destination_city_id: int
+    ) -> BasePriceResult:
+        """
+        Resolve base price with fallback chain:
+        1. Direct route
+        2. Reverse route
+        3. Average of same-origin-city routes
+        4. Average of routes between the same countries (either direction)
+        5. Default estimate
+        """
+        route = self._routes.get((origin_city_id, destination_city_id))
+        if route:
+            return BasePriceResult(price=route[0], ticket_price=route[1], source="database")
+        
+        reverse_route = self._routes.get((destination_city_id, origin_city_id))
+        if reverse_route:
+            return BasePriceResult(price=reverse_route[0], ticket_price=reverse_route[1], source="reverse")
+        
+        origin_avg = self._average(self._origin_sums.get(origin_city_id))
+        if origin_avg:
+            return BasePriceResult(price=origin_avg, ticket_price=None, source="estimate")
+        
+        origin_country = await self._country_of(db, origin_city_id)
+        destination_country = await self._country_of(db, destination_city_id)
+        if origin_country is not None and destination_country is not None:
+            country_avg = (
+                self._average(self._country_pair_sums.get((origin_country, destination_country)))
+                or self._average(self._country_pair_sums.get((destination_country, origin_country)))
+            )
+            if country_avg:
+                return BasePriceResult(price=country_avg, ticket_price=None, source="estimate")
+        
+        # Default fallback
+        return BasePriceResult(price=DEFAULT_PRICE_PER_KG, ticket_price=None, source="estimate")
+    
+    def _put(
+        self,
+        origin_city_id: int,
+        destination_city_id: int,
+        price: float,
+        ticket_price: float
+    ) -> None:
+        """Insert/replace one route and keep aggregate sums consistent."""
+        key = (origin_city_id, destination_city_id)
+        country_pair = (
+            self._city_country.get(origin_city_id),
+            self._city_country.get(destination_city_id)
         )
+        has_countries = None not in country_pair
+        
+        previous = self._routes.get(key)
+        if previous is not None:
+            self._add(self._origin_sums, origin_city_id, -previous[0], -1)
+            if has_countries:
+                self._add(self._country_pair_sums, country_pair, -previous[0], -1)
+        
+        self._routes[key] = (price, ticket_price)
+        self._add(self._origin_sums, origin_city_id, price, 1)
+        if has_countries:
+            self._add(self._country_pair_sums, country_pair, price, 1)
     
-    # Default fallback
-    return BasePriceResult(
-        price=DEFAULT_PRICE_PER_KG,
-        ticket_price=None,
-        source="estimate"
-    )
+    async def _country_of(self, db: AsyncSession, city_id: int) -> Optional[int]:
+        """Country of a city, querying (and memoizing) cities added after load."""
+        if city_id not in self._city_country:
+            result = await db.execute(select(City.country_id).where(City.id == city_id))
+            self._city_country[city_id] = result.scalar_one_or_none()
+        return self._city_country[city_id]
+    
+    @staticmethod
+    def _add(sums: dict, key, price: float, count: int) -> None:
+        total = sums.setdefault(key, [0.0, 0])
+        total[0] += price
+        total[1] += count
+        if total[1] <= 0:
+            del sums[key]
+    
+    @staticmethod
+    def _average(total: Optional[list[float]]) -> Optional[float]:
+        if not total or total[1] <= 0:
+            return None
+        return total[0] / total[1]
+
+
+# Process-wide matrix (loaded in main.lifespan, lazily otherwise)
+route_price_matrix = RoutePriceMatrix(
+    max_age_seconds=settings.ROUTE_PRICE_MATRIX_MAX_AGE_SECONDS
+)
+
+
+async def get_base_price(
+    db: AsyncSession,
+    origin_city_id: int,
+    destination_city_id: int
+) -> BasePriceResult:
+    """
+    Get base price from the in-memory route price matrix
+    (see RoutePriceMatrix.lookup for the fallback chain).
+    """
+    await route_price_matrix.ensure_loaded(db)
+    return await route_price_matrix.lookup(db, origin_city_id, destination_city_id)
+
+
+async def get_base_prices_bulk(
+    db: AsyncSession,
+    routes: Iterable[tuple[int, int]]
+) -> dict[tuple[int, int], BasePriceResult]:
+    """Get base prices for many routes from the in-memory matrix."""
+    await route_price_matrix.ensure_loaded(db)
+    return {
+        (origin, dest): await route_price_matrix.lookup(db, origin, dest)
+        for origin, dest in set(routes)
+    }
 
 
 async def get_route_statistics(
@@ -162,6 +299,215 @@ async def get_supply_demand_counts(
     return travelers, senders
 
 
+async def get_route_statistics_bulk(
+    db: AsyncSession,
+    routes: Iterable[tuple[int, int]],
+    days: int = 30
+) -> dict[tuple[int, int], int]:
+    """
+    Count cards created in the last N days for many routes in one
+    grouped query. Returns {(origin, destination): monthly_cards}.
+    """
+    pairs = set(routes)
+    if not pairs:
+        return {}
+    
+    date_start = datetime.utcnow() - timedelta(days=days)
+    
+    result = await db.execute(
+        select(
+            Card.origin_city_id,
+            Card.destination_city_id,
+            func.count(Card.id)
+        )
+        .where(
+            tuple_(Card.origin_city_id, Card.destination_city_id).in_(list(pairs)),
+            Card.created_at >= date_start
+        )
+        .group_by(Card.origin_city_id, Card.destination_city_id)
+    )
+    counts = {(origin, dest): count for origin, dest, count in result.all()}
+    
+    return {pair: counts.get(pair, 0) for pair in pairs}
+
+
+async def get_supply_demand_counts_bulk(
+    db: AsyncSession,
+    routes: Iterable[tuple[int, int]],
+    travel_date: Optional[datetime] = None
+) -> dict[tuple[int, int], tuple[int, int]]:
+    """
+    Count travelers and senders for many routes in one grouped query.
+    Returns {(origin, destination): (travelers_count, senders_count)}.
+    """
+    pairs = set(routes)
+    if not pairs:
+        return {}
+    
+    if travel_date is None:
+        travel_date = datetime.utcnow()
+    
+    date_start = travel_date - timedelta(days=7)
+    date_end = travel_date + timedelta(days=7)
+    
+    traveler_condition = and_(
+        Card.is_sender == False,
+        Card.ticket_date_time.isnot(None),
+        Card.ticket_date_time >= date_start,
+        Card.ticket_date_time <= date_end
+    )
+    sender_condition = and_(
+        Card.is_sender == True,
+        or_(
+            Card.start_time_frame.between(date_start, date_end),
+            Card.end_time_frame.between(date_start, date_end),
+            (Card.start_time_frame <= date_start) & (Card.end_time_frame >= date_end)
+        )
+    )
+    
+    result = await db.execute(
+        select(
+            Card.origin_city_id,
+            Card.destination_city_id,
+            func.count(Card.id).filter(traveler_condition),
+            func.count(Card.id).filter(sender_condition)
+        )
+        .where(tuple_(Card.origin_city_id, Card.destination_city_id).in_(list(pairs)))
+        .group_by(Card.origin_city_id, Card.destination_city_id)
+    )
+    counts = {
+        (origin, dest): (travelers, senders)
+        for origin, dest, travelers, senders in result.all()
+    }
+    
+    return {pair: counts.get(pair, (0, 0)) for pair in pairs}
+
+
+async def get_all_routes(
+    db: AsyncSession,
+    origin_city_id: Optional[int] = None
+) -> list[tuple[int, int]]:
+    """List (origin, destination) pairs present in route_price."""
+    query = select(RoutePrice.origin_city_id, RoutePrice.destination_city_id)
+    if origin_city_id is not None:
+        query = query.where(RoutePrice.origin_city_id == origin_city_id)
+    query = query.order_by(RoutePrice.origin_city_id, RoutePrice.destination_city_id)
+    
+    result = await db.execute(query)
+    return [(origin, dest) for origin, dest in result.all()]
+
+
+async def get_traveler_daily_counts(
+    db: AsyncSession,
+    date_start: datetime,
+    date_end: datetime
+) -> list[tuple[int, int, date, int]]:
+    """
+    Count traveler cards per route and ticket day within a date range.
+    Returns rows of (origin, destination, day, count).
+    """
+    ticket_day = func.date(Card.ticket_date_time)
+    result = await db.execute(
+        select(
+            Card.origin_city_id,
+            Card.destination_city_id,
+            ticket_day,
+            func.count(Card.id)
+        )
+        .where(
+            Card.is_sender == False,
+            Card.ticket_date_time.isnot(None),
+            Card.ticket_date_time >= date_start,
+            Card.ticket_date_time <= date_end
+        )
+        .group_by(Card.origin_city_id, Card.destination_city_id, ticket_day)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def get_sender_interval_counts(
+    db: AsyncSession,
+    date_start: datetime,
+    date_end: datetime
+) -> list[tuple[int, int, Optional[date], Optional[date], int]]:
+    """
+    Count sender cards per route and (start day, end day) time frame,
+    for time frames that touch a date range.
+    Returns rows of (origin, destination, start_day, end_day, count).
+    """
+    start_day = func.date(Card.start_time_frame)
+    end_day = func.date(Card.end_time_frame)
+    result = await db.execute(
+        select(
+            Card.origin_city_id,
+            Card.destination_city_id,
+            start_day,
+            end_day,
+            func.count(Card.id)
+        )
+        .where(
+            Card.is_sender == True,
+            or_(
+                Card.start_time_frame.between(date_start, date_end),
+                Card.end_time_frame.between(date_start, date_end),
+                (Card.start_time_frame <= date_start) & (Card.end_time_frame >= date_end)
+            )
+        )
+        .group_by(Card.origin_city_id, Card.destination_city_id, start_day, end_day)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def get_price_sketches_bulk(
+    db: AsyncSession,
+    routes: Iterable[tuple[int, int]]
+) -> dict[tuple[int, int], RoutePriceSketch]:
+    """Get persisted price sketches for many routes (missing routes omitted)."""
+    pairs = set(routes)
+    if not pairs:
+        return {}
+    
+    result = await db.execute(
+        select(RoutePriceSketch).where(
+            tuple_(RoutePriceSketch.origin_city_id, RoutePriceSketch.destination_city_id).in_(list(pairs))
+        )
+    )
+    return {
+        (sketch.origin_city_id, sketch.destination_city_id): sketch
+        for sketch in result.scalars().all()
+    }
+
+
+async def lock_price_sketch(
+    db: AsyncSession,
+    origin_city_id: int,
+    destination_city_id: int
+) -> RoutePriceSketch:
+    """
+    Get the price sketch row for a route with a row lock (SELECT ... FOR
+    UPDATE), creating an empty one first if needed. Caller commits.
+    """
+    await db.execute(
+        insert(RoutePriceSketch)
+        .values(
+            origin_city_id=origin_city_id,
+            destination_city_id=destination_city_id,
+            digest={},
+            sample_count=0
+        )
+        .on_conflict_do_nothing(constraint="uq_route_price_sketch_cities")
+    )
+    result = await db.execute(
+        select(RoutePriceSketch)
+        .where(
+            RoutePriceSketch.origin_city_id == origin_city_id,
+            RoutePriceSketch.destination_city_id == destination_city_id
+        )
+        .with_for_update()
+    )
+    return result.scalar_one()
+
+
 async def create_route_price(
     db: AsyncSession,
     origin_city_id: int,
@@ -185,6 +531,7 @@ async def create_route_price(
     db.add(route)
     await db.commit()
     await db.refresh(route)
+    await route_price_matrix.upsert(db, route)
     return route
 
 
@@ -212,4 +559,5 @@ async def update_route_price(
     
     await db.commit()
     await db.refresh(route)
+    await route_price_matrix.upsert(db, route)
     return route
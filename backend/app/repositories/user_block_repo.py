@@ -0,0 +1,108 @@
+"""UserBlock repository برای عملیات دیتابیس بلاک شخصی کاربران."""
+from typing import Optional
+from sqlalchemy import select, delete, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from ..models.user_block import UserBlock
+
+
+async def get_block(
+    db: AsyncSession,
+    blocker_id: int,
+    blocked_id: int
+) -> Optional[UserBlock]:
+    """دریافت بلاک یک کاربر توسط کاربر دیگر.
+
+    Args:
+        db: Database session
+        blocker_id: شناسه کاربر بلاک‌کننده
+        blocked_id: شناسه کاربر بلاک‌شده
+
+    Returns:
+        UserBlock یا None
+    """
+    query = (
+        select(UserBlock)
+        .where(UserBlock.blocker_id == blocker_id)
+        .where(UserBlock.blocked_id == blocked_id)
+    )
+    result = await db.execute(query)
+    return result.scalar_one_or_none()
+
+
+async def get_blocked_users(db: AsyncSession, blocker_id: int) -> list[UserBlock]:
+    """دریافت بلاک‌های یک کاربر به همراه کاربر بلاک‌شده.
+
+    Args:
+        db: Database session
+        blocker_id: شناسه کاربر بلاک‌کننده
+
+    Returns:
+        لیست UserBlock با relation blocked
+    """
+    query = (
+        select(UserBlock)
+        .where(UserBlock.blocker_id == blocker_id)
+        .options(selectinload(UserBlock.blocked))
+        .order_by(UserBlock.id)
+    )
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+async def get_block_sets(db: AsyncSession, user_id: int) -> tuple[set[int], set[int]]:
+    """دریافت کاربرانی که کاربر بلاک کرده و کاربرانی که او را بلاک کرده‌اند (یک کوئری).
+
+    Args:
+        db: Database session
+        user_id: شناسه کاربر
+
+    Returns:
+        tuple از (بلاک‌شده‌ها، بلاک‌کننده‌ها)
+    """
+    query = (
+        select(UserBlock.blocker_id, UserBlock.blocked_id)
+        .where(or_(UserBlock.blocker_id == user_id, UserBlock.blocked_id == user_id))
+    )
+    result = await db.execute(query)
+
+    blocked: set[int] = set()
+    blocked_by: set[int] = set()
+    for blocker_id, blocked_id in result.all():
+        if blocker_id == user_id:
+            blocked.add(blocked_id)
+        else:
+            blocked_by.add(blocker_id)
+    return blocked, blocked_by
+
+
+async def create(db: AsyncSession, blocker_id: int, blocked_id: int) -> UserBlock:
+    """ایجاد بلاک جدید.
+
+    Args:
+        db: Database session
+        blocker_id: شناسه کاربر بلاک‌کننده
+        blocked_id: شناسه کاربر بلاک‌شده
+
+    Returns:
+        UserBlock ایجادشده
+    """
+    block = UserBlock(blocker_id=blocker_id, blocked_id=blocked_id)
+    db.add(block)
+    await db.flush()
+    return block
+
+
+async def delete_block(db: AsyncSession, blocker_id: int, blocked_id: int) -> None:
+    """حذف بلاک.
+
+    Args:
+        db: Database session
+        blocker_id: شناسه کاربر بلاک‌کننده
+        blocked_id: شناسه کاربر بلاک‌شده
+    """
+    await db.execute(
+        delete(UserBlock)
+        .where(UserBlock.blocker_id == blocker_id)
+        .where(UserBlock.blocked_id == blocked_id)
+    )
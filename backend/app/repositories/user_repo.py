@@ -1,5 +1,5 @@
 """User repository برای دسترسی به دیتابیس."""
-from typing import Optional
+from typing import Iterable, Optional
 from datetime import datetime
 from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -53,6 +53,23 @@ async def get_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
     return result.scalar_one_or_none()
 
 
+async def get_by_ids(db: AsyncSession, user_ids: Iterable[int]) -> dict[int, User]:
+    """دریافت چند کاربر با یک کوئری (بدون relationها).
+    
+    Args:
+        db: Database session
+        user_ids: شناسه کاربران
+        
+    Returns:
+        dict از شناسه به کاربر (شناسه‌های ناموجود حذف می‌شوند)
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    result = await db.execute(select(User).where(User.id.in_(user_ids)))
+    return {user.id: user for user in result.scalars()}
+
+
 async def create(
     db: AsyncSession,
     email: str,
@@ -331,6 +331,25 @@ class SystemSettings(BaseModel):
     environment: str = Field(..., description="محیط اجرا")
 
 
+class RedisPoolStats(BaseModel):
+    """متریک‌های connection pool مشترک Redis (در همین process)."""
+    
+    max_connections: int = Field(..., description="سقف اتصال‌ها")
+    in_use: int = Field(..., description="اتصال‌های در حال استفاده")
+    idle: int = Field(..., description="اتصال‌های آزاد")
+    peak_in_use: int = Field(..., description="بیشترین اتصال هم‌زمان از زمان startup")
+    waits: int = Field(..., description="درخواست‌هایی که منتظر اتصال آزاد ماندند")
+    timeouts: int = Field(..., description="درخواست‌هایی که اتصال آزاد پیدا نکردند")
+
+
+class RedisHealth(BaseModel):
+    """وضعیت سلامت Redis."""
+    
+    ok: bool = Field(..., description="آیا Redis به PING پاسخ داد")
+    latency_ms: Optional[float] = Field(None, description="زمان پاسخ PING")
+    pool: RedisPoolStats
+
+
 class SystemSettingsUpdate(BaseModel):
     """ورودی برای بروزرسانی تنظیمات سیستم."""
     
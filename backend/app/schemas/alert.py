@@ -40,6 +40,8 @@ class AlertOut(BaseModel):
     extra_data: Optional[dict] = None
     is_read: bool
     email_sent: bool
+    occurrences: int = 1
+    last_seen_at: Optional[datetime] = None
     created_at: datetime
     
     model_config = ConfigDict(from_attributes=True)
@@ -61,3 +63,24 @@ class AlertStats(BaseModel):
     high_priority_unread: int
     by_type: dict[str, int]
 
+
+
+class AlertDelivery(BaseModel):
+    """وضعیت ایمیل هشدار برای یک گیرنده."""
+    to_email: str
+    status: str
+    attempts: int
+    last_error: Optional[str] = None
+    sent_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AlertDeliveries(BaseModel):
+    """وضعیت ارسال ایمیل یک هشدار به ادمین‌ها."""
+    alert_id: int
+    total: int
+    sent: int
+    pending: int
+    dead: int
+    recipients: list[AlertDelivery]
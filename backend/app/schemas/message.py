@@ -81,3 +81,39 @@ class ConversationOut(BaseModel):
         }
     )
 
+
+
+class MarkReadRequest(BaseModel):
+    """علامت‌گذاری دسته‌ای پیام‌ها به عنوان خوانده شده."""
+    
+    user_ids: Optional[list[int]] = Field(
+        None, max_length=100, description="فرستنده‌ها (خالی یعنی همه مکالمات)"
+    )
+    up_to_id: Optional[int] = Field(
+        None, ge=1, description="فقط پیام‌هایی با id کوچک‌تر یا مساوی"
+    )
+    
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "user_ids": [2, 5],
+                "up_to_id": 1200
+            }
+        }
+    )
+
+
+class RealtimeTicketOut(BaseModel):
+    """ticket یک‌بار مصرف برای باز کردن stream رویدادها."""
+    
+    ticket: str = Field(..., description="ticket برای ?ticket= در /api/v1/realtime/events")
+    expires_in: int = Field(..., description="اعتبار ticket (ثانیه)")
+
+
+class MarkReadOut(BaseModel):
+    """نتیجه علامت‌گذاری دسته‌ای."""
+    
+    count: int = Field(..., description="تعداد کل پیام‌های علامت‌گذاری شده")
+    conversations: dict[int, int] = Field(
+        default_factory=dict, description="تعداد پیام‌های علامت‌گذاری شده هر فرستنده"
+    )
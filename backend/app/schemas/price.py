@@ -12,6 +12,18 @@ class PriceFactorBreakdown(BaseModel):
     factor: float = Field(..., description="Multiplier value")
 
 
+class MarketPriceOut(BaseModel):
+    """Distribution of price_per_kg actually posted on a route (from a t-digest)."""
+    
+    origin_city_id: int = Field(..., description="Origin city ID")
+    destination_city_id: int = Field(..., description="Destination city ID")
+    currency: str = Field(default="USD", description="Currency code")
+    sample_count: int = Field(..., description="Number of card prices in the sketch")
+    p25: Optional[float] = Field(None, description="25th percentile price per kg")
+    median: Optional[float] = Field(None, description="Median price per kg")
+    p75: Optional[float] = Field(None, description="75th percentile price per kg")
+
+
 class PriceSuggestionOut(BaseModel):
     """Price suggestion response with full breakdown."""
     
@@ -36,6 +48,9 @@ class PriceSuggestionOut(BaseModel):
     # User-friendly message
     message: str = Field(..., description="Explanation message")
     
+    # Prices users actually posted on this route
+    market: Optional[MarketPriceOut] = Field(None, description="Market price distribution, if any cards were priced")
+    
     model_config = ConfigDict(
         json_schema_extra={
             "example": {
@@ -72,3 +87,32 @@ class BasePriceResult(BaseModel):
     price: float
     ticket_price: Optional[float] = None
     source: str  # "database", "reverse", "estimate"
+
+
+class PriceRouteIn(BaseModel):
+    """A single origin/destination pair."""
+    
+    origin_city_id: int = Field(..., description="Origin city ID")
+    destination_city_id: int = Field(..., description="Destination city ID")
+
+
+class BatchPriceSuggestionIn(BaseModel):
+    """Batch price suggestion request (shared date/weight/category)."""
+    
+    routes: list[PriceRouteIn] = Field(..., min_length=1, max_length=1000, description="Routes to price")
+    travel_date: Optional[datetime] = Field(None, description="Travel date for seasonal/urgency factors")
+    weight: Optional[float] = Field(None, ge=0, description="Package weight (kg)")
+    category_id: Optional[int] = Field(None, description="Product category ID")
+
+
+class RoutePriceSuggestionOut(PriceSuggestionOut):
+    """Price suggestion for one route in a batch."""
+    
+    origin_city_id: int = Field(..., description="Origin city ID")
+    destination_city_id: int = Field(..., description="Destination city ID")
+
+
+class BatchPriceSuggestionOut(BaseModel):
+    """Batch price suggestion response."""
+    
+    items: list[RoutePriceSuggestionOut] = Field(..., description="One suggestion per requested route")
@@ -8,7 +8,7 @@ from pathlib import Path
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..repositories import admin_repo
+from ..repositories import admin_repo, membership_repo
 from ..schemas.admin import (
     DashboardStats,
     ChartData,
@@ -23,6 +23,8 @@ from ..schemas.admin import (
     LogAdminOut,
     SystemSettings,
     SystemSettingsUpdate,
+    RedisHealth,
+    RedisPoolStats,
     BackupInfo,
     BackupList,
     BackupCreateResponse,
@@ -30,6 +32,8 @@ from ..schemas.admin import (
     BackupUploadResponse,
 )
 from ..core.config import get_settings
+from ..core.redis_client import check_redis, redis_pool_stats
+from .membership_cache_service import membership_cache
 from ..utils.logger import logger
 
 
@@ -217,6 +221,7 @@ async def delete_community(
     """حذف کامیونیتی."""
     logger.info(f"Admin {admin_user_id} deleting community {community_id}")
     
+    member_ids = await membership_repo.get_member_user_ids(db, community_id)
     result = await admin_repo.delete_community(db, community_id)
     if result:
         # لاگ کردن
@@ -227,6 +232,9 @@ async def delete_community(
             actor_user_id=admin_user_id,
             community_id=community_id,
         )
+        # snapshot عضویت اعضا پس از commit باطل می‌شود
+        await db.commit()
+        await membership_cache.invalidate(*member_ids)
     
     return result
 
@@ -391,6 +399,16 @@ async def get_system_settings() -> SystemSettings:
     )
 
 
+async def get_redis_health() -> RedisHealth:
+    """PING روی pool مشترک Redis و متریک‌های pool."""
+    latency = await check_redis()
+    return RedisHealth(
+        ok=latency is not None,
+        latency_ms=round(latency, 2) if latency is not None else None,
+        pool=RedisPoolStats(**redis_pool_stats()),
+    )
+
+
 async def update_system_settings(
     data: SystemSettingsUpdate,
     admin_user_id: int,
@@ -3,21 +3,68 @@
 ارسال هشدار به ادمین‌ها:
 - رخدادهای با اولویت بالا → ایمیل فوری
 - رخدادهای عادی → خلاصه روزانه
+
+ایمیل‌ها در همان تراکنش هشدار در email_outbox ثبت و توسط worker ایمیل ارسال می‌شوند.
+هشدارهای تکراری (مثلاً خطای یک وابستگی در حال قطع) با fingerprint (نوع، الگوی
+عنوان و metadata کلیدی) تجمیع می‌شوند: تکرار در ALERT_DEDUP_WINDOW_SECONDS پس
+از آخرین رخداد فقط occurrences همان ردیف را زیاد می‌کند و ایمیل فوری هر
+fingerprint حداکثر یک بار در ALERT_EMAIL_INTERVAL_SECONDS ارسال می‌شود. هر تکرار
+email_sent را صفر می‌کند تا تکرارهایی که ایمیل فوری نداشته‌اند در خلاصه روزانه
+بعدی بیایند؛ ثبت هر fingerprint با advisory lock تراکنشی سریالی است تا دو
+رخداد هم‌زمان دو ردیف نسازند.
+
+هر ردیف outbox هشدار فوری alert_id دارد تا وضعیت ارسال هر ادمین (ارسال شده،
+در صف، dead) از get_alert_deliveries قابل پیگیری باشد.
 """
-from typing import Optional
-from datetime import datetime, timedelta
-from sqlalchemy import select, func, and_
+import hashlib
+import json
+import re
+from typing import Optional, Sequence
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, func, and_, or_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models.alert import Alert
 from ..models.user import User
-from ..schemas.alert import AlertType, AlertPriority, AlertCreate, AlertOut, AlertList, AlertStats
-from ..utils.email import send_email
+from ..repositories import email_outbox_repo
+from ..schemas.alert import (
+    AlertType, AlertPriority, AlertCreate, AlertOut, AlertList, AlertStats,
+    AlertDelivery, AlertDeliveries,
+)
+from ..services import email_outbox_service
 from ..utils.logger import logger
 from ..core.config import get_settings
 
 settings = get_settings()
 
+# اعداد عنوان (شناسه، تعداد) در fingerprint نادیده گرفته می‌شوند
+_NUMBER_PATTERN = re.compile(r"\d+")
+
+
+def alert_fingerprint(
+    alert_type: str,
+    title: str,
+    metadata: Optional[dict] = None,
+    keys: Optional[Sequence[str]] = None,
+) -> str:
+    """شناسه تجمیع هشدار: نوع، الگوی عنوان و metadata کلیدی.
+    
+    Args:
+        alert_type: نوع هشدار
+        title: عنوان (اعداد با # جایگزین می‌شوند)
+        metadata: اطلاعات اضافی
+        keys: کلیدهای metadata در fingerprint (None یعنی همه)
+    
+    Returns:
+        hash هگزادسیمال 64 کاراکتری
+    """
+    template = _NUMBER_PATTERN.sub("#", title.strip().lower())
+    items = metadata or {}
+    if keys is not None:
+        items = {key: items.get(key) for key in keys}
+    payload = json.dumps([alert_type, template, items], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
 
 async def create_alert(
     db: AsyncSession,
@@ -27,8 +74,13 @@ async def create_alert(
     priority: AlertPriority = AlertPriority.NORMAL,
     metadata: Optional[dict] = None,
     send_email_now: bool = True,
+    fingerprint_keys: Optional[Sequence[str]] = None,
 ) -> Alert:
-    """ایجاد هشدار جدید و ارسال ایمیل در صورت نیاز.
+    """ایجاد هشدار جدید یا ثبت تکرار هشدار مشابه و ارسال ایمیل در صورت نیاز.
+    
+    اگر هشداری با همان fingerprint در ALERT_DEDUP_WINDOW_SECONDS اخیر دیده شده
+    باشد ردیف جدید ساخته نمی‌شود؛ occurrences و last_seen_at همان ردیف به‌روز و
+    هشدار دوباره خوانده نشده می‌شود.
     
     Args:
         db: Database session
@@ -38,42 +90,92 @@ async def create_alert(
         priority: اولویت
         metadata: اطلاعات اضافی
         send_email_now: آیا فوراً ایمیل بفرستد (برای اولویت بالا)
+        fingerprint_keys: کلیدهای metadata که هشدار را متمایز می‌کنند (None یعنی همه)
     
     Returns:
-        Alert object
+        Alert object (ردیف جدید یا ردیف تجمیع شده)
     """
-    alert = Alert(
-        type=alert_type.value,
-        priority=priority.value,
-        title=title,
-        message=message,
-        extra_data=metadata,
-        is_read=False,
-        email_sent=False,
-    )
+    now = datetime.now(timezone.utc)
+    fingerprint = alert_fingerprint(alert_type.value, title, metadata, fingerprint_keys)
+    
+    # رخدادهای هم‌زمان یک fingerprint (تا commit) پشت هم اجرا می‌شوند
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(fingerprint))))
+    alert = await _record_occurrence(db, fingerprint, now)
+    if alert is None:
+        alert = Alert(
+            type=alert_type.value,
+            priority=priority.value,
+            title=title,
+            message=message,
+            extra_data=metadata,
+            is_read=False,
+            email_sent=False,
+            fingerprint=fingerprint,
+            occurrences=1,
+            last_seen_at=now,
+        )
+        db.add(alert)
+        await db.flush()
+        await db.refresh(alert)
+        logger.info(f"Alert created: [{alert_type.value}] {title}")
+    else:
+        logger.debug(f"Alert repeated ({alert.occurrences}x): [{alert_type.value}] {title}")
+    
+    # ایمیل فوری برای اولویت بالا (در همین تراکنش در outbox)، یک بار در هر بازه
+    if send_email_now and priority == AlertPriority.HIGH and await _claim_email(db, alert.id, now):
+        await send_immediate_email(db, alert)
     
-    db.add(alert)
     await db.commit()
-    await db.refresh(alert)
+    return alert
+
+
+async def _record_occurrence(db: AsyncSession, fingerprint: str, now: datetime) -> Optional[Alert]:
+    """ثبت تکرار روی هشدار اخیر با همان fingerprint (یک UPDATE اتمیک).
     
-    logger.info(f"Alert created: [{alert_type.value}] {title}")
+    هشدار دوباره خوانده نشده و ایمیل نشده (email_sent=False) می‌شود تا اگر
+    ایمیل فوری برای این تکرار ارسال نشود، در خلاصه روزانه بعدی بیاید.
     
-    # ارسال ایمیل فوری برای اولویت بالا
-    if send_email_now and priority == AlertPriority.HIGH:
-        await send_immediate_email(db, alert)
+    Returns:
+        Alert به‌روز شده یا None اگر هشدار مشابهی در بازه وجود نداشته باشد
+    """
+    window_start = now - timedelta(seconds=settings.ALERT_DEDUP_WINDOW_SECONDS)
+    result = await db.scalars(
+        update(Alert)
+        .where(Alert.fingerprint == fingerprint, Alert.last_seen_at >= window_start)
+        .values(occurrences=Alert.occurrences + 1, last_seen_at=now, is_read=False, email_sent=False)
+        .returning(Alert)
+    )
+    return result.first()
+
+
+async def _claim_email(db: AsyncSession, alert_id: int, now: datetime) -> bool:
+    """رزرو ارسال ایمیل فوری هشدار (حداکثر یک بار در ALERT_EMAIL_INTERVAL_SECONDS).
     
-    return alert
+    Returns:
+        True اگر ایمیل باید ارسال شود
+    """
+    interval_start = now - timedelta(seconds=settings.ALERT_EMAIL_INTERVAL_SECONDS)
+    result = await db.execute(
+        update(Alert)
+        .where(
+            Alert.id == alert_id,
+            or_(Alert.last_emailed_at.is_(None), Alert.last_emailed_at < interval_start),
+        )
+        .values(last_emailed_at=now)
+        .returning(Alert.id)
+    )
+    return result.scalar_one_or_none() is not None
 
 
 async def send_immediate_email(db: AsyncSession, alert: Alert) -> bool:
-    """ارسال ایمیل فوری به تمام ادمین‌ها.
+    """ثبت ایمیل فوری هشدار برای تمام ادمین‌ها در outbox (بدون commit).
     
     Args:
         db: Database session
         alert: Alert object
         
     Returns:
-        True if at least one email was sent
+        True if at least one email was queued
     """
     try:
         # دریافت لیست ادمین‌ها
@@ -90,31 +192,26 @@ async def send_immediate_email(db: AsyncSession, alert: Alert) -> bool:
         
         # ساخت ایمیل
         subject = f"🚨 [{_get_priority_label(alert.priority)}] {alert.title}"
+        if (alert.occurrences or 1) > 1:
+            subject += f" (×{alert.occurrences})"
         body = _build_alert_email_body(alert)
         
-        sent_count = 0
-        for admin in admins:
-            try:
-                if send_email(admin.email, subject, body):
-                    sent_count += 1
-            except Exception as e:
-                logger.error(f"Failed to send alert email to {admin.email}: {e}")
-        
-        # بروزرسانی وضعیت
-        if sent_count > 0:
-            alert.email_sent = True
-            await db.commit()
-            logger.info(f"Alert email sent to {sent_count} admins")
+        await email_outbox_service.enqueue_many(
+            db, [admin.email for admin in admins], subject, body, kind="alert",
+            alert_id=alert.id,
+        )
         
-        return sent_count > 0
+        alert.email_sent = True
+        logger.info(f"Alert email queued for {len(admins)} admins")
+        return True
         
     except Exception as e:
-        logger.error(f"Failed to send immediate alert email: {e}")
+        logger.error(f"Failed to queue immediate alert email: {e}")
         return False
 
 
 async def send_daily_digest(db: AsyncSession) -> bool:
-    """ارسال خلاصه روزانه به ادمین‌ها.
+    """ثبت خلاصه روزانه برای ادمین‌ها در outbox.
     
     شامل:
     - هشدارهای خوانده نشده (normal priority)
@@ -124,16 +221,16 @@ async def send_daily_digest(db: AsyncSession) -> bool:
         True if successful
     """
     try:
-        # دریافت هشدارهای 24 ساعت اخیر که ایمیل نشده‌اند
+        # دریافت هشدارهای دیده شده در 24 ساعت اخیر که ایمیل نشده‌اند
         yesterday = datetime.utcnow() - timedelta(days=1)
         
         result = await db.execute(
             select(Alert).where(
                 and_(
-                    Alert.created_at >= yesterday,
+                    Alert.last_seen_at >= yesterday,
                     Alert.email_sent == False,
                 )
-            ).order_by(Alert.created_at.desc())
+            ).order_by(Alert.last_seen_at.desc())
         )
         alerts = result.scalars().all()
         
@@ -157,22 +254,17 @@ async def send_daily_digest(db: AsyncSession) -> bool:
         subject = f"📊 خلاصه روزانه مینیلا - {len(alerts)} رخداد"
         body = _build_digest_email_body(alerts)
         
-        sent_count = 0
-        for admin in admins:
-            try:
-                if send_email(admin.email, subject, body):
-                    sent_count += 1
-            except Exception as e:
-                logger.error(f"Failed to send digest to {admin.email}: {e}")
+        await email_outbox_service.enqueue_many(
+            db, [admin.email for admin in admins], subject, body, kind="digest"
+        )
         
-        # علامت‌گذاری به عنوان ایمیل شده
-        if sent_count > 0:
-            for alert in alerts:
-                alert.email_sent = True
-            await db.commit()
-            logger.info(f"Daily digest sent to {sent_count} admins with {len(alerts)} alerts")
+        # علامت‌گذاری به عنوان ایمیل شده (با همان commit ایمیل‌ها)
+        for alert in alerts:
+            alert.email_sent = True
+        await db.commit()
+        logger.info(f"Daily digest queued for {len(admins)} admins with {len(alerts)} alerts")
         
-        return sent_count > 0
+        return True
         
     except Exception as e:
         logger.error(f"Failed to send daily digest: {e}")
@@ -283,6 +375,35 @@ async def get_alert_stats(db: AsyncSession) -> AlertStats:
     )
 
 
+async def get_alert_deliveries(db: AsyncSession, alert_id: int) -> Optional[AlertDeliveries]:
+    """وضعیت ارسال ایمیل هشدار به هر ادمین.
+    
+    Args:
+        db: Database session
+        alert_id: شناسه هشدار
+        
+    Returns:
+        AlertDeliveries یا None اگر هشدار وجود نداشته باشد
+    """
+    alert = await db.get(Alert, alert_id)
+    if not alert:
+        return None
+    
+    entries = await email_outbox_repo.list_for_alert(db, alert_id)
+    counts = {email_outbox_repo.SENT: 0, email_outbox_repo.PENDING: 0, email_outbox_repo.DEAD: 0}
+    for entry in entries:
+        counts[entry.status] = counts.get(entry.status, 0) + 1
+    
+    return AlertDeliveries(
+        alert_id=alert_id,
+        total=len(entries),
+        sent=counts[email_outbox_repo.SENT],
+        pending=counts[email_outbox_repo.PENDING],
+        dead=counts[email_outbox_repo.DEAD],
+        recipients=[AlertDelivery.model_validate(entry) for entry in entries],
+    )
+
+
 async def mark_as_read(db: AsyncSession, alert_id: int) -> bool:
     """علامت‌گذاری یک هشدار به عنوان خوانده شده.
     
@@ -369,6 +490,11 @@ def _build_alert_email_body(alert: Alert) -> str:
 
 پیام:
 {alert.message}
+"""
+    
+    if (alert.occurrences or 1) > 1:
+        body += f"""
+تکرار: {alert.occurrences} بار (آخرین: {alert.last_seen_at.strftime('%Y-%m-%d %H:%M:%S')})
 """
     
     if alert.extra_data:
@@ -396,7 +522,7 @@ def _build_digest_email_body(alerts: list[Alert]) -> str:
     body = f"""
 📊 خلاصه روزانه مینیلا
 
-تعداد کل رخدادها: {len(alerts)}
+تعداد کل رخدادها: {sum(alert.occurrences or 1 for alert in alerts)}
 
 """
     
@@ -408,7 +534,7 @@ def _build_digest_email_body(alerts: list[Alert]) -> str:
 """
         for alert in type_alerts[:5]:  # حداکثر 5 تا از هر نوع
             body += f"""
-• {alert.title}
+• {alert.title}{_format_occurrences(alert)}
   {alert.message[:100]}{'...' if len(alert.message) > 100 else ''}
   زمان: {alert.created_at.strftime('%H:%M')}
 """
@@ -424,6 +550,11 @@ https://minila.app/admin/alerts
     return body
 
 
+def _format_occurrences(alert: Alert) -> str:
+    """برچسب تعداد تکرار هشدار تجمیع شده."""
+    return f" (×{alert.occurrences})" if (alert.occurrences or 1) > 1 else ""
+
+
 def _format_metadata(metadata: dict) -> str:
     """فرمت metadata برای نمایش در ایمیل."""
     lines = []
@@ -439,6 +570,7 @@ async def alert_error(
     title: str,
     message: str,
     metadata: Optional[dict] = None,
+    fingerprint_keys: Optional[Sequence[str]] = None,
 ) -> Alert:
     """ایجاد هشدار خطای سیستمی (اولویت بالا)."""
     return await create_alert(
@@ -448,6 +580,7 @@ async def alert_error(
         message=message,
         priority=AlertPriority.HIGH,
         metadata=metadata,
+        fingerprint_keys=fingerprint_keys,
     )
 
 
@@ -456,6 +589,7 @@ async def alert_security(
     title: str,
     message: str,
     metadata: Optional[dict] = None,
+    fingerprint_keys: Optional[Sequence[str]] = None,
 ) -> Alert:
     """ایجاد هشدار امنیتی (اولویت بالا)."""
     return await create_alert(
@@ -465,6 +599,7 @@ async def alert_security(
         message=message,
         priority=AlertPriority.HIGH,
         metadata=metadata,
+        fingerprint_keys=fingerprint_keys,
     )
 
 
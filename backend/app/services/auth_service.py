@@ -13,8 +13,7 @@ from ..core.security import (
 )
 from ..models.user import User
 from ..repositories import user_repo
-from ..services import log_service
-from ..utils.email import send_otp_email
+from ..services import email_outbox_service, log_service
 from ..utils.logger import logger
 
 settings = get_settings()
@@ -91,15 +90,14 @@ async def signup(
         payload={"email": email}
     )
     
-    await db.commit()
+    # OTP تایید ایمیل با زبان انتخابی (در همین تراکنش در outbox)
+    await email_outbox_service.enqueue_template(
+        db, email, "otp", language, otp_code=otp_code, first_name=first_name or ""
+    )
     
-    # ارسال OTP برای تایید ایمیل با زبان انتخابی
-    try:
-        send_otp_email(email, otp_code, first_name=first_name, language=language)
-    except Exception as e:
-        logger.warning(f"Failed to send verification OTP: {e}")
+    await db.commit()
     
-    logger.info(f"User signed up: {email}, verification OTP sent")
+    logger.info(f"User signed up: {email}, verification OTP queued")
     return user
 
 
@@ -215,11 +213,13 @@ async def request_otp(
         payload={"email": email, "method": "otp"}
     )
     
-    await db.commit()
-    
-    # ارسال ایمیل - اولویت با زبان ارسالی، سپس preferred_language کاربر
+    # ایمیل OTP در همین تراکنش - اولویت با زبان ارسالی، سپس preferred_language کاربر
     email_language = language or user.preferred_language
-    send_otp_email(email, otp_code, first_name=user.first_name or "", language=email_language)
+    await email_outbox_service.enqueue_template(
+        db, email, "otp", email_language, otp_code=otp_code, first_name=user.first_name or ""
+    )
+    
+    await db.commit()
     
     logger.info(f"OTP requested for: {email}")
     return True
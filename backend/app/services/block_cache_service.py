@@ -0,0 +1,90 @@
+"""Block Cache Service - مجموعه بلاک‌های هر کاربر برای مسیر پیام‌رسانی.
+
+برای هر کاربر دو مجموعه نگهداری می‌شود: کاربرانی که او بلاک کرده (blocked)
+و کاربرانی که او را بلاک کرده‌اند (blocked_by)، در VersionedHashCache با TTL
+محلی BLOCK_CACHE_LOCAL_TTL_SECONDS و hash نسخه‌دار blocks:{user_id}. بلاک و
+آنبلاک پس از commit مجموعه هر دو کاربر را باطل می‌کنند.
+"""
+from typing import Optional
+
+import redis.asyncio as redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import get_settings
+from ..core.redis_client import VersionedHashCache
+from ..repositories import user_block_repo
+
+settings = get_settings()
+
+# Redis key pattern: blocks:{user_id} → {blocked: "3,5", blocked_by: "9"}
+KEY_PREFIX = "blocks"
+REDIS_TTL = 60 * 60  # 1 hour
+
+BLOCKED_FIELD = "blocked"
+BLOCKED_BY_FIELD = "blocked_by"
+
+# (بلاک‌شده‌ها، بلاک‌کننده‌ها)
+BlockSets = tuple[frozenset[int], frozenset[int]]
+
+
+def _encode_ids(user_ids) -> str:
+    return ",".join(str(user_id) for user_id in sorted(user_ids))
+
+
+def _decode_ids(value: Optional[str]) -> frozenset[int]:
+    return frozenset(int(user_id) for user_id in value.split(",")) if value else frozenset()
+
+
+def _encode(sets: BlockSets) -> dict[str, str]:
+    return {BLOCKED_FIELD: _encode_ids(sets[0]), BLOCKED_BY_FIELD: _encode_ids(sets[1])}
+
+
+def _decode(fields: dict[str, str]) -> BlockSets:
+    return _decode_ids(fields.get(BLOCKED_FIELD)), _decode_ids(fields.get(BLOCKED_BY_FIELD))
+
+
+async def _query(db: AsyncSession, user_id: int) -> BlockSets:
+    blocked, blocked_by = await user_block_repo.get_block_sets(db, user_id)
+    return frozenset(blocked), frozenset(blocked_by)
+
+
+class BlockCache:
+    """کش مجموعه بلاک‌ها برای بررسی بدون کوئری در ارسال پیام."""
+
+    def __init__(self, client: Optional[redis.Redis] = None, local_ttl_seconds: Optional[float] = None):
+        """مقداردهی اولیه (بدون client از Redis client مشترک استفاده می‌شود)."""
+        if local_ttl_seconds is None:
+            local_ttl_seconds = settings.BLOCK_CACHE_LOCAL_TTL_SECONDS
+        self._cache: VersionedHashCache[BlockSets] = VersionedHashCache(
+            "Block", KEY_PREFIX, _query, _encode, _decode,
+            local_ttl_seconds=local_ttl_seconds, redis_ttl=REDIS_TTL, client=client
+        )
+
+    async def get_sets(self, db: AsyncSession, user_id: int) -> BlockSets:
+        """مجموعه‌های بلاک کاربر.
+
+        Args:
+            db: Database session
+            user_id: شناسه کاربر
+
+        Returns:
+            tuple از (کاربران بلاک‌شده توسط کاربر، کاربرانی که او را بلاک کرده‌اند)
+        """
+        return await self._cache.get(db, user_id)
+
+    async def get_blocked(self, db: AsyncSession, user_id: int) -> frozenset[int]:
+        """کاربرانی که کاربر بلاک کرده است."""
+        return (await self.get_sets(db, user_id))[0]
+
+    async def is_blocked_between(self, db: AsyncSession, user1_id: int, user2_id: int) -> bool:
+        """آیا یکی از دو کاربر دیگری را بلاک کرده است (فقط snapshot کاربر اول)."""
+        blocked, blocked_by = await self.get_sets(db, user1_id)
+        return user2_id in blocked or user2_id in blocked_by
+
+    async def invalidate(self, *user_ids: int) -> None:
+        """باطل کردن مجموعه‌های کاربران (پس از commit بلاک/آنبلاک)."""
+        await self._cache.invalidate(*user_ids)
+
+
+# Singleton instance
+block_cache = BlockCache()
@@ -5,6 +5,8 @@ from ..models.card import Card
 from ..repositories import card_repo, card_view_repo
 from ..schemas.card import CardFilter
 from ..services import log_service
+from ..services.dynamic_pricing_service import dynamic_pricing_service
+from ..services.market_price_service import market_price_service
 from ..utils.pagination import PaginatedResponse
 from ..utils.logger import logger
 
@@ -75,6 +77,7 @@ async def create_card(
     is_packed: Optional[bool] = None,
     price_aed: Optional[float] = None,
     currency: Optional[str] = "USD",
+    price_per_kg: Optional[float] = None,
     description: Optional[str] = None,
     product_classification_id: Optional[int] = None,
     community_ids: Optional[list[int]] = None
@@ -121,6 +124,7 @@ async def create_card(
         "weight": weight,
         "is_packed": is_packed,
         "price_aed": price_aed,
+        "price_per_kg": price_per_kg,
         "currency": currency,
         "description": description,
         "product_classification_id": product_classification_id
@@ -147,6 +151,12 @@ async def create_card(
     
     await db.commit()
     
+    # کارت جدید آمار عرضه/تقاضا و قیمت بازار مسیر را تغییر می‌دهد
+    market_price_service.record_price(
+        origin_city_id, destination_city_id, price_per_kg, currency
+    )
+    dynamic_pricing_service.invalidate_route(origin_city_id, destination_city_id)
+    
     logger.info(f"Card created: {card.id} by user {owner_id}")
     return card
 
@@ -265,11 +275,15 @@ async def delete_card(
         card_id=card_id
     )
     
+    route = (card.origin_city_id, card.destination_city_id)
+    
     # حذف (hard delete در MVP)
     success = await card_repo.delete_card(db, card_id)
     
     await db.commit()
     
+    dynamic_pricing_service.invalidate_route(*route)
+    
     logger.info(f"Card deleted: {card_id} by user {user_id}")
     return success
 
@@ -4,9 +4,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ..models.community import Community
 from ..models.membership import Membership, Request
 from ..repositories import community_repo, membership_repo
-from ..services import log_service
+from ..services import email_outbox_service, log_service
+from ..services.membership_cache_service import membership_cache
 from ..utils.pagination import PaginatedResponse
-from ..utils.email import send_membership_request_notification, send_membership_result, send_role_change_notification
 from ..utils.logger import logger
 
 
@@ -71,21 +71,13 @@ async def get_community(
             community.my_role = "owner"
             logger.debug(f"User {user_id} is owner of community {community_id}")
         else:
-            # بررسی عضویت (فقط عضویت‌های فعال)
-            membership = await membership_repo.get_membership(db, user_id, community_id)
-            logger.debug(f"Membership check for user {user_id} in community {community_id}: found={membership is not None}")
+            # بررسی عضویت از snapshot کش‌شده (فقط عضویت‌های فعال)
+            role = await membership_cache.get_role(db, user_id, community_id)
+            logger.debug(f"Membership check for user {user_id} in community {community_id}: role={role}")
             
-            if membership:
+            if role:
                 community.is_member = True
-                # دریافت نام role از relation
-                if membership.role:
-                    community.my_role = membership.role.name
-                    logger.debug(f"User {user_id} has role '{membership.role.name}' in community {community_id}")
-                else:
-                    # fallback: check with is_manager
-                    is_mgr = await membership_repo.is_manager(db, user_id, community_id)
-                    community.my_role = "manager" if is_mgr else "member"
-                    logger.warning(f"Role relation not loaded for user {user_id} in community {community_id}, fallback: is_manager={is_mgr}")
+                community.my_role = role
             else:
                 community.is_member = False
                 community.my_role = None
@@ -98,6 +90,53 @@ async def get_community(
     return community
 
 
+async def get_user_communities(
+    db: AsyncSession,
+    user_id: int,
+    page: int,
+    page_size: int,
+    viewer_id: Optional[int] = None
+):
+    """دریافت کامیونیتی‌هایی که کاربر عضو فعال آن‌هاست.
+    
+    شناسه‌ها از snapshot عضویت خوانده و فقط صفحه جاری از دیتابیس بارگذاری
+    می‌شود (کامیونیتی‌ها و تعداد اعضا هر کدام با یک کوئری).
+    
+    Args:
+        db: Database session
+        user_id: شناسه کاربری که کامیونیتی‌هایش خواسته شده
+        page: شماره صفحه
+        page_size: تعداد آیتم در صفحه
+        viewer_id: شناسه کاربر جاری برای is_member/my_role (پیش‌فرض user_id)
+        
+    Returns:
+        PaginatedResponse از Community به ترتیب ID
+    """
+    if viewer_id is None:
+        viewer_id = user_id
+    
+    snapshot = await membership_cache.get_snapshot(db, user_id)
+    viewer_snapshot = snapshot if viewer_id == user_id else await membership_cache.get_snapshot(db, viewer_id)
+    
+    community_ids = sorted(snapshot)
+    start = (page - 1) * page_size
+    page_ids = community_ids[start:start + page_size]
+    
+    communities = await community_repo.get_by_ids(db, page_ids)
+    member_counts = await community_repo.get_member_counts(db, page_ids)
+    for community in communities:
+        community.member_count = member_counts[community.id]
+        community.my_role = viewer_snapshot.get(community.id)
+        community.is_member = community.my_role is not None
+    
+    return PaginatedResponse.create(
+        items=communities,
+        total=len(community_ids),
+        page=page,
+        page_size=page_size
+    )
+
+
 async def create_community(
     db: AsyncSession,
     owner_id: int,
@@ -158,6 +197,7 @@ async def create_community(
     )
     
     await db.commit()
+    await membership_cache.invalidate(owner_id)
     
     logger.info(f"Community created: {name} by user {owner_id}")
     return community
@@ -190,7 +230,7 @@ async def update_community(
         raise ValueError("کامیونیتی یافت نشد")
     
     # بررسی permission (فقط owner/manager)
-    if not await membership_repo.is_manager(db, user_id, community_id):
+    if not await membership_cache.is_manager(db, user_id, community_id):
         raise PermissionError("شما مجاز به ویرایش این کامیونیتی نیستید")
     
     # حذف فیلدهای None
@@ -264,30 +304,22 @@ async def join_request(
         community_id=community_id
     )
     
-    await db.commit()
+    # ایمیل به مدیران (در همین تراکنش در outbox)
+    from ..repositories import user_repo
+    user = await user_repo.get_by_id(db, user_id)
+    user_name = f"{user.first_name} {user.last_name}" if user else "Unknown User"
     
-    # ارسال ایمیل به مدیران
-    try:
-        # دریافت اطلاعات کاربر درخواست‌دهنده
-        from ..repositories import user_repo
-        user = await user_repo.get_by_id(db, user_id)
-        user_name = f"{user.first_name} {user.last_name}" if user else "Unknown User"
-        
-        # دریافت ایمیل مدیران
-        managers = await community_repo.get_managers_emails(db, community_id)
-        
-        for manager in managers:
-            try:
-                send_membership_request_notification(
-                    email=manager["email"],
-                    user_name=user_name,
-                    community_name=community.name,
-                    language=manager.get("language", "en")
-                )
-            except Exception as e:
-                logger.warning(f"Failed to send membership request email to {manager['email']}: {e}")
-    except Exception as e:
-        logger.warning(f"Failed to send membership request notifications: {e}")
+    # قالب یک بار برای هر زبان render و برای مدیران یک‌جا ثبت می‌شود
+    managers = await community_repo.get_managers_emails(db, community_id)
+    await email_outbox_service.enqueue_template_bulk(
+        db,
+        [(manager["email"], manager.get("language")) for manager in managers],
+        "membership_request",
+        user_name=user_name,
+        community_name=community.name
+    )
+    
+    await db.commit()
     
     logger.info(f"Join request: user {user_id} → community {community_id}")
     return request
@@ -316,7 +348,7 @@ async def get_join_requests(
         PermissionError: اگر کاربر مجاز نباشد
     """
     # بررسی permission (فقط manager)
-    if not await membership_repo.is_manager(db, user_id, community_id):
+    if not await membership_cache.is_manager(db, user_id, community_id):
         raise PermissionError("شما مجاز به مشاهده درخواست‌ها نیستید")
     
     requests, total = await membership_repo.get_pending_requests(db, community_id, page, page_size)
@@ -359,7 +391,7 @@ async def handle_request(
         raise ValueError("این درخواست قبلاً پردازش شده است")
     
     # بررسی permission
-    if not await membership_repo.is_manager(db, user_id, request.community_id):
+    if not await membership_cache.is_manager(db, user_id, request.community_id):
         raise PermissionError("شما مجاز به پردازش این درخواست نیستید")
     
     membership = None
@@ -414,24 +446,24 @@ async def handle_request(
             community_id=request.community_id
         )
     
-    await db.commit()
+    # ایمیل نتیجه به کاربر (در همین تراکنش در outbox)
+    from ..repositories import user_repo
+    user = await user_repo.get_by_id(db, request.user_id)
+    community = await community_repo.get_by_id(db, request.community_id)
     
-    # ارسال ایمیل نتیجه به کاربر
-    try:
-        from ..repositories import user_repo
-        user = await user_repo.get_by_id(db, request.user_id)
-        community = await community_repo.get_by_id(db, request.community_id)
-        
-        if user and community:
-            send_membership_result(
-                email=user.email,
-                community_name=community.name,
-                approved=approve,
-                first_name=user.first_name or "",
-                language=getattr(user, "preferred_language", "en")
-            )
-    except Exception as e:
-        logger.warning(f"Failed to send membership result email: {e}")
+    if user and community:
+        await email_outbox_service.enqueue_template(
+            db,
+            user.email,
+            "membership_approved" if approve else "membership_rejected",
+            getattr(user, "preferred_language", "en"),
+            community_name=community.name,
+            first_name=user.first_name or ""
+        )
+    
+    await db.commit()
+    if approve:
+        await membership_cache.invalidate(request.user_id)
     
     logger.info(f"Request {request_id} {'approved' if approve else 'rejected'} by user {user_id}")
     return membership
@@ -591,7 +623,22 @@ async def change_member_role(
         payload={"new_role": new_role}
     )
     
+    # ایمیل به کاربر (در همین تراکنش در outbox)
+    from ..repositories import user_repo
+    user = await user_repo.get_by_id(db, target_user_id)
+    if user:
+        await email_outbox_service.enqueue_template(
+            db,
+            user.email,
+            "role_change",
+            getattr(user, "preferred_language", "en"),
+            community_name=community.name,
+            new_role=new_role,
+            first_name=user.first_name or ""
+        )
+    
     await db.commit()
+    await membership_cache.invalidate(target_user_id)
     
     # بارگذاری مجدد عضویت با داده‌های جدید (با استفاده از تابع get_membership)
     # از refresh استفاده نمی‌کنیم چون async session ممکن است cache داشته باشد
@@ -612,22 +659,6 @@ async def change_member_role(
     result = await db.execute(query)
     updated_membership = result.scalar_one_or_none()
     
-    # ارسال ایمیل به کاربر
-    try:
-        from ..repositories import user_repo
-        user = await user_repo.get_by_id(db, target_user_id)
-        
-        if user:
-            send_role_change_notification(
-                email=user.email,
-                community_name=community.name,
-                new_role=new_role,
-                first_name=user.first_name or "",
-                language=getattr(user, "preferred_language", "en")
-            )
-    except Exception as e:
-        logger.warning(f"Failed to send role change email: {e}")
-    
     logger.info(f"Role changed: user {target_user_id} in community {community_id} → {new_role} by {actor_user_id}")
     return updated_membership
 
@@ -659,7 +690,7 @@ async def remove_member(
         raise ValueError("کامیونیتی یافت نشد")
     
     # بررسی دسترسی (owner یا manager)
-    if not await membership_repo.is_manager(db, actor_user_id, community_id):
+    if not await membership_cache.is_manager(db, actor_user_id, community_id):
         raise PermissionError("شما مجاز به حذف اعضا نیستید")
     
     # نمی‌توان owner را حذف کرد
@@ -692,6 +723,7 @@ async def remove_member(
     )
     
     await db.commit()
+    await membership_cache.invalidate(target_user_id)
     
     logger.info(f"Member removed: user {target_user_id} from community {community_id} by {actor_user_id}")
 
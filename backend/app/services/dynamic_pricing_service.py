@@ -11,13 +11,23 @@ This service calculates suggested prices based on multiple factors:
 7. Category Factor (product type)
 
 Formula: final_price = base_price × route × season × demand × urgency × weight × category
+
+When enough users have posted prices on the route, the result is blended
+with the market median from MarketPriceService.
 """
 from typing import Optional
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import get_settings
 from app.repositories import route_price_repo
-from app.schemas.price import PriceSuggestionOut, PriceFactorBreakdown, BasePriceResult
+from app.models.route_price import RoutePrice
+from app.schemas.price import PriceSuggestionOut, PriceFactorBreakdown, BasePriceResult, MarketPriceOut
+from app.services.market_price_service import market_price_service
+from app.utils.cache import AsyncTTLCache
+from app.utils.logger import logger
+
+settings = get_settings()
 
 
 class DynamicPricingService:
@@ -30,6 +40,11 @@ class DynamicPricingService:
     MIN_PRICE_PER_KG = 1.0
     MAX_PRICE_PER_KG = 50.0
     
+    # Market price blending (weight grows with sample count up to the max)
+    MARKET_MIN_SAMPLES = 5
+    MARKET_FULL_WEIGHT_SAMPLES = 50
+    MARKET_MAX_WEIGHT = 0.5
+    
     # Confidence thresholds
     CONFIDENCE_THRESHOLD_HIGH = 0.8
     CONFIDENCE_THRESHOLD_MEDIUM = 0.5
@@ -48,6 +63,16 @@ class DynamicPricingService:
         "general": 1.0,
     }
     
+    def __init__(self, cache_ttl_seconds: Optional[float] = None):
+        """Create the service with its own price-suggestion cache."""
+        if cache_ttl_seconds is None:
+            cache_ttl_seconds = settings.PRICE_SUGGESTION_CACHE_TTL_SECONDS
+        self._cache: AsyncTTLCache[
+            tuple[BasePriceResult, dict[str, float], Optional[MarketPriceOut]]
+        ] = AsyncTTLCache(
+            ttl_seconds=cache_ttl_seconds
+        )
+    
     async def calculate_price(
         self,
         db: AsyncSession,
@@ -60,6 +85,11 @@ class DynamicPricingService:
         """
         Calculate suggested price with all factors.
         
+        Everything except the urgency factor is cached per
+        (route, travel day, weight band, category); concurrent identical
+        requests share one computation. Urgency depends on the current time
+        and is applied on top of the cached factors.
+        
         Args:
             db: Database session
             origin_city_id: Origin city ID
@@ -71,33 +101,147 @@ class DynamicPricingService:
         Returns:
             PriceSuggestionOut with full breakdown
         """
-        # Get base price
+        travel_day = self._bucket_travel_date(travel_date)
+        weight_factor = self._get_weight_factor(weight) if weight else 1.0
+        cache_key = (origin_city_id, destination_city_id, travel_day, weight_factor, category_id)
+        
+        base_price, cached_factors, market = await self._cache.get_or_compute(
+            cache_key,
+            lambda: self._compute_cacheable_factors(
+                db, origin_city_id, destination_city_id, travel_day, weight_factor, category_id
+            ),
+            tag=(origin_city_id, destination_city_id)
+        )
+        
+        factors = dict(cached_factors)
+        factors["urgency"] = self._get_urgency_factor(travel_date) if travel_date else 1.0
+        
+        return self._build_suggestion(base_price, factors, market)
+    
+    def invalidate_route(self, origin_city_id: int, destination_city_id: int) -> None:
+        """Drop cached suggestions for a route (e.g. after a card is created on it)."""
+        self._cache.invalidate_tag((origin_city_id, destination_city_id))
+    
+    async def update_route_price(self, db: AsyncSession, route: RoutePrice) -> None:
+        """
+        Apply a created/updated route price and drop suggestions built on it.
+        
+        The route and its reverse (which falls back to it) are invalidated;
+        other routes that fall back to origin/country averages pick up the
+        change when their cached suggestion expires.
+        """
+        await route_price_repo.route_price_matrix.upsert(db, route)
+        self.invalidate_route(route.origin_city_id, route.destination_city_id)
+        self.invalidate_route(route.destination_city_id, route.origin_city_id)
+    
+    async def calculate_prices_batch(
+        self,
+        db: AsyncSession,
+        routes: list[tuple[int, int]],
+        travel_date: Optional[datetime] = None,
+        weight: Optional[float] = None,
+        category_id: Optional[int] = None
+    ) -> list[PriceSuggestionOut]:
+        """
+        Calculate suggested prices for many routes at once.
+        
+        Base prices, route statistics and supply/demand counts are loaded
+        with a handful of grouped queries for all routes; every factor is
+        then computed in memory.
+        
+        Args:
+            db: Database session
+            routes: (origin_city_id, destination_city_id) pairs
+            travel_date: Optional travel date shared by all routes
+            weight: Optional weight shared by all routes
+            category_id: Optional product category ID shared by all routes
+            
+        Returns:
+            One PriceSuggestionOut per route, in input order
+        """
+        if not routes:
+            return []
+        
+        travel_day = self._bucket_travel_date(travel_date)
+        
+        base_prices = await route_price_repo.get_base_prices_bulk(db, routes)
+        monthly_cards = await route_price_repo.get_route_statistics_bulk(db, routes)
+        supply_demand = await route_price_repo.get_supply_demand_counts_bulk(
+            db, routes, travel_day
+        )
+        
+        # Factors shared by every route
+        season = self._get_season_factor(travel_day) if travel_day else 1.0
+        urgency = self._get_urgency_factor(travel_date) if travel_date else 1.0
+        weight_factor = self._get_weight_factor(weight) if weight else 1.0
+        category = await self._get_category_factor(db, category_id) if category_id else 1.0
+        
+        try:
+            markets = await market_price_service.get_market_prices_bulk(db, routes)
+        except Exception as e:
+            logger.warning(f"Market prices unavailable for batch pricing: {e}")
+            markets = {}
+        
+        suggestions = []
+        for route in routes:
+            factors = {
+                "route": self._route_factor_from_count(monthly_cards[route]),
+                "season": season,
+                "demand": self._demand_factor_from_counts(*supply_demand[route]),
+                "urgency": urgency,
+                "weight": weight_factor,
+                "category": category,
+            }
+            suggestions.append(self._build_suggestion(base_prices[route], factors, markets.get(route)))
+        
+        return suggestions
+    
+    async def _compute_cacheable_factors(
+        self,
+        db: AsyncSession,
+        origin_city_id: int,
+        destination_city_id: int,
+        travel_day: Optional[datetime],
+        weight_factor: float,
+        category_id: Optional[int]
+    ) -> tuple[BasePriceResult, dict[str, float], Optional[MarketPriceOut]]:
+        """Load base price, market prices and every time-independent factor (urgency left neutral)."""
         base_price = await route_price_repo.get_base_price(
             db, origin_city_id, destination_city_id
         )
         
-        # Calculate all factors
         factors = {
             "route": await self._get_route_factor(db, origin_city_id, destination_city_id),
-            "season": self._get_season_factor(travel_date) if travel_date else 1.0,
-            "demand": await self._get_demand_factor(db, origin_city_id, destination_city_id, travel_date),
-            "urgency": self._get_urgency_factor(travel_date) if travel_date else 1.0,
-            "weight": self._get_weight_factor(weight) if weight else 1.0,
+            "season": self._get_season_factor(travel_day) if travel_day else 1.0,
+            "demand": await self._get_demand_factor(db, origin_city_id, destination_city_id, travel_day),
+            "urgency": 1.0,
+            "weight": weight_factor,
             "category": await self._get_category_factor(db, category_id) if category_id else 1.0,
         }
         
-        # Calculate final price
-        multiplier = 1.0
-        for factor_value in factors.values():
-            multiplier *= factor_value
-        
-        final_price = base_price.price * multiplier
-        
-        # Apply global price multiplier (2.5x)
-        final_price *= self.PRICE_MULTIPLIER
+        try:
+            market = await market_price_service.get_market_price(
+                db, origin_city_id, destination_city_id
+            )
+        except Exception as e:
+            logger.warning(f"Market price unavailable for {origin_city_id}->{destination_city_id}: {e}")
+            market = None
         
-        # Apply bounds
-        final_price = max(self.MIN_PRICE_PER_KG, min(self.MAX_PRICE_PER_KG, final_price))
+        return base_price, factors, market
+    
+    def _build_suggestion(
+        self,
+        base_price: BasePriceResult,
+        factors: dict[str, float],
+        market: Optional[MarketPriceOut] = None
+    ) -> PriceSuggestionOut:
+        """Combine base price, factors and market prices into the final suggestion."""
+        if market:
+            final_price = self._final_price(
+                base_price.price, factors, market.sample_count, market.median
+            )
+        else:
+            final_price = self._final_price(base_price.price, factors)
         
         # Calculate confidence
         confidence = self._calculate_confidence(base_price, factors)
@@ -119,9 +263,64 @@ class DynamicPricingService:
             source=base_price.source,
             factors=factors,
             breakdown=self._generate_breakdown(base_price.price, factors),
-            message=message
+            message=message,
+            market=market if market and market.sample_count > 0 else None
         )
     
+    def _blend(
+        self,
+        model_price: float,
+        market_samples: int,
+        market_median: Optional[float]
+    ) -> float:
+        """
+        Move the model price towards the market median.
+        
+        No blending below MARKET_MIN_SAMPLES; the market weight then grows
+        linearly up to MARKET_MAX_WEIGHT at MARKET_FULL_WEIGHT_SAMPLES.
+        """
+        if market_median is None or market_samples < self.MARKET_MIN_SAMPLES:
+            return model_price
+        weight = self.MARKET_MAX_WEIGHT * min(1.0, market_samples / self.MARKET_FULL_WEIGHT_SAMPLES)
+        return (1 - weight) * model_price + weight * market_median
+    
+    def _final_price(
+        self,
+        base_price: float,
+        factors: dict[str, float],
+        market_samples: int = 0,
+        market_median: Optional[float] = None
+    ) -> float:
+        """
+        Final price per kg before rounding.
+        
+        base × factors × PRICE_MULTIPLIER, blended with the market median and
+        clamped to [MIN_PRICE_PER_KG, MAX_PRICE_PER_KG]. Pure, so it is also
+        used by the pricing backtest.
+        """
+        # Calculate final price
+        multiplier = 1.0
+        for factor_value in factors.values():
+            multiplier *= factor_value
+        
+        final_price = base_price * multiplier
+        
+        # Apply global price multiplier (2.5x)
+        final_price *= self.PRICE_MULTIPLIER
+        
+        # Blend with prices users actually post on this route
+        final_price = self._blend(final_price, market_samples, market_median)
+        
+        # Apply bounds
+        return max(self.MIN_PRICE_PER_KG, min(self.MAX_PRICE_PER_KG, final_price))
+    
+    @staticmethod
+    def _bucket_travel_date(travel_date: Optional[datetime]) -> Optional[datetime]:
+        """Truncate travel date to its day so nearby requests share a cache entry."""
+        if travel_date is None:
+            return None
+        return travel_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    
     async def _get_route_factor(
         self,
         db: AsyncSession,
@@ -139,8 +338,10 @@ class DynamicPricingService:
         stats = await route_price_repo.get_route_statistics(
             db, origin_city_id, destination_city_id
         )
-        monthly_cards = stats["monthly_cards"]
-        
+        return self._route_factor_from_count(stats["monthly_cards"])
+    
+    def _route_factor_from_count(self, monthly_cards: int) -> float:
+        """Route factor for a given number of cards in the last month."""
         if monthly_cards > 100:
             return 0.85  # High competition
         elif monthly_cards > 50:
@@ -208,7 +409,10 @@ class DynamicPricingService:
         travelers, senders = await route_price_repo.get_supply_demand_counts(
             db, origin_city_id, destination_city_id, travel_date
         )
-        
+        return self._demand_factor_from_counts(travelers, senders)
+    
+    def _demand_factor_from_counts(self, travelers: int, senders: int) -> float:
+        """Demand factor for given traveler (supply) and sender (demand) counts."""
         # No supply case
         if travelers == 0:
             return 1.5  # Moderate surge (no data)
@@ -230,7 +434,7 @@ class DynamicPricingService:
             # Cap at 2.0
             return min(2.0, 1.6 + (ratio - 3.0) * 0.1)
     
-    def _get_urgency_factor(self, travel_date: datetime) -> float:
+    def _get_urgency_factor(self, travel_date: datetime, now: Optional[datetime] = None) -> float:
         """
         How soon is the travel date?
         
@@ -240,10 +444,14 @@ class DynamicPricingService:
         - 3-7 days: 1.2
         - 1-3 days: 1.35
         - < 24 hours: 1.5 (urgent)
+        
+        `now` defaults to the current time (the backtest passes the card's
+        creation time).
         """
-        now = datetime.utcnow()
-        if travel_date.tzinfo:
-            now = datetime.now(travel_date.tzinfo)
+        if now is None:
+            now = datetime.utcnow()
+            if travel_date.tzinfo:
+                now = datetime.now(travel_date.tzinfo)
         
         days_until = (travel_date - now).days
         
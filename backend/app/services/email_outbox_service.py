@@ -0,0 +1,351 @@
+"""Email Outbox Service - ارسال ایمیل از طریق outbox پایدار.
+
+سرویس‌ها ایمیل را با enqueue/enqueue_template در همان تراکنش درخواست در
+جدول email_outbox ثبت می‌کنند؛ ایمیل فقط اگر تراکنش commit شود ارسال
+می‌شود و درخواست هیچ‌وقت منتظر SMTP/Resend نمی‌ماند.
+
+EmailOutboxWorker (اجرا با scripts/email_worker.py، جدا از API):
+- هر بار حداکثر EMAIL_WORKER_BATCH_SIZE ایمیل را با SKIP LOCKED claim می‌کند
+  (چند worker هم‌زمان ممکن است)
+- ایمیل‌ها را در حداکثر EMAIL_WORKER_CONCURRENCY گروه هم‌زمان ارسال می‌کند؛
+  هر گروه یک عملیات transport است (یک session SMTP یا یک Batch API در Resend)
+  و ایمیل‌های یکسان برای چند گیرنده (هشدار، خلاصه روزانه) در یک گروه می‌مانند
+- اندازه هر گروه و batch طوری محدود می‌شود که ارسال batch حتی با timeout همه
+  ایمیل‌ها از EMAIL_WORKER_LEASE_SECONDS طولانی‌تر نشود (وگرنه worker دیگری
+  ردیف‌های در حال ارسال را دوباره claim و تکراری ارسال می‌کند)
+- ایمیل ناموفق با backoff نمایی دوباره تلاش می‌شود و پس از
+  EMAIL_MAX_ATTEMPTS تلاش به dead letter (status=dead) می‌رود
+- هر EMAIL_WORKER_REPORT_SECONDS آمار ارسال و طول صف را لاگ می‌کند
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import get_settings
+from ..core.database import get_db_session
+from ..models.email_outbox import EmailOutbox
+from ..repositories import email_outbox_repo
+from ..utils.email import OutgoingEmail, deliver_many
+from ..utils.email_templates import get_template, template_registry
+from ..utils.logger import logger
+
+settings = get_settings()
+
+# حداکثر طول خطای ذخیره شده در last_error
+MAX_ERROR_LENGTH = 1000
+
+
+async def enqueue(
+    db: AsyncSession,
+    to_email: str,
+    subject: str,
+    body: str,
+    kind: str,
+    alert_id: Optional[int] = None
+) -> EmailOutbox:
+    """ثبت ایمیل در outbox (در تراکنش جاری؛ با commit فراخواننده ارسال می‌شود).
+
+    Args:
+        db: Database session
+        to_email: آدرس گیرنده
+        subject: موضوع
+        body: متن
+        kind: نوع ایمیل (برای لاگ و آمار)
+        alert_id: هشدار مربوط (برای وضعیت ارسال هر گیرنده)
+
+    Returns:
+        EmailOutbox ثبت شده
+    """
+    return await email_outbox_repo.enqueue(db, to_email, subject, body, kind, alert_id=alert_id)
+
+
+async def enqueue_many(
+    db: AsyncSession,
+    to_emails: Sequence[str],
+    subject: str,
+    body: str,
+    kind: str,
+    alert_id: Optional[int] = None
+) -> list[EmailOutbox]:
+    """ثبت یک ایمیل برای چند گیرنده در outbox (در تراکنش جاری).
+
+    هر گیرنده ردیف جدا دارد (آدرس‌ها به یکدیگر نمایش داده نمی‌شوند) ولی
+    worker آن‌ها را در یک عملیات batch ارسال می‌کند.
+
+    Args:
+        db: Database session
+        to_emails: آدرس گیرندگان
+        subject: موضوع
+        body: متن
+        kind: نوع ایمیل (برای لاگ و آمار)
+        alert_id: هشدار مربوط (برای وضعیت ارسال هر گیرنده)
+
+    Returns:
+        لیست EmailOutbox ثبت شده
+    """
+    return await email_outbox_repo.enqueue_many(db, to_emails, subject, body, kind, alert_id=alert_id)
+
+
+async def enqueue_template(
+    db: AsyncSession,
+    to_email: str,
+    template: str,
+    language: Optional[str] = "en",
+    **context
+) -> EmailOutbox:
+    """ثبت ایمیل template شده در outbox (در تراکنش جاری).
+
+    Args:
+        db: Database session
+        to_email: آدرس گیرنده
+        template: نام template (app/utils/email_templates.py)
+        language: زبان ایمیل
+        **context: متغیرهای template
+
+    Returns:
+        EmailOutbox ثبت شده
+    """
+    subject, body = get_template(template, language or "en", **context)
+    return await enqueue(db, to_email, subject, body, kind=template)
+
+
+async def enqueue_template_many(
+    db: AsyncSession,
+    to_emails: Sequence[str],
+    template: str,
+    language: Optional[str] = "en",
+    **context
+) -> list[EmailOutbox]:
+    """ثبت ایمیل template شده برای چند گیرنده هم‌زبان در outbox (در تراکنش جاری).
+
+    Args:
+        db: Database session
+        to_emails: آدرس گیرندگان
+        template: نام template (app/utils/email_templates.py)
+        language: زبان ایمیل
+        **context: متغیرهای template
+
+    Returns:
+        لیست EmailOutbox ثبت شده
+    """
+    subject, body = get_template(template, language or "en", **context)
+    return await enqueue_many(db, to_emails, subject, body, kind=template)
+
+
+async def enqueue_template_bulk(
+    db: AsyncSession,
+    recipients: Sequence[tuple[str, Optional[str]]],
+    template: str,
+    **context
+) -> list[EmailOutbox]:
+    """ثبت ایمیل template شده با context یکسان برای گیرندگان با زبان‌های مختلف.
+    
+    قالب برای هر زبان فقط یک بار render می‌شود و گیرندگان هم‌زبان با یک
+    enqueue_many ثبت می‌شوند (worker هر گروه را یک‌جا ارسال می‌کند).
+    
+    Args:
+        db: Database session
+        recipients: لیست (آدرس گیرنده، زبان)
+        template: نام template (app/utils/email_templates.py)
+        **context: متغیرهای template
+        
+    Returns:
+        لیست EmailOutbox ثبت شده
+    """
+    emails_by_content: dict[tuple[str, str], list[str]] = {}
+    rendered = template_registry.render_bulk(template, (language for _, language in recipients), **context)
+    for to_email, language in recipients:
+        emails_by_content.setdefault(rendered[language], []).append(to_email)
+    
+    entries = []
+    for (subject, body), to_emails in emails_by_content.items():
+        entries.extend(await enqueue_many(db, to_emails, subject, body, kind=template))
+    return entries
+
+
+def max_chunk_size() -> int:
+    """حداکثر ایمیل در یک گروه ارسال.
+
+    هر ایمیل در بدترین حالت EMAIL_SMTP_TIMEOUT_SECONDS طول می‌کشد و یک گروه
+    حداکثر نصف lease را مصرف می‌کند. با batch_size ایمیل روی سقف هم‌زمانی،
+    کل batch حداکثر (سهم هر ارسال هم‌زمان + بزرگ‌ترین گروه) = یک lease طول
+    می‌کشد، حتی اگر گروه‌هایی پشت semaphore منتظر بمانند.
+    """
+    return max(1, settings.EMAIL_WORKER_LEASE_SECONDS // (2 * settings.EMAIL_SMTP_TIMEOUT_SECONDS))
+
+
+def batch_size() -> int:
+    """تعداد ایمیل claim شده در هر دور (حداکثر یک گروه کامل برای هر ارسال هم‌زمان)."""
+    return min(settings.EMAIL_WORKER_BATCH_SIZE, settings.EMAIL_WORKER_CONCURRENCY * max_chunk_size())
+
+
+def plan_chunks(
+    entries: Sequence[EmailOutbox],
+    chunks: int,
+    max_size: Optional[int] = None
+) -> list[list[EmailOutbox]]:
+    """تقسیم batch به حداقل chunks گروه ارسال هم‌زمان.
+
+    ایمیل‌های با موضوع و متن یکسان (یک ایمیل برای چند گیرنده) با هم می‌مانند
+    مگر از max_size بزرگ‌تر باشند؛ قطعه‌ها از بزرگ به کوچک به سبک‌ترین chunk
+    اضافه می‌شوند و اگر جا نباشد chunk جدید ساخته می‌شود.
+    """
+    groups: dict[tuple[str, str], list[EmailOutbox]] = {}
+    for entry in sorted(entries, key=lambda entry: entry.id):
+        groups.setdefault((entry.subject, entry.body), []).append(entry)
+
+    pieces: list[list[EmailOutbox]] = []
+    for group in groups.values():
+        step = max_size or len(group)
+        pieces.extend(group[start:start + step] for start in range(0, len(group), step))
+
+    planned: list[list[EmailOutbox]] = [[] for _ in range(max(min(chunks, len(entries)), 1))]
+    for piece in sorted(pieces, key=len, reverse=True):
+        target = min(planned, key=len)
+        if max_size and len(target) + len(piece) > max_size:
+            target = []
+            planned.append(target)
+        target.extend(piece)
+    return [chunk for chunk in planned if chunk]
+
+
+def retry_delay(attempts: int) -> float:
+    """فاصله تا تلاش بعدی پس از attempts تلاش ناموفق.
+
+    نمایی از EMAIL_RETRY_BASE_SECONDS با سقف EMAIL_RETRY_MAX_SECONDS و
+    ±10٪ jitter تا ایمیل‌های یک خرابی هم‌زمان دوباره با هم تلاش نشوند.
+    """
+    delay = min(
+        settings.EMAIL_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0),
+        settings.EMAIL_RETRY_MAX_SECONDS
+    )
+    return delay * random.uniform(0.9, 1.1)
+
+
+class EmailOutboxWorker:
+    """خالی کردن outbox: claim، ارسال هم‌زمان، retry و dead letter."""
+
+    def __init__(self):
+        """مقداردهی اولیه."""
+        self._semaphore = asyncio.Semaphore(settings.EMAIL_WORKER_CONCURRENCY)
+        self._reset_stats()
+
+    async def run_once(self) -> int:
+        """یک batch: claim، ارسال و ثبت نتیجه.
+
+        Returns:
+            تعداد ایمیل‌های claim شده
+        """
+        async with get_db_session() as db:
+            batch = await email_outbox_repo.claim_batch(
+                db, batch_size(), settings.EMAIL_WORKER_LEASE_SECONDS
+            )
+        if not batch:
+            return 0
+
+        chunks = plan_chunks(batch, settings.EMAIL_WORKER_CONCURRENCY, max_chunk_size())
+        results = await asyncio.gather(*(self._send(chunk) for chunk in chunks))
+
+        sent_ids = []
+        async with get_db_session() as db:
+            for entry, error in zip(
+                (entry for chunk in chunks for entry in chunk),
+                (error for errors in results for error in errors)
+            ):
+                if error is None:
+                    sent_ids.append(entry.id)
+                elif entry.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                    await email_outbox_repo.mark_dead(db, entry.id, error)
+                    self._stats["dead"] += 1
+                    logger.error(
+                        f"Email {entry.id} ({entry.kind}) to {entry.to_email} dead after "
+                        f"{entry.attempts} attempts: {error}"
+                    )
+                else:
+                    await email_outbox_repo.mark_retry(db, entry.id, error, retry_delay(entry.attempts))
+                    self._stats["retried"] += 1
+                    logger.warning(
+                        f"Email {entry.id} ({entry.kind}) to {entry.to_email} failed "
+                        f"(attempt {entry.attempts}): {error}"
+                    )
+            await email_outbox_repo.mark_sent(db, sent_ids)
+        self._stats["sent"] += len(sent_ids)
+        return len(batch)
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> None:
+        """اجرای worker تا زمان set شدن stop.
+
+        تا وقتی batch پر (batch_size) برگردد بلافاصله ادامه می‌دهد؛ در غیر این صورت
+        EMAIL_WORKER_POLL_SECONDS صبر می‌کند.
+        """
+        stop = stop or asyncio.Event()
+        logger.info(
+            f"Email worker started (batch {batch_size()}, "
+            f"concurrency {settings.EMAIL_WORKER_CONCURRENCY})"
+        )
+        while not stop.is_set():
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Email outbox batch failed: {e}")
+                claimed = 0
+
+            if time.monotonic() - self._window_start >= settings.EMAIL_WORKER_REPORT_SECONDS:
+                try:
+                    await self.report()
+                except Exception as e:
+                    logger.warning(f"Email outbox report failed: {e}")
+
+            if claimed < batch_size():
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=settings.EMAIL_WORKER_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info("Email worker stopped")
+
+    async def report(self) -> dict:
+        """لاگ آمار بازه جاری و طول صف، و حذف ایمیل‌های ارسال شده قدیمی.
+
+        Returns:
+            dict با sent، retried، dead، per_second و pending
+        """
+        elapsed = max(time.monotonic() - self._window_start, 1e-9)
+        retention = datetime.now(timezone.utc) - timedelta(days=settings.EMAIL_OUTBOX_RETENTION_DAYS)
+        async with get_db_session() as db:
+            counts = await email_outbox_repo.count_by_status(db)
+            await email_outbox_repo.purge_sent(db, retention)
+
+        report = {
+            **self._stats,
+            "per_second": round(self._stats["sent"] / elapsed, 2),
+            "pending": counts[email_outbox_repo.PENDING],
+        }
+        logger.info(
+            f"Email outbox: {report['sent']} sent ({report['per_second']}/s), "
+            f"{report['retried']} retried, {report['dead']} dead in {elapsed:.0f}s; "
+            f"{report['pending']} pending, {counts[email_outbox_repo.DEAD]} dead letters"
+        )
+        self._reset_stats()
+        return report
+
+    async def _send(self, chunk: list[EmailOutbox]) -> list[Optional[str]]:
+        # SMTP/Resend blocking هستند؛ در thread و با سقف هم‌زمانی
+        emails = [OutgoingEmail(entry.to_email, entry.subject, entry.body) for entry in chunk]
+        async with self._semaphore:
+            try:
+                errors = await asyncio.to_thread(deliver_many, emails)
+            except Exception as e:
+                errors = [str(e) or e.__class__.__name__] * len(chunk)
+        return [error[:MAX_ERROR_LENGTH] if error else None for error in errors]
+
+    def _reset_stats(self) -> None:
+        self._stats = {"sent": 0, "retried": 0, "dead": 0}
+        self._window_start = time.monotonic()
+
+
+# Singleton instance
+email_outbox_worker = EmailOutboxWorker()
@@ -0,0 +1,179 @@
+"""
+Market Price Service - distribution of prices users actually post.
+
+Keeps a t-digest per route of card price_per_kg (USD). New card prices
+are added to an in-process delta sketch; a background loop periodically
+merges deltas into the persisted route_price_sketch row. Reads merge the
+persisted sketch (cached) with the local delta, so no query ever scans
+historical cards.
+"""
+import asyncio
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.database import get_db_session
+from app.repositories import route_price_repo
+from app.schemas.price import MarketPriceOut
+from app.utils.cache import AsyncTTLCache
+from app.utils.tdigest import TDigest
+from app.utils.logger import logger
+
+settings = get_settings()
+
+Route = tuple[int, int]
+
+
+class MarketPriceService:
+    """Streaming market price estimator per route."""
+
+    # Only prices in the pricing currency are sketched
+    CURRENCY = "USD"
+
+    def __init__(self, flush_interval_seconds: Optional[float] = None):
+        """Create the service with empty deltas and a persisted-sketch cache."""
+        if flush_interval_seconds is None:
+            flush_interval_seconds = settings.MARKET_PRICE_FLUSH_SECONDS
+        self.flush_interval_seconds = flush_interval_seconds
+        self._deltas: dict[Route, TDigest] = {}
+        self._flushing: dict[Route, TDigest] = {}
+        self._persisted: AsyncTTLCache[TDigest] = AsyncTTLCache(ttl_seconds=flush_interval_seconds)
+
+    def record_price(
+        self,
+        origin_city_id: int,
+        destination_city_id: int,
+        price_per_kg: Optional[float],
+        currency: Optional[str] = None
+    ) -> None:
+        """Add a posted card price to the route's delta sketch (O(1) amortized)."""
+        if not price_per_kg or price_per_kg <= 0:
+            return
+        if (currency or self.CURRENCY).upper() != self.CURRENCY:
+            return
+        route = (origin_city_id, destination_city_id)
+        self._deltas.setdefault(route, TDigest()).add(price_per_kg)
+
+    async def get_market_price(
+        self,
+        db: AsyncSession,
+        origin_city_id: int,
+        destination_city_id: int
+    ) -> MarketPriceOut:
+        """Get p25/median/p75 of posted prices on a route."""
+        route = (origin_city_id, destination_city_id)
+        persisted = await self._persisted.get_or_compute(
+            route,
+            lambda: self._load_persisted(db, [route]),
+            tag=route
+        )
+        return self._summarize(route, persisted)
+
+    async def get_market_prices_bulk(
+        self,
+        db: AsyncSession,
+        routes: list[Route]
+    ) -> dict[Route, MarketPriceOut]:
+        """
+        Get market prices for many routes with at most one query.
+
+        Like get_market_price, a sketch loaded while its route is flushed is
+        returned but not cached.
+        """
+        persisted = await self._persisted.get_or_compute_many(
+            set(routes),
+            lambda missing: self._load_persisted_many(db, missing)
+        )
+        return {
+            route: self._summarize(route, persisted.get(route) or TDigest())
+            for route in set(routes)
+        }
+
+    async def flush(self, db: AsyncSession) -> int:
+        """
+        Merge pending deltas into persisted sketches (row-locked per route).
+
+        Returns:
+            Number of routes flushed
+        """
+        if not self._deltas:
+            return 0
+
+        self._flushing, self._deltas = self._deltas, {}
+        try:
+            for (origin, destination), delta in sorted(self._flushing.items()):
+                row = await route_price_repo.lock_price_sketch(db, origin, destination)
+                digest = TDigest.from_dict(row.digest) if row.digest else TDigest()
+                digest.merge(delta)
+                row.digest = digest.to_dict()
+                row.sample_count = int(digest.count)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            # Keep the deltas for the next flush
+            for route, delta in self._flushing.items():
+                self._deltas.setdefault(route, TDigest()).merge(delta)
+            raise
+        finally:
+            flushed, self._flushing = self._flushing, {}
+
+        for route in flushed:
+            self._persisted.invalidate_tag(route)
+
+        logger.info(f"Market price sketches flushed for {len(flushed)} routes")
+        return len(flushed)
+
+    async def run_flush_loop(self) -> None:
+        """Flush deltas every flush_interval_seconds until cancelled."""
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                async with get_db_session() as db:
+                    await self.flush(db)
+            except Exception as e:
+                logger.error(f"Market price sketch flush failed: {e}")
+
+    async def _load_persisted(self, db: AsyncSession, routes: list[Route]) -> TDigest:
+        loaded = await self._load_persisted_many(db, routes)
+        return loaded[routes[0]]
+
+    async def _load_persisted_many(
+        self,
+        db: AsyncSession,
+        routes: list[Route]
+    ) -> dict[Route, TDigest]:
+        rows = await route_price_repo.get_price_sketches_bulk(db, routes)
+        return {
+            route: (
+                TDigest.from_dict(rows[route].digest)
+                if route in rows and rows[route].digest else TDigest()
+            )
+            for route in routes
+        }
+
+    def _summarize(self, route: Route, persisted: TDigest) -> MarketPriceOut:
+        """Merge persisted and pending local prices and read quantiles."""
+        digest = TDigest()
+        digest.merge(persisted)
+        for pending in (self._flushing.get(route), self._deltas.get(route)):
+            if pending is not None:
+                digest.merge(pending)
+
+        def rounded(q: float) -> Optional[float]:
+            value = digest.quantile(q)
+            return round(value, 2) if value is not None else None
+
+        return MarketPriceOut(
+            origin_city_id=route[0],
+            destination_city_id=route[1],
+            currency=self.CURRENCY,
+            sample_count=int(digest.count),
+            p25=rounded(0.25),
+            median=rounded(0.5),
+            p75=rounded(0.75),
+        )
+
+
+# Singleton instance
+market_price_service = MarketPriceService()
@@ -0,0 +1,93 @@
+"""Membership Cache Service - snapshot عضویت‌های هر کاربر.
+
+snapshot یک کاربر نگاشت community_id → نام نقش برای عضویت‌های فعال است و در
+VersionedHashCache (کش محلی با TTL کوتاه MEMBERSHIP_CACHE_LOCAL_TTL_SECONDS روی
+hash نسخه‌دار membership:{user_id}) نگهداری می‌شود. community_service پس از
+commit هر تغییر عضویت، نقش یا حذف، snapshot کاربران مربوطه را باطل می‌کند.
+"""
+from typing import Optional
+
+import redis.asyncio as redis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import get_settings
+from ..core.redis_client import VersionedHashCache
+from ..repositories import membership_repo
+
+settings = get_settings()
+
+# Redis key pattern: membership:{user_id} → {community_id: role_name}
+KEY_PREFIX = "membership"
+REDIS_TTL = 60 * 60  # 1 hour
+
+# فیلد نشانگر تا snapshot خالی (کاربر بدون عضویت) هم کش شود
+EMPTY_FIELD = "_"
+
+MANAGER_ROLES = frozenset({"manager", "owner"})
+
+Snapshot = dict[int, str]
+
+
+def _encode(snapshot: Snapshot) -> dict[str, str]:
+    return {EMPTY_FIELD: "", **{str(community_id): role for community_id, role in snapshot.items()}}
+
+
+def _decode(fields: dict[str, str]) -> Snapshot:
+    return {
+        int(community_id): role
+        for community_id, role in fields.items()
+        if community_id != EMPTY_FIELD
+    }
+
+
+async def _query(db: AsyncSession, user_id: int) -> Snapshot:
+    return (await membership_repo.get_user_roles(db, [user_id]))[user_id]
+
+
+class MembershipCache:
+    """کش snapshot عضویت‌ها برای بررسی‌های دسترسی و کامیونیتی مشترک."""
+
+    def __init__(self, client: Optional[redis.Redis] = None, local_ttl_seconds: Optional[float] = None):
+        """مقداردهی اولیه (بدون client از Redis client مشترک استفاده می‌شود)."""
+        if local_ttl_seconds is None:
+            local_ttl_seconds = settings.MEMBERSHIP_CACHE_LOCAL_TTL_SECONDS
+        self._cache: VersionedHashCache[Snapshot] = VersionedHashCache(
+            "Membership", KEY_PREFIX, _query, _encode, _decode,
+            local_ttl_seconds=local_ttl_seconds, redis_ttl=REDIS_TTL, client=client
+        )
+
+    async def get_snapshot(self, db: AsyncSession, user_id: int) -> Snapshot:
+        """عضویت‌های فعال کاربر (community_id → نقش).
+
+        Args:
+            db: Database session
+            user_id: شناسه کاربر
+
+        Returns:
+            dict از community_id به نام نقش
+        """
+        return await self._cache.get(db, user_id)
+
+    async def get_role(self, db: AsyncSession, user_id: int, community_id: int) -> Optional[str]:
+        """نقش کاربر در یک کامیونیتی (None اگر عضو فعال نباشد)."""
+        return (await self.get_snapshot(db, user_id)).get(community_id)
+
+    async def is_manager(self, db: AsyncSession, user_id: int, community_id: int) -> bool:
+        """آیا کاربر manager یا owner کامیونیتی است."""
+        return await self.get_role(db, user_id, community_id) in MANAGER_ROLES
+
+    async def has_common_community(self, db: AsyncSession, user1_id: int, user2_id: int) -> bool:
+        """آیا دو کاربر حداقل یک کامیونیتی مشترک دارند (اشتراک دو مجموعه)."""
+        first = await self.get_snapshot(db, user1_id)
+        if not first:
+            return False
+        second = await self.get_snapshot(db, user2_id)
+        return not first.keys().isdisjoint(second)
+
+    async def invalidate(self, *user_ids: int) -> None:
+        """باطل کردن snapshot کاربران (پس از commit تغییر عضویت)."""
+        await self._cache.invalidate(*user_ids)
+
+
+# Singleton instance
+membership_cache = MembershipCache()
@@ -0,0 +1,153 @@
+"""Message Fingerprint Service - تشخیص ارسال پیام تکراری به گیرندگان متعدد.
+
+برای هر فرستنده آخرین MESSAGE_FINGERPRINT_HISTORY پیام به صورت
+"{simhash}:{receiver_id}:{timestamp}" در یک list Redis (کلید
+fingerprint:{sender_id}) نگهداری می‌شود. هر پیام جدید با یک LRANGE با همین
+تعداد ثابت fingerprint مقایسه و پس از ساخته شدن با یک pipeline (LPUSH + LTRIM
++ EXPIRE) ثبت می‌شود؛ هزینه هر پیام ثابت است و تاریخچه پیام‌ها در دیتابیس
+خوانده نمی‌شود. تلاش‌های رد شده (مثلاً محدود شده) ثبت نمی‌شوند.
+
+پیامی که fingerprint آن (فاصله Hamming حداکثر MESSAGE_FINGERPRINT_MAX_DISTANCE)
+در بازه MESSAGE_FINGERPRINT_WINDOW_SECONDS به گیرندگان دیگری هم فرستاده شده
+باشد، تعداد آن گیرندگان را برمی‌گرداند؛ تصمیم flag یا محدودیت با message_service است.
+"""
+import time
+from typing import Optional
+
+import redis.asyncio as redis
+
+from ..core.config import get_settings
+from ..core.redis_client import get_redis_client
+from ..utils.logger import logger
+from ..utils.simhash import hamming_distance, simhash
+
+settings = get_settings()
+
+# Redis key patterns: fingerprint:{sender_id} (list)، fingerprint:alerted:{sender_id}:{0|1}
+KEY_PREFIX = "fingerprint"
+ALERTED_PREFIX = "fingerprint:alerted"
+
+
+def key_for(sender_id: int) -> str:
+    """نام کلید Redis fingerprintهای اخیر یک فرستنده."""
+    return f"{KEY_PREFIX}:{sender_id}"
+
+
+def count_recipients(
+    entries: list[str],
+    fingerprint: int,
+    receiver_id: int,
+    since: float,
+    max_distance: int
+) -> int:
+    """تعداد گیرندگان متمایز پیام‌های مشابه (شامل گیرنده فعلی).
+
+    Args:
+        entries: fingerprintهای اخیر فرستنده ("{simhash}:{receiver_id}:{timestamp}")
+        fingerprint: simhash پیام جدید
+        receiver_id: گیرنده پیام جدید
+        since: فقط ورودی‌های بعد از این زمان (unix)
+        max_distance: حداکثر فاصله Hamming برای مشابه بودن
+
+    Returns:
+        تعداد گیرندگان متمایز
+    """
+    recipients = {receiver_id}
+    for entry in entries:
+        try:
+            value, other_receiver, sent_at = entry.split(":")
+            if float(sent_at) < since:
+                continue
+            if hamming_distance(int(value, 16), fingerprint) <= max_distance:
+                recipients.add(int(other_receiver))
+        except ValueError:
+            continue
+    return len(recipients)
+
+
+class MessageFingerprintService:
+    """fingerprint پیام‌های اخیر هر فرستنده در Redis."""
+
+    def __init__(self, client: Optional[redis.Redis] = None):
+        """مقداردهی اولیه (بدون client از Redis client مشترک استفاده می‌شود)."""
+        self._client = client
+
+    async def check(self, sender_id: int, receiver_id: int, body: str) -> int:
+        """شمارش گیرندگان پیام‌های مشابه اخیر (بدون ثبت پیام؛ record را ببینید).
+
+        Args:
+            sender_id: شناسه فرستنده
+            receiver_id: شناسه گیرنده
+            body: متن پیام
+
+        Returns:
+            تعداد گیرندگان متمایز پیام‌های مشابه در بازه (شامل همین گیرنده)؛
+            برای پیام کوتاه یا خطای Redis صفر
+        """
+        if len(body.strip()) < settings.MESSAGE_FINGERPRINT_MIN_CHARS:
+            return 0
+
+        try:
+            entries = await self._get_client().lrange(
+                key_for(sender_id), 0, settings.MESSAGE_FINGERPRINT_HISTORY - 1
+            )
+        except Exception as e:
+            logger.warning(f"Message fingerprint check failed for user {sender_id}: {e}")
+            return 0
+
+        return count_recipients(
+            entries,
+            simhash(body),
+            receiver_id,
+            since=time.time() - settings.MESSAGE_FINGERPRINT_WINDOW_SECONDS,
+            max_distance=settings.MESSAGE_FINGERPRINT_MAX_DISTANCE
+        )
+
+    async def record(self, sender_id: int, receiver_id: int, body: str) -> None:
+        """ثبت fingerprint پیامی که واقعاً ساخته شده است (خطای Redis فقط log می‌شود).
+
+        Args:
+            sender_id: شناسه فرستنده
+            receiver_id: شناسه گیرنده
+            body: متن پیام
+        """
+        if len(body.strip()) < settings.MESSAGE_FINGERPRINT_MIN_CHARS:
+            return
+
+        key = key_for(sender_id)
+        history = settings.MESSAGE_FINGERPRINT_HISTORY
+        try:
+            async with self._get_client().pipeline(transaction=True) as pipe:
+                pipe.lpush(key, f"{simhash(body):016x}:{receiver_id}:{time.time():.0f}")
+                pipe.ltrim(key, 0, history - 1)
+                pipe.expire(key, settings.MESSAGE_FINGERPRINT_WINDOW_SECONDS)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Message fingerprint record failed for user {sender_id}: {e}")
+
+    async def claim_alert(self, sender_id: int, throttled: bool = False) -> bool:
+        """آیا برای این فرستنده و سطح (flag یا محدودیت) در بازه جاری هنوز هشدار ثبت نشده است (SET NX).
+
+        هشدار flag و هشدار محدودیت جدا رزرو می‌شوند تا رسیدن به
+        MESSAGE_FANOUT_BLOCK_RECIPIENTS پس از هشدار flag هم هشدار داشته باشد.
+
+        Returns:
+            True فقط برای اولین فراخوانی هر سطح در هر بازه
+        """
+        try:
+            return bool(await self._get_client().set(
+                f"{ALERTED_PREFIX}:{sender_id}:{int(throttled)}",
+                "1",
+                nx=True,
+                ex=settings.MESSAGE_FINGERPRINT_WINDOW_SECONDS
+            ))
+        except Exception as e:
+            logger.warning(f"Message fingerprint alert claim failed for user {sender_id}: {e}")
+            return False
+
+    def _get_client(self) -> redis.Redis:
+        return self._client if self._client is not None else get_redis_client()
+
+
+# Singleton instance
+message_fingerprint_service = MessageFingerprintService()
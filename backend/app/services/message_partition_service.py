@@ -0,0 +1,179 @@
+"""Message Partition Service - نگهداری partitionهای ماهانه پیام‌ها.
+
+جدول message بر اساس created_at به صورت ماهانه partition شده است (tier داغ).
+این سرویس:
+- partitionهای MESSAGE_PARTITION_MONTHS_AHEAD ماه آینده را از قبل می‌سازد
+  (message partition پیش‌فرض ندارد تا DETACH CONCURRENTLY ممکن باشد؛ به جای
+  آن اگر کمتر از MIN_MONTHS_AHEAD ماه آینده partition داشته باشد، مثلاً چون
+  نگهداری مدتی شکست خورده، قبل از رد شدن insertها هشدار خطا ثبت می‌شود)
+- partitionهای قدیمی‌تر از MESSAGE_HOT_MONTHS ماه را به message_archive
+  (tier سرد) منتقل می‌کند؛ inbox و ارسالی‌ها فقط tier داغ را می‌خوانند و
+  صفحه‌بندی مکالمه در صورت نیاز ادامه را از آرشیو می‌خواند
+
+اجرا با advisory lock انجام می‌شود تا فقط یک worker هم‌زمان DDL اجرا کند.
+"""
+import asyncio
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+
+from ..core.config import get_settings
+from ..core.database import engine, get_db_session
+from ..repositories import message_partition_repo
+from ..repositories.message_partition_repo import add_months, month_start
+from . import alert_service
+from ..utils.logger import logger
+
+settings = get_settings()
+
+# کلید advisory lock نگهداری partitionها
+ADVISORY_LOCK_KEY = 7_340_001
+
+# حداکثر انتظار DDL برای قفل جدول (به جای صف شدن پشت کوئری‌های طولانی)
+LOCK_TIMEOUT = "5s"
+
+# حداقل ماه‌های آینده با partition؛ کمتر از این هشدار ثبت می‌شود
+MIN_MONTHS_AHEAD = 2
+
+
+def months_to_create(existing: set[date], today: date, months_ahead: int) -> list[date]:
+    """ماه‌های جاری و آینده‌ای که partition ندارند."""
+    current = month_start(today)
+    months = (add_months(current, offset) for offset in range(months_ahead + 1))
+    return [month for month in months if month not in existing]
+
+
+def months_ahead(existing: set[date], today: date) -> int:
+    """تعداد ماه‌های پشت سر هم بعد از ماه جاری که partition دارند.
+
+    بدون partition ماه جاری صفر است (insertهای همین حالا رد می‌شوند).
+    """
+    current = month_start(today)
+    if current not in existing:
+        return 0
+    ahead = 0
+    while add_months(current, ahead + 1) in existing:
+        ahead += 1
+    return ahead
+
+
+def months_to_archive(existing: set[date], today: date, hot_months: int) -> list[date]:
+    """partitionهایی که کاملاً قبل از بازه داغ هستند (قدیمی‌ترین اول)."""
+    cutoff = add_months(month_start(today), -hot_months)
+    return sorted(month for month in existing if month < cutoff)
+
+
+class MessagePartitionService:
+    """ساخت partitionهای آینده و انتقال partitionهای قدیمی به آرشیو."""
+
+    async def run_maintenance(self, today: Optional[date] = None) -> dict[str, list[date]]:
+        """یک دور نگهداری.
+
+        Args:
+            today: تاریخ مرجع (پیش‌فرض امروز به UTC)
+
+        Returns:
+            dict با ماه‌های ساخته شده (created) و آرشیو شده (archived)؛
+            اگر worker دیگری در حال اجرا باشد هر دو خالی هستند
+        """
+        today = today or datetime.now(timezone.utc).date()
+        report: dict[str, list[date]] = {"created": [], "archived": []}
+
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            locked = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            if not locked:
+                logger.debug("Message partition maintenance already running on another worker")
+                return report
+            try:
+                await conn.execute(text(f"SET lock_timeout = '{LOCK_TIMEOUT}'"))
+                report["created"] = await self._ensure_partitions(conn, today)
+                report["archived"] = await self._archive_partitions(conn, today)
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+
+        if report["created"] or report["archived"]:
+            logger.info(
+                f"Message partitions created: {report['created']}, archived: {report['archived']}"
+            )
+        return report
+
+    async def check_months_ahead(self, today: Optional[date] = None) -> int:
+        """ثبت هشدار خطا اگر partitionهای آینده رو به اتمام باشند.
+
+        Args:
+            today: تاریخ مرجع (پیش‌فرض امروز به UTC)
+
+        Returns:
+            تعداد ماه‌های آینده که partition دارند
+        """
+        today = today or datetime.now(timezone.utc).date()
+        async with engine.connect() as conn:
+            existing = await message_partition_repo.list_partitions(conn, message_partition_repo.HOT_TABLE)
+        ahead = months_ahead(set(existing), today)
+
+        if ahead < MIN_MONTHS_AHEAD:
+            logger.error(f"Only {ahead} future message partitions left")
+            async with get_db_session() as db:
+                await alert_service.alert_error(
+                    db,
+                    title="Message partitions running out",
+                    message=(
+                        f"Only {ahead} future monthly partitions of message exist; inserts fail "
+                        f"once created_at passes the last one. Check the partition maintenance "
+                        f"logs or run scripts/maintain_message_partitions.py."
+                    ),
+                    metadata={"months_ahead": ahead},
+                    fingerprint_keys=[],
+                )
+        return ahead
+
+    async def run_maintenance_loop(self) -> None:
+        """اجرای نگهداری در startup و سپس هر MESSAGE_PARTITION_MAINTENANCE_SECONDS.
+
+        بعد از هر دور (حتی ناموفق) ماه‌های باقی‌مانده بررسی می‌شوند.
+        """
+        while True:
+            try:
+                await self.run_maintenance()
+            except Exception as e:
+                logger.error(f"Message partition maintenance failed: {e}")
+            try:
+                await self.check_months_ahead()
+            except Exception as e:
+                logger.error(f"Message partition check failed: {e}")
+            await asyncio.sleep(settings.MESSAGE_PARTITION_MAINTENANCE_SECONDS)
+
+    async def _ensure_partitions(self, conn, today: date) -> list[date]:
+        existing = await message_partition_repo.list_partitions(conn, message_partition_repo.HOT_TABLE)
+        created = months_to_create(set(existing), today, settings.MESSAGE_PARTITION_MONTHS_AHEAD)
+        for month in created:
+            await message_partition_repo.create_partition(conn, month)
+        return created
+
+    async def _archive_partitions(self, conn, today: date) -> list[date]:
+        # partitionهایی که دور قبل بعد از detach متوقف شدند
+        archived = await message_partition_repo.list_detached(conn)
+        for month in archived:
+            await self._move_to_archive(conn, month)
+
+        existing = await message_partition_repo.list_partitions(conn, message_partition_repo.HOT_TABLE)
+        for month in months_to_archive(set(existing), today, settings.MESSAGE_HOT_MONTHS):
+            await message_partition_repo.detach_partition(conn, month, finalize=existing[month])
+            await self._move_to_archive(conn, month)
+            archived.append(month)
+        return archived
+
+    async def _move_to_archive(self, conn, month: date) -> None:
+        # حذف indexها، انتقال tablespace و ATTACH با هم commit می‌شوند
+        async with engine.begin() as tx:
+            await tx.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+            await message_partition_repo.attach_to_archive(
+                tx, month, settings.MESSAGE_ARCHIVE_TABLESPACE
+            )
+        await message_partition_repo.freeze_partition(conn, month)
+
+
+# Singleton instance
+message_partition_service = MessagePartitionService()
@@ -1,12 +1,25 @@
 """Message service برای منطق پیام‌رسانی."""
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.background import background_queue
+from ..core.config import get_settings
+from ..core.database import get_db_session
 from ..models.message import Message
-from ..repositories import message_repo, community_repo, user_repo
+from ..repositories import message_repo, user_repo
+from ..schemas.message import MessageOut
+from ..services import alert_service
 from ..services import log_service
 from ..services import notification_service
-from ..utils.pagination import PaginatedResponse
+from ..services import realtime_service
+from ..services.block_cache_service import block_cache
+from ..services.membership_cache_service import membership_cache
+from ..services.message_fingerprint_service import message_fingerprint_service
+from ..services.unread_counter_service import unread_counter_service
+from ..utils.pagination import CursorPaginatedResponse, PaginatedResponse
 from ..utils.logger import logger
 
+settings = get_settings()
+
 
 async def send_message(
     db: AsyncSession,
@@ -27,7 +40,8 @@ async def send_message(
         
     Raises:
         ValueError: اگر گیرنده یافت نشود یا خود کاربر باشد
-        PermissionError: اگر کامیونیتی مشترک نداشته باشند
+        PermissionError: اگر کامیونیتی مشترک نداشته باشند، یکی دیگری را بلاک کرده باشد
+            یا فرستنده متن مشابهی را به گیرندگان زیادی فرستاده باشد
     """
     # بررسی عدم ارسال به خود
     if sender_id == receiver_id:
@@ -42,7 +56,7 @@ async def send_message(
         raise ValueError("گیرنده پیام غیرفعال است")
     
     # بررسی کامیونیتی مشترک (قید اصلی SCOPE)
-    has_common = await community_repo.check_common_membership(db, sender_id, receiver_id)
+    has_common = await membership_cache.has_common_community(db, sender_id, receiver_id)
     if not has_common:
         # ثبت لاگ برای تلاش ناموفق
         await log_service.log_event(
@@ -54,8 +68,36 @@ async def send_message(
         )
         raise PermissionError("شما و گیرنده پیام هیچ کامیونیتی مشترکی ندارید")
     
-    # TODO: بررسی user block (اگر گیرنده فرستنده را بلاک کرده باشد)
-    # این بخش در آینده پیاده‌سازی می‌شود
+    # بررسی بلاک در هر دو جهت (از مجموعه بلاک‌های کش‌شده فرستنده)
+    if await block_cache.is_blocked_between(db, sender_id, receiver_id):
+        await log_service.log_event(
+            db,
+            event_type="message_blocked",
+            actor_user_id=sender_id,
+            target_user_id=receiver_id,
+            payload={"reason": "user_blocked"}
+        )
+        raise PermissionError("امکان ارسال پیام به این کاربر وجود ندارد")
+    
+    # پیام تکراری به گیرندگان متعدد (مقایسه با fingerprintهای اخیر فرستنده در Redis)
+    recipients = await message_fingerprint_service.check(sender_id, receiver_id, body)
+    if recipients >= settings.MESSAGE_FANOUT_FLAG_RECIPIENTS:
+        throttled = recipients >= settings.MESSAGE_FANOUT_BLOCK_RECIPIENTS
+        if await message_fingerprint_service.claim_alert(sender_id, throttled):
+            background_queue.submit(
+                "message_fanout_alert",
+                lambda: _alert_duplicate_fanout(sender_id, recipients, throttled, body[:200])
+            )
+        if throttled:
+            await log_service.log_event(
+                db,
+                event_type="message_blocked",
+                actor_user_id=sender_id,
+                target_user_id=receiver_id,
+                payload={"reason": "duplicate_fanout", "recipients": recipients}
+            )
+            raise PermissionError("ارسال پیام مشابه به کاربران زیاد موقتاً محدود شده است")
+        logger.warning(f"Duplicate message fan-out: user {sender_id} → {recipients} recipients")
     
     # ساخت پیام
     message = await message_repo.create(
@@ -65,37 +107,31 @@ async def send_message(
         body=body
     )
     
-    # ثبت لاگ
-    await log_service.log_event(
-        db,
-        event_type="message_send",
-        actor_user_id=sender_id,
-        target_user_id=receiver_id,
-        payload={"message_id": message.id}
-    )
-    
     await db.commit()
     
-    # ارسال ایمیل notification هوشمند
-    try:
-        sender = await user_repo.get_by_id(db, sender_id)
-        sender_name = (
-            f"{sender.first_name} {sender.last_name}".strip() 
-            if sender.first_name 
-            else sender.email.split('@')[0]
-        )
-        
-        # Smart notification - فقط اولین پیام خوانده نشده
-        await notification_service.send_smart_notification(
-            receiver_email=receiver.email,
-            receiver_id=receiver_id,
-            receiver_language=receiver.preferred_language,
-            receiver_first_name=receiver.first_name or "",
-            sender_id=sender_id,
-            sender_name=sender_name
-        )
-    except Exception as e:
-        logger.warning(f"Failed to send message notification email: {e}")
+    # شمارنده خوانده نشده گیرنده در Redis
+    await unread_counter_service.increment(receiver_id, sender_id)
+    # فقط پیام‌های ساخته شده در تشخیص پیام تکراری شمرده می‌شوند
+    await message_fingerprint_service.record(sender_id, receiver_id, body)
+    
+    # بقیه کارها پس از پاسخ و در صف پس‌زمینه (با retry) انجام می‌شوند
+    # (داده‌ها همین‌جا استخراج می‌شوند؛ کارها به نشست درخواست دسترسی ندارند)
+    message_id = message.id
+    payload = MessageOut.model_validate(message).model_dump(mode="json")
+    
+    background_queue.submit(
+        "message_send_log",
+        lambda: _log_message_sent(sender_id, receiver_id, message_id)
+    )
+    background_queue.submit(
+        "message_realtime",
+        lambda: _publish_new_message(sender_id, receiver_id, payload)
+    )
+    # ایمیل notification با پیام‌های دیگر گیرنده جمع و بعداً ارسال می‌شود
+    background_queue.submit(
+        "message_notification",
+        lambda: notification_service.buffer_notification(receiver_id, sender_id)
+    )
     
     logger.info(f"Message sent: {sender_id} → {receiver_id}")
     return message
@@ -105,7 +141,9 @@ async def get_inbox(
     db: AsyncSession,
     user_id: int,
     page: int,
-    page_size: int
+    page_size: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None
 ):
     """دریافت پیام‌های دریافتی.
     
@@ -114,10 +152,18 @@ async def get_inbox(
         user_id: شناسه کاربر
         page: شماره صفحه
         page_size: تعداد آیتم در صفحه
+        before_id: cursor پیام‌های قدیمی‌تر (به جای page)
+        after_id: cursor پیام‌های جدیدتر (به جای page)
         
     Returns:
-        PaginatedResponse از Message
+        PaginatedResponse از Message، یا CursorPaginatedResponse اگر cursor داده شود
     """
+    if before_id is not None or after_id is not None:
+        messages, has_more = await message_repo.get_inbox_by_cursor(
+            db, user_id, page_size, before_id, after_id
+        )
+        return _cursor_page(messages, has_more, page_size, before_id, after_id)
+    
     messages, total = await message_repo.get_inbox(db, user_id, page, page_size)
     
     return PaginatedResponse.create(
@@ -132,7 +178,9 @@ async def get_sent(
     db: AsyncSession,
     user_id: int,
     page: int,
-    page_size: int
+    page_size: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None
 ):
     """دریافت پیام‌های ارسالی.
     
@@ -141,10 +189,18 @@ async def get_sent(
         user_id: شناسه کاربر
         page: شماره صفحه
         page_size: تعداد آیتم در صفحه
+        before_id: cursor پیام‌های قدیمی‌تر (به جای page)
+        after_id: cursor پیام‌های جدیدتر (به جای page)
         
     Returns:
-        PaginatedResponse از Message
+        PaginatedResponse از Message، یا CursorPaginatedResponse اگر cursor داده شود
     """
+    if before_id is not None or after_id is not None:
+        messages, has_more = await message_repo.get_sent_by_cursor(
+            db, user_id, page_size, before_id, after_id
+        )
+        return _cursor_page(messages, has_more, page_size, before_id, after_id)
+    
     messages, total = await message_repo.get_sent(db, user_id, page, page_size)
     
     return PaginatedResponse.create(
@@ -160,7 +216,9 @@ async def get_conversation(
     user_id: int,
     other_user_id: int,
     page: int,
-    page_size: int
+    page_size: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None
 ):
     """دریافت تمام پیام‌های رد و بدل شده با یک کاربر خاص (conversation).
     
@@ -170,9 +228,11 @@ async def get_conversation(
         other_user_id: شناسه کاربر مقابل
         page: شماره صفحه
         page_size: تعداد آیتم در صفحه
+        before_id: cursor پیام‌های قدیمی‌تر (به جای page)
+        after_id: cursor پیام‌های جدیدتر (به جای page)
         
     Returns:
-        PaginatedResponse از Message
+        PaginatedResponse از Message، یا CursorPaginatedResponse اگر cursor داده شود
         
     Raises:
         ValueError: اگر کاربر مقابل یافت نشود
@@ -182,6 +242,12 @@ async def get_conversation(
     if not other_user:
         raise ValueError("کاربر مورد نظر یافت نشد")
     
+    if before_id is not None or after_id is not None:
+        messages, has_more = await message_repo.get_conversation_by_cursor(
+            db, user_id, other_user_id, page_size, before_id, after_id
+        )
+        return _cursor_page(messages, has_more, page_size, before_id, after_id)
+    
     messages, total = await message_repo.get_conversation(
         db, user_id, other_user_id, page, page_size
     )
@@ -194,25 +260,69 @@ async def get_conversation(
     )
 
 
+async def search_messages(
+    db: AsyncSession,
+    user_id: int,
+    query: str,
+    page_size: int,
+    before_id: Optional[int] = None
+) -> CursorPaginatedResponse:
+    """جستجوی متن در پیام‌های ارسالی و دریافتی کاربر.
+    
+    Args:
+        db: Database session
+        user_id: شناسه کاربر
+        query: عبارت جستجو
+        page_size: تعداد آیتم در صفحه
+        before_id: cursor نتایج بعدی (next_before_id صفحه قبل)
+        
+    Returns:
+        CursorPaginatedResponse از Message به ترتیب امتیاز (مرتبط‌ترین اول)
+        
+    Raises:
+        ValueError: اگر عبارت جستجو خالی باشد
+    """
+    query = " ".join(query.split())
+    if not query:
+        raise ValueError("عبارت جستجو نمی‌تواند خالی باشد")
+    
+    messages, has_more = await message_repo.search(db, user_id, query, page_size, before_id)
+    return CursorPaginatedResponse(
+        items=messages,
+        page_size=page_size,
+        has_more=has_more,
+        next_before_id=messages[-1].id if messages else before_id
+    )
+
+
 async def get_conversations(
     db: AsyncSession,
-    user_id: int
+    user_id: int,
+    page: int = 1,
+    page_size: int = 20
 ):
     """دریافت لیست مکالمات کاربر.
     
     Args:
         db: Database session
         user_id: شناسه کاربر
+        page: شماره صفحه
+        page_size: تعداد آیتم در صفحه
         
     Returns:
-        dict شامل لیست مکالمات و تعداد کل
+        PaginatedResponse از مکالمات (بدون مکالمه با کاربران بلاک‌شده)
     """
-    conversations = await message_repo.get_conversations(db, user_id)
+    blocked = await block_cache.get_blocked(db, user_id)
+    conversations, total = await message_repo.get_conversations(
+        db, user_id, page, page_size, exclude_user_ids=blocked
+    )
     
-    return {
-        "items": conversations,
-        "total": len(conversations)
-    }
+    return PaginatedResponse.create(
+        items=conversations,
+        total=total,
+        page=page,
+        page_size=page_size
+    )
 
 
 async def mark_conversation_as_read(
@@ -241,6 +351,9 @@ async def mark_conversation_as_read(
     # علامت‌گذاری پیام‌ها به عنوان خوانده شده
     count = await message_repo.mark_as_read(db, user_id, other_user_id)
     
+    # صفر کردن شمارنده Redis (حتی اگر count صفر باشد، اختلاف احتمالی رفع می‌شود)
+    await unread_counter_service.reset(user_id, other_user_id)
+    
     # ثبت لاگ اگر پیامی mark شده باشد
     if count > 0:
         await log_service.log_event(
@@ -254,11 +367,75 @@ async def mark_conversation_as_read(
         # پاک کردن flag notification برای این مکالمه
         # تا اگر پیام جدید بیاد، دوباره ایمیل بفرسته
         await notification_service.clear_notification_flag(user_id, other_user_id)
+        
+        # read receipt برای فرستنده و تعداد جدید خوانده‌نشده برای دستگاه‌های کاربر
+        await realtime_service.publish(
+            other_user_id, "read", {"reader_id": user_id, "count": count}
+        )
+        await _publish_unread_count(db, user_id)
     
     logger.info(f"Marked {count} messages as read: {other_user_id} → {user_id}")
     return count
 
 
+async def mark_many_as_read(
+    db: AsyncSession,
+    user_id: int,
+    other_user_ids: Optional[list[int]] = None,
+    up_to_id: Optional[int] = None
+) -> dict[int, int]:
+    """علامت‌گذاری دسته‌ای پیام‌های خوانده نشده چند مکالمه.
+    
+    پیام‌ها و شمارنده‌های conversation در یک دستور SQL به‌روز می‌شوند؛ پس از
+    commit شمارنده‌های Redis با یک فراخوانی کم و read receiptها با یک
+    pipeline فرستاده می‌شوند. کلاینت می‌تواند باز شدن چند مکالمه را جمع و
+    با یک درخواست ارسال کند.
+    
+    Args:
+        db: Database session
+        user_id: شناسه کاربر فعلی
+        other_user_ids: فرستنده‌ها (None یعنی همه مکالمات)
+        up_to_id: فقط پیام‌های تا این id (پیام‌های جدیدتر خوانده نشده می‌مانند)
+        
+    Returns:
+        dict از شناسه فرستنده به تعداد پیام‌هایی که mark شدند
+    """
+    if other_user_ids is not None:
+        other_user_ids = sorted(set(other_user_ids) - {user_id})
+    
+    counts = await message_repo.mark_many_as_read(db, user_id, other_user_ids, up_to_id)
+    await db.commit()
+    
+    if not counts:
+        return counts
+    
+    await unread_counter_service.subtract(user_id, counts)
+    total = sum(counts.values())
+    
+    await log_service.log_event(
+        db,
+        event_type="message_read",
+        actor_user_id=user_id,
+        payload={"count": total, "senders": sorted(counts)}
+    )
+    await notification_service.clear_notification_flags(user_id, counts)
+    
+    # read receipt هر فرستنده و تعداد جدید خوانده‌نشده برای دستگاه‌های کاربر
+    events = [
+        (sender_id, "read", {"reader_id": user_id, "count": count, "up_to_id": up_to_id})
+        for sender_id, count in counts.items()
+    ]
+    try:
+        unread_count = await unread_counter_service.get_total(db, user_id)
+        events.append((user_id, "unread", {"unread_count": unread_count}))
+    except Exception as e:
+        logger.warning(f"Unread count for realtime event failed: {e}")
+    await realtime_service.publish_many(events)
+    
+    logger.info(f"Marked {total} messages as read for user {user_id} in {len(counts)} conversations")
+    return counts
+
+
 async def get_total_unread_count(
     db: AsyncSession,
     user_id: int
@@ -272,5 +449,86 @@ async def get_total_unread_count(
     Returns:
         تعداد کل پیام‌های خوانده نشده
     """
-    return await message_repo.get_total_unread_count(db, user_id)
+    return await unread_counter_service.get_total(db, user_id)
+
+
+def _cursor_page(
+    messages: list[Message],
+    has_more: bool,
+    page_size: int,
+    before_id: Optional[int],
+    after_id: Optional[int]
+) -> CursorPaginatedResponse:
+    """ساخت پاسخ cursor؛ صفحه before جدیدترین اول و صفحه after قدیمی‌ترین اول است."""
+    if not messages:
+        # صفحه خالی: cursor فعلی برای polling بعدی معتبر می‌ماند
+        return CursorPaginatedResponse(
+            items=[], page_size=page_size, has_more=False,
+            next_before_id=before_id, next_after_id=after_id
+        )
+    
+    newest, oldest = (messages[0], messages[-1]) if before_id is not None else (messages[-1], messages[0])
+    return CursorPaginatedResponse(
+        items=messages,
+        page_size=page_size,
+        has_more=has_more,
+        next_before_id=oldest.id,
+        next_after_id=newest.id
+    )
+
+
+async def _log_message_sent(sender_id: int, receiver_id: int, message_id: int) -> None:
+    """ثبت لاگ audit ارسال پیام با نشست دیتابیس مستقل (کار پس‌زمینه)."""
+    async with get_db_session() as db:
+        await log_service.log_event(
+            db,
+            event_type="message_send",
+            actor_user_id=sender_id,
+            target_user_id=receiver_id,
+            payload={"message_id": message_id}
+        )
 
+
+async def _alert_duplicate_fanout(sender_id: int, recipients: int, throttled: bool, sample: str) -> None:
+    """ثبت هشدار ارسال پیام مشابه به گیرندگان متعدد (کار پس‌زمینه)."""
+    action = "محدود شد" if throttled else "علامت‌گذاری شد"
+    async with get_db_session() as db:
+        await alert_service.alert_security(
+            db,
+            title="ارسال پیام تکراری به کاربران متعدد",
+            message=(
+                f"کاربر #{sender_id} پیام مشابهی را به {recipients} گیرنده فرستاده است ({action}):\n\n{sample}"
+            ),
+            metadata={
+                "sender_id": sender_id,
+                "recipients": recipients,
+                "throttled": throttled,
+            },
+            # یک هشدار برای هر فرستنده تا پایان ارسال‌ها (تعداد گیرندگان در fingerprint نیست)
+            fingerprint_keys=("sender_id", "throttled"),
+        )
+
+
+async def _publish_new_message(sender_id: int, receiver_id: int, payload: dict) -> None:
+    """ارسال رویداد message به گیرنده (با unread_count) و فرستنده (کار پس‌زمینه)."""
+    try:
+        async with get_db_session() as db:
+            unread_count = await unread_counter_service.get_total(db, receiver_id)
+    except Exception as e:
+        logger.warning(f"Unread count for realtime event failed: {e}")
+        unread_count = None
+    
+    await realtime_service.publish(
+        receiver_id, "message", {"message": payload, "unread_count": unread_count}
+    )
+    await realtime_service.publish(sender_id, "message", {"message": payload})
+
+
+async def _publish_unread_count(db: AsyncSession, user_id: int) -> None:
+    """ارسال رویداد unread با تعداد فعلی پیام‌های خوانده نشده."""
+    try:
+        unread_count = await unread_counter_service.get_total(db, user_id)
+    except Exception as e:
+        logger.warning(f"Unread count for realtime event failed: {e}")
+        return
+    await realtime_service.publish(user_id, "unread", {"unread_count": unread_count})
@@ -1,77 +1,244 @@
 """Smart Notification Service.
 
-قوانین هوشمند برای ارسال ایمیل:
-1. فقط اولین پیام خوانده نشده از هر فرستنده → ایمیل
-2. پیام‌های بعدی از همان فرستنده → بدون ایمیل (تا زمانی که اولی خوانده شود)
-3. استفاده از Redis برای ردیابی (با TTL 24 ساعته)
+قوانین هوشمند برای ارسال ایمیل پیام جدید:
+1. پیام‌ها برای هر گیرنده NOTIFICATION_COALESCE_SECONDS از اولین پیام جمع
+   می‌شوند و یک ایمیل (برای چند فرستنده، ایمیل خلاصه با لیست فرستنده‌ها)
+   ارسال می‌شود
+2. هر فرستنده تا زمانی که پیام‌هایش خوانده نشده (حداکثر 24 ساعت) فقط یک بار
+   در ایمیل می‌آید
+3. خواندن پیام‌ها پیش از flush فرستنده را از صف ایمیل حذف می‌کند
+
+وضعیت در Redis:
+- notification:pending:{receiver_id}: sorted set فرستنده‌ها (score = زمان اولین پیام)
+- notification:due: sorted set گیرنده‌ها (score = زمان flush)
+- notification:sent:{receiver_id}:{sender_id}: flag ایمیل ارسال شده (TTL 24 ساعت)
+
+run_flush_loop (در lifespan هر worker API) هر NOTIFICATION_FLUSH_SECONDS
+گیرنده‌های سررسید را با یک اسکریپت Lua به صورت atomic برمی‌دارد (هر گیرنده
+فقط توسط یک worker پردازش می‌شود) و ایمیل‌ها را در email_outbox ثبت می‌کند.
 """
-import redis.asyncio as redis
-from typing import Optional
+import asyncio
+import time
+from typing import Iterable, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..core.config import get_settings
-from ..utils.email import send_message_notification
+from ..core.database import get_db_session
+from ..core.redis_client import get_redis_client
+from ..repositories import user_repo
+from ..services import email_outbox_service
 from ..utils.logger import logger
 
 settings = get_settings()
 
 # Redis key patterns
-# notification:sent:{receiver_id}:{sender_id} = timestamp
+# notification:sent:{receiver_id}:{sender_id} = "1"
 # این کلید نشان می‌دهد که ایمیل برای پیام از sender_id به receiver_id فرستاده شده
-
 NOTIFICATION_KEY_PREFIX = "notification:sent"
 NOTIFICATION_TTL = 60 * 60 * 24  # 24 hours
 
+# notification:pending:{receiver_id} = {sender_id: first message timestamp}
+PENDING_KEY_PREFIX = "notification:pending"
+# notification:due = {receiver_id: flush timestamp}
+DUE_KEY = "notification:due"
+
+APP_URL = "https://minila.app"
+
+# برداشتن حداکثر ARGV[2] گیرنده سررسید و فرستنده‌های هر کدام
+# خروجی: [receiver_id, "sender_id,sender_id", ...]
+_CLAIM_SCRIPT = """
+local receivers = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local result = {}
+for _, receiver in ipairs(receivers) do
+    local key = ARGV[3] .. ':' .. receiver
+    redis.call('ZREM', KEYS[1], receiver)
+    result[#result + 1] = receiver
+    result[#result + 1] = table.concat(redis.call('ZRANGE', key, 0, -1), ',')
+    redis.call('DEL', key)
+end
+return result
+"""
+
+
+def flag_key(receiver_id: int, sender_id: int) -> str:
+    """نام کلید flag ایمیل ارسال شده برای یک جفت گیرنده/فرستنده."""
+    return f"{NOTIFICATION_KEY_PREFIX}:{receiver_id}:{sender_id}"
+
+
+def pending_key(receiver_id: int) -> str:
+    """نام sorted set فرستنده‌های در انتظار ایمیل یک گیرنده."""
+    return f"{PENDING_KEY_PREFIX}:{receiver_id}"
 
-async def get_redis_client() -> redis.Redis:
-    """دریافت Redis client."""
-    return redis.from_url(settings.REDIS_URL)
 
+def display_name(user) -> str:
+    """نام نمایشی کاربر برای ایمیل notification."""
+    if user.first_name:
+        return f"{user.first_name} {user.last_name or ''}".strip()
+    return user.email.split('@')[0]
 
-async def should_send_notification(receiver_id: int, sender_id: int) -> bool:
-    """بررسی اینکه آیا باید ایمیل notification فرستاد.
+
+async def buffer_notification(receiver_id: int, sender_id: int) -> None:
+    """افزودن پیام جدید به صف ایمیل گیرنده (یک رفت و برگشت Redis).
     
-    قوانین:
-    - اگر قبلاً برای این جفت sender/receiver ایمیل فرستاده نشده → True
-    - اگر فرستاده شده و 24 ساعت نگذشته → False
+    اولین پیام هر گیرنده زمان flush را NOTIFICATION_COALESCE_SECONDS بعد
+    تعیین می‌کند؛ پیام‌های بعدی (از هر فرستنده‌ای) به همان ایمیل اضافه
+    می‌شوند. اگر Redis در دسترس نباشد ایمیل فوراً در outbox ثبت می‌شود.
     
     Args:
         receiver_id: شناسه گیرنده پیام
         sender_id: شناسه فرستنده پیام
-        
-    Returns:
-        True اگر باید ایمیل بفرستد
     """
+    now = time.time()
+    key = pending_key(receiver_id)
     try:
-        client = await get_redis_client()
-        key = f"{NOTIFICATION_KEY_PREFIX}:{receiver_id}:{sender_id}"
+        async with get_redis_client().pipeline(transaction=True) as pipe:
+            pipe.zadd(key, {sender_id: now}, nx=True)
+            pipe.expire(key, settings.NOTIFICATION_COALESCE_SECONDS + NOTIFICATION_TTL)
+            pipe.zadd(DUE_KEY, {receiver_id: now + settings.NOTIFICATION_COALESCE_SECONDS}, nx=True)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Notification buffer failed, queueing email now: {e}")
+        async with get_db_session() as db:
+            pairs = await enqueue_notifications(db, {receiver_id: [sender_id]})
+        await mark_notifications_sent(pairs)
+
+
+async def claim_due(now: Optional[float] = None, limit: Optional[int] = None) -> dict[int, list[int]]:
+    """برداشتن atomic گیرنده‌های سررسید و فرستنده‌هایشان از Redis.
+    
+    Args:
+        now: زمان فعلی (پیش‌فرض time.time())
+        limit: حداکثر گیرنده (پیش‌فرض NOTIFICATION_FLUSH_BATCH)
         
-        exists = await client.exists(key)
-        await client.aclose()
+    Returns:
+        dict از شناسه گیرنده به شناسه فرستنده‌ها (به ترتیب اولین پیام)
+    """
+    result = await get_redis_client().eval(
+        _CLAIM_SCRIPT,
+        1,
+        DUE_KEY,
+        now if now is not None else time.time(),
+        limit or settings.NOTIFICATION_FLUSH_BATCH,
+        PENDING_KEY_PREFIX
+    )
+    return {
+        int(receiver_id): [int(sender_id) for sender_id in senders.split(",") if sender_id]
+        for receiver_id, senders in zip(result[::2], result[1::2])
+    }
+
+
+async def enqueue_notifications(
+    db: AsyncSession,
+    senders_by_receiver: dict[int, list[int]]
+) -> list[tuple[int, int]]:
+    """ثبت یک ایمیل برای هر گیرنده در outbox (در تراکنش جاری).
+    
+    فرستنده‌هایی که flag ارسال دارند حذف می‌شوند؛ یک فرستنده قالب
+    new_message و چند فرستنده قالب new_messages_summary را می‌گیرد.
+    کاربران با یک کوئری بارگذاری می‌شوند. فراخواننده پس از commit باید
+    mark_notifications_sent را برای جفت‌های برگشتی صدا بزند.
+    
+    Args:
+        db: Database session
+        senders_by_receiver: dict از شناسه گیرنده به شناسه فرستنده‌ها
         
-        return not exists
+    Returns:
+        جفت‌های (گیرنده، فرستنده) که در ایمیل آمدند
+    """
+    senders_by_receiver = await _without_notified(senders_by_receiver)
+    if not senders_by_receiver:
+        return []
+    
+    users = await user_repo.get_by_ids(
+        db,
+        set(senders_by_receiver).union(*senders_by_receiver.values())
+    )
+    pairs = []
+    for receiver_id, sender_ids in senders_by_receiver.items():
+        receiver = users.get(receiver_id)
+        senders = [users[sender_id] for sender_id in sender_ids if sender_id in users]
+        if receiver is None or not receiver.is_active or not senders:
+            continue
         
-    except Exception as e:
-        logger.warning(f"Redis check failed, defaulting to send: {e}")
-        return True  # در صورت خطا، ایمیل بفرست
+        if len(senders) == 1:
+            await email_outbox_service.enqueue_template(
+                db,
+                receiver.email,
+                "new_message",
+                receiver.preferred_language,
+                sender_name=display_name(senders[0]),
+                first_name=receiver.first_name or "",
+                app_url=APP_URL
+            )
+        else:
+            await email_outbox_service.enqueue_template(
+                db,
+                receiver.email,
+                "new_messages_summary",
+                receiver.preferred_language,
+                count=len(senders),
+                sender_names="\n".join(f"- {display_name(sender)}" for sender in senders),
+                first_name=receiver.first_name or "",
+                app_url=APP_URL
+            )
+        pairs.extend((receiver_id, sender.id) for sender in senders)
+    return pairs
 
 
-async def mark_notification_sent(receiver_id: int, sender_id: int) -> None:
-    """ثبت اینکه ایمیل notification فرستاده شد.
+async def flush_due() -> int:
+    """یک دور flush: ثبت ایمیل گیرنده‌های سررسید در outbox.
+    
+    در صورت خطای دیتابیس گیرنده‌های برداشته شده به صف برمی‌گردند.
+    
+    Returns:
+        تعداد گیرنده‌های برداشته شده
+    """
+    claimed = await claim_due()
+    if not claimed:
+        return 0
+    
+    try:
+        async with get_db_session() as db:
+            pairs = await enqueue_notifications(db, claimed)
+    except Exception:
+        await _requeue(claimed)
+        raise
+    await mark_notifications_sent(pairs)
+    
+    logger.info(
+        f"Notification flush: {len(claimed)} receivers, "
+        f"{len({receiver_id for receiver_id, _ in pairs})} emails, {len(pairs)} senders"
+    )
+    return len(claimed)
+
+
+async def run_flush_loop() -> None:
+    """اجرای flush هر NOTIFICATION_FLUSH_SECONDS تا زمان cancel."""
+    while True:
+        await asyncio.sleep(settings.NOTIFICATION_FLUSH_SECONDS)
+        try:
+            # batch پر یعنی گیرنده سررسید دیگری هم ممکن است باشد
+            while await flush_due() >= settings.NOTIFICATION_FLUSH_BATCH:
+                pass
+        except Exception as e:
+            logger.error(f"Notification flush failed: {e}")
+
+
+async def mark_notifications_sent(pairs: Iterable[tuple[int, int]]) -> None:
+    """ثبت flag ایمیل ارسال شده برای چند جفت با یک pipeline.
     
     Args:
-        receiver_id: شناسه گیرنده پیام
-        sender_id: شناسه فرستنده پیام
+        pairs: جفت‌های (گیرنده، فرستنده)
     """
+    keys = [flag_key(receiver_id, sender_id) for receiver_id, sender_id in pairs]
+    if not keys:
+        return
     try:
-        client = await get_redis_client()
-        key = f"{NOTIFICATION_KEY_PREFIX}:{receiver_id}:{sender_id}"
-        
-        await client.setex(key, NOTIFICATION_TTL, "1")
-        await client.aclose()
-        
-        logger.debug(f"Marked notification sent: {sender_id} → {receiver_id}")
-        
+        async with get_redis_client().pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.setex(key, NOTIFICATION_TTL, "1")
+            await pipe.execute()
     except Exception as e:
-        logger.warning(f"Failed to mark notification in Redis: {e}")
+        logger.warning(f"Failed to mark notifications in Redis: {e}")
 
 
 async def clear_notification_flag(receiver_id: int, sender_id: int) -> None:
@@ -81,69 +248,62 @@ async def clear_notification_flag(receiver_id: int, sender_id: int) -> None:
         receiver_id: شناسه گیرنده پیام
         sender_id: شناسه فرستنده پیام
     """
-    try:
-        client = await get_redis_client()
-        key = f"{NOTIFICATION_KEY_PREFIX}:{receiver_id}:{sender_id}"
-        
-        await client.delete(key)
-        await client.aclose()
-        
-        logger.debug(f"Cleared notification flag: {sender_id} → {receiver_id}")
-        
-    except Exception as e:
-        logger.warning(f"Failed to clear notification flag: {e}")
-
-
-async def send_smart_notification(
-    receiver_email: str,
-    receiver_id: int,
-    receiver_language: str,
-    receiver_first_name: str,
-    sender_id: int,
-    sender_name: str,
-    app_url: str = "https://minila.app"
-) -> bool:
-    """ارسال ایمیل notification هوشمند.
-    
-    فقط ایمیل می‌فرستد اگر:
-    - قبلاً برای این جفت فرستنده/گیرنده ایمیل نفرستاده باشیم
+    await clear_notification_flags(receiver_id, [sender_id])
+
+
+async def clear_notification_flags(receiver_id: int, sender_ids: Iterable[int]) -> None:
+    """پاک کردن flag notification چند مکالمه و حذف آن‌ها از صف ایمیل.
     
     Args:
-        receiver_email: ایمیل گیرنده
-        receiver_id: شناسه گیرنده
-        receiver_language: زبان ترجیحی گیرنده
-        receiver_first_name: نام گیرنده
-        sender_id: شناسه فرستنده
-        sender_name: نام فرستنده
-        app_url: آدرس اپلیکیشن
-        
-    Returns:
-        True اگر ایمیل فرستاده شد یا نیازی نبود
+        receiver_id: شناسه گیرنده پیام‌ها
+        sender_ids: شناسه فرستنده‌ها
     """
-    # بررسی اینکه آیا باید ایمیل بفرستیم
-    should_send = await should_send_notification(receiver_id, sender_id)
-    
-    if not should_send:
-        logger.debug(
-            f"Skipping notification: already sent for {sender_id} → {receiver_id}"
-        )
-        return True
-    
-    # ارسال ایمیل
-    success = send_message_notification(
-        email=receiver_email,
-        sender_name=sender_name,
-        first_name=receiver_first_name,
-        language=receiver_language,
-        app_url=app_url
-    )
-    
-    if success:
-        # ثبت اینکه ایمیل فرستاده شد
-        await mark_notification_sent(receiver_id, sender_id)
-        logger.info(f"Notification sent: {sender_id} → {receiver_id}")
-    else:
-        logger.warning(f"Notification failed: {sender_id} → {receiver_id}")
+    sender_ids = list(sender_ids)
+    if not sender_ids:
+        return
+    try:
+        async with get_redis_client().pipeline(transaction=False) as pipe:
+            pipe.delete(*(flag_key(receiver_id, sender_id) for sender_id in sender_ids))
+            pipe.zrem(pending_key(receiver_id), *sender_ids)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(f"Failed to clear notification flags: {e}")
+
+
+async def _without_notified(senders_by_receiver: dict[int, list[int]]) -> dict[int, list[int]]:
+    """حذف فرستنده‌هایی که برایشان ایمیل فرستاده شده (یک MGET)."""
+    pairs = [
+        (receiver_id, sender_id)
+        for receiver_id, sender_ids in senders_by_receiver.items()
+        for sender_id in sender_ids
+    ]
+    if not pairs:
+        return {}
+    try:
+        flags = await get_redis_client().mget([flag_key(*pair) for pair in pairs])
+    except Exception as e:
+        logger.warning(f"Redis check failed, defaulting to send: {e}")
+        flags = [None] * len(pairs)
     
-    return success
+    pending: dict[int, list[int]] = {}
+    for (receiver_id, sender_id), flag in zip(pairs, flags):
+        if not flag:
+            pending.setdefault(receiver_id, []).append(sender_id)
+    return pending
+
 
+async def _requeue(claimed: dict[int, list[int]]) -> None:
+    """بازگرداندن گیرنده‌های برداشته شده به صف (flush بعدی)."""
+    now = time.time()
+    try:
+        async with get_redis_client().pipeline(transaction=True) as pipe:
+            for receiver_id, sender_ids in claimed.items():
+                if not sender_ids:
+                    continue
+                key = pending_key(receiver_id)
+                pipe.zadd(key, {sender_id: now for sender_id in sender_ids}, nx=True)
+                pipe.expire(key, settings.NOTIFICATION_COALESCE_SECONDS + NOTIFICATION_TTL)
+                pipe.zadd(DUE_KEY, {receiver_id: now + settings.NOTIFICATION_FLUSH_SECONDS}, nx=True)
+            await pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to requeue {len(claimed)} notification receivers: {e}")
@@ -0,0 +1,399 @@
+"""
+Pricing Backtest Service - replay card history through DynamicPricingService.
+
+Cards are streamed in creation order. Route statistics, supply/demand and
+the market sketch are kept as incremental per-route state, so the factors
+for each card are reconstructed *as of* its creation time without any
+per-card query. The suggestion is then compared with the price the user
+actually posted.
+
+route_price has no history, so base prices come from the current route
+price matrix. Category factor is neutral, as in the live calculation.
+The market median is computed exactly from the sorted earlier posted
+prices (the live t-digest approximates the same value).
+
+Ticket times, time frames and prices are kept in bucketed sorted lists, so
+inserts, range counts and the median stay sub-linear even when one route
+holds a large share of millions of cards. They are not pruned: a card's
+window is centred on its travel date, which may lie arbitrarily far behind
+the replay cursor.
+"""
+import bisect
+import math
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repositories import card_repo
+from app.repositories.route_price_repo import route_price_matrix
+from app.services.dynamic_pricing_service import DynamicPricingService, dynamic_pricing_service
+
+# Windows used by route_price_repo.get_route_statistics / get_supply_demand_counts
+ROUTE_STATS_WINDOW = timedelta(days=30)
+DEMAND_WINDOW = timedelta(days=7)
+
+# Suggested range shown to users (see DynamicPricingService._build_suggestion)
+RANGE_LOW, RANGE_HIGH = 0.85, 1.15
+
+Route = tuple[int, int]
+
+
+class HistoricalCard(NamedTuple):
+    """Columns of a card needed to replay its price suggestion."""
+
+    origin_city_id: int
+    destination_city_id: int
+    is_sender: bool
+    created_at: datetime
+    ticket_date_time: Optional[datetime]
+    start_time_frame: Optional[datetime]
+    end_time_frame: Optional[datetime]
+    weight: Optional[float]
+    price_per_kg: Optional[float]
+    currency: Optional[str]
+
+    @property
+    def travel_date(self) -> Optional[datetime]:
+        """Date the user would have priced: ticket date or start of time frame."""
+        return self.ticket_date_time or self.start_time_frame
+
+
+class BacktestPoint(NamedTuple):
+    """Suggestion replayed for one card."""
+
+    suggested_price_per_kg: float
+    factors: dict[str, float]
+    posted_price_per_kg: Optional[float]
+
+
+class _SortedList:
+    """
+    Sorted multiset of floats split into bounded buckets.
+
+    Bucket sizes are kept in a Fenwick tree, so insert is O(√n) (one bucket
+    insort) and rank queries are O(log n).
+    """
+
+    __slots__ = ("_buckets", "_maxes", "_tree", "_len")
+
+    BUCKET_SIZE = 2000
+
+    def __init__(self):
+        self._buckets: list[list[float]] = []
+        self._maxes: list[float] = []
+        self._tree: list[int] = [0]
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, value: float) -> None:
+        self._len += 1
+        if not self._buckets:
+            self._buckets.append([value])
+            self._maxes.append(value)
+            self._rebuild_tree()
+            return
+        i = bisect.bisect_left(self._maxes, value)
+        if i == len(self._maxes):
+            i -= 1
+            self._buckets[i].append(value)
+            self._maxes[i] = value
+        else:
+            bisect.insort(self._buckets[i], value)
+        bucket = self._buckets[i]
+        if len(bucket) > 2 * self.BUCKET_SIZE:
+            half = self.BUCKET_SIZE
+            self._buckets[i:i + 1] = [bucket[:half], bucket[half:]]
+            self._maxes[i:i + 1] = [bucket[half - 1], bucket[-1]]
+            self._rebuild_tree()
+            return
+        tree, j = self._tree, i + 1
+        while j < len(tree):
+            tree[j] += 1
+            j += j & -j
+
+    def count_below(self, value: float, inclusive: bool = False) -> int:
+        """Number of items < value (<= value if inclusive)."""
+        find = bisect.bisect_right if inclusive else bisect.bisect_left
+        i = find(self._maxes, value)
+        count = 0
+        if i < len(self._buckets):
+            count = find(self._buckets[i], value)
+        tree = self._tree
+        while i:
+            count += tree[i]
+            i &= i - 1
+        return count
+
+    def __getitem__(self, index: int) -> float:
+        for bucket in self._buckets:
+            if index < len(bucket):
+                return bucket[index]
+            index -= len(bucket)
+        raise IndexError(index)
+
+    def _rebuild_tree(self) -> None:
+        """Fenwick tree of bucket sizes (after the bucket list changed)."""
+        tree = [0] + [len(bucket) for bucket in self._buckets]
+        for j in range(1, len(tree)):
+            parent = j + (j & -j)
+            if parent < len(tree):
+                tree[parent] += tree[j]
+        self._tree = tree
+
+
+class _RouteState:
+    """Incremental supply/demand/market state of one route."""
+
+    __slots__ = ("created", "travelers", "sender_starts", "sender_ends", "prices")
+
+    def __init__(self):
+        self.created: deque[float] = deque()  # creation times inside the stats window
+        self.travelers = _SortedList()  # ticket times
+        self.sender_starts = _SortedList()  # time-frame starts
+        self.sender_ends = _SortedList()  # time-frame ends
+        self.prices = _SortedList()  # posted prices
+
+    def monthly_cards(self, now: float) -> int:
+        cutoff = now - ROUTE_STATS_WINDOW.total_seconds()
+        while self.created and self.created[0] < cutoff:
+            self.created.popleft()
+        return len(self.created)
+
+    def supply_demand(self, start: float, end: float) -> tuple[int, int]:
+        travelers = (
+            self.travelers.count_below(end, inclusive=True) - self.travelers.count_below(start)
+        )
+        # Frames overlapping [start, end]: all with start <= end minus those ending before start
+        senders = (
+            self.sender_starts.count_below(end, inclusive=True) - self.sender_ends.count_below(start)
+        )
+        return travelers, senders
+
+    def market_median(self) -> Optional[float]:
+        n = len(self.prices)
+        if not n:
+            return None
+        mid = n // 2
+        return self.prices[mid] if n % 2 else (self.prices[mid - 1] + self.prices[mid]) / 2
+
+    def add(self, card: HistoricalCard) -> None:
+        self.created.append(card.created_at.timestamp())
+        if not card.is_sender:
+            if card.ticket_date_time is not None:
+                self.travelers.add(card.ticket_date_time.timestamp())
+            return
+        # A frame with one missing bound only matches on the other bound
+        start = card.start_time_frame or card.end_time_frame
+        end = card.end_time_frame or card.start_time_frame
+        if start is not None:
+            start, end = sorted((start.timestamp(), end.timestamp()))
+            self.sender_starts.add(start)
+            self.sender_ends.add(end)
+
+
+@dataclass
+class BacktestReport:
+    """Error of replayed suggestions against posted prices."""
+
+    cards: int = 0
+    samples: int = 0
+    abs_error_sum: float = 0.0
+    squared_error_sum: float = 0.0
+    pct_error_sum: float = 0.0
+    error_sum: float = 0.0
+    within_range: int = 0
+    # factor name -> factor value -> [count, sum of log(posted / suggested)]
+    factor_log_ratios: dict[str, dict[float, list[float]]] = field(
+        default_factory=lambda: defaultdict(lambda: defaultdict(lambda: [0, 0.0]))
+    )
+
+    def add(self, suggested: float, posted: float, factors: dict[str, float]) -> None:
+        """Record one (suggested, posted) pair."""
+        error = suggested - posted
+        self.samples += 1
+        self.error_sum += error
+        self.abs_error_sum += abs(error)
+        self.squared_error_sum += error * error
+        self.pct_error_sum += abs(error) / posted
+        if RANGE_LOW * suggested <= posted <= RANGE_HIGH * suggested:
+            self.within_range += 1
+
+        log_ratio = math.log(posted / suggested)
+        for name, value in factors.items():
+            # Demand is interpolated; two decimals keep its buckets few
+            bucket = self.factor_log_ratios[name][round(value, 2)]
+            bucket[0] += 1
+            bucket[1] += log_ratio
+
+    @property
+    def mae(self) -> Optional[float]:
+        return self.abs_error_sum / self.samples if self.samples else None
+
+    @property
+    def rmse(self) -> Optional[float]:
+        return math.sqrt(self.squared_error_sum / self.samples) if self.samples else None
+
+    @property
+    def mape(self) -> Optional[float]:
+        return self.pct_error_sum / self.samples if self.samples else None
+
+    @property
+    def bias(self) -> Optional[float]:
+        """Mean signed error (positive = suggestions above posted prices)."""
+        return self.error_sum / self.samples if self.samples else None
+
+    @property
+    def within_range_ratio(self) -> Optional[float]:
+        return self.within_range / self.samples if self.samples else None
+
+    def factor_adjustments(self) -> dict[str, dict[float, tuple[int, float]]]:
+        """
+        Per factor value: (samples, geometric mean of posted / suggested).
+
+        A ratio above 1 means cards priced with that factor value were posted
+        higher than suggested, i.e. the factor value could be raised.
+        """
+        return {
+            name: {
+                value: (int(count), math.exp(log_sum / count))
+                for value, (count, log_sum) in sorted(values.items())
+            }
+            for name, values in self.factor_log_ratios.items()
+        }
+
+    def to_dict(self) -> dict:
+        """JSON-serializable summary."""
+        return {
+            "cards": self.cards,
+            "samples": self.samples,
+            "mae": self.mae,
+            "rmse": self.rmse,
+            "mape": self.mape,
+            "bias": self.bias,
+            "within_range_ratio": self.within_range_ratio,
+            "factors": {
+                name: {str(value): {"samples": count, "ratio": ratio} for value, (count, ratio) in values.items()}
+                for name, values in self.factor_adjustments().items()
+            },
+        }
+
+
+class PricingBacktest:
+    """Replays cards one by one against incrementally maintained route state."""
+
+    def __init__(
+        self,
+        service: DynamicPricingService = dynamic_pricing_service,
+        use_market: bool = True
+    ):
+        """
+        Args:
+            service: Pricing service whose factors/constants are evaluated
+            use_market: Blend with the market median as of each card
+        """
+        self.service = service
+        self.use_market = use_market
+        self.report = BacktestReport()
+        self._routes: dict[Route, _RouteState] = defaultdict(_RouteState)
+
+    def process(self, card: HistoricalCard, base_price: float, score: bool = True) -> BacktestPoint:
+        """
+        Replay the suggestion for a card, then add the card to the route state.
+
+        Args:
+            card: Card in creation order
+            base_price: Base price per kg of the card's route
+            score: Record the error in the report (False while warming up)
+
+        Returns:
+            BacktestPoint with the suggestion as of the card's creation
+        """
+        service = self.service
+        state = self._routes[(card.origin_city_id, card.destination_city_id)]
+        now = card.created_at
+        travel_date = card.travel_date
+
+        # Same window as the live calculation: travel day ± 7 days (or now)
+        center = service._bucket_travel_date(travel_date) if travel_date else now
+        travelers, senders = state.supply_demand(
+            (center - DEMAND_WINDOW).timestamp(), (center + DEMAND_WINDOW).timestamp()
+        )
+
+        factors = {
+            "route": service._route_factor_from_count(state.monthly_cards(now.timestamp())),
+            "season": service._get_season_factor(travel_date) if travel_date else 1.0,
+            "demand": service._demand_factor_from_counts(travelers, senders),
+            "urgency": service._get_urgency_factor(travel_date, now) if travel_date else 1.0,
+            "weight": service._get_weight_factor(card.weight) if card.weight else 1.0,
+            "category": 1.0,
+        }
+
+        market_samples, market_median = 0, None
+        if self.use_market:
+            market_samples = len(state.prices)
+            if market_samples >= service.MARKET_MIN_SAMPLES:
+                market_median = state.market_median()
+
+        suggested = service._final_price(base_price, factors, market_samples, market_median)
+
+        posted = self._posted_price(card)
+        self.report.cards += 1
+        if score and posted is not None:
+            self.report.add(suggested, posted, factors)
+
+        state.add(card)
+        if self.use_market and posted is not None:
+            state.prices.add(posted)
+
+        return BacktestPoint(round(suggested, 2), factors, posted)
+
+    @staticmethod
+    def _posted_price(card: HistoricalCard) -> Optional[float]:
+        """Posted price per kg in USD, if comparable."""
+        if not card.price_per_kg or card.price_per_kg <= 0:
+            return None
+        if (card.currency or "USD").upper() != "USD":
+            return None
+        return card.price_per_kg
+
+
+async def run_backtest(
+    db: AsyncSession,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    use_market: bool = True,
+    service: DynamicPricingService = dynamic_pricing_service
+) -> BacktestReport:
+    """
+    Replay card history and report suggestion error.
+
+    Cards created before `since` are still replayed to build route state
+    but are not scored.
+
+    Args:
+        db: Database session
+        since: Score cards created at or after this time
+        until: Stop at cards created before this time
+        use_market: Blend with the market median as of each card
+        service: Pricing service to evaluate (e.g. one with tuned constants)
+
+    Returns:
+        BacktestReport
+    """
+    await route_price_matrix.ensure_loaded(db)
+    backtest = PricingBacktest(service, use_market)
+    base_prices: dict[Route, float] = {}
+
+    async for row in card_repo.stream_pricing_history(db, until=until):
+        card = HistoricalCard(*row)
+        route = (card.origin_city_id, card.destination_city_id)
+        if route not in base_prices:
+            base_prices[route] = (await route_price_matrix.lookup(db, *route)).price
+        backtest.process(card, base_prices[route], score=since is None or card.created_at >= since)
+
+    return backtest.report
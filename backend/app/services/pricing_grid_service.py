@@ -0,0 +1,234 @@
+"""
+Pricing Grid Service - city-pair × week matrix of suggested prices.
+
+Loads route prices, route statistics and card supply/demand in bulk and
+evaluates every DynamicPricingService factor as NumPy array operations
+over all (route, week) cells at once. Cells are blended with each route's
+market median exactly like DynamicPricingService._final_price, so the grid
+agrees with /pricing/suggest. Used by the admin price heatmap.
+
+Supply/demand is aggregated per card day, so window edges are resolved
+to whole days (the per-request calculation uses exact timestamps).
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterator, Optional
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repositories import route_price_repo
+from app.services.dynamic_pricing_service import DynamicPricingService, dynamic_pricing_service
+from app.services.market_price_service import market_price_service
+from app.utils.logger import logger
+
+# Supply/demand window around each travel date (matches get_supply_demand_counts)
+DEMAND_WINDOW_DAYS = 7
+
+
+@dataclass
+class PriceGrid:
+    """Suggested prices for routes (rows) × weeks (columns)."""
+
+    routes: list[tuple[int, int]]
+    weeks: list[date]
+    prices: np.ndarray
+
+    def iter_rows(self) -> Iterator[dict]:
+        """Yield one JSON-serializable dict per route."""
+        for (origin, destination), row in zip(self.routes, self.prices.tolist()):
+            yield {
+                "origin_city_id": origin,
+                "destination_city_id": destination,
+                "prices": row,
+            }
+
+
+async def compute_price_grid(
+    db: AsyncSession,
+    start_date: date,
+    weeks: int = 12,
+    origin_city_id: Optional[int] = None,
+    weight: Optional[float] = None,
+    service: DynamicPricingService = dynamic_pricing_service
+) -> PriceGrid:
+    """
+    Compute the route × week price matrix for every route in route_price.
+
+    Args:
+        db: Database session
+        start_date: Travel date of the first week column
+        weeks: Number of weekly columns
+        origin_city_id: Optional filter on origin city
+        weight: Optional weight applied to every cell
+        service: Pricing service whose constants/scalar factors are used
+
+    Returns:
+        PriceGrid with a (routes, weeks) price matrix
+    """
+    routes = await route_price_repo.get_all_routes(db, origin_city_id)
+    week_dates = [start_date + timedelta(weeks=i) for i in range(weeks)]
+    if not routes:
+        return PriceGrid(routes=[], weeks=week_dates, prices=np.zeros((0, weeks)))
+
+    base_prices = await route_price_repo.get_base_prices_bulk(db, routes)
+    monthly_cards = await route_price_repo.get_route_statistics_bulk(db, routes)
+    travelers, senders = await _load_supply_demand(db, routes, week_dates)
+    try:
+        markets = await market_price_service.get_market_prices_bulk(db, routes)
+    except Exception as e:
+        logger.warning(f"Market prices unavailable for price grid: {e}")
+        markets = {}
+
+    base = np.array([base_prices[route].price for route in routes])
+    route_factor = route_factors(np.array([monthly_cards[route] for route in routes]))
+    season = season_factors(week_dates)
+    urgency = urgency_factors(week_dates, datetime.utcnow())
+    demand = demand_factors(travelers, senders)
+    weight_factor = service._get_weight_factor(weight) if weight else 1.0
+
+    prices = (
+        base[:, None]
+        * route_factor[:, None]
+        * season[None, :]
+        * demand
+        * urgency[None, :]
+        * weight_factor
+        * service.PRICE_MULTIPLIER
+    )
+    samples = np.array([markets[route].sample_count if route in markets else 0 for route in routes])
+    medians = np.array([
+        markets[route].median if route in markets and markets[route].median is not None else np.nan
+        for route in routes
+    ], dtype=float)
+    prices = market_blend(prices, samples, medians, service)
+    prices = np.clip(prices, service.MIN_PRICE_PER_KG, service.MAX_PRICE_PER_KG)
+
+    return PriceGrid(routes=routes, weeks=week_dates, prices=np.round(prices, 2))
+
+
+async def _load_supply_demand(
+    db: AsyncSession,
+    routes: list[tuple[int, int]],
+    week_dates: list[date]
+) -> tuple[np.ndarray, np.ndarray]:
+    """Build (routes, weeks) traveler and sender count matrices."""
+    window_start = week_dates[0] - timedelta(days=DEMAND_WINDOW_DAYS)
+    window_end = week_dates[-1] + timedelta(days=DEMAND_WINDOW_DAYS)
+    n_days = (window_end - window_start).days + 1
+    route_index = {route: i for i, route in enumerate(routes)}
+
+    # Day offsets of each week's [date - 7, date + 7] window
+    week_offsets = np.array([(d - window_start).days for d in week_dates])
+    lo = week_offsets - DEMAND_WINDOW_DAYS
+    hi = week_offsets + DEMAND_WINDOW_DAYS
+
+    range_start = datetime.combine(window_start, datetime.min.time())
+    range_end = datetime.combine(window_end, datetime.min.time())
+
+    # Travelers: daily counts -> prefix sums -> window sums
+    daily = np.zeros((len(routes), n_days + 1))
+    rows = [
+        (route_index[(origin, dest)], (day - window_start).days, count)
+        for origin, dest, day, count in await route_price_repo.get_traveler_daily_counts(
+            db, range_start, range_end
+        )
+        if (origin, dest) in route_index and 0 <= (day - window_start).days < n_days
+    ]
+    if rows:
+        r_idx, d_idx, counts = (np.array(col) for col in zip(*rows))
+        np.add.at(daily, (r_idx, d_idx + 1), counts)
+    prefix = np.cumsum(daily, axis=1)
+    travelers = prefix[:, hi + 1] - prefix[:, lo]
+
+    # Senders: time frame overlaps each week's window
+    senders = np.zeros((len(routes), len(week_dates)))
+    intervals = [
+        (
+            route_index[(origin, dest)],
+            (start - window_start).days if start else np.nan,
+            (end - window_start).days if end else np.nan,
+            count
+        )
+        for origin, dest, start, end, count in await route_price_repo.get_sender_interval_counts(
+            db, range_start, range_end
+        )
+        if (origin, dest) in route_index
+    ]
+    if intervals:
+        r_idx, s_day, e_day, counts = (np.array(col, dtype=float) for col in zip(*intervals))
+        s_day, e_day = s_day[:, None], e_day[:, None]
+        overlaps = (
+            ((s_day >= lo) & (s_day <= hi))
+            | ((e_day >= lo) & (e_day <= hi))
+            | ((s_day <= lo) & (e_day >= hi))
+        )
+        np.add.at(senders, r_idx.astype(int), overlaps * counts[:, None])
+
+    return travelers, senders
+
+
+def route_factors(monthly_cards: np.ndarray) -> np.ndarray:
+    """Vectorized DynamicPricingService._route_factor_from_count."""
+    return np.select(
+        [monthly_cards > 100, monthly_cards > 50, monthly_cards > 10],
+        [0.85, 1.0, 1.15],
+        default=1.3
+    )
+
+
+def season_factors(dates: list[date]) -> np.ndarray:
+    """Vectorized DynamicPricingService._get_season_factor."""
+    month = np.array([d.month for d in dates])
+    day = np.array([d.day for d in dates])
+    return np.select(
+        [
+            ((month == 3) & (day >= 15)) | ((month == 4) & (day <= 10)),
+            (month >= 6) & (month <= 9),
+            ((month == 12) & (day >= 15)) | ((month == 1) & (day <= 10)),
+            np.isin(month, [11, 2]) | ((month == 12) & (day < 15)) | ((month == 1) & (day > 10)),
+        ],
+        [1.4, 1.25, 1.3, 0.9],
+        default=1.0
+    )
+
+
+def urgency_factors(dates: list[date], now: datetime) -> np.ndarray:
+    """Vectorized DynamicPricingService._get_urgency_factor."""
+    days_until = np.array([
+        (datetime.combine(d, datetime.min.time()) - now).days for d in dates
+    ])
+    return np.select(
+        [days_until < 0, days_until > 30, days_until > 14, days_until > 7, days_until > 3, days_until > 1],
+        [1.5, 1.0, 1.05, 1.1, 1.2, 1.35],
+        default=1.5
+    )
+
+
+def market_blend(
+    prices: np.ndarray,
+    samples: np.ndarray,
+    medians: np.ndarray,
+    service: DynamicPricingService = dynamic_pricing_service
+) -> np.ndarray:
+    """Vectorized DynamicPricingService._blend (one market per row; NaN median = no market)."""
+    weight = service.MARKET_MAX_WEIGHT * np.minimum(1.0, samples / service.MARKET_FULL_WEIGHT_SAMPLES)
+    weight = np.where((samples >= service.MARKET_MIN_SAMPLES) & ~np.isnan(medians), weight, 0.0)
+    return (1 - weight[:, None]) * prices + weight[:, None] * np.nan_to_num(medians)[:, None]
+
+
+def demand_factors(travelers: np.ndarray, senders: np.ndarray) -> np.ndarray:
+    """Vectorized DynamicPricingService._demand_factor_from_counts."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(travelers > 0, senders / np.where(travelers > 0, travelers, 1), 0.0)
+    return np.select(
+        [travelers == 0, ratio < 0.5, ratio < 1.0, ratio < 2.0, ratio < 3.0],
+        [
+            1.5,
+            0.8,
+            0.9 + (ratio - 0.5) * 0.2,
+            1.0 + (ratio - 1.0) * 0.3,
+            1.3 + (ratio - 2.0) * 0.3,
+        ],
+        default=np.minimum(2.0, 1.6 + (ratio - 3.0) * 0.1)
+    )
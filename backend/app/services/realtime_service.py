@@ -0,0 +1,221 @@
+"""Realtime Service - push رویدادهای پیام به کلاینت‌های متصل (SSE).
+
+رویدادها پس از commit با PUBLISH روی کانال realtime:user:{user_id} در Redis
+فرستاده می‌شوند. هر worker یک اتصال pub/sub دارد و فقط روی کانال کاربرانی
+که به همان worker متصل‌اند subscribe می‌کند، پس کاربر روی هر workerی که
+متصل باشد رویداد را دریافت می‌کند.
+
+انواع رویداد:
+- message: پیام جدید (برای گیرنده به همراه unread_count)
+- read: پیام‌های ارسالی خوانده شدند (read receipt)
+- unread: تعداد کل پیام‌های خوانده نشده تغییر کرد
+- resync: صف کلاینت پر شد؛ کلاینت باید داده‌ها را دوباره بگیرد
+
+EventSource هدر Authorization نمی‌فرستد؛ به جای access token در URL (و در
+لاگ‌های دسترسی) کلاینت با POST احراز هویت شده یک ticket یک‌بار مصرف کوتاه‌مدت
+می‌گیرد که با باز شدن stream در Redis مصرف می‌شود.
+"""
+import asyncio
+import json
+import secrets
+from contextlib import asynccontextmanager, suppress
+from typing import Any, AsyncIterator, Optional
+
+import redis.asyncio as redis
+
+from ..core.config import get_settings
+from ..core.redis_client import get_redis_client
+from ..utils.logger import logger
+
+settings = get_settings()
+
+# Redis channel pattern: realtime:user:{user_id}
+CHANNEL_PREFIX = "realtime:user"
+
+# Redis key pattern: realtime:ticket:{ticket} -> user_id
+TICKET_PREFIX = "realtime:ticket"
+
+# حداکثر رویدادهای در انتظار برای هر اتصال
+QUEUE_SIZE = 100
+
+RESYNC_EVENT = json.dumps({"type": "resync", "data": {}})
+
+
+def channel_for(user_id: int) -> str:
+    """نام کانال Redis یک کاربر."""
+    return f"{CHANNEL_PREFIX}:{user_id}"
+
+
+class RealtimeHub:
+    """Fan-out رویدادها بین workerها با Redis pub/sub."""
+
+    def __init__(self, client: Optional[redis.Redis] = None):
+        """مقداردهی اولیه (بدون client از Redis client مشترک استفاده می‌شود)."""
+        self._client = client
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._subscribers: dict[int, set[asyncio.Queue]] = {}
+        self._lock = asyncio.Lock()
+
+    async def publish(self, user_id: int, event_type: str, data: dict[str, Any]) -> None:
+        """ارسال رویداد برای همه اتصال‌های یک کاربر (روی همه workerها).
+
+        Args:
+            user_id: شناسه کاربر مقصد
+            event_type: نوع رویداد
+            data: داده JSON-serializable
+        """
+        payload = json.dumps({"type": event_type, "data": data}, default=str)
+        await self._get_client().publish(channel_for(user_id), payload)
+
+    async def publish_many(self, events: list[tuple[int, str, dict[str, Any]]]) -> None:
+        """ارسال چند رویداد با یک رفت و برگشت Redis (pipeline).
+
+        Args:
+            events: لیست (شناسه کاربر مقصد، نوع رویداد، داده)
+        """
+        async with self._get_client().pipeline(transaction=False) as pipe:
+            for user_id, event_type, data in events:
+                pipe.publish(
+                    channel_for(user_id),
+                    json.dumps({"type": event_type, "data": data}, default=str)
+                )
+            await pipe.execute()
+
+    async def issue_ticket(self, user_id: int) -> str:
+        """ساخت ticket یک‌بار مصرف stream (معتبر تا REALTIME_TICKET_SECONDS).
+
+        Args:
+            user_id: شناسه کاربر احراز هویت شده
+
+        Returns:
+            ticket تصادفی
+        """
+        ticket = secrets.token_urlsafe(32)
+        await self._get_client().set(
+            f"{TICKET_PREFIX}:{ticket}", user_id, ex=settings.REALTIME_TICKET_SECONDS
+        )
+        return ticket
+
+    async def redeem_ticket(self, ticket: str) -> Optional[int]:
+        """مصرف ticket (GETDEL اتمیک؛ هر ticket فقط یک بار).
+
+        Returns:
+            شناسه کاربر یا None اگر ticket نامعتبر، منقضی یا مصرف شده باشد
+        """
+        user_id = await self._get_client().getdel(f"{TICKET_PREFIX}:{ticket}")
+        return int(user_id) if user_id else None
+
+    @asynccontextmanager
+    async def subscribe(self, user_id: int) -> AsyncIterator[asyncio.Queue]:
+        """ثبت یک اتصال کاربر؛ رویدادها (JSON string) در صف برگشتی قرار می‌گیرند."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        async with self._lock:
+            listeners = self._subscribers.setdefault(user_id, set())
+            if not listeners:
+                try:
+                    await self._get_pubsub().subscribe(channel_for(user_id))
+                except Exception:
+                    del self._subscribers[user_id]
+                    raise
+                self._ensure_reader()
+            listeners.add(queue)
+
+        try:
+            yield queue
+        finally:
+            async with self._lock:
+                listeners = self._subscribers.get(user_id, set())
+                listeners.discard(queue)
+                if not listeners:
+                    self._subscribers.pop(user_id, None)
+                    try:
+                        await self._pubsub.unsubscribe(channel_for(user_id))
+                    except Exception as e:
+                        logger.warning(f"Realtime unsubscribe failed for user {user_id}: {e}")
+
+    def dispatch(self, channel: str, data: str) -> None:
+        """رساندن یک پیام pub/sub به صف‌های محلی کاربر."""
+        try:
+            user_id = int(channel.rsplit(":", 1)[1])
+        except (IndexError, ValueError):
+            return
+
+        for queue in self._subscribers.get(user_id, ()):
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # کلاینت کند: رویدادهای قدیمی دور ریخته و resync خواسته می‌شود
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC_EVENT)
+
+    async def close(self) -> None:
+        """بستن reader و اتصال pub/sub (در shutdown؛ pool مشترک جدا بسته می‌شود)."""
+        if self._reader:
+            self._reader.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._reader
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+    def _get_client(self) -> redis.Redis:
+        return self._client if self._client is not None else get_redis_client()
+
+    def _get_pubsub(self):
+        if self._pubsub is None:
+            self._pubsub = self._get_client().pubsub(ignore_subscribe_messages=True)
+        return self._pubsub
+
+    def _ensure_reader(self) -> None:
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self) -> None:
+        """خواندن پیام‌های pub/sub و توزیع در صف‌ها (اتصال قطع‌شده خودکار وصل می‌شود)."""
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Realtime pub/sub read failed: {e}")
+                await asyncio.sleep(1.0)
+                continue
+
+            if message and message.get("type") == "message":
+                self.dispatch(message["channel"], message["data"])
+
+
+# Singleton instance
+realtime_hub = RealtimeHub()
+
+
+async def publish(user_id: int, event_type: str, data: dict[str, Any]) -> None:
+    """ارسال رویداد realtime؛ خطای Redis فقط log می‌شود.
+
+    Args:
+        user_id: شناسه کاربر مقصد
+        event_type: نوع رویداد
+        data: داده JSON-serializable
+    """
+    try:
+        await realtime_hub.publish(user_id, event_type, data)
+    except Exception as e:
+        logger.warning(f"Realtime publish failed for user {user_id}: {e}")
+
+
+async def publish_many(events: list[tuple[int, str, dict[str, Any]]]) -> None:
+    """ارسال چند رویداد realtime با یک pipeline؛ خطای Redis فقط log می‌شود.
+
+    Args:
+        events: لیست (شناسه کاربر مقصد، نوع رویداد، داده)
+    """
+    if not events:
+        return
+    try:
+        await realtime_hub.publish_many(events)
+    except Exception as e:
+        logger.warning(f"Realtime publish failed for {len(events)} events: {e}")
@@ -0,0 +1,298 @@
+"""Unread Counter Service - شمارنده پیام‌های خوانده نشده در Redis.
+
+برای هر کاربر یک hash با کلید unread:{user_id} نگهداری می‌شود:
+- فیلد total: تعداد کل خوانده نشده‌ها (badge)
+- فیلد c:{other_user_id}: تعداد خوانده نشده‌های هر مکالمه
+
+ارسال پیام شمارنده گیرنده را افزایش و mark_as_read شمارنده مکالمه را صفر
+می‌کند (هر دو پس از commit)؛ mark_many_as_read تعداد خوانده شده‌های چند
+مکالمه را با یک فراخوانی کم می‌کند. شمارنده فقط وقتی تغییر می‌کند که hash وجود
+داشته باشد؛ hash غایب با یک کوئری روی جدول conversation دوباره ساخته
+می‌شود. هر تغییر نسخه کلید را افزایش می‌دهد و بازسازی فقط اگر نسخه از قبل از
+کوئری تغییر نکرده باشد ذخیره می‌شود، تا پیامی که حین بازسازی commit شده گم
+نشود. reconcile هش‌های موجود را با Postgres مقایسه و اختلاف را اصلاح می‌کند؛
+حلقه دوره‌ای آن با advisory lock اجرا می‌شود تا در هر دوره فقط یک worker
+مقایسه کند.
+"""
+import asyncio
+from typing import Optional
+
+import redis.asyncio as redis
+from redis.exceptions import WatchError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import get_settings
+from ..core.database import engine, get_db_session
+from ..core.redis_client import get_redis_client, read_version, store_hash_if_unchanged, version_key
+from ..repositories import message_repo
+from ..utils.logger import logger
+
+settings = get_settings()
+
+# Redis key pattern: unread:{user_id}
+KEY_PREFIX = "unread"
+TOTAL_FIELD = "total"
+
+# hash کاربران غیرفعال پس از این مدت حذف و در صورت نیاز دوباره ساخته می‌شود
+COUNTER_TTL = 60 * 60 * 24 * 7  # 7 days
+
+# TTL کلید نسخه (باید از زمان یک بازسازی از دیتابیس بیشتر باشد)
+VERSION_TTL = 60 * 60  # 1 hour
+
+# تعداد کاربران در هر دور مقایسه reconcile
+RECONCILE_BATCH_SIZE = 500
+
+# کلید advisory lock حلقه reconcile
+ADVISORY_LOCK_KEY = 7_340_002
+
+# افزایش نسخه (KEYS[2]، ARGV[1] = TTL) در ابتدای هر اسکریپت تغییر
+_BUMP_VERSION = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+"""
+
+# افزایش فقط روی hash موجود (hash غایب از دیتابیس ساخته می‌شود)
+_INCREMENT_SCRIPT = _BUMP_VERSION + """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HINCRBY', KEYS[1], ARGV[2], 1)
+    return redis.call('HINCRBY', KEYS[1], 'total', 1)
+end
+return -1
+"""
+
+# صفر کردن یک مکالمه و کم کردن همان مقدار از total
+_RESET_SCRIPT = _BUMP_VERSION + """
+local count = tonumber(redis.call('HGET', KEYS[1], ARGV[2]) or '0')
+if count > 0 then
+    redis.call('HDEL', KEYS[1], ARGV[2])
+    return redis.call('HINCRBY', KEYS[1], 'total', -count)
+end
+return -1
+"""
+
+# کم کردن چند مکالمه (ARGV[2:]: فیلد، مقدار، ...)؛ هیچ شمارنده‌ای منفی نمی‌شود
+_SUBTRACT_SCRIPT = _BUMP_VERSION + """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local removed = 0
+for i = 2, #ARGV, 2 do
+    local current = tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0')
+    local count = math.min(current, tonumber(ARGV[i + 1]))
+    if count > 0 then
+        if count == current then
+            redis.call('HDEL', KEYS[1], ARGV[i])
+        else
+            redis.call('HINCRBY', KEYS[1], ARGV[i], -count)
+        end
+        removed = removed + count
+    end
+end
+return redis.call('HINCRBY', KEYS[1], 'total', -removed)
+"""
+
+
+def key_for(user_id: int) -> str:
+    """نام کلید Redis شمارنده‌های یک کاربر."""
+    return f"{KEY_PREFIX}:{user_id}"
+
+
+def field_for(other_user_id: int) -> str:
+    """نام فیلد شمارنده یک مکالمه."""
+    return f"c:{other_user_id}"
+
+
+def to_mapping(counts: dict[int, int]) -> dict[str, int]:
+    """تبدیل تعداد هر مکالمه به فیلدهای hash (به همراه total)."""
+    mapping = {field_for(other_id): count for other_id, count in counts.items() if count}
+    mapping[TOTAL_FIELD] = sum(mapping.values())
+    return mapping
+
+
+class UnreadCounterService:
+    """شمارنده‌های خوانده نشده در Redis با بازسازی از Postgres."""
+
+    def __init__(self, client: Optional[redis.Redis] = None):
+        """مقداردهی اولیه (بدون client از Redis client مشترک استفاده می‌شود)."""
+        self._client = client
+
+    async def get_total(self, db: AsyncSession, user_id: int) -> int:
+        """تعداد کل خوانده نشده‌ها (یک HGET؛ در miss بازسازی از دیتابیس).
+
+        Args:
+            db: Database session
+            user_id: شناسه کاربر
+
+        Returns:
+            تعداد کل پیام‌های خوانده نشده
+        """
+        try:
+            total = await self._get_client().hget(key_for(user_id), TOTAL_FIELD)
+        except Exception as e:
+            logger.warning(f"Unread counter read failed, using database: {e}")
+            return await message_repo.get_total_unread_count(db, user_id)
+
+        if total is not None:
+            return max(int(total), 0)
+        return await self.rebuild(db, user_id)
+
+    async def increment(self, receiver_id: int, sender_id: int) -> None:
+        """افزایش شمارنده گیرنده برای یک پیام جدید (پس از commit)."""
+        try:
+            await self._eval(_INCREMENT_SCRIPT, receiver_id, field_for(sender_id))
+        except Exception as e:
+            logger.warning(f"Unread counter increment failed for user {receiver_id}: {e}")
+
+    async def reset(self, user_id: int, other_user_id: int) -> None:
+        """صفر کردن شمارنده یک مکالمه پس از mark_as_read."""
+        try:
+            await self._eval(_RESET_SCRIPT, user_id, field_for(other_user_id))
+        except Exception as e:
+            logger.warning(f"Unread counter reset failed for user {user_id}: {e}")
+
+    async def subtract(self, user_id: int, counts: dict[int, int]) -> None:
+        """کم کردن شمارنده چند مکالمه در یک فراخوانی (پس از mark_many_as_read).
+
+        Args:
+            user_id: شناسه کاربر خواننده
+            counts: dict از شناسه فرستنده به تعداد پیام‌های خوانده شده
+        """
+        args = [value for other_id, count in counts.items() if count for value in (field_for(other_id), count)]
+        if not args:
+            return
+        try:
+            await self._eval(_SUBTRACT_SCRIPT, user_id, *args)
+        except Exception as e:
+            logger.warning(f"Unread counter subtract failed for user {user_id}: {e}")
+
+    async def rebuild(self, db: AsyncSession, user_id: int) -> int:
+        """ساخت hash یک کاربر از جدول conversation.
+
+        hash فقط اگر از قبل از کوئری تغییری (increment/reset/subtract) ثبت نشده
+        باشد ذخیره می‌شود؛ در غیر این صورت درخواست بعدی دوباره می‌سازد.
+
+        Returns:
+            تعداد کل خوانده نشده‌ها
+        """
+        key = key_for(user_id)
+        try:
+            version = await read_version(self._get_client(), key)
+        except Exception as e:
+            logger.warning(f"Unread counter version read failed, using database: {e}")
+            version = None
+
+        counts = (await message_repo.get_unread_counts_by_user(db, [user_id]))[user_id]
+        if version is not None:
+            try:
+                await store_hash_if_unchanged(
+                    self._get_client(), key, version, to_mapping(counts), COUNTER_TTL
+                )
+            except Exception as e:
+                logger.warning(f"Unread counter store failed for user {user_id}: {e}")
+        return sum(counts.values())
+
+    async def reconcile(self, db: AsyncSession) -> int:
+        """مقایسه همه hashهای موجود با Postgres و اصلاح اختلاف‌ها.
+
+        hashهایی که حین مقایسه تغییر کنند (WATCH) در این دور رد می‌شوند.
+
+        Returns:
+            تعداد کاربرانی که شمارنده‌شان اصلاح شد
+        """
+        client = self._get_client()
+        repaired = 0
+        batch: list[int] = []
+
+        async for key in client.scan_iter(match=f"{KEY_PREFIX}:*", count=RECONCILE_BATCH_SIZE):
+            try:
+                batch.append(int(key.rsplit(":", 1)[1]))
+            except ValueError:
+                continue
+            if len(batch) >= RECONCILE_BATCH_SIZE:
+                repaired += await self._reconcile_batch(db, batch)
+                batch = []
+        if batch:
+            repaired += await self._reconcile_batch(db, batch)
+
+        if repaired:
+            logger.warning(f"Unread counters repaired for {repaired} users")
+        return repaired
+
+    async def run_reconcile(self) -> Optional[int]:
+        """یک دور reconcile با advisory lock (فقط یک worker هم‌زمان).
+
+        Returns:
+            تعداد کاربران اصلاح شده؛ None اگر worker دیگری در حال اجرا باشد
+        """
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            locked = await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            if not locked:
+                logger.debug("Unread counter reconciliation already running on another worker")
+                return None
+            try:
+                async with get_db_session() as db:
+                    return await self.reconcile(db)
+            finally:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+
+    async def run_reconcile_loop(self) -> None:
+        """اجرای run_reconcile هر UNREAD_COUNTER_RECONCILE_SECONDS تا زمان cancel."""
+        while True:
+            await asyncio.sleep(settings.UNREAD_COUNTER_RECONCILE_SECONDS)
+            try:
+                await self.run_reconcile()
+            except Exception as e:
+                logger.error(f"Unread counter reconciliation failed: {e}")
+
+    async def _reconcile_batch(self, db: AsyncSession, user_ids: list[int]) -> int:
+        client = self._get_client()
+        keys = [key_for(user_id) for user_id in user_ids]
+        async with client.pipeline(transaction=True) as tx:
+            # WATCH قبل از خواندن: تغییری که بعد از آن برسد دور را رد می‌کند،
+            # و پیامی که قبل از آن commit شده در کوئری دیتابیس دیده می‌شود
+            await tx.watch(*keys)
+            async with client.pipeline(transaction=False) as reader:
+                for key in keys:
+                    reader.hgetall(key)
+                stored = await reader.execute()
+            expected = await message_repo.get_unread_counts_by_user(db, user_ids)
+
+            drifted = [
+                user_id
+                for user_id, fields in zip(user_ids, stored)
+                if fields and {k: int(v) for k, v in fields.items()} != to_mapping(expected[user_id])
+            ]
+            if not drifted:
+                return 0
+
+            tx.multi()
+            for user_id in drifted:
+                self._queue_store(tx, user_id, expected[user_id])
+            try:
+                await tx.execute()
+            except WatchError:
+                logger.info("Unread counters changed during reconciliation; batch skipped")
+                return 0
+
+        logger.info(f"Unread counter drift repaired for users {drifted}")
+        return len(drifted)
+
+    async def _eval(self, script: str, user_id: int, *args) -> None:
+        key = key_for(user_id)
+        await self._get_client().eval(script, 2, key, version_key(key), VERSION_TTL, *args)
+
+    @staticmethod
+    def _queue_store(pipe, user_id: int, counts: dict[int, int]) -> None:
+        key = key_for(user_id)
+        pipe.delete(key)
+        pipe.hset(key, mapping=to_mapping(counts))
+        pipe.expire(key, COUNTER_TTL)
+
+    def _get_client(self) -> redis.Redis:
+        return self._client if self._client is not None else get_redis_client()
+
+
+# Singleton instance
+unread_counter_service = UnreadCounterService()
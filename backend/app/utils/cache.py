@@ -0,0 +1,237 @@
+"""In-process async TTL cache with request coalescing."""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Iterable, List, Optional, Set, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class _LeaderCancelled(Exception):
+    """محاسبه مشترک لغو شد (مثلاً قطع اتصال کلاینت)؛ منتظرها دوباره تلاش می‌کنند."""
+
+
+class AsyncTTLCache(Generic[T]):
+    """کش درون‌پردازه‌ای با TTL، ادغام درخواست‌های هم‌زمان و ابطال بر اساس tag.
+
+    درخواست‌های هم‌زمان برای یک کلید فقط یک بار factory را اجرا می‌کنند
+    و بقیه منتظر همان نتیجه می‌مانند. کلیدهای منقضی یا حذف‌شده از tag خود
+    خارج می‌شوند و نسخه هر tag فقط تا پایان محاسبه‌های در حال اجرای آن نگه
+    داشته می‌شود، پس حافظه با تعداد entryها محدود می‌ماند.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10_000):
+        """مقداردهی اولیه.
+
+        Args:
+            ttl_seconds: مدت اعتبار هر entry به ثانیه
+            max_entries: حداکثر تعداد entry (قدیمی‌ترین‌ها حذف می‌شوند)
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, T]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self._key_tags: Dict[Hashable, Hashable] = {}
+        # نسخه و تعداد محاسبه‌های در حال اجرای هر tag (فقط tagهای در حال محاسبه)
+        self._generations: Dict[Hashable, int] = {}
+        self._pending: Dict[Hashable, int] = {}
+        self._epoch = 0
+
+    def get(self, key: Hashable) -> Optional[T]:
+        """دریافت مقدار معتبر از کش (یا None)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: T, tag: Optional[Hashable] = None) -> None:
+        """ذخیره مقدار در کش.
+
+        Args:
+            key: کلید
+            value: مقدار
+            tag: tag اختیاری برای ابطال گروهی
+        """
+        if key in self._entries:
+            self._remove(key)
+        elif len(self._entries) >= self.max_entries:
+            self._evict()
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        if tag is not None:
+            self._tags.setdefault(tag, set()).add(key)
+            self._key_tags[key] = tag
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        factory: Callable[[], Awaitable[T]],
+        tag: Optional[Hashable] = None
+    ) -> T:
+        """دریافت از کش یا محاسبه با ادغام درخواست‌های هم‌زمان.
+
+        اگر در حین محاسبه tag باطل شود، نتیجه در کش ذخیره نمی‌شود. اگر
+        درخواستی که محاسبه را انجام می‌دهد لغو شود، منتظرهای دیگر لغو نمی‌شوند
+        و یکی از آن‌ها محاسبه را دوباره شروع می‌کند.
+
+        Args:
+            key: کلید
+            factory: coroutine factory برای محاسبه مقدار
+            tag: tag اختیاری برای ابطال گروهی
+
+        Returns:
+            مقدار کش‌شده یا تازه محاسبه‌شده
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                return await self._compute(key, factory, tag)
+            try:
+                return await asyncio.shield(pending)
+            except _LeaderCancelled:
+                continue
+
+    async def get_or_compute_many(
+        self,
+        keys: Iterable[Hashable],
+        factory: Callable[[List[Hashable]], Awaitable[Dict[Hashable, T]]]
+    ) -> Dict[Hashable, T]:
+        """دریافت چند کلید از کش و محاسبه کلیدهای غایب با یک فراخوانی.
+
+        هر کلید tag خودش است. مانند get_or_compute، نتیجه کلیدی که در حین
+        محاسبه باطل شود ذخیره نمی‌شود؛ با محاسبه‌های تکی در حال اجرا ادغام
+        نمی‌شود.
+
+        Args:
+            keys: کلیدها
+            factory: coroutine factory که برای لیست کلیدهای غایب dict مقدارها را برمی‌گرداند
+
+        Returns:
+            dict از کلید به مقدار (کلیدهایی که factory برنگرداند حذف می‌شوند)
+        """
+        values: Dict[Hashable, T] = {}
+        missing: List[Hashable] = []
+        for key in dict.fromkeys(keys):
+            value = self.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                values[key] = value
+        if not missing:
+            return values
+
+        generations = {key: self._begin(key) for key in missing}
+        try:
+            loaded = await factory(missing)
+            for key, value in loaded.items():
+                if key in generations and self._unchanged(key, generations[key]):
+                    self.set(key, value, tag=key)
+        finally:
+            for key in missing:
+                self._end(key)
+        values.update(loaded)
+        return values
+
+    async def _compute(
+        self,
+        key: Hashable,
+        factory: Callable[[], Awaitable[T]],
+        tag: Optional[Hashable]
+    ) -> T:
+        """اجرای factory به عنوان leader و انتشار نتیجه به منتظرها."""
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        generation = self._begin(tag)
+        try:
+            value = await factory()
+        except asyncio.CancelledError:
+            # future مشترک لغو نمی‌شود؛ منتظرها با _LeaderCancelled دوباره تلاش می‌کنند
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # جلوگیری از هشدار "exception was never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if self._unchanged(tag, generation):
+                self.set(key, value, tag)
+            return value
+        finally:
+            self._end(tag)
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def invalidate_tag(self, tag: Hashable) -> int:
+        """ابطال همه entryهای یک tag.
+
+        Args:
+            tag: tag موردنظر
+
+        Returns:
+            تعداد entryهای حذف‌شده
+        """
+        if tag in self._generations:
+            self._generations[tag] += 1
+        keys = self._tags.pop(tag, set())
+        for key in keys:
+            self._entries.pop(key, None)
+            self._key_tags.pop(key, None)
+        return len(keys)
+
+    def clear(self) -> None:
+        """پاک کردن کامل کش."""
+        self._entries.clear()
+        self._tags.clear()
+        self._key_tags.clear()
+        self._epoch += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self) -> None:
+        """حذف entryهای منقضی و در صورت نیاز قدیمی‌ترین entry."""
+        now = time.monotonic()
+        expired = [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        if len(self._entries) >= self.max_entries:
+            self._remove(min(self._entries, key=lambda k: self._entries[k][0]))
+
+    def _remove(self, key: Hashable) -> None:
+        """حذف یک entry و خارج کردن آن از tag (tag خالی حذف می‌شود)."""
+        self._entries.pop(key, None)
+        tag = self._key_tags.pop(key, None)
+        if tag is None:
+            return
+        keys = self._tags.get(tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def _begin(self, tag: Optional[Hashable]) -> Tuple[int, int]:
+        """ثبت شروع محاسبه برای tag و برگرداندن نسخه فعلی."""
+        self._pending[tag] = self._pending.get(tag, 0) + 1
+        self._generations.setdefault(tag, 0)
+        return self._epoch, self._generations[tag]
+
+    def _unchanged(self, tag: Optional[Hashable], generation: Tuple[int, int]) -> bool:
+        """آیا از زمان _begin ابطالی (tag یا clear) رخ نداده است."""
+        return (self._epoch, self._generations[tag]) == generation
+
+    def _end(self, tag: Optional[Hashable]) -> None:
+        """پایان محاسبه؛ نسخه tag بدون محاسبه در حال اجرا حذف می‌شود."""
+        self._pending[tag] -= 1
+        if not self._pending[tag]:
+            del self._pending[tag]
+            del self._generations[tag]
@@ -1,181 +1,271 @@
-"""Email utilities با پشتیبانی SendGrid و SMTP."""
+"""Email utilities با پشتیبانی Resend و SMTP.
+
+ارسال از طریق یک transport مشترک (هر process یک نمونه):
+- SmtpTransport: sessionهای SMTP پایدار در یک pool (بدون اتصال و STARTTLS
+  جدید برای هر ایمیل)؛ هر فراخوانی send_many همه ایمیل‌ها را روی یک session می‌فرستد
+- ResendTransport: Batch API (حداکثر RESEND_BATCH_LIMIT ایمیل در هر درخواست HTTP)
+"""
+import queue
 import smtplib
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from typing import Optional, Sequence
 from ..core.config import get_settings
 from .logger import logger
-from .email_templates import get_template
 
 settings = get_settings()
 
+# حداکثر ایمیل در هر درخواست Batch API در Resend
+RESEND_BATCH_LIMIT = 100
+
+
+@dataclass(frozen=True)
+class OutgoingEmail:
+    """یک ایمیل آماده ارسال."""
+
+    to_email: str
+    subject: str
+    body: str
+
+
+class EmailTransport(ABC):
+    """رابط ارسال ایمیل."""
+
+    @abstractmethod
+    def send_many(self, emails: Sequence[OutgoingEmail]) -> list[Optional[str]]:
+        """ارسال چند ایمیل در یک عملیات (blocking).
+
+        Returns:
+            برای هر ایمیل None در صورت موفقیت یا متن خطا
+        """
+
+    def close(self) -> None:
+        """بستن اتصال‌های باز."""
+
 
-def _send_via_smtp(to_email: str, subject: str, body: str) -> bool:
-    """ارسال ایمیل با SMTP (برای dev/MailHog)."""
-    try:
-        from_addr = settings.EMAIL_FROM
-        
+class SmtpTransport(EmailTransport):
+    """SMTP با pool اتصال‌های پایدار (thread-safe)."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: Optional[str],
+        password: Optional[str],
+        from_addr: str,
+        pool_size: int,
+        idle_seconds: float,
+        timeout: float
+    ):
+        """مقداردهی اولیه (اتصال‌ها در اولین استفاده ساخته می‌شوند)."""
+        self._host = host
+        self._port = port
+        self._user = user
+        self._password = password
+        self._from_addr = from_addr
+        self._idle_seconds = idle_seconds
+        self._timeout = timeout
+        self._slots = threading.BoundedSemaphore(pool_size)
+        # LIFO: اتصال‌های اخیراً استفاده شده زنده‌تر هستند
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self.connections_opened = 0
+
+    def send_many(self, emails: Sequence[OutgoingEmail]) -> list[Optional[str]]:
+        errors: list[Optional[str]] = []
+        with self._slots:
+            conn = self._acquire()
+            try:
+                for index, email in enumerate(emails):
+                    conn, error = self._send_one(conn, email)
+                    errors.append(error)
+                    if error and conn is None:
+                        # سرور در دسترس نیست یا پاسخ نمی‌دهد: بقیه batch را امتحان نمی‌کنیم
+                        errors.extend([error] * (len(emails) - index - 1))
+                        break
+            finally:
+                self._release(conn)
+        return errors
+
+    def close(self) -> None:
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._quit(conn)
+
+    def _send_one(self, conn: Optional[smtplib.SMTP], email: OutgoingEmail):
+        message = self._build_message(email)
+        # اتصال pool ممکن است توسط سرور بسته شده باشد: یک بار با اتصال جدید
+        for attempt in range(2):
+            try:
+                if conn is None:
+                    conn = self._connect()
+                conn.send_message(message)
+                logger.info(f"Email sent via SMTP to {email.to_email}")
+                return conn, None
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+                # پاسخ خطای سرور برای همین ایمیل؛ smtplib پیش از آن RSET کرده و اتصال هم‌گام است
+                return conn, str(e) or e.__class__.__name__
+            except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                self._quit(conn)
+                conn = None
+                if attempt:
+                    return conn, str(e) or e.__class__.__name__
+            except Exception as e:
+                # timeout یا خطای دیگر وسط dialogue: پاسخ بعدی ممکن است مال همین دستور باشد
+                self._discard(conn)
+                return None, str(e) or e.__class__.__name__
+
+    def _build_message(self, email: OutgoingEmail) -> MIMEMultipart:
         msg = MIMEMultipart()
-        msg['From'] = from_addr
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(body, 'plain', 'utf-8'))
-        
-        with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-            if settings.SMTP_USER and settings.SMTP_PASS:
-                server.starttls()
-                server.login(settings.SMTP_USER, settings.SMTP_PASS)
-            server.send_message(msg)
-        
-        logger.info(f"Email sent via SMTP to {to_email}")
-        return True
-        
-    except Exception as e:
-        logger.error(f"SMTP email failed to {to_email}: {str(e)}")
-        return False
-
-
-def _send_via_resend(to_email: str, subject: str, body: str) -> bool:
-    """ارسال ایمیل با Resend."""
-    try:
+        msg['From'] = self._from_addr
+        msg['To'] = email.to_email
+        msg['Subject'] = email.subject
+        msg.attach(MIMEText(email.body, 'plain', 'utf-8'))
+        return msg
+
+    def _connect(self) -> smtplib.SMTP:
+        conn = smtplib.SMTP(self._host, self._port, timeout=self._timeout)
+        if self._user and self._password:
+            conn.starttls()
+            conn.login(self._user, self._password)
+        self.connections_opened += 1
+        return conn
+
+    def _acquire(self) -> Optional[smtplib.SMTP]:
+        while True:
+            try:
+                conn, released_at = self._idle.get_nowait()
+            except queue.Empty:
+                return None  # در اولین ارسال ساخته می‌شود
+            if time.monotonic() - released_at < self._idle_seconds:
+                return conn
+            self._quit(conn)
+
+    def _release(self, conn: Optional[smtplib.SMTP]) -> None:
+        if conn is not None:
+            self._idle.put((conn, time.monotonic()))
+
+    @staticmethod
+    def _discard(conn: Optional[smtplib.SMTP]) -> None:
+        # بستن socket بدون QUIT (dialogue اتصال هم‌گام نیست)
+        if conn is None:
+            return
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _quit(conn: Optional[smtplib.SMTP]) -> None:
+        if conn is None:
+            return
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+
+class ResendTransport(EmailTransport):
+    """Resend با Batch API."""
+
+    def __init__(self, api_key: str, from_addr: str):
+        """مقداردهی اولیه."""
         import resend
-        
-        resend.api_key = settings.RESEND_API_KEY
-        
-        response = resend.Emails.send({
-            "from": settings.EMAIL_FROM,
-            "to": to_email,
-            "subject": subject,
-            "text": body
-        })
-        
-        if response and response.get("id"):
-            logger.info(f"Email sent via Resend to {to_email}, id: {response['id']}")
-            return True
-        else:
-            logger.error(f"Resend failed: {response}")
-            return False
-            
-    except Exception as e:
-        logger.error(f"Resend email failed to {to_email}: {str(e)}")
-        return False
+
+        resend.api_key = api_key
+        self._resend = resend
+        self._from_addr = from_addr
+
+    def send_many(self, emails: Sequence[OutgoingEmail]) -> list[Optional[str]]:
+        errors: list[Optional[str]] = []
+        for start in range(0, len(emails), RESEND_BATCH_LIMIT):
+            chunk = emails[start:start + RESEND_BATCH_LIMIT]
+            # Batch API همه یا هیچ است: خطا برای کل chunk ثبت می‌شود
+            try:
+                response = self._resend.Batch.send([
+                    {
+                        "from": self._from_addr,
+                        "to": email.to_email,
+                        "subject": email.subject,
+                        "text": email.body
+                    }
+                    for email in chunk
+                ])
+                if len((response or {}).get("data") or []) != len(chunk):
+                    raise RuntimeError(f"Resend batch failed: {response}")
+                errors.extend([None] * len(chunk))
+                logger.info(f"Email batch sent via Resend: {len(chunk)} emails")
+            except Exception as e:
+                errors.extend([str(e) or e.__class__.__name__] * len(chunk))
+        return errors
+
+
+_transport: Optional[EmailTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> EmailTransport:
+    """transport مشترک process (بر اساس EMAIL_PROVIDER)."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            if settings.EMAIL_PROVIDER == "resend" and settings.RESEND_API_KEY:
+                _transport = ResendTransport(settings.RESEND_API_KEY, settings.EMAIL_FROM)
+            else:
+                _transport = SmtpTransport(
+                    host=settings.SMTP_HOST,
+                    port=settings.SMTP_PORT,
+                    user=settings.SMTP_USER,
+                    password=settings.SMTP_PASS,
+                    from_addr=settings.EMAIL_FROM,
+                    pool_size=settings.EMAIL_SMTP_POOL_SIZE,
+                    idle_seconds=settings.EMAIL_SMTP_IDLE_SECONDS,
+                    timeout=settings.EMAIL_SMTP_TIMEOUT_SECONDS
+                )
+        return _transport
+
+
+def close_transport() -> None:
+    """بستن اتصال‌های transport مشترک (در shutdown)."""
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+            _transport = None
+
+
+def deliver_many(emails: Sequence[OutgoingEmail]) -> list[Optional[str]]:
+    """ارسال چند ایمیل در یک عملیات batch (blocking).
+
+    فقط worker ایمیل (app/services/email_outbox_service.py) و هشدار startup
+    مستقیماً ایمیل می‌فرستند؛ بقیه کد ایمیل را در outbox ثبت می‌کند.
+
+    Returns:
+        برای هر ایمیل None در صورت موفقیت یا متن خطا
+    """
+    if not emails:
+        return []
+    return get_transport().send_many(emails)
 
 
 def send_email(to_email: str, subject: str, body: str) -> bool:
-    """ارسال ایمیل با provider تنظیم‌شده.
-    
+    """ارسال یک ایمیل با provider تنظیم‌شده.
+
     Args:
         to_email: آدرس گیرنده
         subject: موضوع ایمیل
         body: متن ایمیل
-        
+
     Returns:
         True در صورت موفقیت
     """
-    if settings.EMAIL_PROVIDER == "resend" and settings.RESEND_API_KEY:
-        return _send_via_resend(to_email, subject, body)
-    else:
-        return _send_via_smtp(to_email, subject, body)
-
-
-# ==================== Email Functions ====================
-
-def send_otp_email(email: str, otp_code: str, first_name: str = "", language: str = "en") -> bool:
-    """ارسال کد OTP به ایمیل کاربر."""
-    subject, body = get_template("otp", language, otp_code=otp_code, first_name=first_name or "")
-    return send_email(email, subject, body)
-
-
-def send_welcome_email(email: str, first_name: str, language: str = "en") -> bool:
-    """ارسال ایمیل خوش‌آمدگویی."""
-    subject, body = get_template("welcome", language, first_name=first_name or "User")
-    return send_email(email, subject, body)
-
-
-def send_message_notification(
-    email: str,
-    sender_name: str,
-    first_name: str = "",
-    language: str = "en",
-    app_url: str = "https://minila.app"
-) -> bool:
-    """اطلاع‌رسانی دریافت پیام جدید."""
-    subject, body = get_template(
-        "new_message", 
-        language, 
-        sender_name=sender_name,
-        first_name=first_name or "",
-        app_url=app_url
-    )
-    return send_email(email, subject, body)
-
-
-def send_unread_summary(
-    email: str,
-    count: int,
-    first_name: str = "",
-    language: str = "en",
-    app_url: str = "https://minila.app"
-) -> bool:
-    """ارسال خلاصه پیام‌های خوانده نشده."""
-    subject, body = get_template(
-        "unread_summary",
-        language,
-        count=count,
-        first_name=first_name or "",
-        app_url=app_url
-    )
-    return send_email(email, subject, body)
-
-
-def send_membership_request_notification(
-    email: str,
-    user_name: str,
-    community_name: str,
-    language: str = "en"
-) -> bool:
-    """اطلاع‌رسانی درخواست عضویت جدید."""
-    subject, body = get_template(
-        "membership_request",
-        language,
-        user_name=user_name,
-        community_name=community_name
-    )
-    return send_email(email, subject, body)
-
-
-def send_membership_result(
-    email: str,
-    community_name: str,
-    approved: bool,
-    first_name: str = "",
-    language: str = "en"
-) -> bool:
-    """اطلاع‌رسانی نتیجه درخواست عضویت."""
-    template_name = "membership_approved" if approved else "membership_rejected"
-    subject, body = get_template(
-        template_name,
-        language,
-        community_name=community_name,
-        first_name=first_name or ""
-    )
-    return send_email(email, subject, body)
-
-
-def send_role_change_notification(
-    email: str,
-    community_name: str,
-    new_role: str,
-    first_name: str = "",
-    language: str = "en"
-) -> bool:
-    """اطلاع‌رسانی تغییر نقش کاربر."""
-    subject, body = get_template(
-        "role_change",
-        language,
-        community_name=community_name,
-        new_role=new_role,
-        first_name=first_name or ""
-    )
-    return send_email(email, subject, body)
+    error = deliver_many([OutgoingEmail(to_email, subject, body)])[0]
+    if error:
+        logger.error(f"Email failed to {to_email}: {error}")
+    return error is None
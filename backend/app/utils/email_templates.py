@@ -1,5 +1,12 @@
-"""Email templates - چندزبانه."""
-from typing import Dict, Any
+"""Email templates - چندزبانه.
+
+قالب‌ها در import یک بار compile می‌شوند (TemplateRegistry): placeholderها
+اعتبارسنجی، بخش‌های ثابت هر (قالب، زبان) جدا و متن‌های بدون placeholder کش
+می‌شوند. render_bulk یک قالب را برای گیرندگان زیاد فقط یک بار برای هر زبان
+render می‌کند.
+"""
+import string
+from typing import Any, Dict, Iterable, Optional
 
 # Languages supported: fa (Farsi), en (English), ar (Arabic)
 
@@ -147,6 +154,58 @@ To disable email notifications, change your account settings."""
 ---
 فريق Minila
 
+لإيقاف إشعارات البريد الإلكتروني، قم بتغيير إعدادات حسابك."""
+        }
+    },
+    
+    # ==================== New Messages From Several Senders ====================
+    "new_messages_summary": {
+        "fa": {
+            "subject": "شما از {count} نفر پیام جدید دارید - Minila",
+            "body": """سلام {first_name}،
+
+شما از این افراد پیام جدید دریافت کردید:
+
+{sender_names}
+
+برای مشاهده و پاسخ به پیام‌ها، وارد حساب کاربری خود شوید:
+{app_url}
+
+---
+تیم Minila
+
+برای غیرفعال کردن اعلان‌های ایمیلی، تنظیمات حساب خود را تغییر دهید."""
+        },
+        "en": {
+            "subject": "You have new messages from {count} people - Minila",
+            "body": """Hello {first_name},
+
+You have received new messages from:
+
+{sender_names}
+
+To view and reply to the messages, log in to your account:
+{app_url}
+
+---
+Minila Team
+
+To disable email notifications, change your account settings."""
+        },
+        "ar": {
+            "subject": "لديك رسائل جديدة من {count} أشخاص - Minila",
+            "body": """مرحباً {first_name}،
+
+لقد تلقيت رسائل جديدة من:
+
+{sender_names}
+
+لعرض الرسائل والرد عليها، قم بتسجيل الدخول إلى حسابك:
+{app_url}
+
+---
+فريق Minila
+
 لإيقاف إشعارات البريد الإلكتروني، قم بتغيير إعدادات حسابك."""
         }
     },
@@ -335,8 +394,157 @@ Minila Team"""
 }
 
 
+class TemplateError(ValueError):
+    """قالب نامعتبر (placeholder نادرست یا ناهمخوان بین زبان‌ها)."""
+
+
+class CompiledText:
+    """متن قالب که یک بار parse شده است.
+    
+    بخش‌های ثابت از قبل جدا شده‌اند و render فقط آن‌ها را با مقدار
+    placeholderها به هم وصل می‌کند؛ متن بدون placeholder همان رشته کش شده
+    برگردانده می‌شود.
+    """
+    
+    __slots__ = ("placeholders", "_segments", "_static")
+    
+    def __init__(self, source: str, where: str = ""):
+        """Parse متن و اعتبارسنجی placeholderها.
+        
+        Raises:
+            TemplateError: اگر متن آکولاد نامتوازن، format spec/conversion
+                یا placeholder غیر از نام ساده داشته باشد
+        """
+        try:
+            parsed = list(_FORMATTER.parse(source))
+        except ValueError as e:
+            raise TemplateError(f"{where}: {e}") from e
+        
+        segments = []
+        for literal, field, format_spec, conversion in parsed:
+            if field is not None and (not field.isidentifier() or format_spec or conversion):
+                raise TemplateError(f"{where}: unsupported placeholder {{{field}}}")
+            segments.append((literal, field))
+        
+        self.placeholders = frozenset(field for _, field in segments if field is not None)
+        self._segments = tuple(segments)
+        self._static = None if self.placeholders else "".join(literal for literal, _ in segments)
+    
+    def render(self, context: Dict[str, Any]) -> str:
+        """جایگذاری مقادیر (مانند str.format؛ placeholder غایب KeyError می‌دهد)."""
+        if self._static is not None:
+            return self._static
+        parts = []
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(context[field]))
+        return "".join(parts)
+
+
+class CompiledTemplate:
+    """موضوع و متن compile شده یک قالب در یک زبان."""
+    
+    __slots__ = ("name", "language", "subject", "body", "placeholders")
+    
+    def __init__(self, name: str, language: str, content: Dict[str, str]):
+        """Compile موضوع و متن."""
+        self.name = name
+        self.language = language
+        self.subject = CompiledText(content["subject"], f"{name}[{language}].subject")
+        self.body = CompiledText(content["body"], f"{name}[{language}].body")
+        self.placeholders = self.subject.placeholders | self.body.placeholders
+    
+    def render(self, context: Dict[str, Any]) -> tuple[str, str]:
+        """Render موضوع و متن."""
+        return self.subject.render(context), self.body.render(context)
+
+
+class TemplateRegistry:
+    """همه قالب‌ها، compile شده یک بار در import (startup).
+    
+    قالبی که placeholder نامعتبر دارد یا placeholderهای زبان‌هایش یکسان
+    نیست import را با TemplateError متوقف می‌کند، نه اولین ارسال را.
+    """
+    
+    def __init__(self, templates: Dict[str, Dict[str, Dict[str, str]]]):
+        """Compile و اعتبارسنجی همه قالب‌ها."""
+        self._compiled: Dict[tuple[str, str], CompiledTemplate] = {}
+        for name, languages in templates.items():
+            compiled = [CompiledTemplate(name, language, content) for language, content in languages.items()]
+            placeholders = {template.placeholders for template in compiled}
+            if len(placeholders) > 1:
+                raise TemplateError(
+                    f"{name}: placeholders differ between languages: "
+                    + ", ".join(f"{t.language}={sorted(t.placeholders)}" for t in compiled)
+                )
+            for template in compiled:
+                self._compiled[(name, template.language)] = template
+    
+    def get(self, template_name: str, language: str = "en") -> Optional[CompiledTemplate]:
+        """قالب compile شده برای ارسال به یک زبان.
+        
+        Args:
+            template_name: نام قالب
+            language: زبان - ignored, always uses English (fallback: fa)
+            
+        Returns:
+            CompiledTemplate یا None اگر قالب وجود نداشته باشد
+        """
+        return self._compiled.get((template_name, "en")) or self._compiled.get((template_name, "fa"))
+    
+    def render(self, template_name: str, language: str = "en", **kwargs: Any) -> tuple[str, str]:
+        """Render قالب (قالب ناموجود: نام قالب به عنوان موضوع).
+        
+        Returns:
+            tuple (subject, body)
+        """
+        template = self.get(template_name, language)
+        if template is None:
+            return template_name, str(kwargs)
+        return template.render(kwargs)
+    
+    def render_bulk(
+        self,
+        template_name: str,
+        languages: Iterable[Optional[str]],
+        **kwargs: Any
+    ) -> Dict[Optional[str], tuple[str, str]]:
+        """Render یک قالب با context یکسان برای گیرندگانی با زبان‌های مختلف.
+        
+        هر قالب compile شده فقط یک بار render می‌شود (نه یک بار برای هر
+        گیرنده یا هر زبان درخواستی که به همان قالب می‌رسد).
+        
+        Args:
+            template_name: نام قالب
+            languages: زبان گیرندگان (تکراری مجاز)
+            **kwargs: متغیرهای قالب
+            
+        Returns:
+            dict از زبان درخواستی به (subject, body)
+        """
+        rendered: Dict[int, tuple[str, str]] = {}
+        result: Dict[Optional[str], tuple[str, str]] = {}
+        for language in languages:
+            if language in result:
+                continue
+            template = self.get(template_name, language or "en")
+            if template is None:
+                result[language] = (template_name, str(kwargs))
+                continue
+            if id(template) not in rendered:
+                rendered[id(template)] = template.render(kwargs)
+            result[language] = rendered[id(template)]
+        return result
+
+
+_FORMATTER = string.Formatter()
+
+template_registry = TemplateRegistry(TEMPLATES)
+
+
 def get_template(template_name: str, language: str = "en", **kwargs: Any) -> tuple[str, str]:
-    """دریافت قالب ایمیل با متغیرها.
+    """دریافت قالب ایمیل با متغیرها (از قالب‌های compile شده).
     
     Args:
         template_name: نام قالب
@@ -346,17 +554,7 @@ def get_template(template_name: str, language: str = "en", **kwargs: Any) -> tup
     Returns:
         tuple (subject, body)
     """
-    # Always use English templates
-    template = TEMPLATES.get(template_name, {}).get("en")
-    if not template:
-        # Fallback to any available language
-        template = TEMPLATES.get(template_name, {}).get("fa", {
-            "subject": template_name,
-            "body": str(kwargs)
-        })
-    
-    subject = template["subject"].format(**kwargs)
-    body = template["body"].format(**kwargs)
-    
-    return subject, body
-
+    template = template_registry.get(template_name, language)
+    if template is None:
+        return template_name, str(kwargs)
+    return template.render(kwargs)
@@ -1,5 +1,5 @@
 """Pagination utilities."""
-from typing import TypeVar, Generic, Sequence
+from typing import TypeVar, Generic, Optional, Sequence
 from pydantic import BaseModel, Field
 
 T = TypeVar('T')
@@ -46,6 +46,19 @@ class PaginatedResponse(BaseModel, Generic[T]):
         )
 
 
+class CursorPaginatedResponse(BaseModel, Generic[T]):
+    """پاسخ صفحه‌بندی شده با cursor (keyset) بدون شمارش کل آیتم‌ها.
+    
+    برای صفحه بعد، `next_before_id` (قدیمی‌تر) یا `next_after_id` (جدیدتر)
+    دوباره به عنوان پارامتر فرستاده می‌شود.
+    """
+    items: Sequence[T] = Field(..., description="لیست آیتم‌های صفحه جاری")
+    page_size: int = Field(..., description="حداکثر تعداد آیتم‌ها در هر صفحه")
+    has_more: bool = Field(..., description="آیا آیتم دیگری در همین جهت وجود دارد")
+    next_before_id: Optional[int] = Field(None, description="cursor برای آیتم‌های قدیمی‌تر")
+    next_after_id: Optional[int] = Field(None, description="cursor برای آیتم‌های جدیدتر")
+
+
 def get_pagination_params(
     page: int = 1,
     page_size: int = 20
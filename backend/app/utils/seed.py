@@ -1,4 +1,5 @@
 """Database seeding and startup health check utilities."""
+import asyncio
 import os
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -8,7 +9,7 @@ from sqlalchemy import select, text
 from ..models.user import User
 from ..core.security import hash_password
 from .logger import logger
-from .email import send_email
+from .email import OutgoingEmail, deliver_many
 
 
 # Default admin credentials from environment or hardcoded defaults
@@ -249,15 +250,18 @@ Recommended Actions:
 Panel: https://minila.app/admin
 """
     
-    # Send to all admins
-    for email in admin_emails:
-        try:
-            if send_email(email, subject, body):
-                logger.info(f"Startup alert sent to {email}")
+    # Send to all admins in one batch (directly: the outbox needs the database)
+    try:
+        errors = await asyncio.to_thread(
+            deliver_many, [OutgoingEmail(email, subject, body) for email in admin_emails]
+        )
+        for email, error in zip(admin_emails, errors):
+            if error:
+                logger.warning(f"Failed to send startup alert to {email}: {error}")
             else:
-                logger.warning(f"Failed to send startup alert to {email}")
-        except Exception as e:
-            logger.error(f"Error sending startup alert to {email}: {e}")
+                logger.info(f"Startup alert sent to {email}")
+    except Exception as e:
+        logger.error(f"Error sending startup alerts: {e}")
 
 
 async def run_startup_checks(db: AsyncSession) -> None:
@@ -0,0 +1,43 @@
+"""SimHash fingerprints for near-duplicate text detection."""
+import hashlib
+import re
+
+import numpy as np
+
+from .text_search import normalize_text
+
+BITS = 64
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _feature_hashes(text: str) -> np.ndarray:
+    # ویژگی‌ها کلمات هستند (نه جفت کلمات): در پیام‌های کوتاه تغییر یک کلمه
+    # فقط یک ویژگی را عوض می‌کند
+    tokens = _TOKEN.findall(normalize_text(text))
+    digests = b"".join(hashlib.blake2b(token.encode(), digest_size=BITS // 8).digest() for token in tokens)
+    return np.frombuffer(digests, dtype=np.uint8).reshape(-1, BITS // 8)
+
+
+def simhash(text: str) -> int:
+    """fingerprint شصت و چهار بیتی SimHash (Charikar).
+
+    هر بیت fingerprint اکثریت همان بیت در hash ویژگی‌های متن است؛ متن‌هایی
+    که فقط در چند کلمه فرق دارند fingerprintهایی با فاصله Hamming کم دارند.
+
+    Args:
+        text: متن (با همان یکسان‌سازی جستجو)
+
+    Returns:
+        fingerprint به صورت int بدون علامت (برای متن بدون کلمه 0)
+    """
+    hashes = _feature_hashes(text)
+    if not len(hashes):
+        return 0
+    ones = np.unpackbits(hashes, axis=1).sum(axis=0)
+    return int.from_bytes(np.packbits(ones * 2 > len(hashes)).tobytes(), "big")
+
+
+def hamming_distance(first: int, second: int) -> int:
+    """تعداد بیت‌های متفاوت دو fingerprint."""
+    return (first ^ second).bit_count()
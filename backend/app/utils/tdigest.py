@@ -0,0 +1,140 @@
+"""Merging t-digest for streaming quantile estimation."""
+import math
+from typing import Iterable, Optional
+
+
+class TDigest:
+    """خلاصه‌ساز کوانتایل جریانی (merging t-digest، Dunning).
+
+    مقادیر به صورت افزایشی اضافه می‌شوند و حافظه به تعداد centroidها
+    (حدود compression) محدود است. دو digest قابل ادغام هستند.
+    """
+
+    def __init__(self, compression: float = 100.0):
+        """مقداردهی اولیه.
+
+        Args:
+            compression: پارامتر فشرده‌سازی (بیشتر = دقیق‌تر و بزرگ‌تر)
+        """
+        self.compression = compression
+        self.means: list[float] = []
+        self.weights: list[float] = []
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer: list[tuple[float, float]] = []
+        self._buffer_size = int(compression * 5)
+
+    @property
+    def count(self) -> float:
+        """مجموع وزن مقادیر اضافه‌شده."""
+        return sum(self.weights) + sum(w for _, w in self._buffer)
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        """اضافه کردن یک مقدار."""
+        self._buffer.append((value, weight))
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self._buffer_size:
+            self.compress()
+
+    def update(self, values: Iterable[float]) -> None:
+        """اضافه کردن چند مقدار."""
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "TDigest") -> None:
+        """ادغام یک digest دیگر در این digest."""
+        if other.count == 0:
+            return
+        self._buffer.extend(zip(other.means, other.weights))
+        self._buffer.extend(other._buffer)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.compress()
+
+    def compress(self) -> None:
+        """ادغام buffer در centroidها با تابع مقیاس k1."""
+        if not self._buffer:
+            return
+        items = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+        total = sum(w for _, w in items)
+
+        means: list[float] = []
+        weights: list[float] = []
+        cur_mean, cur_weight = items[0]
+        weight_so_far = 0.0
+        limit = total * self._k_inv(self._k(0.0) + 1.0)
+
+        for mean, weight in items[1:]:
+            if weight_so_far + cur_weight + weight <= limit:
+                cur_weight += weight
+                cur_mean += (mean - cur_mean) * weight / cur_weight
+            else:
+                means.append(cur_mean)
+                weights.append(cur_weight)
+                weight_so_far += cur_weight
+                limit = total * self._k_inv(self._k(weight_so_far / total) + 1.0)
+                cur_mean, cur_weight = mean, weight
+        means.append(cur_mean)
+        weights.append(cur_weight)
+
+        self.means, self.weights = means, weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        """تخمین کوانتایل q (بین 0 و 1)؛ برای digest خالی None."""
+        self.compress()
+        if not self.weights:
+            return None
+        if len(self.means) == 1:
+            return self.means[0]
+
+        total = sum(self.weights)
+        target = min(max(q, 0.0), 1.0) * total
+
+        # مرکز هر centroid روی محور وزن تجمعی
+        cumulative = 0.0
+        prev_center, prev_mean = 0.0, self.min
+        for mean, weight in zip(self.means, self.weights):
+            center = cumulative + weight / 2
+            if target <= center:
+                span = center - prev_center
+                if span <= 0:
+                    return mean
+                return prev_mean + (mean - prev_mean) * (target - prev_center) / span
+            prev_center, prev_mean = center, mean
+            cumulative += weight
+
+        span = total - prev_center
+        if span <= 0:
+            return self.max
+        return prev_mean + (self.max - prev_mean) * (target - prev_center) / span
+
+    def to_dict(self) -> dict:
+        """سریال‌سازی برای ذخیره در JSON."""
+        self.compress()
+        return {
+            "compression": self.compression,
+            "means": self.means,
+            "weights": self.weights,
+            "min": self.min if self.weights else None,
+            "max": self.max if self.weights else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TDigest":
+        """بازسازی از خروجی to_dict."""
+        digest = cls(compression=data.get("compression", 100.0))
+        digest.means = list(data.get("means", []))
+        digest.weights = list(data.get("weights", []))
+        if digest.weights:
+            digest.min = data["min"]
+            digest.max = data["max"]
+        return digest
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _k_inv(self, k: float) -> float:
+        k = min(k, self.compression / 4)
+        return (math.sin(2 * math.pi * k / self.compression) + 1) / 2
@@ -0,0 +1,64 @@
+"""Full-text search helpers (tsvector/tsquery) برای متن‌های فارسی، عربی و انگلیسی.
+
+Postgres دیکشنری فارسی ندارد؛ متن با پیکربندی simple (بدون stemming و
+stopword) توکن‌بندی می‌شود و قبل از آن در خود SQL یکسان‌سازی می‌شود:
+- حروف کوچک (انگلیسی)
+- حروف عربی به فارسی (ي ى → ی، ك → ک، ة ۀ → ه، أ إ ٱ → ا، ؤ → و)
+- ارقام فارسی و عربی به لاتین
+- حذف اعراب و کشیده (ـ)، نیم‌فاصله به فاصله
+
+عبارت‌ها با literal ساخته می‌شوند (نه پارامتر bind) تا متن کوئری دقیقاً با
+عبارت GIN index یکسان باشد و planner از index استفاده کند.
+"""
+from typing import Union
+
+from sqlalchemy import func, text as sql_text
+from sqlalchemy.sql.elements import ColumnElement, TextClause
+
+SEARCH_CONFIG = "simple"
+
+# جایگزینی‌های یک به یک
+_REPLACE = {
+    "ي": "ی", "ى": "ی", "ك": "ک", "ة": "ه", "ۀ": "ه",
+    "أ": "ا", "إ": "ا", "ٱ": "ا", "ؤ": "و",
+    "‌": " ",  # نیم‌فاصله
+    **{chr(0x06F0 + digit): str(digit) for digit in range(10)},  # ۰-۹
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # ٠-٩
+}
+
+# حذف: اعراب (U+064B تا U+065F، U+0670) و کشیده
+_REMOVE = "".join(chr(code) for code in range(0x064B, 0x0660)) + "ٰـ"
+
+# translate() کاراکترهای اضافه from (بدون معادل در to) را حذف می‌کند
+TRANSLATE_FROM = "".join(_REPLACE) + _REMOVE
+TRANSLATE_TO = "".join(_REPLACE.values())
+
+
+def _literal(value: str) -> TextClause:
+    return sql_text("'" + value.replace("'", "''") + "'")
+
+
+def normalize(text: Union[ColumnElement, str]) -> ColumnElement:
+    """عبارت SQL یکسان‌سازی متن."""
+    return func.translate(func.lower(text), _literal(TRANSLATE_FROM), _literal(TRANSLATE_TO))
+
+
+def search_vector(column: ColumnElement) -> ColumnElement:
+    """tsvector یک ستون متنی (همان عبارت GIN index)."""
+    return func.to_tsvector(_literal(SEARCH_CONFIG), normalize(column))
+
+
+def search_query(text: str) -> ColumnElement:
+    """tsquery عبارت جستجوی کاربر (نحو websearch: "عبارت دقیق"، OR، -کلمه)."""
+    return func.websearch_to_tsquery(_literal(SEARCH_CONFIG), normalize(text))
+
+
+_PYTHON_TABLE = {
+    ord(char): TRANSLATE_TO[index] if index < len(TRANSLATE_TO) else None
+    for index, char in enumerate(TRANSLATE_FROM)
+}
+
+
+def normalize_text(text: str) -> str:
+    """همان یکسان‌سازی normalize در Python (برای fingerprint پیام‌ها)."""
+    return text.lower().translate(_PYTHON_TABLE)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Pricing backtest script.
+
+بازپخش تاریخچه کارت‌ها با الگوریتم قیمت‌گذاری پویا و گزارش خطای قیمت
+پیشنهادی نسبت به قیمت ثبت‌شده کاربران. برای تنظیم فاکتورها استفاده می‌شود.
+
+Usage:
+    python -m scripts.backtest_pricing
+    python -m scripts.backtest_pricing --since 2025-06-01 --until 2025-09-01
+    python -m scripts.backtest_pricing --no-market --json > report.json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import get_db_session
+from app.services.pricing_backtest_service import run_backtest
+
+
+def parse_date(value: str) -> datetime:
+    """Parse an ISO date/datetime as UTC."""
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def print_report(report, elapsed: float) -> None:
+    """چاپ خلاصه گزارش و نسبت قیمت ثبت‌شده به پیشنهادی برای هر فاکتور."""
+    print("=" * 50)
+    print(f"Cards replayed: {report.cards} ({elapsed:.1f}s)")
+    print(f"Scored samples: {report.samples}")
+    if not report.samples:
+        print("No cards with a USD price_per_kg in range")
+        return
+    print(f"  MAE:  {report.mae:.3f} USD/kg")
+    print(f"  RMSE: {report.rmse:.3f} USD/kg")
+    print(f"  MAPE: {report.mape:.1%}")
+    print(f"  Bias: {report.bias:+.3f} USD/kg")
+    print(f"  Posted within suggested range: {report.within_range_ratio:.1%}")
+    print("=" * 50)
+    print("posted / suggested per factor value (>1: raise the factor)")
+    for name, values in report.factor_adjustments().items():
+        print(f"  {name}:")
+        for value, (count, ratio) in values.items():
+            print(f"    {value:>6} -> {ratio:.3f}  (n={count})")
+
+
+async def main():
+    """اجرای backtest."""
+    parser = argparse.ArgumentParser(description="Replay card history through dynamic pricing")
+    parser.add_argument("--since", type=parse_date, help="Score cards created at/after this date")
+    parser.add_argument("--until", type=parse_date, help="Stop at cards created before this date")
+    parser.add_argument("--no-market", action="store_true", help="Disable market median blending")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    async with get_db_session() as db:
+        report = await run_backtest(
+            db, since=args.since, until=args.until, use_market=not args.no_market
+        )
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+    else:
+        print_report(report, elapsed)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+"""
+Benchmark the pooled SMTP transport against one connection per email.
+
+Starts a local SMTP sink (or uses --host/--port, e.g. MailHog on 1025) and
+sends the same emails twice:
+
+    per-email   a new SMTP connection for every email (the old behaviour)
+    pooled      SmtpTransport: persistent sessions, one batch per thread
+
+--latency adds a delay to every sink reply to approximate a remote server.
+
+Usage:
+    python scripts/benchmark_email_transport.py [--emails 500] [--threads 4] [--latency 0.005]
+"""
+import argparse
+import smtplib
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.utils.email import OutgoingEmail, SmtpTransport
+
+FROM_ADDR = "no-reply@example.local"
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP server that accepts and discards every message."""
+
+    latency = 0.0
+
+    def reply(self, line: str) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        self.reply("220 sink ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith("EHLO"):
+                self.reply("250-sink\r\n250 8BITMIME")
+            elif command == "DATA":
+                self.reply("354 end with .")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                self.server.received += 1
+                self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+class _Sink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    received = 0
+
+
+def _send_per_email(host: str, port: int, email: OutgoingEmail) -> None:
+    with smtplib.SMTP(host, port) as server:
+        server.sendmail(FROM_ADDR, [email.to_email], f"Subject: {email.subject}\r\n\r\n{email.body}")
+
+
+def benchmark(emails: int, threads: int, latency: float, host: str = None, port: int = None):
+    """Send the emails both ways and print emails/second."""
+    sink = None
+    if host is None:
+        _SinkHandler.latency = latency
+        sink = _Sink(("127.0.0.1", 0), _SinkHandler)
+        threading.Thread(target=sink.serve_forever, daemon=True).start()
+        host, port = sink.server_address
+
+    batch = [OutgoingEmail(f"user{index}@example.com", "Benchmark", "Body " * 40) for index in range(emails)]
+    chunk = -(-emails // threads)
+    chunks = [batch[start:start + chunk] for start in range(0, emails, chunk)]
+
+    print(f"Sending {emails} emails to {host}:{port} with {threads} threads")
+    print("-" * 60)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(lambda email: _send_per_email(host, port, email), batch))
+    per_email = time.perf_counter() - started
+    print(f"per-email : {per_email:7.2f}s  {emails / per_email:8.1f} emails/s  {emails} connections")
+
+    transport = SmtpTransport(host, port, None, None, FROM_ADDR, pool_size=threads, idle_seconds=60, timeout=30)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        results = [error for errors in executor.map(transport.send_many, chunks) for error in errors]
+    pooled = time.perf_counter() - started
+    transport.close()
+    failed = sum(1 for error in results if error)
+    print(
+        f"pooled    : {pooled:7.2f}s  {emails / pooled:8.1f} emails/s  "
+        f"{transport.connections_opened} connections, {failed} failed"
+    )
+    print("-" * 60)
+    print(f"speedup   : {per_email / pooled:.1f}x")
+
+    if sink:
+        sink.shutdown()
+        sink.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark SMTP connection reuse")
+    parser.add_argument("--emails", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to each sink reply")
+    parser.add_argument("--host", help="External SMTP server instead of the built-in sink")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+    benchmark(args.emails, args.threads, args.latency, args.host, args.port if args.host else None)
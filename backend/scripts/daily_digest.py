@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """Daily digest email script.
 
-ارسال خلاصه روزانه هشدارها به ادمین‌ها.
+ارسال خلاصه روزانه هشدارها به ادمین‌ها (از طریق email outbox و worker ایمیل).
 این اسکریپت باید روزانه ساعت 9 صبح اجرا شود.
 
 Usage:
@@ -32,7 +32,7 @@ async def main():
             success = await alert_service.send_daily_digest(db)
             
             if success:
-                print("✅ Daily digest sent successfully")
+                print("✅ Daily digest queued for the email worker")
             else:
                 print("⚠️ No alerts to send or no admins found")
                 
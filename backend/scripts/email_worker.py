@@ -0,0 +1,54 @@
+"""
+Send queued emails from the email_outbox table.
+
+The API never talks to SMTP/Resend: services write emails to email_outbox in
+the request transaction and this worker delivers them (concurrently, with
+retries and a dead letter status). Several workers can run side by side.
+
+Usage:
+    python scripts/email_worker.py                  # run until SIGINT/SIGTERM
+    python scripts/email_worker.py --status         # pending/sent/dead counts
+    python scripts/email_worker.py --requeue-dead   # retry dead letters
+"""
+import argparse
+import asyncio
+import signal
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import close_db, get_db_session
+from app.repositories import email_outbox_repo
+from app.services.email_outbox_service import email_outbox_worker
+from app.utils.email import close_transport
+
+
+async def email_worker(status: bool = False, requeue_dead: bool = False):
+    """Run the worker (or only print the queue / requeue dead letters)."""
+    try:
+        if status or requeue_dead:
+            async with get_db_session() as db:
+                if requeue_dead:
+                    print(f"Requeued {await email_outbox_repo.requeue_dead(db)} dead emails")
+                for state, count in (await email_outbox_repo.count_by_status(db)).items():
+                    print(f"{state}: {count}")
+            return
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await email_outbox_worker.run(stop)
+    finally:
+        close_transport()
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deliver emails from the outbox")
+    parser.add_argument("--status", action="store_true", help="Print outbox counts and exit")
+    parser.add_argument("--requeue-dead", action="store_true", help="Move dead letters back to pending")
+    args = parser.parse_args()
+    asyncio.run(email_worker(args.status, args.requeue_dead))
@@ -0,0 +1,49 @@
+"""
+Create upcoming message partitions and move old months to the archive tier.
+
+The API process runs the same maintenance at startup and every
+MESSAGE_PARTITION_MAINTENANCE_SECONDS. Run this manually after changing
+MESSAGE_HOT_MONTHS or MESSAGE_ARCHIVE_TABLESPACE, or with --status to list
+the partitions of both tiers.
+
+Usage:
+    python scripts/maintain_message_partitions.py [--status]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import close_db, engine
+from app.repositories import message_partition_repo
+from app.services.message_partition_service import message_partition_service
+
+
+async def maintain_message_partitions(status: bool = False):
+    """Run one maintenance pass (or only print the partition layout)."""
+    try:
+        if status:
+            async with engine.connect() as conn:
+                for table in (message_partition_repo.HOT_TABLE, message_partition_repo.ARCHIVE_TABLE):
+                    months = sorted(await message_partition_repo.list_partitions(conn, table))
+                    print(f"{table}: {len(months)} partitions")
+                    for month in months:
+                        print(f"  {message_partition_repo.partition_name(month)}")
+            return
+
+        print("Maintaining message partitions...")
+        report = await message_partition_service.run_maintenance()
+        print(f"Created: {[f'{month:%Y-%m}' for month in report['created']]}")
+        print(f"Archived: {[f'{month:%Y-%m}' for month in report['archived']]}")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain monthly message partitions")
+    parser.add_argument("--status", action="store_true", help="List partitions instead of maintaining them")
+    args = parser.parse_args()
+    asyncio.run(maintain_message_partitions(args.status))
@@ -0,0 +1,59 @@
+"""
+Rebuild market price sketches from existing cards.
+
+Market prices are normally maintained incrementally when cards are
+created. Run this once after applying migration 010 (or to recover from
+a lost sketch table) to build route_price_sketch from every card that
+has a price_per_kg.
+
+Usage:
+    python scripts/rebuild_market_sketches.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import delete, select
+
+from app.core.database import get_db_session
+from app.models.card import Card
+from app.models.route_price import RoutePriceSketch
+from app.services.market_price_service import MarketPriceService
+
+
+async def rebuild_market_sketches():
+    """Replace every route sketch with one built from all card prices."""
+    service = MarketPriceService()
+    scanned = 0
+
+    async with get_db_session() as session:
+        print("Rebuilding market price sketches...")
+        result = await session.stream(
+            select(
+                Card.origin_city_id,
+                Card.destination_city_id,
+                Card.price_per_kg,
+                Card.currency
+            )
+            .where(Card.price_per_kg.is_not(None))
+            .execution_options(yield_per=1000)
+        )
+        async for origin_id, dest_id, price_per_kg, currency in result:
+            service.record_price(origin_id, dest_id, price_per_kg, currency)
+            scanned += 1
+
+        await session.execute(delete(RoutePriceSketch))
+        routes = await service.flush(session)
+
+    print("\n" + "="*50)
+    print("Rebuild complete!")
+    print(f"  Cards scanned: {scanned}")
+    print(f"  Routes: {routes}")
+    print("="*50)
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild_market_sketches())
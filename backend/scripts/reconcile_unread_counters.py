@@ -0,0 +1,50 @@
+"""
+Reconcile Redis unread counters with the conversation table.
+
+The API process runs the same reconciliation every
+UNREAD_COUNTER_RECONCILE_SECONDS. Run this manually after restoring the
+database or Redis, or with --flush to drop every counter so each one is
+rebuilt from Postgres on its next read.
+
+Usage:
+    python scripts/reconcile_unread_counters.py [--flush]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.core.database import get_db_session
+from app.core.redis_client import close_redis
+from app.services.unread_counter_service import KEY_PREFIX, unread_counter_service
+
+
+async def reconcile_unread_counters(flush: bool = False):
+    """Repair drifted counters (or drop them all with flush)."""
+    client = unread_counter_service._get_client()
+    try:
+        if flush:
+            deleted = 0
+            async for key in client.scan_iter(match=f"{KEY_PREFIX}:*", count=1000):
+                if key.endswith(":version"):
+                    continue
+                deleted += await client.delete(key)
+            print(f"Dropped {deleted} unread counters")
+            return
+
+        async with get_db_session() as session:
+            print("Reconciling unread counters...")
+            repaired = await unread_counter_service.reconcile(session)
+        print(f"Repaired counters: {repaired}")
+    finally:
+        await close_redis()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile Redis unread counters with the database")
+    parser.add_argument("--flush", action="store_true", help="Drop all counters instead of repairing")
+    args = parser.parse_args()
+    asyncio.run(reconcile_unread_counters(args.flush))
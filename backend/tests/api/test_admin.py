@@ -267,3 +267,72 @@ class TestAdminSettings:
         assert "rate_limit_messages_per_day" in data
         assert "smtp_configured" in data
 
+
+
+class TestAdminBatchPricing:
+    """تست‌های endpoint قیمت پیشنهادی دسته‌ای."""
+
+    async def test_batch_pricing_non_admin(
+        self, client: AsyncClient, auth_headers: dict
+    ):
+        """کاربر عادی نباید بتواند قیمت دسته‌ای بگیرد."""
+        response = await client.post(
+            "/api/v1/admin/pricing/batch",
+            json={"routes": [{"origin_city_id": 1, "destination_city_id": 2}]},
+            headers=auth_headers
+        )
+        assert response.status_code == 403
+
+    async def test_batch_pricing_admin(
+        self, client: AsyncClient, admin_auth_headers: dict
+    ):
+        """ادمین باید برای هر مسیر یک قیمت به همان ترتیب دریافت کند."""
+        routes = [
+            {"origin_city_id": 1, "destination_city_id": 2},
+            {"origin_city_id": 2, "destination_city_id": 1},
+        ]
+        response = await client.post(
+            "/api/v1/admin/pricing/batch",
+            json={"routes": routes, "weight": 3},
+            headers=admin_auth_headers
+        )
+        assert response.status_code == 200
+        items = response.json()["items"]
+        assert [(i["origin_city_id"], i["destination_city_id"]) for i in items] == [(1, 2), (2, 1)]
+        assert all(i["suggested_price_per_kg"] > 0 for i in items)
+
+    async def test_batch_pricing_empty_routes(
+        self, client: AsyncClient, admin_auth_headers: dict
+    ):
+        """لیست خالی مسیرها باید خطای validation بدهد."""
+        response = await client.post(
+            "/api/v1/admin/pricing/batch",
+            json={"routes": []},
+            headers=admin_auth_headers
+        )
+        assert response.status_code == 422
+
+
+class TestAdminPriceHeatmap:
+    """تست‌های endpoint نقشه حرارتی قیمت."""
+
+    async def test_heatmap_unauthorized(self, client: AsyncClient):
+        """کاربر غیر احراز هویت نباید بتواند نقشه حرارتی را ببیند."""
+        response = await client.get("/api/v1/admin/pricing/heatmap")
+        assert response.status_code == 401
+
+    async def test_heatmap_admin(
+        self, client: AsyncClient, admin_auth_headers: dict
+    ):
+        """ادمین باید خط هدر هفته‌ها را به صورت NDJSON دریافت کند."""
+        import json
+
+        response = await client.get(
+            "/api/v1/admin/pricing/heatmap",
+            params={"weeks": 4},
+            headers=admin_auth_headers
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert len(lines[0]["weeks"]) == 4
@@ -841,6 +841,41 @@ class TestGetConversations:
             timestamps = [conv["last_message"]["created_at"] for conv in data["items"]]
             assert timestamps == sorted(timestamps, reverse=True)
 
+    @pytest.mark.asyncio
+    async def test_get_conversations_paginated(
+        self, 
+        client: AsyncClient, 
+        test_user: dict,
+        test_user2: dict,
+        test_community: dict,
+        test_membership: dict,
+        auth_headers: dict,
+        redis_client: aioredis.Redis
+    ):
+        """Test conversations list returns pagination metadata."""
+        # Arrange
+        await redis_client.delete(f"test:msg:{test_user['user_id']}")
+        await client.post(
+            "/api/v1/messages/",
+            json={"receiver_id": test_user2["user_id"], "body": "Paged"},
+            headers=auth_headers
+        )
+        
+        # Act
+        response = await client.get(
+            "/api/v1/messages/conversations?page=1&page_size=1",
+            headers=auth_headers
+        )
+        
+        # Assert
+        assert response.status_code == 200
+        data = response.json()
+        assert data["page"] == 1
+        assert data["page_size"] == 1
+        assert data["total"] == 1
+        assert data["total_pages"] == 1
+        assert data["items"][0]["user"]["id"] == test_user2["user_id"]
+
 
 # ==================== GET /api/v1/messages/unread-count ====================
 
@@ -964,3 +999,72 @@ class TestGetUnreadCount:
         
         # Assert
         assert response.status_code == 401
+
+
+# ==================== GET /api/v1/realtime/events ====================
+
+class TestRealtimeEvents:
+    """Test cases for the realtime event stream."""
+
+    @pytest.mark.asyncio
+    async def test_stream_without_token(self, client: AsyncClient):
+        """Test opening the event stream without a token returns 401."""
+        response = await client.get("/api/v1/realtime/events")
+        
+        assert response.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_stream_with_invalid_bearer(self, client: AsyncClient):
+        """Test opening the event stream with an invalid bearer token returns 401."""
+        response = await client.get(
+            "/api/v1/realtime/events", headers={"Authorization": "Bearer invalid"}
+        )
+        
+        assert response.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_access_token_not_accepted_in_query(self, client: AsyncClient, test_user: dict):
+        """Test the access token in the query string is no longer accepted."""
+        response = await client.get("/api/v1/realtime/events", params={"token": test_user["token"]})
+        
+        assert response.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_ticket_requires_auth(self, client: AsyncClient):
+        """Test issuing a stream ticket requires authentication."""
+        response = await client.post("/api/v1/realtime/ticket")
+        
+        assert response.status_code == 401
+
+
+class TestCursorParameters:
+    """Test cases for before_id/after_id query parameters."""
+
+    @pytest.mark.asyncio
+    async def test_before_and_after_are_exclusive(self, client: AsyncClient, auth_headers: dict):
+        """Test sending both cursors returns 400."""
+        response = await client.get(
+            "/api/v1/messages/inbox",
+            params={"before_id": 10, "after_id": 5},
+            headers=auth_headers
+        )
+        
+        assert response.status_code == 400
+
+
+class TestSearchMessages:
+    """Test cases for GET /api/v1/messages/search."""
+
+    @pytest.mark.asyncio
+    async def test_search_requires_query(self, client: AsyncClient, auth_headers: dict):
+        """Test missing q returns 422."""
+        response = await client.get("/api/v1/messages/search", headers=auth_headers)
+        
+        assert response.status_code == 422
+
+    @pytest.mark.asyncio
+    async def test_search_without_auth(self, client: AsyncClient):
+        """Test search requires authentication."""
+        response = await client.get("/api/v1/messages/search", params={"q": "package"})
+        
+        assert response.status_code == 401
@@ -720,6 +720,8 @@ def mock_message_repo():
     repo.create = AsyncMock()
     repo.get_inbox = AsyncMock()
     repo.get_sent = AsyncMock()
+    repo.mark_as_read = AsyncMock()
+    repo.get_total_unread_count = AsyncMock()
     return repo
 
 
@@ -767,3 +769,49 @@ def mock_email_functions():
         'send_membership_result': MagicMock(),
         'send_message_notification': MagicMock()
     }
+
+
+class FakePipeline:
+    """Redis pipeline ساختگی که دستورهای صف شده را در commands ثبت می‌کند.
+
+    Args:
+        results: خروجی execute؛ لیست یا تابعی از commands
+        fail: خطایی که execute پرتاب می‌کند
+    """
+
+    def __init__(self, results=None, fail: Exception = None):
+        self.results = results
+        self.fail = fail
+        self.commands: list[tuple] = []
+        self.watch = AsyncMock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def multi(self):
+        self.commands.append(("multi",))
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+        return queue
+
+    async def execute(self):
+        if self.fail:
+            raise self.fail
+        if callable(self.results):
+            return self.results(self.commands)
+        return list(self.results or [])
+
+
+@pytest.fixture
+def fake_pipeline():
+    """Factory ساخت Redis pipeline ساختگی برای unit tests.
+
+    Returns:
+        type: کلاس FakePipeline (هر فراخوانی یک pipeline جدید)
+    """
+    return FakePipeline
@@ -0,0 +1,88 @@
+"""Unit tests for the background job queue."""
+import asyncio
+import pytest
+
+from app.core.background import BackgroundQueue
+
+
+@pytest.mark.asyncio
+class TestBackgroundQueue:
+    """Tests for BackgroundQueue."""
+    
+    async def test_runs_submitted_jobs(self):
+        queue = BackgroundQueue(workers=2, max_size=10, max_retries=0)
+        done = []
+        
+        async def job(i):
+            done.append(i)
+        
+        for i in range(5):
+            assert queue.submit(f"job-{i}", lambda i=i: job(i))
+        await queue.join()
+        await queue.stop()
+        
+        assert sorted(done) == [0, 1, 2, 3, 4]
+    
+    async def test_concurrency_is_bounded(self):
+        queue = BackgroundQueue(workers=2, max_size=10, max_retries=0)
+        running = 0
+        peak = 0
+        
+        async def job():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+        
+        for _ in range(6):
+            queue.submit("job", job)
+        await queue.stop()
+        
+        assert peak == 2
+    
+    async def test_failed_job_is_retried(self):
+        queue = BackgroundQueue(workers=1, max_size=10, max_retries=2, retry_base_seconds=0.001)
+        attempts = 0
+        
+        async def flaky():
+            nonlocal attempts
+            attempts += 1
+            if attempts < 3:
+                raise RuntimeError("provider down")
+        
+        queue.submit("flaky", flaky)
+        await queue.join()
+        await queue.stop()
+        
+        assert attempts == 3
+    
+    async def test_gives_up_after_max_retries(self):
+        queue = BackgroundQueue(workers=1, max_size=10, max_retries=1, retry_base_seconds=0.001)
+        attempts = 0
+        
+        async def broken():
+            nonlocal attempts
+            attempts += 1
+            raise RuntimeError("always fails")
+        
+        queue.submit("broken", broken)
+        await queue.join()
+        await queue.stop()
+        
+        assert attempts == 2
+    
+    async def test_full_queue_drops_job(self):
+        queue = BackgroundQueue(workers=1, max_size=1, max_retries=0)
+        release = asyncio.Event()
+        
+        async def blocker():
+            await release.wait()
+        
+        queue.submit("blocker", blocker)
+        await asyncio.sleep(0)  # worker takes the first job
+        assert queue.submit("queued", blocker)
+        assert queue.submit("dropped", blocker) is False
+        
+        release.set()
+        await queue.stop()
@@ -0,0 +1,202 @@
+"""Unit tests for the shared Redis client."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import redis.asyncio as redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.core import redis_client
+from app.core.redis_client import MeteredConnectionPool
+
+
+@pytest.fixture
+async def shared_client():
+    """Reset the process-wide pool around each test."""
+    await redis_client.close_redis()
+    yield
+    await redis_client.close_redis()
+
+
+def _pool(max_connections: int = 2) -> MeteredConnectionPool:
+    return MeteredConnectionPool.from_url("redis://test:6379/0", max_connections=max_connections, timeout=1)
+
+
+@pytest.mark.asyncio
+class TestSharedClient:
+    """Tests for get_redis_client / close_redis."""
+
+    async def test_one_pool_per_process(self, shared_client):
+        first = redis_client.get_redis_client()
+
+        assert redis_client.get_redis_client() is first
+        assert first.connection_pool is redis_client._pool
+
+    async def test_pool_uses_settings(self, shared_client):
+        with patch.object(redis_client.settings, "REDIS_MAX_CONNECTIONS", 7), \
+             patch.object(redis_client.settings, "REDIS_HEALTH_CHECK_INTERVAL_SECONDS", 15):
+            pool = redis_client.get_redis_client().connection_pool
+
+        assert isinstance(pool, MeteredConnectionPool)
+        assert pool.max_connections == 7
+        assert pool.connection_kwargs["health_check_interval"] == 15
+        assert pool.connection_kwargs["decode_responses"] is True
+
+    async def test_close_drops_pool(self, shared_client):
+        first = redis_client.get_redis_client()
+
+        await redis_client.close_redis()
+
+        assert redis_client._pool is None
+        assert redis_client.get_redis_client() is not first
+
+    async def test_stats_before_pool_created(self, shared_client):
+        with patch.object(redis_client.settings, "REDIS_MAX_CONNECTIONS", 9):
+            stats = redis_client.redis_pool_stats()
+
+        assert stats["max_connections"] == 9
+        assert stats["in_use"] == 0
+
+
+@pytest.mark.asyncio
+class TestCheckRedis:
+    """Tests for check_redis."""
+
+    async def test_latency_when_reachable(self):
+        client = MagicMock()
+        client.ping = AsyncMock(return_value=True)
+
+        with patch("app.core.redis_client.get_redis_client", return_value=client):
+            latency = await redis_client.check_redis()
+
+        assert latency is not None and latency >= 0
+
+    async def test_none_when_unreachable(self):
+        client = MagicMock()
+        client.ping = AsyncMock(side_effect=RedisConnectionError("refused"))
+
+        with patch("app.core.redis_client.get_redis_client", return_value=client):
+            assert await redis_client.check_redis() is None
+
+
+@pytest.mark.asyncio
+class TestVersionedHash:
+    """Tests for store_hash_if_unchanged / read_version."""
+
+    async def test_store_passes_version_and_flat_fields(self):
+        client = MagicMock()
+        client.eval = AsyncMock(return_value=0)
+
+        stored = await redis_client.store_hash_if_unchanged(client, "blocks:7", "3", {"a": "1", "b": ""}, 60)
+
+        assert stored is False
+        assert client.eval.call_args.args[1:] == (2, "blocks:7", "blocks:7:version", "3", 60, "a", "1", "b", "")
+
+    async def test_missing_version_reads_as_zero(self):
+        client = MagicMock()
+        client.get = AsyncMock(return_value=None)
+
+        assert await redis_client.read_version(client, "blocks:7") == "0"
+
+
+def _versioned_cache(client, load):
+    return redis_client.VersionedHashCache(
+        "Test", "things", load,
+        encode=lambda value: {"v": str(value)},
+        decode=lambda fields: int(fields["v"]),
+        local_ttl_seconds=60, redis_ttl=600, client=client
+    )
+
+
+@pytest.mark.asyncio
+class TestVersionedHashCache:
+    """Tests for VersionedHashCache."""
+
+    async def test_miss_loads_and_stores_with_read_version(self):
+        client = MagicMock()
+        client.hgetall = AsyncMock(return_value={})
+        client.get = AsyncMock(return_value="4")
+        client.eval = AsyncMock(return_value=1)
+        load = AsyncMock(return_value=9)
+        cache = _versioned_cache(client, load)
+
+        assert await cache.get("db", 7) == 9
+        assert await cache.get("db", 7) == 9
+
+        load.assert_awaited_once_with("db", 7)
+        assert client.eval.call_args.args[1:] == (2, "things:7", "things:7:version", "4", 600, "v", "9")
+
+    async def test_version_read_failure_skips_store(self):
+        client = MagicMock()
+        client.hgetall = AsyncMock(return_value={})
+        client.get = AsyncMock(side_effect=RedisConnectionError("down"))
+        client.eval = AsyncMock()
+        cache = _versioned_cache(client, AsyncMock(return_value=9))
+
+        assert await cache.get("db", 7) == 9
+        client.eval.assert_not_called()
+
+    async def test_invalidate_drops_local_entry(self):
+        client = MagicMock()
+        client.hgetall = AsyncMock(return_value={"v": "1"})
+        client.pipeline = MagicMock(return_value=MagicMock(execute=AsyncMock()))
+        load = AsyncMock()
+        cache = _versioned_cache(client, load)
+
+        assert await cache.get("db", 7) == 1
+        client.hgetall.return_value = {"v": "2"}
+        await cache.invalidate(7)
+
+        assert await cache.get("db", 7) == 2
+        load.assert_not_called()
+
+
+@pytest.mark.asyncio
+class TestMeteredConnectionPool:
+    """Tests for MeteredConnectionPool metrics."""
+
+    async def test_tracks_in_use_and_peak(self):
+        pool = _pool()
+        connections = [MagicMock(), MagicMock()]
+
+        async def acquire(self, *args, **kwargs):
+            connection = connections.pop()
+            pool._in_use_connections.add(connection)
+            return connection
+
+        with patch.object(redis.BlockingConnectionPool, "get_connection", acquire):
+            first = await pool.get_connection("GET")
+            await pool.get_connection("GET")
+        pool._in_use_connections.discard(first)
+
+        stats = pool.stats()
+        assert stats["in_use"] == 1
+        assert stats["peak_in_use"] == 2
+        assert stats["waits"] == 0
+
+    async def test_counts_waits_and_timeouts(self):
+        pool = _pool(max_connections=1)
+        pool._in_use_connections.add(busy := MagicMock())
+
+        async def exhausted(self, *args, **kwargs):
+            raise RedisConnectionError("No connection available.") from asyncio.TimeoutError()
+
+        with patch.object(redis.BlockingConnectionPool, "get_connection", exhausted):
+            with pytest.raises(RedisConnectionError):
+                await pool.get_connection("GET")
+
+        assert busy in pool._in_use_connections
+        assert pool.stats()["waits"] == 1
+        assert pool.stats()["timeouts"] == 1
+
+    async def test_connect_error_is_not_a_timeout(self):
+        pool = _pool()
+
+        async def refused(self, *args, **kwargs):
+            raise RedisConnectionError("Connection refused")
+
+        with patch.object(redis.BlockingConnectionPool, "get_connection", refused):
+            with pytest.raises(RedisConnectionError):
+                await pool.get_connection("GET")
+
+        assert pool.stats()["timeouts"] == 0
@@ -142,3 +142,271 @@ class TestGetSent:
         assert total == 0
         assert len(messages) == 0
 
+
+
+async def _create_user(db, email: str) -> User:
+    user = User(email=email, password="x", first_name=email.split("@")[0])
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+
+@pytest.mark.asyncio
+class TestGetConversations:
+    """Tests for get_conversations function."""
+    
+    async def test_last_message_and_unread_per_partner(self, test_db: AsyncMock, test_user: dict, test_user2: dict):
+        """تست آخرین پیام و تعداد خوانده نشده برای هر کاربر مقابل."""
+        user_id = test_user["user_id"]
+        third = await _create_user(test_db, "third@example.com")
+        
+        await message_repo.create(test_db, sender_id=test_user2["user_id"], receiver_id=user_id, body="a1")
+        await message_repo.create(test_db, sender_id=test_user2["user_id"], receiver_id=user_id, body="a2")
+        await message_repo.create(test_db, sender_id=user_id, receiver_id=third.id, body="b1")
+        await message_repo.create(test_db, sender_id=third.id, receiver_id=user_id, body="b2")
+        await message_repo.create(test_db, sender_id=user_id, receiver_id=test_user2["user_id"], body="a3")
+        
+        conversations, total = await message_repo.get_conversations(test_db, user_id, page=1, page_size=10)
+        
+        assert total == 2
+        assert [c["user"].id for c in conversations] == [test_user2["user_id"], third.id]
+        assert [c["last_message"].body for c in conversations] == ["a3", "b2"]
+        assert [c["unread_count"] for c in conversations] == [2, 1]
+    
+    async def test_pagination(self, test_db: AsyncMock, test_user: dict):
+        """تست pagination مکالمات."""
+        for i in range(5):
+            partner = await _create_user(test_db, f"partner{i}@example.com")
+            await message_repo.create(test_db, sender_id=partner.id, receiver_id=test_user["user_id"], body=f"m{i}")
+        
+        first, total = await message_repo.get_conversations(test_db, test_user["user_id"], page=1, page_size=2)
+        last, _ = await message_repo.get_conversations(test_db, test_user["user_id"], page=3, page_size=2)
+        beyond, beyond_total = await message_repo.get_conversations(test_db, test_user["user_id"], page=4, page_size=2)
+        
+        assert total == 5
+        assert [c["last_message"].body for c in first] == ["m4", "m3"]
+        assert [c["last_message"].body for c in last] == ["m0"]
+        assert beyond == [] and beyond_total == 5
+    
+    async def test_get_conversations_empty(self, test_db: AsyncMock, test_user: dict):
+        """تست مکالمات خالی."""
+        conversations, total = await message_repo.get_conversations(test_db, test_user["user_id"])
+        
+        assert total == 0
+        assert conversations == []
+    
+    @pytest.mark.slow
+    async def test_get_conversations_benchmark(self, test_db: AsyncMock, test_user: dict):
+        """کاربر با 10k+ پیام: خواندن چند ردیف conversation و زمان پاسخ کوتاه."""
+        import time
+        from sqlalchemy import event, insert
+        from app.models.conversation import Conversation
+        
+        user_id = test_user["user_id"]
+        partners = [await _create_user(test_db, f"bench{i}@example.com") for i in range(200)]
+        rows = []
+        for i in range(12_000):
+            partner_id = partners[i % len(partners)].id
+            incoming = i % 3 != 0
+            rows.append({
+                "sender_id": partner_id if incoming else user_id,
+                "receiver_id": user_id if incoming else partner_id,
+                "body": f"message {i}",
+                "is_read": i % 7 == 0,
+            })
+        inserted = await test_db.execute(
+            insert(Message).returning(Message.id, Message.created_at), rows
+        )
+        
+        # همان خلاصه‌ای که message_repo.create نگه می‌دارد
+        summary = {}
+        for row, (message_id, created_at) in zip(rows, inserted.all()):
+            user_a_id, user_b_id = Conversation.ordered_pair(row["sender_id"], row["receiver_id"])
+            conv = summary.setdefault((user_a_id, user_b_id), {
+                "user_a_id": user_a_id, "user_b_id": user_b_id, "unread_a": 0, "unread_b": 0
+            })
+            conv["last_message_id"], conv["last_message_at"] = message_id, created_at
+            if not row["is_read"]:
+                conv["unread_a" if row["receiver_id"] == user_a_id else "unread_b"] += 1
+        await test_db.execute(insert(Conversation), list(summary.values()))
+        await test_db.commit()
+        
+        statements = []
+        sync_engine = test_db.bind.sync_engine
+        
+        def listener(conn, cursor, statement, *args):
+            statements.append(statement)
+        
+        event.listen(sync_engine, "before_cursor_execute", listener)
+        try:
+            started = time.perf_counter()
+            conversations, total = await message_repo.get_conversations(test_db, user_id, page=1, page_size=20)
+            elapsed = time.perf_counter() - started
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", listener)
+        
+        assert total == 200
+        assert len(conversations) == 20
+        # count + page: هر دو روی index جدول conversation
+        assert len(statements) == 2
+        assert elapsed < 1.0
+
+
+@pytest.mark.asyncio
+class TestConversationTable:
+    """Tests for conversation rows maintained by create and mark_as_read."""
+    
+    async def _conversation(self, db, user_id: int, other_user_id: int):
+        from app.models.conversation import Conversation
+        user_a_id, user_b_id = Conversation.ordered_pair(user_id, other_user_id)
+        result = await db.execute(
+            select(Conversation).where(
+                Conversation.user_a_id == user_a_id,
+                Conversation.user_b_id == user_b_id
+            ).execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+    
+    async def test_create_updates_last_message_and_unread(self, test_db: AsyncMock, test_user: dict, test_user2: dict):
+        """تست به‌روزرسانی conversation هنگام ارسال."""
+        user_id, other_id = test_user["user_id"], test_user2["user_id"]
+        await message_repo.create(test_db, sender_id=other_id, receiver_id=user_id, body="1")
+        await message_repo.create(test_db, sender_id=other_id, receiver_id=user_id, body="2")
+        last = await message_repo.create(test_db, sender_id=user_id, receiver_id=other_id, body="3")
+        
+        conversation = await self._conversation(test_db, user_id, other_id)
+        
+        assert conversation.last_message_id == last.id
+        user_unread = conversation.unread_a if conversation.user_a_id == user_id else conversation.unread_b
+        other_unread = conversation.unread_b if conversation.user_a_id == user_id else conversation.unread_a
+        assert (user_unread, other_unread) == (2, 1)
+        assert await message_repo.get_total_unread_count(test_db, user_id) == 2
+    
+    async def test_mark_as_read_resets_reader_counter(self, test_db: AsyncMock, test_user: dict, test_user2: dict):
+        """تست صفر شدن شمارنده خواننده پس از mark_as_read."""
+        user_id, other_id = test_user["user_id"], test_user2["user_id"]
+        await message_repo.create(test_db, sender_id=other_id, receiver_id=user_id, body="1")
+        await message_repo.create(test_db, sender_id=user_id, receiver_id=other_id, body="2")
+        
+        marked = await message_repo.mark_as_read(test_db, user_id, other_id)
+        
+        assert marked == 1
+        assert await message_repo.get_total_unread_count(test_db, user_id) == 0
+        assert await message_repo.get_total_unread_count(test_db, other_id) == 1
+    
+    async def test_mark_many_as_read_up_to_id(self, test_db: AsyncMock, test_user: dict, test_user2: dict):
+        """تست علامت‌گذاری دسته‌ای تا یک پیام و کم شدن شمارنده conversation."""
+        user_id, other_id = test_user["user_id"], test_user2["user_id"]
+        third = await _create_user(test_db, "third@example.com")
+        first = await message_repo.create(test_db, sender_id=other_id, receiver_id=user_id, body="1")
+        await message_repo.create(test_db, sender_id=third.id, receiver_id=user_id, body="2")
+        await message_repo.create(test_db, sender_id=other_id, receiver_id=user_id, body="3")
+        
+        counts = await message_repo.mark_many_as_read(
+            test_db, user_id, [other_id, third.id], up_to_id=first.id + 1
+        )
+        await test_db.commit()
+        
+        assert counts == {other_id: 1, third.id: 1}
+        assert await message_repo.get_unread_counts_by_user(test_db, [user_id]) == {user_id: {other_id: 1}}
+    
+    async def test_get_unread_counts_by_user(self, test_db: AsyncMock, test_user: dict, test_user2: dict):
+        """تست تعداد خوانده نشده هر مکالمه برای reconcile شمارنده‌های Redis."""
+        user_id, other_id = test_user["user_id"], test_user2["user_id"]
+        await message_repo.create(test_db, sender_id=other_id, receiver_id=user_id, body="1")
+        await message_repo.create(test_db, sender_id=other_id, receiver_id=user_id, body="2")
+        
+        counts = await message_repo.get_unread_counts_by_user(test_db, [user_id, other_id])
+        
+        assert counts == {user_id: {other_id: 2}, other_id: {}}
+
+
+@pytest.mark.asyncio
+class TestCursorPagination:
+    """Tests for keyset (before_id/after_id) pages."""
+    
+    async def _messages(self, db, sender_id: int, receiver_id: int, count: int) -> list[Message]:
+        return [
+            await message_repo.create(db, sender_id=sender_id, receiver_id=receiver_id, body=f"{i}")
+            for i in range(count)
+        ]
+    
+    async def test_inbox_before_id(self, test_db: AsyncMock, test_user: dict, test_user2: dict):
+        """تست صفحه پیام‌های قدیمی‌تر (جدیدترین اول)."""
+        sent = await self._messages(test_db, test_user2["user_id"], test_user["user_id"], 5)
+        
+        messages, has_more = await message_repo.get_inbox_by_cursor(
+            test_db, test_user["user_id"], page_size=2, before_id=sent[3].id
+        )
+        
+        assert [m.id for m in messages] == [sent[2].id, sent[1].id]
+        assert has_more is True
+    
+    async def test_sent_after_id(self, test_db: AsyncMock, test_user: dict, test_user2: dict):
+        """تست صفحه پیام‌های جدیدتر (قدیمی‌ترین اول)."""
+        sent = await self._messages(test_db, test_user["user_id"], test_user2["user_id"], 4)
+        
+        messages, has_more = await message_repo.get_sent_by_cursor(
+            test_db, test_user["user_id"], page_size=10, after_id=sent[1].id
+        )
+        
+        assert [m.id for m in messages] == [sent[2].id, sent[3].id]
+        assert has_more is False
+    
+    async def test_conversation_both_directions(self, test_db: AsyncMock, test_user: dict, test_user2: dict):
+        """تست cursor مکالمه شامل پیام‌های هر دو طرف."""
+        user_id, other_id = test_user["user_id"], test_user2["user_id"]
+        first = await message_repo.create(test_db, sender_id=user_id, receiver_id=other_id, body="1")
+        second = await message_repo.create(test_db, sender_id=other_id, receiver_id=user_id, body="2")
+        third = await message_repo.create(test_db, sender_id=user_id, receiver_id=other_id, body="3")
+        
+        messages, has_more = await message_repo.get_conversation_by_cursor(
+            test_db, other_id, user_id, page_size=10, before_id=third.id
+        )
+        
+        assert [m.id for m in messages] == [second.id, first.id]
+        assert has_more is False
+    
+    async def test_unknown_cursor_returns_empty_page(self, test_db: AsyncMock, test_user: dict, test_user2: dict):
+        """تست cursor ناموجود."""
+        await self._messages(test_db, test_user2["user_id"], test_user["user_id"], 2)
+        
+        messages, has_more = await message_repo.get_inbox_by_cursor(
+            test_db, test_user["user_id"], page_size=10, before_id=999999
+        )
+        
+        assert messages == []
+        assert has_more is False
+
+
+@pytest.mark.asyncio
+class TestSearch:
+    """Tests for full-text message search."""
+    
+    async def test_normalized_match_scoped_to_user(self, test_db: AsyncMock, test_user: dict, test_user2: dict):
+        """تست یکسان‌سازی حروف عربی و ارقام و محدود بودن به پیام‌های کاربر."""
+        user_id, other_id = test_user["user_id"], test_user2["user_id"]
+        third = await _create_user(test_db, "third@example.com")
+        match = await message_repo.create(test_db, sender_id=other_id, receiver_id=user_id, body="يك بسته ۵kg دارم")
+        await message_repo.create(test_db, sender_id=user_id, receiver_id=other_id, body="سلام")
+        await message_repo.create(test_db, sender_id=other_id, receiver_id=third.id, body="یک بسته 5kg")
+        
+        messages, has_more = await message_repo.search(test_db, user_id, "بسته 5KG", page_size=10)
+        
+        assert [m.id for m in messages] == [match.id]
+        assert has_more is False
+    
+    async def test_cursor_pages(self, test_db: AsyncMock, test_user: dict, test_user2: dict):
+        """تست صفحه‌بندی cursor روی (امتیاز، id)."""
+        user_id, other_id = test_user["user_id"], test_user2["user_id"]
+        sent = [
+            await message_repo.create(test_db, sender_id=user_id, receiver_id=other_id, body=f"package {i}")
+            for i in range(3)
+        ]
+        
+        first, has_more = await message_repo.search(test_db, user_id, "package", page_size=2)
+        rest, more = await message_repo.search(test_db, user_id, "package", page_size=2, before_id=first[-1].id)
+        
+        assert has_more is True and more is False
+        assert {m.id for m in first + rest} == {m.id for m in sent}
@@ -0,0 +1,100 @@
+"""Unit tests for the in-memory route price matrix."""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.models.route_price import RoutePrice
+from app.repositories.route_price_repo import RoutePriceMatrix, DEFAULT_PRICE_PER_KG
+
+
+def _result(rows=None, scalar=None):
+    result = MagicMock()
+    result.all.return_value = rows or []
+    result.scalar_one_or_none.return_value = scalar
+    return result
+
+
+@pytest.fixture
+def matrix_db():
+    """DB mock returning cities (1,2 -> country 10; 3 -> 20; 4 -> 30) and routes."""
+    db = MagicMock()
+    db.execute = AsyncMock(side_effect=[
+        _result(rows=[(1, 10), (2, 10), (3, 20), (4, 30)]),
+        _result(rows=[
+            (1, 3, 2.0, 500.0),
+            (2, 3, 4.0, 900.0),
+        ]),
+    ])
+    return db
+
+
+@pytest.mark.asyncio
+class TestRoutePriceMatrix:
+    """Tests for RoutePriceMatrix fallback chain and updates."""
+
+    async def test_direct_and_reverse(self, matrix_db):
+        matrix = RoutePriceMatrix(max_age_seconds=600)
+        await matrix.load(matrix_db)
+
+        direct = await matrix.lookup(matrix_db, 1, 3)
+        reverse = await matrix.lookup(matrix_db, 3, 1)
+
+        assert (direct.price, direct.ticket_price, direct.source) == (2.0, 500.0, "database")
+        assert (reverse.price, reverse.source) == (2.0, "reverse")
+
+    async def test_origin_city_average(self, matrix_db):
+        matrix = RoutePriceMatrix(max_age_seconds=600)
+        await matrix.load(matrix_db)
+
+        result = await matrix.lookup(matrix_db, 1, 4)
+
+        assert (result.price, result.source) == (2.0, "estimate")
+
+    async def test_country_pair_average(self, matrix_db):
+        """City 5 has no routes; its country (10) pairs with country 20 on average 3.0."""
+        matrix = RoutePriceMatrix(max_age_seconds=600)
+        await matrix.load(matrix_db)
+        matrix_db.execute = AsyncMock(return_value=_result(scalar=10))
+
+        result = await matrix.lookup(matrix_db, 5, 3)
+        reverse_pair = await matrix.lookup(matrix_db, 3, 5)
+
+        assert (result.price, result.source) == (3.0, "estimate")
+        assert reverse_pair.price == 3.0
+        # city 5's country is memoized after the first lookup
+        assert matrix_db.execute.await_count == 1
+
+    async def test_default_fallback(self, matrix_db):
+        matrix = RoutePriceMatrix(max_age_seconds=600)
+        await matrix.load(matrix_db)
+
+        result = await matrix.lookup(matrix_db, 4, 4)
+
+        assert (result.price, result.source) == (DEFAULT_PRICE_PER_KG, "estimate")
+
+    async def test_upsert_updates_aggregates(self, matrix_db):
+        matrix = RoutePriceMatrix(max_age_seconds=600)
+        await matrix.load(matrix_db)
+
+        await matrix.upsert(matrix_db, RoutePrice(
+            origin_city_id=1, destination_city_id=3,
+            price_per_kg_suggested=6.0, base_ticket_price_usd=1700.0
+        ))
+
+        direct = await matrix.lookup(matrix_db, 1, 3)
+        origin_avg = await matrix.lookup(matrix_db, 1, 4)
+        country_avg = await matrix.lookup(matrix_db, 2, 4)
+        assert direct.price == 6.0
+        assert origin_avg.price == 6.0
+        # country 10 -> 20 now averages (6.0 + 4.0) / 2; city 2 has its own origin avg
+        assert country_avg.price == 4.0
+        assert matrix._average(matrix._country_pair_sums[(10, 20)]) == 5.0
+
+    async def test_ensure_loaded_only_when_stale(self, matrix_db):
+        matrix = RoutePriceMatrix(max_age_seconds=600)
+        assert matrix.is_stale
+
+        await matrix.ensure_loaded(matrix_db)
+        await matrix.ensure_loaded(matrix_db)
+
+        assert not matrix.is_stale
+        assert matrix_db.execute.await_count == 2
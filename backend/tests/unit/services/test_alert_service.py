@@ -0,0 +1,219 @@
+"""Unit tests for alert coalescing and email delivery tracking."""
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models.alert import Alert
+from app.models.email_outbox import EmailOutbox
+from app.models.user import User
+from app.schemas.alert import AlertPriority, AlertType
+from app.services import alert_service
+from app.services.alert_service import alert_fingerprint
+
+
+def _alert() -> Alert:
+    return Alert(
+        id=7,
+        type="security",
+        priority="high",
+        title="Fan-out detected",
+        message="Same text sent to 50 users",
+        is_read=False,
+        email_sent=False,
+        created_at=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+def _row(to_email: str, status: str, attempts: int = 1, last_error: str = None) -> EmailOutbox:
+    return EmailOutbox(
+        to_email=to_email,
+        status=status,
+        attempts=attempts,
+        last_error=last_error,
+        sent_at=datetime(2026, 1, 1, tzinfo=timezone.utc) if status == "sent" else None,
+        alert_id=7,
+    )
+
+
+def _db(existing: Alert = None, email_claimed: bool = True) -> MagicMock:
+    db = MagicMock()
+    occurrence = MagicMock()
+    occurrence.first.return_value = existing
+    db.scalars = AsyncMock(return_value=occurrence)
+    claim = MagicMock()
+    claim.scalar_one_or_none.return_value = 7 if email_claimed else None
+    db.execute = AsyncMock(return_value=claim)
+    db.flush = AsyncMock()
+    db.refresh = AsyncMock()
+    db.commit = AsyncMock()
+    return db
+
+
+class TestAlertFingerprint:
+    """Tests for alert_fingerprint."""
+
+    def test_numbers_in_title_ignored(self):
+        assert alert_fingerprint("error", "Redis timeout after 5000 ms", {}) == \
+            alert_fingerprint("error", "redis timeout after 3000 ms", {})
+
+    def test_type_distinguishes(self):
+        assert alert_fingerprint("error", "Timeout") != alert_fingerprint("security", "Timeout")
+
+    def test_only_selected_metadata_keys(self):
+        first = alert_fingerprint("security", "Fan-out", {"sender_id": 4, "recipients": 20}, keys=("sender_id",))
+        second = alert_fingerprint("security", "Fan-out", {"sender_id": 4, "recipients": 60}, keys=("sender_id",))
+        other = alert_fingerprint("security", "Fan-out", {"sender_id": 5, "recipients": 20}, keys=("sender_id",))
+
+        assert first == second
+        assert first != other
+
+    def test_all_metadata_by_default(self):
+        assert alert_fingerprint("report", "New report", {"report_id": 1}) != \
+            alert_fingerprint("report", "New report", {"report_id": 2})
+
+
+@pytest.mark.asyncio
+class TestCreateAlert:
+    """Tests for create_alert coalescing."""
+
+    async def test_first_occurrence_inserts_and_emails(self):
+        db = _db()
+
+        with patch("app.services.alert_service.send_immediate_email", AsyncMock()) as send:
+            alert = await alert_service.create_alert(
+                db, AlertType.ERROR, "Redis down", "Connection refused", priority=AlertPriority.HIGH
+            )
+
+        db.add.assert_called_once_with(alert)
+        assert alert.occurrences == 1
+        assert alert.fingerprint == alert_fingerprint("error", "Redis down")
+        send.assert_awaited_once()
+        db.commit.assert_awaited_once()
+
+    async def test_repeat_updates_existing_row(self):
+        existing = _alert()
+        existing.occurrences = 42
+        db = _db(existing=existing, email_claimed=False)
+
+        with patch("app.services.alert_service.send_immediate_email", AsyncMock()) as send:
+            alert = await alert_service.create_alert(
+                db, AlertType.SECURITY, "Fan-out detected", "again", priority=AlertPriority.HIGH
+            )
+
+        assert alert is existing
+        db.add.assert_not_called()
+        send.assert_not_called()
+
+    async def test_repeat_emails_again_after_interval(self):
+        db = _db(existing=_alert(), email_claimed=True)
+
+        with patch("app.services.alert_service.send_immediate_email", AsyncMock()) as send:
+            await alert_service.create_alert(
+                db, AlertType.SECURITY, "Fan-out detected", "again", priority=AlertPriority.HIGH
+            )
+
+        send.assert_awaited_once()
+
+    async def test_normal_priority_never_claims_email(self):
+        db = _db()
+
+        await alert_service.create_alert(db, AlertType.USER, "New user", "signup")
+
+        # فقط advisory lock؛ بدون UPDATE رزرو ایمیل
+        db.execute.assert_awaited_once()
+        assert "pg_advisory_xact_lock" in str(db.execute.call_args.args[0])
+
+    async def test_fingerprint_locked_before_update(self):
+        db = _db()
+        calls = []
+        db.execute.side_effect = lambda statement: calls.append(("execute", statement)) or MagicMock()
+        scalars = db.scalars.return_value
+        db.scalars.side_effect = lambda statement: calls.append(("scalars", statement)) or scalars
+
+        await alert_service.create_alert(db, AlertType.USER, "New user", "signup")
+
+        assert [call[0] for call in calls] == ["execute", "scalars"]
+        lock, occurrence = calls[0][1], calls[1][1]
+        assert "pg_advisory_xact_lock(hashtext(" in str(lock)
+        assert list(lock.compile().params.values()) == [alert_fingerprint("user", "New user")]
+        assert str(occurrence).startswith("UPDATE alert")
+
+    async def test_repeat_marks_alert_for_next_digest(self):
+        db = _db(existing=_alert(), email_claimed=False)
+
+        await alert_service.create_alert(db, AlertType.SECURITY, "Fan-out detected", "again")
+
+        params = db.scalars.call_args.args[0].compile().params
+        assert params["email_sent"] is False
+        assert params["is_read"] is False
+
+
+@pytest.mark.asyncio
+class TestSendImmediateEmail:
+    """Tests for send_immediate_email."""
+
+    async def test_rows_linked_to_alert(self):
+        admins = MagicMock()
+        admins.scalars.return_value.all.return_value = [
+            User(id=1, email="a@example.com"),
+            User(id=2, email="b@example.com"),
+        ]
+        db = MagicMock()
+        db.execute = AsyncMock(return_value=admins)
+        mock_outbox = AsyncMock()
+        alert = _alert()
+
+        with patch("app.services.alert_service.email_outbox_service", mock_outbox):
+            assert await alert_service.send_immediate_email(db, alert) is True
+
+        args, kwargs = mock_outbox.enqueue_many.call_args
+        assert args[1] == ["a@example.com", "b@example.com"]
+        assert kwargs["alert_id"] == 7
+        assert alert.email_sent is True
+
+    async def test_repeated_alert_subject_shows_count(self):
+        admins = MagicMock()
+        admins.scalars.return_value.all.return_value = [User(id=1, email="a@example.com")]
+        db = MagicMock()
+        db.execute = AsyncMock(return_value=admins)
+        mock_outbox = AsyncMock()
+        alert = _alert()
+        alert.occurrences = 12
+        alert.last_seen_at = datetime(2026, 1, 1, 0, 40, tzinfo=timezone.utc)
+
+        with patch("app.services.alert_service.email_outbox_service", mock_outbox):
+            await alert_service.send_immediate_email(db, alert)
+
+        subject, body = mock_outbox.enqueue_many.call_args.args[2:4]
+        assert subject.endswith("(×12)")
+        assert "تکرار: 12 بار" in body
+
+
+@pytest.mark.asyncio
+class TestGetAlertDeliveries:
+    """Tests for get_alert_deliveries."""
+
+    async def test_counts_per_status(self):
+        db = MagicMock()
+        db.get = AsyncMock(return_value=_alert())
+        mock_repo = MagicMock()
+        mock_repo.SENT, mock_repo.PENDING, mock_repo.DEAD = "sent", "pending", "dead"
+        mock_repo.list_for_alert = AsyncMock(return_value=[
+            _row("a@example.com", "sent"),
+            _row("b@example.com", "pending", attempts=2, last_error="timeout"),
+            _row("c@example.com", "dead", attempts=8, last_error="mailbox full"),
+        ])
+
+        with patch("app.services.alert_service.email_outbox_repo", mock_repo):
+            deliveries = await alert_service.get_alert_deliveries(db, 7)
+
+        assert (deliveries.total, deliveries.sent, deliveries.pending, deliveries.dead) == (3, 1, 1, 1)
+        assert deliveries.recipients[2].last_error == "mailbox full"
+        assert deliveries.recipients[0].sent_at is not None
+
+    async def test_missing_alert(self):
+        db = MagicMock()
+        db.get = AsyncMock(return_value=None)
+
+        assert await alert_service.get_alert_deliveries(db, 99) is None
@@ -95,7 +95,8 @@ class TestSignup:
         # Mock email sending
         with patch('app.services.auth_service.user_repo', mock_user_repo):
             with patch('app.services.auth_service.log_service', mock_log_service):
-                with patch('app.services.auth_service.send_otp_email'):
+                with patch('app.services.auth_service.email_outbox_service') as mock_outbox:
+                    mock_outbox.enqueue_template = AsyncMock()
                     user = await auth_service.signup(
                         mock_db_session,
                         "newuser@example.com",
@@ -108,6 +109,9 @@ class TestSignup:
         mock_user_repo.email_exists.assert_called_once()
         mock_user_repo.create.assert_called_once()
         mock_db_session.commit.assert_called_once()
+        # OTP در همان تراکنش ثبت‌نام در outbox
+        mock_outbox.enqueue_template.assert_awaited_once()
+        assert mock_outbox.enqueue_template.call_args.args[:3] == (mock_db_session, "newuser@example.com", "otp")
     
     async def test_signup_duplicate_email(self, mock_db_session, mock_user_repo):
         """تست ثبت‌نام با ایمیل تکراری."""
@@ -222,7 +226,8 @@ class TestRequestOTP:
         
         with patch('app.services.auth_service.user_repo', mock_user_repo):
             with patch('app.services.auth_service.log_service', mock_log_service):
-                with patch('app.services.auth_service.send_otp_email'):
+                with patch('app.services.auth_service.email_outbox_service') as mock_outbox:
+                    mock_outbox.enqueue_template = AsyncMock()
                     result = await auth_service.request_otp(
                         mock_db_session,
                         "test@example.com"
@@ -230,6 +235,7 @@ class TestRequestOTP:
         
         assert result is True
         mock_user_repo.update_otp.assert_called_once()
+        mock_outbox.enqueue_template.assert_awaited_once()
     
     async def test_request_otp_user_not_found(self, mock_db_session, mock_user_repo):
         """تست کاربر ناموجود."""
@@ -0,0 +1,119 @@
+"""Unit tests for the user block cache."""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.services.block_cache_service import BlockCache
+
+
+def _cache(client: MagicMock) -> BlockCache:
+    return BlockCache(client=client, local_ttl_seconds=60)
+
+
+def _missing_client(version: str = "4") -> MagicMock:
+    """Redis miss: empty hash, version key at `version`, fill accepted."""
+    client = MagicMock()
+    client.hgetall = AsyncMock(return_value={})
+    client.get = AsyncMock(return_value=version)
+    client.eval = AsyncMock(return_value=1)
+    return client
+
+
+@pytest.mark.asyncio
+class TestGetSets:
+    """Tests for BlockCache.get_sets."""
+
+    async def test_redis_hit_parses_fields(self, mock_db_session):
+        client = MagicMock()
+        client.hgetall = AsyncMock(return_value={"blocked": "3,5", "blocked_by": ""})
+
+        with patch("app.services.block_cache_service.user_block_repo") as repo:
+            blocked, blocked_by = await _cache(client).get_sets(mock_db_session, 7)
+
+        assert blocked == {3, 5}
+        assert blocked_by == frozenset()
+        repo.get_block_sets.assert_not_called()
+
+    async def test_miss_loads_database_and_stores(self, mock_db_session):
+        client = _missing_client(version="4")
+
+        with patch("app.services.block_cache_service.user_block_repo") as repo:
+            repo.get_block_sets = AsyncMock(return_value=({5, 3}, {9}))
+            assert await _cache(client).get_sets(mock_db_session, 7) == ({3, 5}, {9})
+
+        assert client.eval.call_args.args[2:] == (
+            "blocks:7", "blocks:7:version", "4", 3600, "blocked", "3,5", "blocked_by", "9"
+        )
+
+    async def test_block_during_load_skips_store(self, mock_db_session):
+        """A block committed after the version read must not be hidden by a stale snapshot."""
+        versions = {"blocks:7:version": "4"}
+        hashes = {}
+        client = _missing_client()
+        client.get = AsyncMock(side_effect=lambda key: versions.get(key))
+
+        async def compare_and_set(script, numkeys, key, version_key, expected, ttl, *fields):
+            if (versions.get(version_key) or "0") != expected:
+                return 0
+            hashes[key] = dict(zip(fields[::2], fields[1::2]))
+            return 1
+
+        async def load_then_block(db, user_id):
+            versions["blocks:7:version"] = "5"  # invalidate() INCR between read and store
+            return set(), set()
+
+        client.eval = AsyncMock(side_effect=compare_and_set)
+
+        with patch("app.services.block_cache_service.user_block_repo") as repo:
+            repo.get_block_sets = load_then_block
+            await _cache(client).get_sets(mock_db_session, 7)
+
+        assert "blocks:7" not in hashes
+
+    async def test_local_hit_skips_redis(self, mock_db_session):
+        client = MagicMock()
+        client.hgetall = AsyncMock(return_value={"blocked": "", "blocked_by": ""})
+        cache = _cache(client)
+
+        await cache.get_sets(mock_db_session, 7)
+        await cache.get_sets(mock_db_session, 7)
+
+        client.hgetall.assert_awaited_once()
+
+    async def test_redis_down_falls_back_to_database(self, mock_db_session):
+        client = MagicMock()
+        client.hgetall = AsyncMock(side_effect=RedisConnectionError("down"))
+
+        with patch("app.services.block_cache_service.user_block_repo") as repo:
+            repo.get_block_sets = AsyncMock(return_value=(set(), {4}))
+            assert await _cache(client).get_sets(mock_db_session, 7) == (frozenset(), {4})
+
+
+@pytest.mark.asyncio
+class TestIsBlockedBetween:
+    """Tests for BlockCache.is_blocked_between and invalidation."""
+
+    async def test_both_directions(self, mock_db_session):
+        client = MagicMock()
+        client.hgetall = AsyncMock(return_value={"blocked": "3", "blocked_by": "9"})
+        cache = _cache(client)
+
+        assert await cache.is_blocked_between(mock_db_session, 7, 3)
+        assert await cache.is_blocked_between(mock_db_session, 7, 9)
+        assert not await cache.is_blocked_between(mock_db_session, 7, 4)
+
+    async def test_invalidate_drops_local_and_redis(self, mock_db_session, fake_pipeline):
+        client = MagicMock()
+        client.hgetall = AsyncMock(return_value={"blocked": "", "blocked_by": ""})
+        pipe = fake_pipeline()
+        client.pipeline.return_value = pipe
+        cache = _cache(client)
+
+        await cache.get_sets(mock_db_session, 7)
+        await cache.invalidate(7, 3)
+        await cache.get_sets(mock_db_session, 7)
+
+        assert pipe.commands[0] == ("delete", ("blocks:7", "blocks:3"), {})
+        assert ("incr", ("blocks:3:version",), {}) in pipe.commands
+        assert client.hgetall.await_count == 2
@@ -4,7 +4,7 @@ from datetime import datetime, timedelta
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from app.services.dynamic_pricing_service import DynamicPricingService
-from app.schemas.price import BasePriceResult
+from app.schemas.price import BasePriceResult, MarketPriceOut
 
 
 class TestSeasonFactor:
@@ -395,3 +395,187 @@ class TestCalculatePrice:
             assert abs(result.min_price - result.suggested_price_per_kg * 0.85) < 0.01
             assert abs(result.max_price - result.suggested_price_per_kg * 1.15) < 0.01
 
+
+
+@pytest.mark.asyncio
+class TestPriceSuggestionCache:
+    """Tests for cached price suggestions."""
+    
+    def _mock_repo(self, mock_repo):
+        mock_repo.get_base_price = AsyncMock(return_value=BasePriceResult(
+            price=1.0, ticket_price=300, source="database"
+        ))
+        mock_repo.get_route_statistics = AsyncMock(return_value={"monthly_cards": 50})
+        mock_repo.get_supply_demand_counts = AsyncMock(return_value=(10, 10))
+    
+    async def test_same_day_requests_hit_cache(self):
+        """Requests on the same route/day/weight band reuse the cached factors."""
+        service = DynamicPricingService()
+        
+        with patch('app.services.dynamic_pricing_service.route_price_repo') as mock_repo:
+            self._mock_repo(mock_repo)
+            travel_date = datetime.utcnow() + timedelta(days=45)
+            
+            first = await service.calculate_price(
+                MagicMock(), 1, 10, travel_date=travel_date, weight=3
+            )
+            second = await service.calculate_price(
+                MagicMock(), 1, 10, travel_date=travel_date + timedelta(hours=1), weight=4
+            )
+            
+            assert mock_repo.get_base_price.await_count == 1
+            assert first.suggested_price_per_kg == second.suggested_price_per_kg
+    
+    async def test_urgency_recomputed_on_cache_hit(self):
+        """Urgency is applied on top of the cached entry, not cached itself."""
+        service = DynamicPricingService()
+        travel_date = datetime.utcnow() + timedelta(days=20)
+        
+        with patch('app.services.dynamic_pricing_service.route_price_repo') as mock_repo:
+            self._mock_repo(mock_repo)
+            await service.calculate_price(MagicMock(), 1, 10, travel_date=travel_date)
+            
+            with patch.object(service, '_get_urgency_factor', return_value=1.5):
+                result = await service.calculate_price(MagicMock(), 1, 10, travel_date=travel_date)
+            
+            assert mock_repo.get_base_price.await_count == 1
+            assert result.factors["urgency"] == 1.5
+            assert list(result.factors) == ["route", "season", "demand", "urgency", "weight", "category"]
+    
+    async def test_concurrent_requests_share_computation(self):
+        """Concurrent identical requests run the DB lookups once."""
+        import asyncio
+        service = DynamicPricingService()
+        
+        with patch('app.services.dynamic_pricing_service.route_price_repo') as mock_repo:
+            self._mock_repo(mock_repo)
+            results = await asyncio.gather(
+                *[service.calculate_price(MagicMock(), 1, 10) for _ in range(5)]
+            )
+            
+            assert mock_repo.get_base_price.await_count == 1
+            assert len({r.suggested_price_per_kg for r in results}) == 1
+    
+    async def test_invalidate_route(self):
+        """Invalidating a route forces recomputation for that route only."""
+        service = DynamicPricingService()
+        
+        with patch('app.services.dynamic_pricing_service.route_price_repo') as mock_repo:
+            self._mock_repo(mock_repo)
+            await service.calculate_price(MagicMock(), 1, 10)
+            await service.calculate_price(MagicMock(), 2, 20)
+            
+            service.invalidate_route(1, 10)
+            await service.calculate_price(MagicMock(), 1, 10)
+            await service.calculate_price(MagicMock(), 2, 20)
+            
+            assert mock_repo.get_base_price.await_count == 3
+    
+    async def test_update_route_price_invalidates_route_and_reverse(self):
+        """A route price change drops cached suggestions for both directions."""
+        service = DynamicPricingService()
+        route = MagicMock(origin_city_id=1, destination_city_id=10)
+        
+        with patch('app.services.dynamic_pricing_service.route_price_repo') as mock_repo:
+            self._mock_repo(mock_repo)
+            mock_repo.route_price_matrix.upsert = AsyncMock()
+            for origin, destination in [(1, 10), (10, 1), (2, 20)]:
+                await service.calculate_price(MagicMock(), origin, destination)
+            
+            await service.update_route_price(MagicMock(), route)
+            for origin, destination in [(1, 10), (10, 1), (2, 20)]:
+                await service.calculate_price(MagicMock(), origin, destination)
+            
+            mock_repo.route_price_matrix.upsert.assert_awaited_once()
+            assert mock_repo.get_base_price.await_count == 5
+
+
+class TestMarketBlend:
+    """Tests for blending the model price with the market median."""
+    
+    def setup_method(self):
+        self.service = DynamicPricingService()
+    
+    def _market(self, sample_count, median):
+        return MarketPriceOut(
+            origin_city_id=1, destination_city_id=10, currency="USD",
+            sample_count=sample_count, p25=median, median=median, p75=median
+        )
+    
+    def test_no_blend_below_min_samples(self):
+        assert self.service._blend(2.0, 4, 10.0) == 2.0
+        assert self.service._blend(2.0, 500, None) == 2.0
+    
+    def test_weight_grows_with_samples(self):
+        half = self.service._blend(2.0, 25, 10.0)
+        full = self.service._blend(2.0, 500, 10.0)
+        assert half == pytest.approx(2.0 * 0.75 + 10.0 * 0.25)
+        assert full == pytest.approx(6.0)
+    
+    def test_suggestion_exposes_market(self):
+        base = BasePriceResult(price=1.0, ticket_price=300, source="database")
+        factors = {"route": 1.0, "season": 1.0, "demand": 1.0, "urgency": 1.0, "weight": 1.0, "category": 1.0}
+        result = self.service._build_suggestion(base, factors, self._market(50, 3.0))
+        assert result.market.median == 3.0
+        assert result.suggested_price_per_kg > 1.0 * self.service.PRICE_MULTIPLIER
+
+
+@pytest.mark.asyncio
+class TestCalculatePricesBatch:
+    """Tests for batch price calculation."""
+    
+    async def test_batch_uses_bulk_queries_and_keeps_order(self):
+        """Batch pricing loads data once for all routes and returns input order."""
+        service = DynamicPricingService()
+        routes = [(1, 10), (2, 20), (3, 30)]
+        
+        with patch('app.services.dynamic_pricing_service.route_price_repo') as mock_repo:
+            mock_repo.get_base_prices_bulk = AsyncMock(return_value={
+                (1, 10): BasePriceResult(price=1.0, ticket_price=300, source="database"),
+                (2, 20): BasePriceResult(price=2.0, ticket_price=None, source="reverse"),
+                (3, 30): BasePriceResult(price=1.5, ticket_price=None, source="estimate"),
+            })
+            mock_repo.get_route_statistics_bulk = AsyncMock(return_value={
+                (1, 10): 150, (2, 20): 60, (3, 30): 0,
+            })
+            mock_repo.get_supply_demand_counts_bulk = AsyncMock(return_value={
+                (1, 10): (10, 10), (2, 20): (10, 30), (3, 30): (0, 0),
+            })
+            mock_repo.get_base_price = AsyncMock()
+            
+            results = await service.calculate_prices_batch(MagicMock(), routes, weight=25)
+            
+            assert len(results) == 3
+            assert [r.source for r in results] == ["database", "reverse", "estimate"]
+            assert results[0].factors["route"] == 0.85
+            assert results[2].factors["route"] == 1.3
+            assert results[1].factors["demand"] == 1.6
+            assert results[2].factors["demand"] == 1.5
+            assert all(r.factors["weight"] == 0.9 for r in results)
+            mock_repo.get_base_price.assert_not_called()
+    
+    async def test_batch_matches_single_calculation(self):
+        """Batch and single-route pricing agree for the same inputs."""
+        service = DynamicPricingService()
+        travel_date = datetime(2025, 7, 15)
+        base = BasePriceResult(price=1.0, ticket_price=300, source="database")
+        
+        with patch('app.services.dynamic_pricing_service.route_price_repo') as mock_repo:
+            mock_repo.get_base_price = AsyncMock(return_value=base)
+            mock_repo.get_route_statistics = AsyncMock(return_value={"monthly_cards": 30})
+            mock_repo.get_supply_demand_counts = AsyncMock(return_value=(4, 6))
+            mock_repo.get_base_prices_bulk = AsyncMock(return_value={(1, 10): base})
+            mock_repo.get_route_statistics_bulk = AsyncMock(return_value={(1, 10): 30})
+            mock_repo.get_supply_demand_counts_bulk = AsyncMock(return_value={(1, 10): (4, 6)})
+            
+            single = await service.calculate_price(MagicMock(), 1, 10, travel_date=travel_date)
+            [batch] = await service.calculate_prices_batch(
+                MagicMock(), [(1, 10)], travel_date=travel_date
+            )
+            
+            assert batch == single
+    
+    async def test_empty_batch(self):
+        """Empty route list returns an empty result without queries."""
+        service = DynamicPricingService()
+        assert await service.calculate_prices_batch(MagicMock(), []) == []
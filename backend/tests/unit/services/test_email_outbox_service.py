@@ -0,0 +1,279 @@
+"""Unit tests for the email outbox service and worker."""
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models.email_outbox import EmailOutbox
+from app.services import email_outbox_service
+from app.services.email_outbox_service import (
+    EmailOutboxWorker,
+    batch_size,
+    max_chunk_size,
+    plan_chunks,
+    retry_delay,
+)
+
+
+def _entry(entry_id: int, attempts: int = 1, body: str = None) -> EmailOutbox:
+    return EmailOutbox(
+        id=entry_id,
+        to_email=f"user{entry_id}@example.com",
+        subject="Subject",
+        body=body or f"Body {entry_id}",
+        kind="otp",
+        status="pending",
+        attempts=attempts,
+    )
+
+
+def _session_factory(db):
+    @asynccontextmanager
+    async def get_db_session():
+        yield db
+    return get_db_session
+
+
+class TestRetryDelay:
+    """Tests for retry_delay."""
+
+    def test_grows_exponentially(self):
+        with patch("app.services.email_outbox_service.random.uniform", return_value=1.0), \
+             patch.object(email_outbox_service.settings, "EMAIL_RETRY_BASE_SECONDS", 30), \
+             patch.object(email_outbox_service.settings, "EMAIL_RETRY_MAX_SECONDS", 3600):
+            assert [retry_delay(attempt) for attempt in (1, 2, 3)] == [30, 60, 120]
+
+    def test_capped(self):
+        with patch("app.services.email_outbox_service.random.uniform", return_value=1.0), \
+             patch.object(email_outbox_service.settings, "EMAIL_RETRY_BASE_SECONDS", 30), \
+             patch.object(email_outbox_service.settings, "EMAIL_RETRY_MAX_SECONDS", 3600):
+            assert retry_delay(20) == 3600
+
+    def test_jitter_within_ten_percent(self):
+        with patch.object(email_outbox_service.settings, "EMAIL_RETRY_BASE_SECONDS", 100):
+            delays = [retry_delay(1) for _ in range(50)]
+
+        assert all(90 <= delay <= 110 for delay in delays)
+
+
+class TestPlanChunks:
+    """Tests for plan_chunks."""
+
+    def test_spreads_entries_across_chunks(self):
+        chunks = plan_chunks([_entry(entry_id) for entry_id in range(1, 9)], 4)
+
+        assert [len(chunk) for chunk in chunks] == [2, 2, 2, 2]
+
+    def test_same_email_for_many_recipients_stays_together(self):
+        batch = [_entry(1), _entry(2, body="alert"), _entry(3), _entry(4, body="alert"), _entry(5, body="alert")]
+
+        chunks = plan_chunks(batch, 3)
+
+        alert_chunks = [chunk for chunk in chunks if any(entry.body == "alert" for entry in chunk)]
+        assert len(alert_chunks) == 1
+        assert [entry.id for entry in alert_chunks[0]] == [2, 4, 5]
+        assert sorted(entry.id for chunk in chunks for entry in chunk) == [1, 2, 3, 4, 5]
+
+    def test_large_group_split_at_max_size(self):
+        batch = [_entry(entry_id, body="alert") for entry_id in range(1, 13)] + [_entry(20)]
+
+        chunks = plan_chunks(batch, 2, max_size=5)
+
+        assert all(len(chunk) <= 5 for chunk in chunks)
+        assert sorted(entry.id for chunk in chunks for entry in chunk) == list(range(1, 13)) + [20]
+
+    def test_fewer_entries_than_chunks(self):
+        assert len(plan_chunks([_entry(1)], 8)) == 1
+        assert plan_chunks([], 8) == []
+
+
+class TestBatchLimits:
+    """Tests for max_chunk_size and batch_size."""
+
+    def test_chunk_finishes_within_lease(self):
+        with patch.object(email_outbox_service.settings, "EMAIL_WORKER_LEASE_SECONDS", 300), \
+             patch.object(email_outbox_service.settings, "EMAIL_SMTP_TIMEOUT_SECONDS", 30):
+            assert max_chunk_size() == 5
+            assert max_chunk_size() * 30 < 300
+
+    def test_timeout_longer_than_lease(self):
+        with patch.object(email_outbox_service.settings, "EMAIL_WORKER_LEASE_SECONDS", 20), \
+             patch.object(email_outbox_service.settings, "EMAIL_SMTP_TIMEOUT_SECONDS", 30):
+            assert max_chunk_size() == 1
+
+    def test_batch_limited_by_concurrency(self):
+        with patch.object(email_outbox_service.settings, "EMAIL_WORKER_LEASE_SECONDS", 300), \
+             patch.object(email_outbox_service.settings, "EMAIL_SMTP_TIMEOUT_SECONDS", 30), \
+             patch.object(email_outbox_service.settings, "EMAIL_WORKER_CONCURRENCY", 8), \
+             patch.object(email_outbox_service.settings, "EMAIL_WORKER_BATCH_SIZE", 50):
+            assert batch_size() == 40
+
+
+@pytest.mark.asyncio
+class TestEnqueue:
+    """Tests for enqueue_template."""
+
+    async def test_renders_template_into_outbox(self):
+        mock_repo = AsyncMock()
+        db = MagicMock()
+
+        with patch("app.services.email_outbox_service.email_outbox_repo", mock_repo):
+            await email_outbox_service.enqueue_template(
+                db, "user@example.com", "otp", "fa", otp_code="123456", first_name="Ali"
+            )
+
+        args = mock_repo.enqueue.call_args.args
+        assert args[0] is db
+        assert args[1] == "user@example.com"
+        assert "123456" in args[3]
+        assert args[4] == "otp"
+
+    async def test_template_for_many_recipients(self):
+        mock_repo = AsyncMock()
+        db = MagicMock()
+
+        with patch("app.services.email_outbox_service.email_outbox_repo", mock_repo):
+            await email_outbox_service.enqueue_template_many(
+                db, ["a@example.com", "b@example.com"], "membership_request", "en",
+                user_name="Ali", community_name="Travelers"
+            )
+
+        args = mock_repo.enqueue_many.call_args.args
+        assert args[1] == ["a@example.com", "b@example.com"]
+        assert args[4] == "membership_request"
+
+    async def test_alert_id_recorded_on_rows(self):
+        mock_repo = AsyncMock()
+        db = MagicMock()
+
+        with patch("app.services.email_outbox_service.email_outbox_repo", mock_repo):
+            await email_outbox_service.enqueue_many(
+                db, ["a@example.com"], "Subject", "Body", kind="alert", alert_id=7
+            )
+
+        assert mock_repo.enqueue_many.call_args.kwargs["alert_id"] == 7
+
+    async def test_template_bulk_one_row_group_per_rendering(self):
+        mock_repo = AsyncMock()
+        mock_repo.enqueue_many.side_effect = lambda db, to_emails, *args, **kwargs: [MagicMock() for _ in to_emails]
+        db = MagicMock()
+        
+        with patch("app.services.email_outbox_service.email_outbox_repo", mock_repo):
+            entries = await email_outbox_service.enqueue_template_bulk(
+                db,
+                [("a@example.com", "fa"), ("b@example.com", "en"), ("c@example.com", None)],
+                "membership_request",
+                user_name="Ali",
+                community_name="Travelers"
+            )
+        
+        # همه زبان‌ها به قالب انگلیسی می‌رسند: یک گروه
+        mock_repo.enqueue_many.assert_awaited_once()
+        assert mock_repo.enqueue_many.call_args.args[1] == ["a@example.com", "b@example.com", "c@example.com"]
+        assert len(entries) == 3
+
+
+@pytest.mark.asyncio
+class TestWorkerRunOnce:
+    """Tests for EmailOutboxWorker.run_once."""
+
+    async def test_empty_outbox(self):
+        mock_repo = AsyncMock()
+        mock_repo.claim_batch.return_value = []
+
+        with patch("app.services.email_outbox_service.email_outbox_repo", mock_repo), \
+             patch("app.services.email_outbox_service.get_db_session", _session_factory(MagicMock())):
+            assert await EmailOutboxWorker().run_once() == 0
+
+        mock_repo.mark_sent.assert_not_called()
+
+    async def test_claims_only_what_fits_in_lease(self):
+        mock_repo = AsyncMock()
+        mock_repo.claim_batch.return_value = []
+
+        with patch("app.services.email_outbox_service.email_outbox_repo", mock_repo), \
+             patch("app.services.email_outbox_service.get_db_session", _session_factory(MagicMock())), \
+             patch.object(email_outbox_service.settings, "EMAIL_WORKER_LEASE_SECONDS", 300), \
+             patch.object(email_outbox_service.settings, "EMAIL_SMTP_TIMEOUT_SECONDS", 30), \
+             patch.object(email_outbox_service.settings, "EMAIL_WORKER_CONCURRENCY", 2), \
+             patch.object(email_outbox_service.settings, "EMAIL_WORKER_BATCH_SIZE", 50):
+            await EmailOutboxWorker().run_once()
+
+        assert mock_repo.claim_batch.call_args.args[1:] == (10, 300)
+
+    async def test_sent_retried_and_dead(self):
+        batch = [_entry(1), _entry(2, attempts=2), _entry(3, attempts=8)]
+        mock_repo = AsyncMock()
+        mock_repo.claim_batch.return_value = batch
+
+        def deliver(emails):
+            return [None if email.to_email == "user1@example.com" else "smtp down" for email in emails]
+
+        worker = EmailOutboxWorker()
+        with patch("app.services.email_outbox_service.email_outbox_repo", mock_repo), \
+             patch("app.services.email_outbox_service.get_db_session", _session_factory(MagicMock())), \
+             patch("app.services.email_outbox_service.deliver_many", deliver), \
+             patch.object(email_outbox_service.settings, "EMAIL_MAX_ATTEMPTS", 8):
+            assert await worker.run_once() == 3
+
+        mock_repo.mark_sent.assert_awaited_once()
+        assert mock_repo.mark_sent.call_args.args[1] == [1]
+        mock_repo.mark_retry.assert_awaited_once()
+        assert mock_repo.mark_retry.call_args.args[1:3] == (2, "smtp down")
+        mock_repo.mark_dead.assert_awaited_once()
+        assert mock_repo.mark_dead.call_args.args[1:] == (3, "smtp down")
+        assert worker._stats == {"sent": 1, "retried": 1, "dead": 1}
+
+    async def test_concurrency_limited(self):
+        import threading
+        import time
+
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def deliver(emails):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+            return [None] * len(emails)
+
+        mock_repo = AsyncMock()
+        mock_repo.claim_batch.return_value = [_entry(entry_id) for entry_id in range(10)]
+
+        with patch.object(email_outbox_service.settings, "EMAIL_WORKER_CONCURRENCY", 3):
+            worker = EmailOutboxWorker()
+        with patch("app.services.email_outbox_service.email_outbox_repo", mock_repo), \
+             patch("app.services.email_outbox_service.get_db_session", _session_factory(MagicMock())), \
+             patch("app.services.email_outbox_service.deliver_many", deliver):
+            await worker.run_once()
+
+        assert 1 < peak <= 3
+        assert len(mock_repo.mark_sent.call_args.args[1]) == 10
+
+
+@pytest.mark.asyncio
+class TestWorkerReport:
+    """Tests for EmailOutboxWorker.report."""
+
+    async def test_reports_and_resets(self):
+        mock_repo = AsyncMock()
+        mock_repo.PENDING = "pending"
+        mock_repo.DEAD = "dead"
+        mock_repo.count_by_status.return_value = {"pending": 4, "sent": 10, "dead": 1}
+
+        worker = EmailOutboxWorker()
+        worker._stats["sent"] = 6
+        with patch("app.services.email_outbox_service.email_outbox_repo", mock_repo), \
+             patch("app.services.email_outbox_service.get_db_session", _session_factory(MagicMock())):
+            report = await worker.report()
+
+        assert report["sent"] == 6
+        assert report["pending"] == 4
+        assert report["per_second"] > 0
+        mock_repo.purge_sent.assert_awaited_once()
+        assert worker._stats == {"sent": 0, "retried": 0, "dead": 0}
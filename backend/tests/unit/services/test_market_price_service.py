@@ -0,0 +1,104 @@
+"""Unit tests for streaming market price estimation."""
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.market_price_service import MarketPriceService
+from app.utils.tdigest import TDigest
+
+
+def _db():
+    db = MagicMock()
+    db.commit = AsyncMock()
+    db.rollback = AsyncMock()
+    return db
+
+
+@pytest.mark.asyncio
+class TestMarketPriceService:
+    """Tests for MarketPriceService."""
+
+    async def test_record_and_read_pending_prices(self):
+        """Unflushed prices are visible immediately."""
+        service = MarketPriceService(flush_interval_seconds=60)
+        for price in (2.0, 3.0, 4.0, 5.0, 6.0):
+            service.record_price(1, 10, price, "USD")
+
+        with patch('app.services.market_price_service.route_price_repo') as mock_repo:
+            mock_repo.get_price_sketches_bulk = AsyncMock(return_value={})
+            market = await service.get_market_price(_db(), 1, 10)
+
+        assert market.sample_count == 5
+        assert market.median == 4.0
+        assert market.p25 <= market.median <= market.p75
+
+    async def test_ignores_missing_and_foreign_currency_prices(self):
+        service = MarketPriceService(flush_interval_seconds=60)
+        service.record_price(1, 10, None, "USD")
+        service.record_price(1, 10, 0, "USD")
+        service.record_price(1, 10, 5.0, "AED")
+
+        assert service._deltas == {}
+
+    async def test_flush_merges_into_persisted_sketch(self):
+        """Flush merges deltas into the locked row and clears them."""
+        service = MarketPriceService(flush_interval_seconds=60)
+        existing = TDigest()
+        existing.update([1.0, 1.0, 1.0])
+        row = SimpleNamespace(digest=existing.to_dict(), sample_count=3)
+        service.record_price(1, 10, 9.0, "USD")
+        db = _db()
+
+        with patch('app.services.market_price_service.route_price_repo') as mock_repo:
+            mock_repo.lock_price_sketch = AsyncMock(return_value=row)
+            flushed = await service.flush(db)
+
+        assert flushed == 1
+        assert row.sample_count == 4
+        assert TDigest.from_dict(row.digest).max == 9.0
+        assert service._deltas == {}
+        db.commit.assert_awaited_once()
+
+    async def test_flush_failure_keeps_deltas(self):
+        service = MarketPriceService(flush_interval_seconds=60)
+        service.record_price(1, 10, 9.0, "USD")
+        db = _db()
+
+        with patch('app.services.market_price_service.route_price_repo') as mock_repo:
+            mock_repo.lock_price_sketch = AsyncMock(side_effect=RuntimeError("db down"))
+            with pytest.raises(RuntimeError):
+                await service.flush(db)
+
+        db.rollback.assert_awaited_once()
+        assert service._deltas[(1, 10)].count == 1
+
+    async def test_bulk_loads_missing_routes_once(self):
+        service = MarketPriceService(flush_interval_seconds=60)
+        persisted = TDigest()
+        persisted.update([3.0] * 10)
+
+        with patch('app.services.market_price_service.route_price_repo') as mock_repo:
+            mock_repo.get_price_sketches_bulk = AsyncMock(return_value={
+                (1, 10): SimpleNamespace(digest=persisted.to_dict())
+            })
+            first = await service.get_market_prices_bulk(_db(), [(1, 10), (2, 20)])
+            await service.get_market_prices_bulk(_db(), [(1, 10), (2, 20)])
+
+        assert mock_repo.get_price_sketches_bulk.await_count == 1
+        assert first[(1, 10)].median == 3.0
+        assert first[(2, 20)].sample_count == 0
+
+    async def test_bulk_does_not_cache_sketch_read_during_flush(self):
+        """A bulk read that races a flush is returned but not cached."""
+        service = MarketPriceService(flush_interval_seconds=60)
+
+        async def read_then_flush(db, routes):
+            service._persisted.invalidate_tag((1, 10))
+            return {}
+
+        with patch('app.services.market_price_service.route_price_repo') as mock_repo:
+            mock_repo.get_price_sketches_bulk = AsyncMock(side_effect=read_then_flush)
+            await service.get_market_prices_bulk(_db(), [(1, 10), (2, 20)])
+            await service.get_market_prices_bulk(_db(), [(1, 10), (2, 20)])
+
+        assert mock_repo.get_price_sketches_bulk.await_args_list[1].args[1] == [(1, 10)]
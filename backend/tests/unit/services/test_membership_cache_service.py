@@ -0,0 +1,145 @@
+"""Unit tests for the membership snapshot cache."""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.services.membership_cache_service import MembershipCache
+
+
+def _cache(client: MagicMock) -> MembershipCache:
+    return MembershipCache(client=client, local_ttl_seconds=60)
+
+
+def _missing_client(version: str = "4") -> MagicMock:
+    """Redis miss: empty hash, version key at `version`, fill accepted."""
+    client = MagicMock()
+    client.hgetall = AsyncMock(return_value={})
+    client.get = AsyncMock(return_value=version)
+    client.eval = AsyncMock(return_value=1)
+    return client
+
+
+@pytest.mark.asyncio
+class TestGetSnapshot:
+    """Tests for MembershipCache.get_snapshot."""
+
+    async def test_redis_hit_parses_fields(self, mock_db_session):
+        client = MagicMock()
+        client.hgetall = AsyncMock(return_value={"_": "", "3": "manager", "8": "member"})
+
+        with patch("app.services.membership_cache_service.membership_repo") as repo:
+            snapshot = await _cache(client).get_snapshot(mock_db_session, 7)
+
+        assert snapshot == {3: "manager", 8: "member"}
+        client.hgetall.assert_awaited_once_with("membership:7")
+        repo.get_user_roles.assert_not_called()
+
+    async def test_local_hit_skips_redis(self, mock_db_session):
+        client = MagicMock()
+        client.hgetall = AsyncMock(return_value={"_": "", "3": "owner"})
+        cache = _cache(client)
+
+        await cache.get_snapshot(mock_db_session, 7)
+        await cache.get_snapshot(mock_db_session, 7)
+
+        client.hgetall.assert_awaited_once()
+
+    async def test_miss_loads_database_and_stores(self, mock_db_session):
+        client = _missing_client(version="4")
+
+        with patch("app.services.membership_cache_service.membership_repo") as repo:
+            repo.get_user_roles = AsyncMock(return_value={7: {3: "member"}})
+            snapshot = await _cache(client).get_snapshot(mock_db_session, 7)
+
+        assert snapshot == {3: "member"}
+        client.get.assert_awaited_once_with("membership:7:version")
+        assert client.eval.call_args.args[2:] == (
+            "membership:7", "membership:7:version", "4", 3600, "_", "", "3", "member"
+        )
+
+    async def test_empty_snapshot_is_cached(self, mock_db_session):
+        client = _missing_client(version=None)
+
+        with patch("app.services.membership_cache_service.membership_repo") as repo:
+            repo.get_user_roles = AsyncMock(return_value={7: {}})
+            assert await _cache(client).get_snapshot(mock_db_session, 7) == {}
+
+        assert client.eval.call_args.args[4:] == ("0", 3600, "_", "")
+
+    async def test_invalidation_during_load_skips_store(self, mock_db_session):
+        """A membership change committed after the version read must not be overwritten."""
+        versions = {"membership:7:version": "4"}
+        hashes = {}
+        client = _missing_client()
+        client.get = AsyncMock(side_effect=lambda key: versions.get(key))
+
+        async def compare_and_set(script, numkeys, key, version_key, expected, ttl, *fields):
+            if (versions.get(version_key) or "0") != expected:
+                return 0
+            hashes[key] = dict(zip(fields[::2], fields[1::2]))
+            return 1
+
+        async def load_then_invalidate(db, user_ids):
+            versions["membership:7:version"] = "5"  # invalidate() INCR between read and store
+            return {7: {3: "manager"}}
+
+        client.eval = AsyncMock(side_effect=compare_and_set)
+
+        with patch("app.services.membership_cache_service.membership_repo") as repo:
+            repo.get_user_roles = load_then_invalidate
+            assert await _cache(client).get_snapshot(mock_db_session, 7) == {3: "manager"}
+
+        assert "membership:7" not in hashes
+
+    async def test_redis_down_falls_back_to_database(self, mock_db_session):
+        client = MagicMock()
+        client.hgetall = AsyncMock(side_effect=RedisConnectionError("down"))
+
+        with patch("app.services.membership_cache_service.membership_repo") as repo:
+            repo.get_user_roles = AsyncMock(return_value={7: {3: "owner"}})
+            assert await _cache(client).get_snapshot(mock_db_session, 7) == {3: "owner"}
+
+
+@pytest.mark.asyncio
+class TestChecks:
+    """Tests for role and common-community checks."""
+
+    async def test_is_manager(self, mock_db_session):
+        client = MagicMock()
+        client.hgetall = AsyncMock(return_value={"_": "", "3": "owner", "4": "manager", "5": "member"})
+        cache = _cache(client)
+
+        assert await cache.is_manager(mock_db_session, 7, 3)
+        assert await cache.is_manager(mock_db_session, 7, 4)
+        assert not await cache.is_manager(mock_db_session, 7, 5)
+        assert not await cache.is_manager(mock_db_session, 7, 6)
+
+    async def test_has_common_community(self, mock_db_session):
+        snapshots = {
+            "membership:1": {"_": "", "3": "member", "4": "member"},
+            "membership:2": {"_": "", "4": "manager"},
+            "membership:3": {"_": "", "9": "member"},
+        }
+        client = MagicMock()
+        client.hgetall = AsyncMock(side_effect=lambda key: snapshots[key])
+        cache = _cache(client)
+
+        assert await cache.has_common_community(mock_db_session, 1, 2)
+        assert not await cache.has_common_community(mock_db_session, 1, 3)
+
+    async def test_invalidate_drops_local_and_redis(self, mock_db_session, fake_pipeline):
+        client = MagicMock()
+        client.hgetall = AsyncMock(return_value={"_": "", "3": "member"})
+        pipe = fake_pipeline()
+        client.pipeline.return_value = pipe
+        cache = _cache(client)
+
+        await cache.get_snapshot(mock_db_session, 7)
+        await cache.invalidate(7, 8)
+        await cache.get_snapshot(mock_db_session, 7)
+
+        assert pipe.commands[0] == ("delete", ("membership:7", "membership:8"), {})
+        assert ("incr", ("membership:7:version",), {}) in pipe.commands
+        assert ("incr", ("membership:8:version",), {}) in pipe.commands
+        assert client.hgetall.await_count == 2
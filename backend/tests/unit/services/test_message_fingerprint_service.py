@@ -0,0 +1,101 @@
+"""Unit tests for duplicate message fan-out detection."""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.services.message_fingerprint_service import MessageFingerprintService, count_recipients
+from app.utils.simhash import simhash
+
+BODY = "Hi, I have a flight next week from Istanbul to Berlin and can carry a small package for you."
+
+
+def _service(client: MagicMock) -> MessageFingerprintService:
+    return MessageFingerprintService(client=client)
+
+
+def _entry(body: str, receiver_id: int, sent_at: float) -> str:
+    return f"{simhash(body):016x}:{receiver_id}:{sent_at:.0f}"
+
+
+class TestCountRecipients:
+    """Tests for count_recipients."""
+
+    def test_counts_distinct_similar_recipients(self):
+        entries = [
+            _entry(BODY, 2, 100),
+            _entry(BODY, 2, 90),
+            _entry(BODY.replace("package", "parcel"), 3, 80),
+            _entry("Do you still have the 5kg box for Dubai? I can take it on Friday.", 4, 70),
+        ]
+
+        assert count_recipients(entries, simhash(BODY), 5, since=0, max_distance=6) == 3
+
+    def test_ignores_old_and_malformed_entries(self):
+        entries = [_entry(BODY, 2, 10), "garbage", _entry(BODY, 3, 100)]
+
+        assert count_recipients(entries, simhash(BODY), 5, since=50, max_distance=6) == 2
+
+
+@pytest.mark.asyncio
+class TestCheck:
+    """Tests for MessageFingerprintService.check."""
+
+    async def test_short_message_is_not_fingerprinted(self):
+        client = MagicMock()
+
+        assert await _service(client).check(1, 2, "سلام") == 0
+        client.pipeline.assert_not_called()
+
+    async def test_compares_without_recording(self):
+        client = MagicMock()
+        client.lrange = AsyncMock(return_value=[_entry(BODY, 2, 1e12), _entry(BODY, 3, 1e12)])
+
+        recipients = await _service(client).check(1, 4, BODY)
+
+        assert recipients == 3
+        client.lrange.assert_awaited_once_with("fingerprint:1", 0, 31)
+        client.pipeline.assert_not_called()
+
+    async def test_redis_down_allows_message(self):
+        client = MagicMock()
+        client.lrange = AsyncMock(side_effect=RedisConnectionError("down"))
+
+        assert await _service(client).check(1, 2, BODY) == 0
+
+    async def test_record_pushes_and_trims(self, fake_pipeline):
+        pipe = fake_pipeline()
+        client = MagicMock()
+        client.pipeline = MagicMock(return_value=pipe)
+
+        await _service(client).record(1, 4, BODY)
+
+        assert [command[0] for command in pipe.commands] == ["lpush", "ltrim", "expire"]
+        assert pipe.commands[0][1][0] == "fingerprint:1"
+        assert pipe.commands[0][1][1].startswith(f"{simhash(BODY):016x}:4:")
+
+    async def test_record_skips_short_message(self):
+        client = MagicMock()
+
+        await _service(client).record(1, 2, "سلام")
+
+        client.pipeline.assert_not_called()
+
+    async def test_claim_alert_once(self):
+        client = MagicMock()
+        client.set = AsyncMock(side_effect=[True, None])
+        service = _service(client)
+
+        assert await service.claim_alert(1) is True
+        assert await service.claim_alert(1) is False
+
+    async def test_throttle_alert_claimed_after_flag(self):
+        claimed = set()
+        client = MagicMock()
+        client.set = AsyncMock(side_effect=lambda key, value, nx, ex: key not in claimed and not claimed.add(key))
+        service = _service(client)
+
+        assert await service.claim_alert(1, throttled=False) is True
+        assert await service.claim_alert(1, throttled=False) is False
+        assert await service.claim_alert(1, throttled=True) is True
+        assert await service.claim_alert(1, throttled=True) is False
@@ -0,0 +1,135 @@
+"""Unit tests for message partition maintenance."""
+from contextlib import asynccontextmanager
+from datetime import date
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.repositories.message_partition_repo import (
+    add_months,
+    month_start,
+    partition_month,
+    partition_name,
+)
+from app.services.message_partition_service import (
+    MessagePartitionService,
+    months_ahead,
+    months_to_archive,
+    months_to_create,
+)
+
+
+class TestMonthHelpers:
+    """Tests for the month arithmetic and partition naming."""
+
+    def test_month_start(self):
+        assert month_start(date(2026, 10, 19)) == date(2026, 10, 1)
+
+    def test_add_months_across_years(self):
+        assert add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+        assert add_months(date(2026, 2, 1), -6) == date(2025, 8, 1)
+        assert add_months(date(2026, 1, 1), 0) == date(2026, 1, 1)
+
+    def test_partition_name_roundtrip(self):
+        assert partition_name(date(2026, 3, 1)) == "message_p202603"
+        assert partition_month("message_p202603") == date(2026, 3, 1)
+
+    def test_partition_month_ignores_other_tables(self):
+        assert partition_month("message") is None
+        assert partition_month("message_archive") is None
+        assert partition_month("message_p2026") is None
+
+
+class TestMonthsToCreate:
+    """Tests for months_to_create."""
+
+    def test_creates_current_and_future_months(self):
+        months = months_to_create(set(), date(2026, 11, 20), months_ahead=2)
+
+        assert months == [date(2026, 11, 1), date(2026, 12, 1), date(2027, 1, 1)]
+
+    def test_skips_existing(self):
+        existing = {date(2026, 10, 1), date(2026, 11, 1)}
+
+        months = months_to_create(existing, date(2026, 10, 5), months_ahead=2)
+
+        assert months == [date(2026, 12, 1)]
+
+
+class TestMonthsToArchive:
+    """Tests for months_to_archive."""
+
+    def test_archives_months_before_hot_window(self):
+        existing = {date(2026, month, 1) for month in range(1, 11)}
+
+        months = months_to_archive(existing, date(2026, 10, 19), hot_months=6)
+
+        # hot window: 2026-04 .. 2026-10
+        assert months == [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)]
+
+    def test_nothing_to_archive(self):
+        existing = {date(2026, 9, 1), date(2026, 10, 1), date(2026, 11, 1)}
+
+        assert months_to_archive(existing, date(2026, 10, 1), hot_months=6) == []
+
+
+class TestMonthsAhead:
+    """Tests for months_ahead."""
+
+    def test_counts_consecutive_future_months(self):
+        existing = {date(2026, 10, 1), date(2026, 11, 1), date(2026, 12, 1), date(2027, 2, 1)}
+
+        assert months_ahead(existing, date(2026, 10, 19)) == 2
+
+    def test_missing_current_month(self):
+        assert months_ahead({date(2026, 11, 1), date(2026, 12, 1)}, date(2026, 10, 19)) == 0
+
+
+def _engine():
+    @asynccontextmanager
+    async def connect():
+        yield MagicMock()
+
+    engine = MagicMock()
+    engine.connect = connect
+    return engine
+
+
+def _session_factory(db):
+    @asynccontextmanager
+    async def get_db_session():
+        yield db
+    return get_db_session
+
+
+@pytest.mark.asyncio
+class TestCheckMonthsAhead:
+    """Tests for MessagePartitionService.check_months_ahead."""
+
+    async def _check(self, months: list[date]):
+        mock_repo = MagicMock()
+        mock_repo.list_partitions = AsyncMock(return_value={month: False for month in months})
+        mock_alerts = AsyncMock()
+
+        with patch("app.services.message_partition_service.engine", _engine()), \
+             patch("app.services.message_partition_service.message_partition_repo", mock_repo), \
+             patch("app.services.message_partition_service.get_db_session", _session_factory(MagicMock())), \
+             patch("app.services.message_partition_service.alert_service", mock_alerts):
+            ahead = await MessagePartitionService().check_months_ahead(date(2026, 10, 19))
+        return ahead, mock_alerts
+
+    async def test_enough_partitions_no_alert(self):
+        ahead, mock_alerts = await self._check([date(2026, 10, 1), date(2026, 11, 1), date(2026, 12, 1)])
+
+        assert ahead == 2
+        mock_alerts.alert_error.assert_not_called()
+
+    async def test_alerts_when_running_out(self):
+        ahead, mock_alerts = await self._check([date(2026, 10, 1), date(2026, 11, 1)])
+
+        assert ahead == 1
+        mock_alerts.alert_error.assert_awaited_once()
+        kwargs = mock_alerts.alert_error.call_args.kwargs
+        assert kwargs["metadata"] == {"months_ahead": 1}
+        # هشدار هر دور نگهداری در یک ردیف تجمیع می‌شود
+        assert kwargs["fingerprint_keys"] == []
@@ -1,6 +1,7 @@
 """Unit tests for message service."""
 import pytest
-from unittest.mock import AsyncMock, patch
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from app.services import message_service
 from app.models.user import User
@@ -16,42 +17,97 @@ class TestSendMessage:
         mock_db_session, 
         mock_user_repo, 
         mock_message_repo, 
-        mock_community_repo,
         mock_log_service
     ):
-        """تست ارسال موفق پیام."""
+        """تست ارسال موفق پیام (لاگ و notification در صف پس‌زمینه)."""
         # Mock receiver
         mock_receiver = User(id=2, email="receiver@example.com", is_active=True)
         mock_user_repo.get_by_id.return_value = mock_receiver
         
         # Mock common community check
-        mock_community_repo.check_common_membership.return_value = True
+        mock_membership_cache = AsyncMock()
+        mock_membership_cache.has_common_community.return_value = True
+        mock_block_cache = AsyncMock()
+        mock_block_cache.is_blocked_between.return_value = False
         
-        # Mock message creation
-        mock_message = Message(id=1, sender_id=1, receiver_id=2, body="Test message")
+        # Mock message creation (sender/receiver loaded by the repository)
+        mock_sender = User(id=1, email="sender@example.com", first_name="Sender")
+        mock_message = Message(
+            id=1, sender_id=1, receiver_id=2, body="Test message",
+            created_at=datetime.utcnow(), is_read=False, status="sent"
+        )
+        mock_message.sender = mock_sender
+        mock_message.receiver = mock_receiver
         mock_message_repo.create.return_value = mock_message
         
-        # Mock sender for email notification
-        mock_sender = User(id=1, email="sender@example.com", first_name="Sender")
+        mock_queue = MagicMock()
+        mock_notification = AsyncMock()
         
-        with patch('app.services.message_service.user_repo', mock_user_repo):
-            with patch('app.services.message_service.message_repo', mock_message_repo):
-                with patch('app.services.message_service.community_repo', mock_community_repo):
-                    with patch('app.services.message_service.log_service', mock_log_service):
-                        with patch('app.services.message_service.send_message_notification'):
-                            # Set side_effect to return different users
-                            mock_user_repo.get_by_id.side_effect = [mock_receiver, mock_sender]
-                            
-                            message = await message_service.send_message(
-                                mock_db_session,
-                                sender_id=1,
-                                receiver_id=2,
-                                body="Test message"
-                            )
+        with patch('app.services.message_service.user_repo', mock_user_repo), \
+             patch('app.services.message_service.message_repo', mock_message_repo), \
+             patch('app.services.message_service.membership_cache', mock_membership_cache), \
+             patch('app.services.message_service.block_cache', mock_block_cache), \
+             patch('app.services.message_service.log_service', mock_log_service), \
+             patch('app.services.message_service.notification_service', mock_notification), \
+             patch('app.services.message_service.unread_counter_service', AsyncMock()), \
+             patch('app.services.message_service.background_queue', mock_queue):
+            message = await message_service.send_message(
+                mock_db_session,
+                sender_id=1,
+                receiver_id=2,
+                body="Test message"
+            )
         
         assert message.id == 1
         mock_message_repo.create.assert_called_once()
-        mock_log_service.log_event.assert_called_once()
+        mock_db_session.commit.assert_awaited_once()
+        # لاگ audit، رویداد realtime و صف ایمیل notification بعد از پاسخ اجرا می‌شوند
+        mock_notification.buffer_notification.assert_not_called()
+        mock_log_service.log_event.assert_not_called()
+        submitted = [call.args[0] for call in mock_queue.submit.call_args_list]
+        assert submitted == ["message_send_log", "message_realtime", "message_notification"]
+    
+    async def test_send_message_buffers_notification(
+        self,
+        mock_db_session,
+        mock_user_repo,
+        mock_message_repo,
+        mock_log_service
+    ):
+        """تست اینکه ایمیل notification برای جمع شدن با پیام‌های دیگر در صف گیرنده قرار می‌گیرد."""
+        mock_user_repo.get_by_id.return_value = User(id=2, email="receiver@example.com", is_active=True)
+        mock_membership_cache = AsyncMock()
+        mock_membership_cache.has_common_community.return_value = True
+        mock_block_cache = AsyncMock()
+        mock_block_cache.is_blocked_between.return_value = False
+        mock_message = Message(
+            id=1, sender_id=1, receiver_id=2, body="Test message",
+            created_at=datetime.utcnow(), is_read=False, status="sent"
+        )
+        mock_message.sender = User(id=1, email="sender@example.com", first_name="Sender")
+        mock_message.receiver = mock_user_repo.get_by_id.return_value
+        mock_message_repo.create.return_value = mock_message
+        mock_queue = MagicMock()
+        mock_notification = AsyncMock()
+        
+        with patch('app.services.message_service.user_repo', mock_user_repo), \
+             patch('app.services.message_service.message_repo', mock_message_repo), \
+             patch('app.services.message_service.membership_cache', mock_membership_cache), \
+             patch('app.services.message_service.block_cache', mock_block_cache), \
+             patch('app.services.message_service.log_service', mock_log_service), \
+             patch('app.services.message_service.notification_service', mock_notification), \
+             patch('app.services.message_service.unread_counter_service', AsyncMock()), \
+             patch('app.services.message_service.background_queue', mock_queue):
+            await message_service.send_message(
+                mock_db_session,
+                sender_id=1,
+                receiver_id=2,
+                body="Test message"
+            )
+            jobs = {call.args[0]: call.args[1] for call in mock_queue.submit.call_args_list}
+            await jobs["message_notification"]()
+        
+        mock_notification.buffer_notification.assert_awaited_once_with(2, 1)
     
     async def test_send_message_to_self(self, mock_db_session):
         """تست ارسال پیام به خود."""
@@ -102,7 +158,6 @@ class TestSendMessage:
         self, 
         mock_db_session, 
         mock_user_repo, 
-        mock_community_repo,
         mock_log_service
     ):
         """تست عدم وجود کامیونیتی مشترک."""
@@ -110,10 +165,11 @@ class TestSendMessage:
         mock_user_repo.get_by_id.return_value = mock_receiver
         
         # No common community
-        mock_community_repo.check_common_membership.return_value = False
+        mock_membership_cache = AsyncMock()
+        mock_membership_cache.has_common_community.return_value = False
         
         with patch('app.services.message_service.user_repo', mock_user_repo):
-            with patch('app.services.message_service.community_repo', mock_community_repo):
+            with patch('app.services.message_service.membership_cache', mock_membership_cache):
                 with patch('app.services.message_service.log_service', mock_log_service):
                     with pytest.raises(PermissionError, match="مشترکی"):
                         await message_service.send_message(
@@ -125,6 +181,118 @@ class TestSendMessage:
         
         # Check that blocked event was logged
         mock_log_service.log_event.assert_called_once()
+    
+    async def test_send_message_blocked(
+        self, 
+        mock_db_session, 
+        mock_user_repo, 
+        mock_message_repo,
+        mock_log_service
+    ):
+        """تست ارسال پیام بین دو کاربری که یکی دیگری را بلاک کرده."""
+        mock_receiver = User(id=2, email="receiver@example.com", is_active=True)
+        mock_user_repo.get_by_id.return_value = mock_receiver
+        
+        mock_membership_cache = AsyncMock()
+        mock_membership_cache.has_common_community.return_value = True
+        mock_block_cache = AsyncMock()
+        mock_block_cache.is_blocked_between.return_value = True
+        
+        with patch('app.services.message_service.user_repo', mock_user_repo), \
+             patch('app.services.message_service.message_repo', mock_message_repo), \
+             patch('app.services.message_service.membership_cache', mock_membership_cache), \
+             patch('app.services.message_service.block_cache', mock_block_cache), \
+             patch('app.services.message_service.log_service', mock_log_service):
+            with pytest.raises(PermissionError):
+                await message_service.send_message(
+                    mock_db_session,
+                    sender_id=1,
+                    receiver_id=2,
+                    body="Test"
+                )
+        
+        mock_block_cache.is_blocked_between.assert_awaited_once_with(mock_db_session, 1, 2)
+        mock_message_repo.create.assert_not_called()
+        assert mock_log_service.log_event.call_args.kwargs["payload"] == {"reason": "user_blocked"}
+
+    async def test_send_message_duplicate_fanout_throttled(
+        self,
+        mock_db_session,
+        mock_user_repo,
+        mock_message_repo,
+        mock_log_service
+    ):
+        """تست محدود شدن ارسال متن مشابه به گیرندگان زیاد و ثبت هشدار."""
+        mock_user_repo.get_by_id.return_value = User(id=2, email="receiver@example.com", is_active=True)
+        mock_membership_cache = AsyncMock()
+        mock_membership_cache.has_common_community.return_value = True
+        mock_block_cache = AsyncMock()
+        mock_block_cache.is_blocked_between.return_value = False
+        mock_fingerprints = AsyncMock()
+        mock_fingerprints.check.return_value = 12
+        mock_fingerprints.claim_alert.return_value = True
+        mock_queue = MagicMock()
+        
+        with patch('app.services.message_service.user_repo', mock_user_repo), \
+             patch('app.services.message_service.message_repo', mock_message_repo), \
+             patch('app.services.message_service.membership_cache', mock_membership_cache), \
+             patch('app.services.message_service.block_cache', mock_block_cache), \
+             patch('app.services.message_service.message_fingerprint_service', mock_fingerprints), \
+             patch('app.services.message_service.log_service', mock_log_service), \
+             patch('app.services.message_service.background_queue', mock_queue):
+            with pytest.raises(PermissionError):
+                await message_service.send_message(
+                    mock_db_session, sender_id=1, receiver_id=2, body="Same offer pasted to many card owners"
+                )
+        
+        mock_message_repo.create.assert_not_called()
+        assert mock_queue.submit.call_args.args[0] == "message_fanout_alert"
+        assert mock_log_service.log_event.call_args.kwargs["payload"]["reason"] == "duplicate_fanout"
+        mock_fingerprints.claim_alert.assert_awaited_once_with(1, True)
+        # تلاش رد شده در تاریخچه fingerprint ثبت نمی‌شود
+        mock_fingerprints.record.assert_not_called()
+
+    async def test_send_message_fanout_flag_then_throttle_alerts(
+        self,
+        mock_db_session,
+        mock_user_repo,
+        mock_message_repo,
+        mock_log_service
+    ):
+        """تست هشدار جدا برای محدود شدن فرستنده‌ای که قبلاً flag شده است."""
+        from app.services.message_fingerprint_service import MessageFingerprintService
+
+        mock_user_repo.get_by_id.return_value = User(id=2, email="receiver@example.com", is_active=True)
+        mock_message_repo.create.return_value = Message(id=5, sender_id=1, receiver_id=2, body="x")
+        mock_membership_cache = AsyncMock()
+        mock_membership_cache.has_common_community.return_value = True
+        mock_block_cache = AsyncMock()
+        mock_block_cache.is_blocked_between.return_value = False
+        claimed = set()
+        client = MagicMock()
+        client.set = AsyncMock(side_effect=lambda key, value, nx, ex: key not in claimed and not claimed.add(key))
+        fingerprints = MessageFingerprintService(client=client)
+        fingerprints.check = AsyncMock(side_effect=[6, 7, 12])
+        fingerprints.record = AsyncMock()
+        mock_queue = MagicMock()
+        
+        with patch('app.services.message_service.user_repo', mock_user_repo), \
+             patch('app.services.message_service.message_repo', mock_message_repo), \
+             patch('app.services.message_service.membership_cache', mock_membership_cache), \
+             patch('app.services.message_service.block_cache', mock_block_cache), \
+             patch('app.services.message_service.message_fingerprint_service', fingerprints), \
+             patch('app.services.message_service.unread_counter_service', AsyncMock()), \
+             patch('app.services.message_service.MessageOut', MagicMock()), \
+             patch('app.services.message_service.log_service', mock_log_service), \
+             patch('app.services.message_service.background_queue', mock_queue):
+            for _ in range(2):
+                await message_service.send_message(mock_db_session, sender_id=1, receiver_id=2, body="Same offer")
+            with pytest.raises(PermissionError):
+                await message_service.send_message(mock_db_session, sender_id=1, receiver_id=2, body="Same offer")
+        
+        alerts = [call for call in mock_queue.submit.call_args_list if call.args[0] == "message_fanout_alert"]
+        assert len(alerts) == 2
+        assert fingerprints.record.await_count == 2
 
 
 @pytest.mark.asyncio
@@ -241,3 +409,179 @@ class TestGetSent:
         assert result.page == 3
         assert result.page_size == 10
 
+
+
+@pytest.mark.asyncio
+class TestMarkConversationAsRead:
+    """تست‌های mark_conversation_as_read."""
+    
+    async def test_publishes_read_receipt_and_unread_count(
+        self, mock_db_session, mock_user_repo, mock_message_repo
+    ):
+        """تست ارسال رویداد read به فرستنده و unread به خواننده."""
+        mock_user_repo.get_by_id.return_value = User(id=2, email="other@test.com")
+        mock_message_repo.mark_as_read.return_value = 3
+        mock_counters = AsyncMock()
+        mock_counters.get_total.return_value = 1
+        mock_realtime = AsyncMock()
+        
+        with patch('app.services.message_service.user_repo', mock_user_repo), \
+             patch('app.services.message_service.message_repo', mock_message_repo), \
+             patch('app.services.message_service.log_service', AsyncMock()), \
+             patch('app.services.message_service.notification_service', AsyncMock()), \
+             patch('app.services.message_service.unread_counter_service', mock_counters), \
+             patch('app.services.message_service.realtime_service', mock_realtime):
+            count = await message_service.mark_conversation_as_read(mock_db_session, 1, 2)
+        
+        assert count == 3
+        mock_counters.reset.assert_awaited_once_with(1, 2)
+        assert mock_realtime.publish.await_args_list[0].args == (2, "read", {"reader_id": 1, "count": 3})
+        assert mock_realtime.publish.await_args_list[1].args == (1, "unread", {"unread_count": 1})
+    
+    async def test_no_events_when_nothing_marked(
+        self, mock_db_session, mock_user_repo, mock_message_repo
+    ):
+        """تست عدم ارسال رویداد وقتی پیامی خوانده نشد."""
+        mock_user_repo.get_by_id.return_value = User(id=2, email="other@test.com")
+        mock_message_repo.mark_as_read.return_value = 0
+        mock_counters = AsyncMock()
+        mock_realtime = AsyncMock()
+        
+        with patch('app.services.message_service.user_repo', mock_user_repo), \
+             patch('app.services.message_service.message_repo', mock_message_repo), \
+             patch('app.services.message_service.unread_counter_service', mock_counters), \
+             patch('app.services.message_service.realtime_service', mock_realtime):
+            await message_service.mark_conversation_as_read(mock_db_session, 1, 2)
+        
+        mock_realtime.publish.assert_not_awaited()
+        # شمارنده Redis همیشه صفر می‌شود تا اختلاف احتمالی رفع شود
+        mock_counters.reset.assert_awaited_once_with(1, 2)
+    
+    async def test_mark_many_publishes_one_batch(self, mock_db_session, mock_message_repo):
+        """تست علامت‌گذاری دسته‌ای: یک commit، یک subtract و یک pipeline رویداد."""
+        mock_message_repo.mark_many_as_read = AsyncMock(return_value={2: 3, 5: 1})
+        mock_counters = AsyncMock()
+        mock_counters.get_total.return_value = 4
+        mock_realtime = AsyncMock()
+        mock_notifications = AsyncMock()
+        
+        with patch('app.services.message_service.message_repo', mock_message_repo), \
+             patch('app.services.message_service.log_service', AsyncMock()), \
+             patch('app.services.message_service.notification_service', mock_notifications), \
+             patch('app.services.message_service.unread_counter_service', mock_counters), \
+             patch('app.services.message_service.realtime_service', mock_realtime):
+            counts = await message_service.mark_many_as_read(
+                mock_db_session, 1, other_user_ids=[5, 2, 2, 1], up_to_id=90
+            )
+        
+        assert counts == {2: 3, 5: 1}
+        mock_message_repo.mark_many_as_read.assert_awaited_once_with(mock_db_session, 1, [2, 5], 90)
+        mock_db_session.commit.assert_awaited_once()
+        mock_counters.subtract.assert_awaited_once_with(1, {2: 3, 5: 1})
+        mock_notifications.clear_notification_flags.assert_awaited_once_with(1, {2: 3, 5: 1})
+        mock_realtime.publish.assert_not_awaited()
+        events = mock_realtime.publish_many.await_args.args[0]
+        assert events == [
+            (2, "read", {"reader_id": 1, "count": 3, "up_to_id": 90}),
+            (5, "read", {"reader_id": 1, "count": 1, "up_to_id": 90}),
+            (1, "unread", {"unread_count": 4}),
+        ]
+    
+    async def test_mark_many_nothing_marked(self, mock_db_session, mock_message_repo):
+        """تست عدم ارسال رویداد وقتی پیامی خوانده نشد."""
+        mock_message_repo.mark_many_as_read = AsyncMock(return_value={})
+        mock_counters = AsyncMock()
+        mock_realtime = AsyncMock()
+        
+        with patch('app.services.message_service.message_repo', mock_message_repo), \
+             patch('app.services.message_service.unread_counter_service', mock_counters), \
+             patch('app.services.message_service.realtime_service', mock_realtime):
+            counts = await message_service.mark_many_as_read(mock_db_session, 1)
+        
+        assert counts == {}
+        mock_counters.subtract.assert_not_awaited()
+        mock_realtime.publish_many.assert_not_awaited()
+    
+    async def test_get_total_unread_count_reads_counter(self, mock_db_session):
+        """تست خواندن badge از شمارنده Redis."""
+        mock_counters = AsyncMock()
+        mock_counters.get_total.return_value = 5
+        
+        with patch('app.services.message_service.unread_counter_service', mock_counters):
+            assert await message_service.get_total_unread_count(mock_db_session, 1) == 5
+        
+        mock_counters.get_total.assert_awaited_once_with(mock_db_session, 1)
+
+
+@pytest.mark.asyncio
+class TestCursorPagination:
+    """تست‌های صفحه‌بندی cursor."""
+    
+    async def test_before_id_uses_keyset_query(self, mock_db_session, mock_message_repo):
+        """تست استفاده از keyset به جای offset و count."""
+        messages = [Message(id=9, sender_id=2, receiver_id=1, body="9"),
+                    Message(id=7, sender_id=2, receiver_id=1, body="7")]
+        mock_message_repo.get_inbox_by_cursor = AsyncMock(return_value=(messages, True))
+        
+        with patch('app.services.message_service.message_repo', mock_message_repo):
+            result = await message_service.get_inbox(
+                mock_db_session, user_id=1, page=1, page_size=2, before_id=10
+            )
+        
+        mock_message_repo.get_inbox.assert_not_awaited()
+        mock_message_repo.get_inbox_by_cursor.assert_awaited_once_with(mock_db_session, 1, 2, 10, None)
+        assert result.has_more is True
+        assert (result.next_before_id, result.next_after_id) == (7, 9)
+    
+    async def test_after_id_page_is_oldest_first(self, mock_db_session, mock_message_repo):
+        """تست cursorهای صفحه after (قدیمی‌ترین اول)."""
+        messages = [Message(id=11, sender_id=1, receiver_id=2, body="11"),
+                    Message(id=12, sender_id=1, receiver_id=2, body="12")]
+        mock_message_repo.get_sent_by_cursor = AsyncMock(return_value=(messages, False))
+        
+        with patch('app.services.message_service.message_repo', mock_message_repo):
+            result = await message_service.get_sent(
+                mock_db_session, user_id=1, page=1, page_size=20, after_id=10
+            )
+        
+        assert (result.next_before_id, result.next_after_id) == (11, 12)
+    
+    async def test_empty_page_keeps_cursor(self, mock_db_session, mock_message_repo):
+        """تست حفظ cursor وقتی پیام جدیدی نیست (polling)."""
+        mock_message_repo.get_inbox_by_cursor = AsyncMock(return_value=([], False))
+        
+        with patch('app.services.message_service.message_repo', mock_message_repo):
+            result = await message_service.get_inbox(
+                mock_db_session, user_id=1, page=1, page_size=20, after_id=42
+            )
+        
+        assert result.items == []
+        assert result.next_after_id == 42
+
+
+@pytest.mark.asyncio
+class TestSearchMessages:
+    """تست‌های جستجوی پیام‌ها."""
+    
+    async def test_search_returns_cursor_page(self, mock_db_session, mock_message_repo):
+        """تست یکسان‌سازی فاصله‌ها و cursor صفحه بعد."""
+        messages = [Message(id=5, sender_id=1, receiver_id=2, body="بسته 5kg"),
+                    Message(id=3, sender_id=2, receiver_id=1, body="بسته")]
+        mock_message_repo.search = AsyncMock(return_value=(messages, True))
+        
+        with patch('app.services.message_service.message_repo', mock_message_repo):
+            result = await message_service.search_messages(
+                mock_db_session, user_id=1, query="  بسته   5kg ", page_size=2
+            )
+        
+        mock_message_repo.search.assert_awaited_once_with(mock_db_session, 1, "بسته 5kg", 2, None)
+        assert result.has_more is True
+        assert result.next_before_id == 3
+    
+    async def test_blank_query_rejected(self, mock_db_session, mock_message_repo):
+        """تست عبارت خالی."""
+        with patch('app.services.message_service.message_repo', mock_message_repo):
+            with pytest.raises(ValueError):
+                await message_service.search_messages(
+                    mock_db_session, user_id=1, query="   ", page_size=20
+                )
@@ -0,0 +1,191 @@
+"""Unit tests for coalesced message notification emails."""
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.models.user import User
+from app.services import notification_service
+
+
+def _client(pipeline, flags: list = None) -> MagicMock:
+    client = MagicMock()
+    client.pipeline.return_value = pipeline
+    client.mget = AsyncMock(side_effect=lambda keys: flags if flags is not None else [None] * len(keys))
+    return client
+
+
+def _session_factory(db):
+    @asynccontextmanager
+    async def get_db_session():
+        yield db
+    return get_db_session
+
+
+def _users(*users: User) -> dict[int, User]:
+    return {user.id: user for user in users}
+
+
+RECEIVER = User(id=1, email="receiver@example.com", first_name="Sara", preferred_language="fa", is_active=True)
+ALI = User(id=2, email="ali@example.com", first_name="Ali", last_name="Karimi")
+NO_NAME = User(id=3, email="reza@example.com")
+
+
+@pytest.mark.asyncio
+class TestBufferNotification:
+    """Tests for buffer_notification."""
+
+    async def test_one_pipeline_per_message(self, fake_pipeline):
+        pipeline = fake_pipeline()
+
+        with patch("app.services.notification_service.get_redis_client", return_value=_client(pipeline)), \
+             patch("app.services.notification_service.time.time", return_value=1000.0), \
+             patch.object(notification_service.settings, "NOTIFICATION_COALESCE_SECONDS", 300):
+            await notification_service.buffer_notification(1, 2)
+
+        zadds = [command for command in pipeline.commands if command[0] == "zadd"]
+        assert zadds == [
+            ("zadd", ("notification:pending:1", {2: 1000.0}), {"nx": True}),
+            ("zadd", ("notification:due", {1: 1300.0}), {"nx": True}),
+        ]
+
+    async def test_redis_down_queues_email_now(self, fake_pipeline):
+        client = _client(fake_pipeline(fail=ConnectionError("down")))
+        client.mget = AsyncMock(side_effect=ConnectionError("down"))
+        mock_outbox = AsyncMock()
+        mock_user_repo = AsyncMock()
+        mock_user_repo.get_by_ids.return_value = _users(RECEIVER, ALI)
+
+        with patch("app.services.notification_service.get_redis_client", return_value=client), \
+             patch("app.services.notification_service.get_db_session", _session_factory(MagicMock())), \
+             patch("app.services.notification_service.user_repo", mock_user_repo), \
+             patch("app.services.notification_service.email_outbox_service", mock_outbox):
+            await notification_service.buffer_notification(1, 2)
+
+        assert mock_outbox.enqueue_template.call_args.args[2] == "new_message"
+
+
+@pytest.mark.asyncio
+class TestClaimDue:
+    """Tests for claim_due."""
+
+    async def test_parses_script_result(self):
+        client = MagicMock()
+        client.eval = AsyncMock(return_value=["1", "4,2", "7", ""])
+
+        with patch("app.services.notification_service.get_redis_client", return_value=client):
+            claimed = await notification_service.claim_due(now=500.0, limit=10)
+
+        assert claimed == {1: [4, 2], 7: []}
+        assert client.eval.call_args.args[2:] == ("notification:due", 500.0, 10, "notification:pending")
+
+
+@pytest.mark.asyncio
+class TestEnqueueNotifications:
+    """Tests for enqueue_notifications."""
+
+    async def test_single_sender_uses_new_message(self, fake_pipeline):
+        mock_outbox = AsyncMock()
+        mock_user_repo = AsyncMock()
+        mock_user_repo.get_by_ids.return_value = _users(RECEIVER, ALI)
+
+        with patch("app.services.notification_service.get_redis_client", return_value=_client(fake_pipeline())), \
+             patch("app.services.notification_service.user_repo", mock_user_repo), \
+             patch("app.services.notification_service.email_outbox_service", mock_outbox):
+            pairs = await notification_service.enqueue_notifications(MagicMock(), {1: [2]})
+
+        assert pairs == [(1, 2)]
+        args, kwargs = mock_outbox.enqueue_template.call_args
+        assert args[1:4] == ("receiver@example.com", "new_message", "fa")
+        assert kwargs["sender_name"] == "Ali Karimi"
+
+    async def test_many_senders_one_summary_email(self, fake_pipeline):
+        mock_outbox = AsyncMock()
+        mock_user_repo = AsyncMock()
+        mock_user_repo.get_by_ids.return_value = _users(RECEIVER, ALI, NO_NAME)
+
+        with patch("app.services.notification_service.get_redis_client", return_value=_client(fake_pipeline())), \
+             patch("app.services.notification_service.user_repo", mock_user_repo), \
+             patch("app.services.notification_service.email_outbox_service", mock_outbox):
+            pairs = await notification_service.enqueue_notifications(MagicMock(), {1: [2, 3]})
+
+        assert pairs == [(1, 2), (1, 3)]
+        mock_outbox.enqueue_template.assert_awaited_once()
+        args, kwargs = mock_outbox.enqueue_template.call_args
+        assert args[2] == "new_messages_summary"
+        assert kwargs["count"] == 2
+        assert kwargs["sender_names"] == "- Ali Karimi\n- reza"
+
+    async def test_already_notified_senders_skipped(self, fake_pipeline):
+        mock_outbox = AsyncMock()
+        mock_user_repo = AsyncMock()
+        mock_user_repo.get_by_ids.return_value = _users(RECEIVER, NO_NAME)
+
+        with patch("app.services.notification_service.get_redis_client", return_value=_client(fake_pipeline(), flags=["1", None])), \
+             patch("app.services.notification_service.user_repo", mock_user_repo), \
+             patch("app.services.notification_service.email_outbox_service", mock_outbox):
+            pairs = await notification_service.enqueue_notifications(MagicMock(), {1: [2, 3]})
+
+        assert pairs == [(1, 3)]
+        assert mock_outbox.enqueue_template.call_args.args[2] == "new_message"
+
+    async def test_inactive_receiver_skipped(self, fake_pipeline):
+        inactive = User(id=1, email="receiver@example.com", is_active=False)
+        mock_outbox = AsyncMock()
+        mock_user_repo = AsyncMock()
+        mock_user_repo.get_by_ids.return_value = _users(inactive, ALI)
+
+        with patch("app.services.notification_service.get_redis_client", return_value=_client(fake_pipeline())), \
+             patch("app.services.notification_service.user_repo", mock_user_repo), \
+             patch("app.services.notification_service.email_outbox_service", mock_outbox):
+            assert await notification_service.enqueue_notifications(MagicMock(), {1: [2]}) == []
+
+        mock_outbox.enqueue_template.assert_not_called()
+
+
+@pytest.mark.asyncio
+class TestFlushDue:
+    """Tests for flush_due."""
+
+    async def test_marks_flags_after_commit(self):
+        with patch("app.services.notification_service.claim_due", AsyncMock(return_value={1: [2, 3]})), \
+             patch("app.services.notification_service.get_db_session", _session_factory(MagicMock())), \
+             patch("app.services.notification_service.enqueue_notifications",
+                   AsyncMock(return_value=[(1, 2), (1, 3)])), \
+             patch("app.services.notification_service.mark_notifications_sent", AsyncMock()) as mark:
+            assert await notification_service.flush_due() == 1
+
+        mark.assert_awaited_once_with([(1, 2), (1, 3)])
+
+    async def test_requeues_on_failure(self):
+        with patch("app.services.notification_service.claim_due", AsyncMock(return_value={1: [2]})), \
+             patch("app.services.notification_service.get_db_session", _session_factory(MagicMock())), \
+             patch("app.services.notification_service.enqueue_notifications",
+                   AsyncMock(side_effect=RuntimeError("db down"))), \
+             patch("app.services.notification_service._requeue", AsyncMock()) as requeue, \
+             patch("app.services.notification_service.mark_notifications_sent", AsyncMock()) as mark:
+            with pytest.raises(RuntimeError):
+                await notification_service.flush_due()
+
+        requeue.assert_awaited_once_with({1: [2]})
+        mark.assert_not_called()
+
+    async def test_nothing_due(self):
+        with patch("app.services.notification_service.claim_due", AsyncMock(return_value={})):
+            assert await notification_service.flush_due() == 0
+
+
+@pytest.mark.asyncio
+class TestClearNotificationFlags:
+    """Tests for clear_notification_flags."""
+
+    async def test_read_senders_leave_pending_email(self, fake_pipeline):
+        pipeline = fake_pipeline()
+
+        with patch("app.services.notification_service.get_redis_client", return_value=_client(pipeline)):
+            await notification_service.clear_notification_flags(1, {2: 3, 5: 1})
+
+        assert pipeline.commands == [
+            ("delete", ("notification:sent:1:2", "notification:sent:1:5"), {}),
+            ("zrem", ("notification:pending:1", 2, 5), {}),
+        ]
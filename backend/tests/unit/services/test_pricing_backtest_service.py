@@ -0,0 +1,211 @@
+"""Unit tests for the pricing backtest harness."""
+import random
+import time
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.dynamic_pricing_service import DynamicPricingService
+from app.services.pricing_backtest_service import (
+    BacktestReport,
+    HistoricalCard,
+    PricingBacktest,
+    run_backtest,
+    _SortedList,
+)
+from app.schemas.price import BasePriceResult
+
+START = datetime(2025, 1, 1)
+
+
+def _card(created, is_sender=False, travel=None, end=None, route=(1, 10), price=None, weight=None):
+    return HistoricalCard(
+        origin_city_id=route[0],
+        destination_city_id=route[1],
+        is_sender=is_sender,
+        created_at=created,
+        ticket_date_time=None if is_sender else travel,
+        start_time_frame=travel if is_sender else None,
+        end_time_frame=end if is_sender else None,
+        weight=weight,
+        price_per_kg=price,
+        currency="USD",
+    )
+
+
+def _random_history(n, routes, seed=0):
+    rng = random.Random(seed)
+    cards = []
+    for i in range(n):
+        created = START + timedelta(minutes=10 * i)
+        travel = created + timedelta(days=rng.randint(-2, 60), hours=rng.randint(0, 23))
+        is_sender = rng.random() < 0.5
+        cards.append(_card(
+            created,
+            is_sender=is_sender,
+            travel=travel,
+            end=travel + timedelta(days=rng.randint(0, 20)),
+            route=rng.choice(routes),
+            price=rng.choice([None, rng.uniform(1, 20)]),
+            weight=rng.choice([None, rng.uniform(0.5, 30)]),
+        ))
+    return cards
+
+
+def _brute_force_factors(service, history, card):
+    """Factors from scanning every earlier card, mirroring the repo queries."""
+    route = (card.origin_city_id, card.destination_city_id)
+    earlier = [c for c in history if (c.origin_city_id, c.destination_city_id) == route]
+    now = card.created_at
+    monthly = sum(1 for c in earlier if c.created_at >= now - timedelta(days=30))
+
+    center = service._bucket_travel_date(card.travel_date) if card.travel_date else now
+    lo, hi = center - timedelta(days=7), center + timedelta(days=7)
+    travelers = sum(
+        1 for c in earlier
+        if not c.is_sender and c.ticket_date_time and lo <= c.ticket_date_time <= hi
+    )
+    senders = sum(
+        1 for c in earlier
+        if c.is_sender and (
+            lo <= c.start_time_frame <= hi
+            or lo <= c.end_time_frame <= hi
+            or (c.start_time_frame <= lo and c.end_time_frame >= hi)
+        )
+    )
+    return {
+        "route": service._route_factor_from_count(monthly),
+        "season": service._get_season_factor(card.travel_date),
+        "demand": service._demand_factor_from_counts(travelers, senders),
+        "urgency": service._get_urgency_factor(card.travel_date, now),
+        "weight": service._get_weight_factor(card.weight) if card.weight else 1.0,
+        "category": 1.0,
+    }
+
+
+class TestPricingBacktest:
+    """Tests for PricingBacktest incremental state."""
+
+    def test_factors_match_full_rescan(self):
+        """Incremental state reproduces the as-of factors of a full rescan."""
+        service = DynamicPricingService()
+        backtest = PricingBacktest(service, use_market=False)
+        history = _random_history(600, routes=[(1, 10), (2, 20), (3, 30)])
+
+        for i, card in enumerate(history):
+            point = backtest.process(card, base_price=1.0)
+            assert point.factors == pytest.approx(_brute_force_factors(service, history[:i], card))
+
+    def test_suggestion_uses_service_formula(self):
+        service = DynamicPricingService()
+        backtest = PricingBacktest(service, use_market=False)
+        card = _card(START, travel=START + timedelta(days=40), price=3.0, weight=25)
+
+        point = backtest.process(card, base_price=1.2)
+
+        assert point.suggested_price_per_kg == round(service._final_price(1.2, point.factors), 2)
+        assert point.factors["weight"] == 0.9
+
+    def test_market_median_as_of_card(self):
+        """Only prices posted before the card feed its market blend."""
+        service = DynamicPricingService()
+        backtest = PricingBacktest(service, use_market=True)
+        travel = START + timedelta(days=90)
+        for i in range(service.MARKET_MIN_SAMPLES):
+            backtest.process(_card(START + timedelta(hours=i), travel=travel, price=20.0), base_price=1.0)
+
+        point = backtest.process(_card(START + timedelta(days=1), travel=travel), base_price=1.0)
+
+        unblended = service._final_price(1.0, point.factors)
+        assert point.suggested_price_per_kg > round(unblended, 2)
+
+    def test_sorted_list_matches_plain_sort(self):
+        rng = random.Random(3)
+        values = [rng.randint(0, 500) for _ in range(5_000)]
+        items = _SortedList()
+        with patch.object(_SortedList, "BUCKET_SIZE", 16):
+            for value in values:
+                items.add(float(value))
+        expected = sorted(values)
+
+        assert len(items) == len(expected)
+        assert [items[i] for i in range(0, len(expected), 97)] == expected[::97]
+        for probe in (-1, 0, 17, 250, 500, 501):
+            assert items.count_below(probe) == sum(1 for v in expected if v < probe)
+            assert items.count_below(probe, inclusive=True) == sum(1 for v in expected if v <= probe)
+
+    def test_report_metrics(self):
+        report = BacktestReport()
+        report.add(suggested=10.0, posted=8.0, factors={"route": 1.3})
+        report.add(suggested=10.0, posted=10.0, factors={"route": 1.3})
+
+        assert report.samples == 2
+        assert report.mae == 1.0
+        assert report.bias == 1.0
+        assert report.within_range_ratio == 0.5
+        count, ratio = report.factor_adjustments()["route"][1.3]
+        assert count == 2
+        assert ratio == pytest.approx((0.8 * 1.0) ** 0.5)
+
+    def test_unscored_cards_only_build_state(self):
+        backtest = PricingBacktest(DynamicPricingService(), use_market=False)
+        backtest.process(_card(START, travel=START, price=5.0), base_price=1.0, score=False)
+
+        assert backtest.report.cards == 1
+        assert backtest.report.samples == 0
+
+    @pytest.mark.slow
+    def test_backtest_benchmark(self):
+        """200k cards over 2,000 routes replay in a few seconds."""
+        routes = [(o, d) for o in range(1, 41) for d in range(101, 151)]
+        history = _random_history(200_000, routes=routes, seed=1)
+        backtest = PricingBacktest(DynamicPricingService(), use_market=True)
+
+        started = time.perf_counter()
+        for card in history:
+            backtest.process(card, base_price=1.0)
+        elapsed = time.perf_counter() - started
+
+        assert backtest.report.cards == 200_000
+        assert elapsed < 10.0
+
+    @pytest.mark.slow
+    def test_skewed_route_benchmark(self):
+        """100k cards on a single hot route stay near-linear."""
+        history = _random_history(100_000, routes=[(1, 10)], seed=2)
+        backtest = PricingBacktest(DynamicPricingService(), use_market=True)
+
+        started = time.perf_counter()
+        for card in history:
+            backtest.process(card, base_price=1.0)
+        elapsed = time.perf_counter() - started
+
+        assert backtest.report.cards == 100_000
+        assert elapsed < 10.0
+
+
+@pytest.mark.asyncio
+class TestRunBacktest:
+    """Tests for run_backtest."""
+
+    async def test_streams_history_and_scores_since(self):
+        """Cards before `since` warm up state; base prices are looked up once per route."""
+        history = _random_history(50, routes=[(1, 10), (2, 20)])
+        since = history[25].created_at
+
+        async def stream(db, since=None, until=None):
+            for card in history:
+                yield tuple(card)
+
+        with patch('app.services.pricing_backtest_service.card_repo') as mock_card_repo, \
+                patch('app.services.pricing_backtest_service.route_price_matrix') as mock_matrix:
+            mock_card_repo.stream_pricing_history = stream
+            mock_matrix.ensure_loaded = AsyncMock()
+            mock_matrix.lookup = AsyncMock(return_value=BasePriceResult(
+                price=1.0, ticket_price=None, source="database"
+            ))
+            report = await run_backtest(MagicMock(), since=since)
+
+        assert report.cards == 50
+        assert report.samples == sum(1 for c in history[25:] if c.price_per_kg)
+        assert mock_matrix.lookup.await_count == 2
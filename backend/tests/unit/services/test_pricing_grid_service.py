@@ -0,0 +1,211 @@
+"""Unit tests for the vectorized pricing grid."""
+import time
+import pytest
+import numpy as np
+from datetime import date, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services import pricing_grid_service
+from app.services.dynamic_pricing_service import DynamicPricingService
+from app.schemas.price import BasePriceResult, MarketPriceOut
+
+
+class TestVectorizedFactors:
+    """Vectorized factors must match the scalar DynamicPricingService factors."""
+
+    def setup_method(self):
+        self.service = DynamicPricingService()
+
+    def test_route_factors_match_scalar(self):
+        counts = np.array([0, 10, 11, 50, 51, 100, 101, 500])
+        expected = [self.service._route_factor_from_count(int(c)) for c in counts]
+        assert pricing_grid_service.route_factors(counts).tolist() == expected
+
+    def test_season_factors_match_scalar(self):
+        dates = [date(2025, 1, 1) + timedelta(days=i) for i in range(366)]
+        expected = [self.service._get_season_factor(d) for d in dates]
+        assert pricing_grid_service.season_factors(dates).tolist() == expected
+
+    def test_urgency_factors_match_scalar(self):
+        now = datetime.utcnow()
+        dates = [(now + timedelta(days=i)).date() for i in range(-3, 45)]
+        expected = [
+            self.service._get_urgency_factor(datetime.combine(d, datetime.min.time()))
+            for d in dates
+        ]
+        assert pricing_grid_service.urgency_factors(dates, now).tolist() == expected
+
+    def test_demand_factors_match_scalar(self):
+        pairs = [(t, s) for t in range(0, 12) for s in range(0, 40, 3)]
+        travelers = np.array([t for t, _ in pairs], dtype=float)
+        senders = np.array([s for _, s in pairs], dtype=float)
+        expected = [self.service._demand_factor_from_counts(t, s) for t, s in pairs]
+        result = pricing_grid_service.demand_factors(travelers, senders)
+        assert np.allclose(result, expected)
+
+    def test_market_blend_matches_scalar(self):
+        samples = np.array([0, 4, 5, 20, 50, 500, 30])
+        medians = np.array([9.0, 9.0, 9.0, 9.0, 9.0, 9.0, np.nan])
+        prices = np.full((len(samples), 2), 4.0)
+        expected = [
+            self.service._blend(4.0, int(n), None if np.isnan(m) else float(m))
+            for n, m in zip(samples, medians)
+        ]
+        result = pricing_grid_service.market_blend(prices, samples, medians, self.service)
+        assert np.allclose(result[:, 0], expected)
+        assert np.allclose(result[:, 1], expected)
+
+
+def _mock_repo(mock_repo, routes, traveler_rows=(), sender_rows=()):
+    mock_repo.get_all_routes = AsyncMock(return_value=routes)
+    mock_repo.get_base_prices_bulk = AsyncMock(return_value={
+        route: BasePriceResult(price=1.0, ticket_price=300, source="database") for route in routes
+    })
+    mock_repo.get_route_statistics_bulk = AsyncMock(return_value={route: 60 for route in routes})
+    mock_repo.get_traveler_daily_counts = AsyncMock(return_value=list(traveler_rows))
+    mock_repo.get_sender_interval_counts = AsyncMock(return_value=list(sender_rows))
+
+
+def _market(route, sample_count, median):
+    return MarketPriceOut(
+        origin_city_id=route[0], destination_city_id=route[1],
+        sample_count=sample_count, median=median
+    )
+
+
+@pytest.fixture(autouse=True)
+def mock_markets():
+    """No market data unless a test sets get_market_prices_bulk."""
+    with patch('app.services.pricing_grid_service.market_price_service') as mock_service:
+        mock_service.get_market_prices_bulk = AsyncMock(return_value={})
+        yield mock_service
+
+
+@pytest.mark.asyncio
+class TestComputePriceGrid:
+    """Tests for compute_price_grid."""
+
+    async def test_grid_matches_scalar_pricing(self):
+        """Each cell equals the scalar price for the same route and week."""
+        service = DynamicPricingService()
+        start = date.today() + timedelta(days=60)
+        routes = [(1, 10), (2, 20)]
+        traveler_rows = [(1, 10, start, 2), (1, 10, start + timedelta(days=9), 1)]
+        sender_rows = [(1, 10, start - timedelta(days=3), start + timedelta(days=3), 5)]
+
+        with patch('app.services.pricing_grid_service.route_price_repo') as mock_repo:
+            _mock_repo(mock_repo, routes, traveler_rows, sender_rows)
+            grid = await pricing_grid_service.compute_price_grid(
+                MagicMock(), start_date=start, weeks=3, service=service
+            )
+
+        assert grid.prices.shape == (2, 3)
+        # week 0 window holds 2 travelers (start) and 5 senders -> ratio 2.5
+        week0 = datetime.combine(start, datetime.min.time())
+        expected = (
+            1.0
+            * service._route_factor_from_count(60)
+            * service._get_season_factor(week0)
+            * service._demand_factor_from_counts(2, 5)
+            * service._get_urgency_factor(week0)
+            * service.PRICE_MULTIPLIER
+        )
+        expected = max(service.MIN_PRICE_PER_KG, min(service.MAX_PRICE_PER_KG, expected))
+        assert grid.prices[0, 0] == round(expected, 2)
+        # route without cards gets the "no supply" demand factor in every week
+        week1 = week0 + timedelta(weeks=1)
+        no_supply = (
+            service._route_factor_from_count(60)
+            * service._get_season_factor(week1)
+            * 1.5
+            * service._get_urgency_factor(week1)
+            * service.PRICE_MULTIPLIER
+        )
+        assert grid.prices[1, 1] == round(min(service.MAX_PRICE_PER_KG, no_supply), 2)
+
+    async def test_grid_matches_calculate_price(self, mock_markets):
+        """A cell equals the /pricing/suggest price (market blend included)."""
+        service = DynamicPricingService(cache_ttl_seconds=0)
+        start = date.today() + timedelta(days=60)
+        routes = [(1, 10), (2, 20)]
+        traveler_rows = [(1, 10, start, 2)]
+        sender_rows = [(1, 10, start - timedelta(days=3), start + timedelta(days=3), 5)]
+        markets = {(1, 10): _market((1, 10), 30, 20.0), (2, 20): _market((2, 20), 3, 40.0)}
+        mock_markets.get_market_prices_bulk = AsyncMock(return_value=markets)
+
+        with patch('app.services.pricing_grid_service.route_price_repo') as mock_repo:
+            _mock_repo(mock_repo, routes, traveler_rows, sender_rows)
+            grid = await pricing_grid_service.compute_price_grid(
+                MagicMock(), start_date=start, weeks=1, service=service
+            )
+
+        travel_date = datetime.combine(start, datetime.min.time())
+        for row, (route, counts) in enumerate([((1, 10), (2, 5)), ((2, 20), (0, 0))]):
+            with patch('app.services.dynamic_pricing_service.route_price_repo') as scalar_repo, \
+                 patch('app.services.dynamic_pricing_service.market_price_service') as scalar_market:
+                scalar_repo.get_base_price = AsyncMock(
+                    return_value=BasePriceResult(price=1.0, ticket_price=300, source="database")
+                )
+                scalar_repo.get_route_statistics = AsyncMock(return_value={"monthly_cards": 60})
+                scalar_repo.get_supply_demand_counts = AsyncMock(return_value=counts)
+                scalar_market.get_market_price = AsyncMock(return_value=markets[route])
+                suggestion = await service.calculate_price(MagicMock(), *route, travel_date=travel_date)
+
+            assert grid.prices[row, 0] == suggestion.suggested_price_per_kg
+
+    async def test_iter_rows(self):
+        """Rows are streamed in route order with one price per week."""
+        with patch('app.services.pricing_grid_service.route_price_repo') as mock_repo:
+            _mock_repo(mock_repo, [(1, 10), (2, 20)])
+            grid = await pricing_grid_service.compute_price_grid(
+                MagicMock(), start_date=date.today(), weeks=4
+            )
+
+        rows = list(grid.iter_rows())
+        assert [(r["origin_city_id"], r["destination_city_id"]) for r in rows] == [(1, 10), (2, 20)]
+        assert all(len(r["prices"]) == 4 for r in rows)
+
+    async def test_empty_routes(self):
+        """No routes yields an empty matrix without further queries."""
+        with patch('app.services.pricing_grid_service.route_price_repo') as mock_repo:
+            _mock_repo(mock_repo, [])
+            grid = await pricing_grid_service.compute_price_grid(
+                MagicMock(), start_date=date.today(), weeks=4
+            )
+
+        assert grid.prices.shape == (0, 4)
+        mock_repo.get_base_prices_bulk.assert_not_called()
+
+    @pytest.mark.slow
+    async def test_thousands_of_routes_benchmark(self):
+        """5,000 routes × 52 weeks with 100k card aggregates stays well under a few seconds."""
+        rng = np.random.default_rng(0)
+        routes = [(o, d) for o in range(1, 101) for d in range(101, 151)]
+        start = date.today()
+        traveler_rows = [
+            (*routes[i], start + timedelta(days=int(day)), int(c))
+            for i, day, c in zip(
+                rng.integers(0, len(routes), 50_000),
+                rng.integers(0, 364, 50_000),
+                rng.integers(1, 5, 50_000)
+            )
+        ]
+        sender_rows = [
+            (*routes[i], start + timedelta(days=int(day)), start + timedelta(days=int(day + span)), 1)
+            for i, day, span in zip(
+                rng.integers(0, len(routes), 50_000),
+                rng.integers(0, 364, 50_000),
+                rng.integers(0, 30, 50_000)
+            )
+        ]
+
+        with patch('app.services.pricing_grid_service.route_price_repo') as mock_repo:
+            _mock_repo(mock_repo, routes, traveler_rows, sender_rows)
+            started = time.perf_counter()
+            grid = await pricing_grid_service.compute_price_grid(
+                MagicMock(), start_date=start, weeks=52
+            )
+            elapsed = time.perf_counter() - started
+
+        assert grid.prices.shape == (5000, 52)
+        assert elapsed < 5.0
@@ -0,0 +1,100 @@
+"""Unit tests for realtime event fan-out."""
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services import realtime_service
+from app.services.realtime_service import RealtimeHub, QUEUE_SIZE, channel_for
+
+
+def _hub_with_mocks():
+    hub = RealtimeHub(client=MagicMock())
+    hub._client.publish = AsyncMock()
+    hub._pubsub = MagicMock()
+    hub._pubsub.subscribe = AsyncMock()
+    hub._pubsub.unsubscribe = AsyncMock()
+    hub._ensure_reader = MagicMock()
+    return hub
+
+
+@pytest.mark.asyncio
+class TestRealtimeHub:
+    """Tests for RealtimeHub."""
+    
+    async def test_publish_to_user_channel(self):
+        hub = _hub_with_mocks()
+        
+        await hub.publish(7, "unread", {"unread_count": 3})
+        
+        channel, payload = hub._client.publish.await_args.args
+        assert channel == "realtime:user:7"
+        assert json.loads(payload) == {"type": "unread", "data": {"unread_count": 3}}
+    
+    async def test_subscribe_once_per_user(self):
+        """Redis subscription is shared by all local connections of a user."""
+        hub = _hub_with_mocks()
+        
+        async with hub.subscribe(7):
+            async with hub.subscribe(7):
+                assert hub._pubsub.subscribe.await_count == 1
+            hub._pubsub.unsubscribe.assert_not_awaited()
+        
+        hub._pubsub.unsubscribe.assert_awaited_once_with(channel_for(7))
+        assert hub._subscribers == {}
+    
+    async def test_dispatch_only_to_target_user(self):
+        hub = _hub_with_mocks()
+        
+        async with hub.subscribe(7) as first, hub.subscribe(7) as second, hub.subscribe(8) as other:
+            hub.dispatch(channel_for(7), '{"type": "message"}')
+            
+            assert first.get_nowait() == second.get_nowait() == '{"type": "message"}'
+            assert other.empty()
+    
+    async def test_slow_consumer_gets_resync(self):
+        """A full queue is replaced by a single resync event."""
+        hub = _hub_with_mocks()
+        
+        async with hub.subscribe(7) as queue:
+            for i in range(QUEUE_SIZE + 1):
+                hub.dispatch(channel_for(7), str(i))
+            
+            assert queue.qsize() == 1
+            assert json.loads(queue.get_nowait())["type"] == "resync"
+    
+    async def test_read_loop_dispatches_messages(self):
+        hub = _hub_with_mocks()
+        hub._pubsub.get_message = AsyncMock(side_effect=[
+            {"type": "message", "channel": channel_for(7), "data": "payload"},
+            asyncio.CancelledError(),
+        ])
+        
+        async with hub.subscribe(7) as queue:
+            with pytest.raises(asyncio.CancelledError):
+                await hub._read_loop()
+            assert queue.get_nowait() == "payload"
+    
+    async def test_ticket_single_use(self):
+        hub = _hub_with_mocks()
+        stored = {}
+        hub._client.set = AsyncMock(side_effect=lambda key, value, ex: stored.__setitem__(key, str(value)))
+        hub._client.getdel = AsyncMock(side_effect=lambda key: stored.pop(key, None))
+        
+        with patch.object(realtime_service.settings, "REALTIME_TICKET_SECONDS", 30):
+            ticket = await hub.issue_ticket(7)
+        
+        assert hub._client.set.await_args.kwargs == {"ex": 30}
+        assert await hub.redeem_ticket(ticket) == 7
+        assert await hub.redeem_ticket(ticket) is None
+    
+    async def test_unknown_ticket(self):
+        hub = _hub_with_mocks()
+        hub._client.getdel = AsyncMock(return_value=None)
+        
+        assert await hub.redeem_ticket("forged") is None
+    
+    async def test_module_publish_swallows_redis_errors(self):
+        with patch.object(realtime_service, "realtime_hub") as mock_hub:
+            mock_hub.publish = AsyncMock(side_effect=ConnectionError("redis down"))
+            await realtime_service.publish(7, "unread", {})
@@ -0,0 +1,196 @@
+"""Unit tests for Redis unread counters."""
+from contextlib import asynccontextmanager
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from redis.exceptions import ConnectionError as RedisConnectionError, WatchError
+
+from app.services.unread_counter_service import ADVISORY_LOCK_KEY, UnreadCounterService, to_mapping
+
+
+def _hgetall_results(stored: dict):
+    return lambda commands: [stored.get(cmd[1][0], {}) for cmd in commands if cmd[0] == "hgetall"]
+
+
+def _service(client: MagicMock) -> UnreadCounterService:
+    return UnreadCounterService(client=client)
+
+
+@pytest.mark.asyncio
+class TestGetTotal:
+    """Tests for UnreadCounterService.get_total."""
+    
+    async def test_hit_is_single_hget(self, mock_db_session):
+        client = MagicMock()
+        client.hget = AsyncMock(return_value="4")
+        
+        with patch("app.services.unread_counter_service.message_repo") as repo:
+            assert await _service(client).get_total(mock_db_session, 7) == 4
+        
+        client.hget.assert_awaited_once_with("unread:7", "total")
+        repo.get_unread_counts_by_user.assert_not_called()
+    
+    async def test_miss_rebuilds_from_database(self, mock_db_session):
+        client = MagicMock()
+        client.hget = AsyncMock(return_value=None)
+        client.get = AsyncMock(return_value="5")
+        client.eval = AsyncMock(return_value=1)
+        
+        with patch("app.services.unread_counter_service.message_repo") as repo:
+            repo.get_unread_counts_by_user = AsyncMock(return_value={7: {2: 3, 5: 1}})
+            assert await _service(client).get_total(mock_db_session, 7) == 4
+        
+        client.get.assert_awaited_once_with("unread:7:version")
+        assert client.eval.await_args.args[1:] == (
+            2, "unread:7", "unread:7:version", "5", 60 * 60 * 24 * 7, "c:2", 3, "c:5", 1, "total", 4
+        )
+    
+    async def test_rebuild_skips_store_without_version(self, mock_db_session):
+        client = MagicMock()
+        client.hget = AsyncMock(return_value=None)
+        client.get = AsyncMock(side_effect=RedisConnectionError("down"))
+        client.eval = AsyncMock()
+        
+        with patch("app.services.unread_counter_service.message_repo") as repo:
+            repo.get_unread_counts_by_user = AsyncMock(return_value={7: {2: 3}})
+            assert await _service(client).get_total(mock_db_session, 7) == 3
+        
+        client.eval.assert_not_awaited()
+    
+    async def test_redis_down_falls_back_to_database(self, mock_db_session):
+        client = MagicMock()
+        client.hget = AsyncMock(side_effect=RedisConnectionError("down"))
+        
+        with patch("app.services.unread_counter_service.message_repo") as repo:
+            repo.get_total_unread_count = AsyncMock(return_value=2)
+            assert await _service(client).get_total(mock_db_session, 7) == 2
+
+
+@pytest.mark.asyncio
+class TestUpdates:
+    """Tests for increment/reset."""
+    
+    async def test_increment_targets_receiver_hash_and_version(self):
+        client = MagicMock()
+        client.eval = AsyncMock()
+        
+        await _service(client).increment(receiver_id=7, sender_id=2)
+        
+        assert client.eval.await_args.args[1:] == (2, "unread:7", "unread:7:version", 3600, "c:2")
+    
+    async def test_reset_swallows_redis_errors(self):
+        client = MagicMock()
+        client.eval = AsyncMock(side_effect=RedisConnectionError("down"))
+        
+        await _service(client).reset(7, 2)
+    
+    async def test_subtract_is_single_eval(self):
+        client = MagicMock()
+        client.eval = AsyncMock()
+        
+        await _service(client).subtract(7, {2: 3, 5: 0, 9: 1})
+        
+        client.eval.assert_awaited_once()
+        assert client.eval.await_args.args[1:] == (2, "unread:7", "unread:7:version", 3600, "c:2", 3, "c:9", 1)
+    
+    async def test_subtract_nothing_skips_redis(self):
+        client = MagicMock()
+        client.eval = AsyncMock()
+        
+        await _service(client).subtract(7, {})
+        
+        client.eval.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+class TestReconcile:
+    """Tests for drift detection and repair."""
+    
+    def _client(self, fake_pipeline, stored: dict, fail_execute: Exception = None):
+        client = MagicMock()
+        reader = fake_pipeline(_hgetall_results(stored))
+        tx = fake_pipeline(_hgetall_results(stored), fail_execute)
+        client.pipeline.side_effect = lambda transaction=True: tx if transaction else reader
+        
+        async def scan_iter(**kwargs):
+            for key in stored:
+                yield key
+        client.scan_iter = scan_iter
+        return client, tx
+    
+    async def test_repairs_only_drifted_users(self, mock_db_session, fake_pipeline):
+        stored = {
+            "unread:1": {"total": "2", "c:9": "2"},
+            "unread:2": {"total": "5", "c:9": "5"},
+        }
+        client, tx = self._client(fake_pipeline, stored)
+        
+        with patch("app.services.unread_counter_service.message_repo") as repo:
+            repo.get_unread_counts_by_user = AsyncMock(return_value={1: {9: 2}, 2: {9: 1}})
+            repaired = await _service(client).reconcile(mock_db_session)
+        
+        assert repaired == 1
+        tx.watch.assert_awaited_once_with("unread:1", "unread:2")
+        assert ("hset", ("unread:2",), {"mapping": {"c:9": 1, "total": 1}}) in tx.commands
+        assert not any(cmd[0] == "hset" and cmd[1] == ("unread:1",) for cmd in tx.commands)
+    
+    async def test_concurrent_update_skips_batch(self, mock_db_session, fake_pipeline):
+        client, _ = self._client(fake_pipeline, {"unread:1": {"total": "3", "c:9": "3"}}, WatchError())
+        
+        with patch("app.services.unread_counter_service.message_repo") as repo:
+            repo.get_unread_counts_by_user = AsyncMock(return_value={1: {}})
+            assert await _service(client).reconcile(mock_db_session) == 0
+
+
+def test_to_mapping_drops_zero_counts():
+    assert to_mapping({2: 0, 3: 4}) == {"c:3": 4, "total": 4}
+    assert to_mapping({}) == {"total": 0}
+
+
+def _engine(locked: bool):
+    conn = MagicMock()
+    conn.execution_options = AsyncMock(return_value=conn)
+    conn.scalar = AsyncMock(return_value=locked)
+    conn.execute = AsyncMock()
+
+    @asynccontextmanager
+    async def connect():
+        yield conn
+
+    engine = MagicMock()
+    engine.connect = connect
+    return engine, conn
+
+
+@asynccontextmanager
+async def _session():
+    yield MagicMock()
+
+
+@pytest.mark.asyncio
+class TestRunReconcile:
+    """Tests for the advisory-locked reconcile round."""
+    
+    async def test_skips_when_another_worker_holds_lock(self):
+        engine, conn = _engine(locked=False)
+        service = _service(MagicMock())
+        service.reconcile = AsyncMock()
+        
+        with patch("app.services.unread_counter_service.engine", engine):
+            assert await service.run_reconcile() is None
+        
+        service.reconcile.assert_not_awaited()
+        conn.execute.assert_not_awaited()
+    
+    async def test_reconciles_and_releases_lock(self):
+        engine, conn = _engine(locked=True)
+        service = _service(MagicMock())
+        service.reconcile = AsyncMock(return_value=3)
+        
+        with patch("app.services.unread_counter_service.engine", engine), \
+             patch("app.services.unread_counter_service.get_db_session", _session):
+            assert await service.run_reconcile() == 3
+        
+        assert conn.scalar.await_args.args[1] == {"key": ADVISORY_LOCK_KEY}
+        assert "pg_advisory_unlock" in str(conn.execute.await_args.args[0])
@@ -0,0 +1,190 @@
+"""Unit tests for the async TTL cache."""
+import asyncio
+import pytest
+
+from app.utils.cache import AsyncTTLCache
+
+
+@pytest.mark.asyncio
+class TestAsyncTTLCache:
+    """Tests for AsyncTTLCache."""
+
+    async def test_get_or_compute_caches_value(self):
+        """مقدار محاسبه‌شده باید کش شود."""
+        cache = AsyncTTLCache(ttl_seconds=60)
+        calls = 0
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            return "value"
+
+        assert await cache.get_or_compute("k", factory) == "value"
+        assert await cache.get_or_compute("k", factory) == "value"
+        assert calls == 1
+
+    async def test_expired_entry_recomputed(self):
+        """entry منقضی باید دوباره محاسبه شود."""
+        cache = AsyncTTLCache(ttl_seconds=0)
+        calls = 0
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        assert await cache.get_or_compute("k", factory) == 1
+        assert await cache.get_or_compute("k", factory) == 2
+
+    async def test_concurrent_requests_coalesced(self):
+        """درخواست‌های هم‌زمان باید یک محاسبه را به اشتراک بگذارند."""
+        cache = AsyncTTLCache(ttl_seconds=60)
+        calls = 0
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "shared"
+
+        results = await asyncio.gather(
+            *[cache.get_or_compute("k", factory) for _ in range(10)]
+        )
+
+        assert results == ["shared"] * 10
+        assert calls == 1
+
+    async def test_failure_not_cached_and_propagated(self):
+        """خطا باید به همه منتظرها برسد و کش نشود."""
+        cache = AsyncTTLCache(ttl_seconds=60)
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            cache.get_or_compute("k", failing),
+            cache.get_or_compute("k", failing),
+            return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert cache.get("k") is None
+
+    async def test_leader_cancelled_waiter_recomputes(self):
+        """لغو درخواست اول نباید منتظرهای دیگر را لغو کند."""
+        cache = AsyncTTLCache(ttl_seconds=60)
+        calls = 0
+
+        async def factory():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return calls
+
+        leader = asyncio.create_task(cache.get_or_compute("k", factory))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get_or_compute("k", factory))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+
+        assert await waiter == 2
+        assert leader.cancelled()
+        assert cache.get("k") == 2
+
+    async def test_invalidate_tag(self):
+        """ابطال tag باید فقط entryهای همان tag را حذف کند."""
+        cache = AsyncTTLCache(ttl_seconds=60)
+        cache.set("a", 1, tag="route-1")
+        cache.set("b", 2, tag="route-1")
+        cache.set("c", 3, tag="route-2")
+
+        assert cache.invalidate_tag("route-1") == 2
+        assert cache.get("a") is None
+        assert cache.get("b") is None
+        assert cache.get("c") == 3
+
+    async def test_invalidation_during_compute_skips_store(self):
+        """اگر در حین محاسبه tag باطل شود، نتیجه قدیمی کش نشود."""
+        cache = AsyncTTLCache(ttl_seconds=60)
+
+        async def factory():
+            cache.invalidate_tag("route")
+            return "stale"
+
+        assert await cache.get_or_compute("k", factory, tag="route") == "stale"
+        assert cache.get("k") is None
+
+    async def test_max_entries_evicts(self):
+        """تعداد entryها نباید از max_entries بیشتر شود."""
+        cache = AsyncTTLCache(ttl_seconds=60, max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("c", 3)
+
+        assert len(cache) == 2
+        assert cache.get("c") == 3
+
+    async def test_expired_and_evicted_keys_leave_their_tags(self):
+        """کلید منقضی یا حذف‌شده باید از tag خارج و tag خالی حذف شود."""
+        cache = AsyncTTLCache(ttl_seconds=0, max_entries=1)
+        cache.set("a", 1, tag="route-1")
+        assert cache.get("a") is None
+
+        cache.ttl_seconds = 60
+        cache.set("b", 2, tag="route-2")
+        cache.set("c", 3, tag="route-3")
+
+        assert cache._tags == {"route-3": {"c"}}
+        assert cache._key_tags == {"c": "route-3"}
+
+    async def test_generations_dropped_after_compute(self):
+        """نسخه tag پس از پایان محاسبه‌ها نگه داشته نشود."""
+        cache = AsyncTTLCache(ttl_seconds=60)
+
+        async def factory():
+            return 1
+
+        await cache.get_or_compute("k", factory, tag="route")
+        cache.invalidate_tag("route")
+        cache.invalidate_tag("other")
+
+        assert cache._generations == {}
+        assert cache._pending == {}
+
+    async def test_retag_moves_key(self):
+        """ذخیره دوباره کلید با tag دیگر باید tag قبلی را پاک کند."""
+        cache = AsyncTTLCache(ttl_seconds=60)
+        cache.set("k", 1, tag="route-1")
+        cache.set("k", 2, tag="route-2")
+
+        assert cache.invalidate_tag("route-1") == 0
+        assert cache.get("k") == 2
+
+    async def test_get_or_compute_many_loads_only_missing(self):
+        """فقط کلیدهای غایب با یک فراخوانی محاسبه شوند."""
+        cache = AsyncTTLCache(ttl_seconds=60)
+        cache.set("a", 1, tag="a")
+        calls = []
+
+        async def factory(missing):
+            calls.append(missing)
+            return {key: key.upper() for key in missing}
+
+        assert await cache.get_or_compute_many(["a", "b", "b"], factory) == {"a": 1, "b": "B"}
+        assert await cache.get_or_compute_many(["a", "b"], factory) == {"a": 1, "b": "B"}
+        assert calls == [["b"]]
+
+    async def test_get_or_compute_many_skips_invalidated_keys(self):
+        """کلیدی که در حین محاسبه باطل شود کش نشود."""
+        cache = AsyncTTLCache(ttl_seconds=60)
+
+        async def factory(missing):
+            cache.invalidate_tag("a")
+            return {key: "stale" for key in missing}
+
+        assert await cache.get_or_compute_many(["a", "b"], factory) == {"a": "stale", "b": "stale"}
+        assert cache.get("a") is None
+        assert cache.get("b") == "stale"
+        assert cache._generations == {}
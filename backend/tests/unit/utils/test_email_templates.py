@@ -1,7 +1,16 @@
 """Unit tests for email templates."""
 
 import pytest
-from app.utils.email_templates import get_template, TEMPLATES
+from unittest.mock import patch
+from app.utils.email_templates import (
+    get_template,
+    TEMPLATES,
+    CompiledTemplate,
+    CompiledText,
+    TemplateError,
+    TemplateRegistry,
+    template_registry,
+)
 
 
 class TestGetTemplate:
@@ -141,3 +150,59 @@ class TestTemplatesStructure:
                 assert not persian_chars, f"{template_name}[en] subject contains Persian/Arabic"
 
 
+class TestTemplateRegistry:
+    """Tests for compiled templates."""
+    
+    def test_compiled_matches_str_format(self):
+        """Every template renders exactly like str.format."""
+        for template_name, languages in TEMPLATES.items():
+            for language, content in languages.items():
+                compiled = CompiledTemplate(template_name, language, content)
+                context = {name: f"<{name}>" for name in compiled.placeholders}
+                assert compiled.render(context) == (
+                    content["subject"].format(**context),
+                    content["body"].format(**context),
+                )
+    
+    def test_static_text_cached(self):
+        text = CompiledText("No placeholders {{here}}")
+        
+        assert text.placeholders == frozenset()
+        assert text.render({}) is text.render({"x": 1})
+        assert text.render({}) == "No placeholders {here}"
+    
+    def test_missing_placeholder_raises_key_error(self):
+        with pytest.raises(KeyError):
+            CompiledText("Hello {first_name}").render({})
+    
+    def test_invalid_placeholders_rejected(self):
+        for source in ("{user.name}", "{0}", "{count:>5}", "{name!r}", "{unclosed"):
+            with pytest.raises(TemplateError):
+                CompiledText(source)
+    
+    def test_languages_must_share_placeholders(self):
+        templates = {
+            "greeting": {
+                "en": {"subject": "Hi", "body": "Hello {first_name}"},
+                "fa": {"subject": "سلام", "body": "سلام {name}"},
+            }
+        }
+        
+        with pytest.raises(TemplateError, match="greeting"):
+            TemplateRegistry(templates)
+    
+    def test_render_bulk_renders_once(self):
+        languages = ["fa", "en", "ar", None, "fa"] * 20
+        
+        with patch.object(CompiledTemplate, "render", autospec=True, side_effect=lambda self, ctx: ("s", "b")) as render:
+            rendered = template_registry.render_bulk(
+                "membership_request", languages, user_name="Ali", community_name="Travelers"
+            )
+        
+        assert render.call_count == 1
+        assert set(rendered) == {"fa", "en", "ar", None}
+    
+    def test_render_bulk_unknown_template(self):
+        rendered = template_registry.render_bulk("nonexistent_template", ["en"])
+        
+        assert rendered["en"][0] == "nonexistent_template"
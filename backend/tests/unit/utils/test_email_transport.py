@@ -0,0 +1,144 @@
+"""Unit tests for the email transports."""
+import smtplib
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.utils.email import EmailTransport, OutgoingEmail, ResendTransport, SmtpTransport
+
+
+def _emails(count: int) -> list[OutgoingEmail]:
+    return [OutgoingEmail(f"user{index}@example.com", "Subject", "Body") for index in range(count)]
+
+
+def _transport(**overrides) -> SmtpTransport:
+    options = dict(
+        host="localhost", port=1025, user=None, password=None, from_addr="no-reply@example.local",
+        pool_size=2, idle_seconds=60, timeout=5
+    )
+    options.update(overrides)
+    return SmtpTransport(**options)
+
+
+class TestEmailTransport:
+    """Tests for the EmailTransport interface."""
+
+    def test_send_many_required(self):
+        class Incomplete(EmailTransport):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+
+class TestSmtpTransport:
+    """Tests for SmtpTransport."""
+
+    def test_reuses_connection_across_batches(self):
+        transport = _transport()
+
+        with patch("app.utils.email.smtplib.SMTP") as smtp:
+            assert transport.send_many(_emails(3)) == [None, None, None]
+            assert transport.send_many(_emails(2)) == [None, None]
+
+        assert smtp.call_count == 1
+        assert transport.connections_opened == 1
+        assert smtp.return_value.send_message.call_count == 5
+
+    def test_login_once_per_connection(self):
+        transport = _transport(user="user", password="secret")
+
+        with patch("app.utils.email.smtplib.SMTP") as smtp:
+            transport.send_many(_emails(3))
+
+        smtp.return_value.starttls.assert_called_once()
+        smtp.return_value.login.assert_called_once_with("user", "secret")
+
+    def test_reconnects_when_pooled_connection_dropped(self):
+        transport = _transport()
+        stale = MagicMock()
+        stale.send_message.side_effect = smtplib.SMTPServerDisconnected("closed")
+        fresh = MagicMock()
+
+        with patch("app.utils.email.smtplib.SMTP", side_effect=[stale, fresh]):
+            assert transport.send_many(_emails(2)) == [None, None]
+
+        assert fresh.send_message.call_count == 2
+
+    def test_recipient_error_does_not_fail_batch(self):
+        transport = _transport()
+
+        with patch("app.utils.email.smtplib.SMTP") as smtp:
+            smtp.return_value.send_message.side_effect = [
+                None, smtplib.SMTPRecipientsRefused({"user1@example.com": (550, b"no")}), None
+            ]
+            errors = transport.send_many(_emails(3))
+
+        assert errors[0] is None and errors[2] is None
+        assert errors[1]
+
+    def test_data_error_keeps_connection(self):
+        transport = _transport()
+
+        with patch("app.utils.email.smtplib.SMTP") as smtp:
+            smtp.return_value.send_message.side_effect = [smtplib.SMTPDataError(554, b"rejected"), None]
+            errors = transport.send_many(_emails(2))
+            transport.send_many(_emails(1))
+
+        assert errors[0] and errors[1] is None
+        assert smtp.call_count == 1
+
+    def test_timeout_discards_connection(self):
+        transport = _transport()
+        timed_out = MagicMock()
+        timed_out.send_message.side_effect = TimeoutError("timed out")
+        fresh = MagicMock()
+
+        with patch("app.utils.email.smtplib.SMTP", side_effect=[timed_out, fresh]):
+            assert transport.send_many(_emails(3)) == ["timed out"] * 3
+            assert transport.send_many(_emails(1)) == [None]
+
+        timed_out.close.assert_called_once()
+        timed_out.quit.assert_not_called()
+        assert timed_out.send_message.call_count == 1
+        fresh.send_message.assert_called_once()
+
+    def test_unreachable_server_fails_whole_batch_fast(self):
+        transport = _transport()
+
+        with patch("app.utils.email.smtplib.SMTP", side_effect=ConnectionRefusedError("refused")) as smtp:
+            errors = transport.send_many(_emails(5))
+
+        assert errors == ["refused"] * 5
+        assert smtp.call_count == 2
+
+    def test_idle_connections_are_replaced(self):
+        transport = _transport(idle_seconds=0)
+
+        with patch("app.utils.email.smtplib.SMTP") as smtp:
+            transport.send_many(_emails(1))
+            transport.send_many(_emails(1))
+
+        assert smtp.call_count == 2
+        smtp.return_value.quit.assert_called_once()
+
+
+class TestResendTransport:
+    """Tests for ResendTransport."""
+
+    def test_one_request_per_hundred_emails(self):
+        transport = ResendTransport("re_test", "no-reply@example.local")
+        transport._resend = MagicMock()
+        transport._resend.Batch.send.side_effect = lambda params: {"data": [{"id": "x"}] * len(params)}
+
+        errors = transport.send_many(_emails(150))
+
+        assert errors == [None] * 150
+        assert [len(call.args[0]) for call in transport._resend.Batch.send.call_args_list] == [100, 50]
+
+    def test_failed_batch_marks_every_email(self):
+        transport = ResendTransport("re_test", "no-reply@example.local")
+        transport._resend = MagicMock()
+        transport._resend.Batch.send.side_effect = RuntimeError("rate limited")
+
+        assert transport.send_many(_emails(3)) == ["rate limited"] * 3
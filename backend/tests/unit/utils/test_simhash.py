@@ -0,0 +1,35 @@
+"""Unit tests for SimHash fingerprints."""
+from app.utils.simhash import hamming_distance, simhash
+
+OFFER = "Hi, I have a flight next week from Istanbul to Berlin and can carry a small package for you."
+
+
+class TestSimHash:
+    """Tests for simhash/hamming_distance."""
+
+    def test_identical_text(self):
+        assert simhash(OFFER) == simhash(OFFER)
+
+    def test_near_duplicate_is_close(self):
+        variant = OFFER.replace("package", "parcel")
+
+        assert hamming_distance(simhash(OFFER), simhash(variant)) <= 6
+
+    def test_unrelated_text_is_far(self):
+        other = "Do you still have the 5kg box for Dubai? I can take it on Friday."
+
+        assert hamming_distance(simhash(OFFER), simhash(other)) > 16
+
+    def test_normalization(self):
+        """حروف عربی، ارقام فارسی، حروف بزرگ و علائم fingerprint را تغییر نمی‌دهند."""
+        assert simhash("يك بسته ۵ كيلويي") == simhash("یک بسته 5 کیلویی!")
+        assert simhash("HELLO World") == simhash("hello, world")
+
+    def test_empty_text(self):
+        assert simhash("") == 0
+        assert simhash("?!") == 0
+
+
+def test_hamming_distance():
+    assert hamming_distance(0b1011, 0b0001) == 2
+    assert hamming_distance(2**64 - 1, 0) == 64
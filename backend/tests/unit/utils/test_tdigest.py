@@ -0,0 +1,55 @@
+"""Unit tests for the streaming t-digest."""
+import random
+
+from app.utils.tdigest import TDigest
+
+
+class TestTDigest:
+    """Tests for TDigest quantile estimation."""
+
+    def test_empty_digest(self):
+        digest = TDigest()
+        assert digest.count == 0
+        assert digest.quantile(0.5) is None
+
+    def test_single_value(self):
+        digest = TDigest()
+        digest.add(4.5)
+        assert digest.quantile(0.1) == 4.5
+        assert digest.quantile(0.9) == 4.5
+
+    def test_quantiles_close_to_exact(self):
+        rng = random.Random(0)
+        values = [rng.lognormvariate(1.5, 0.4) for _ in range(20_000)]
+        digest = TDigest()
+        digest.update(values)
+
+        exact = sorted(values)
+        for q in (0.25, 0.5, 0.75):
+            expected = exact[int(q * len(exact))]
+            assert abs(digest.quantile(q) - expected) / expected < 0.01
+        # memory stays bounded regardless of the number of values
+        assert len(digest.means) < 200
+
+    def test_merge_equals_single_stream(self):
+        rng = random.Random(1)
+        values = [rng.uniform(1, 20) for _ in range(5_000)]
+        left, right, whole = TDigest(), TDigest(), TDigest()
+        left.update(values[:2_000])
+        right.update(values[2_000:])
+        whole.update(values)
+
+        left.merge(right)
+
+        assert left.count == whole.count == 5_000
+        assert abs(left.quantile(0.5) - whole.quantile(0.5)) < 0.2
+
+    def test_dict_round_trip(self):
+        digest = TDigest()
+        digest.update([1.0, 2.0, 3.0, 10.0])
+
+        restored = TDigest.from_dict(digest.to_dict())
+
+        assert restored.count == 4
+        assert (restored.min, restored.max) == (1.0, 10.0)
+        assert restored.quantile(0.5) == digest.quantile(0.5)
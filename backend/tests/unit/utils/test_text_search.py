@@ -0,0 +1,49 @@
+"""Unit tests for the full-text search expressions."""
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from app.models.message import Message
+from app.utils.text_search import TRANSLATE_FROM, TRANSLATE_TO, search_vector
+
+
+def _translate(text: str) -> str:
+    """Python equivalent of Postgres translate(lower(text), TRANSLATE_FROM, TRANSLATE_TO)."""
+    table = {
+        ord(char): TRANSLATE_TO[index] if index < len(TRANSLATE_TO) else None
+        for index, char in enumerate(TRANSLATE_FROM)
+    }
+    return text.lower().translate(table)
+
+
+class TestNormalization:
+    """Tests for the translate() mapping."""
+
+    def test_arabic_letters_become_persian(self):
+        assert _translate("كيف") == _translate("کیف") == "کیف"
+
+    def test_digits_become_ascii(self):
+        assert _translate("۵kg") == _translate("٥KG") == "5kg"
+
+    def test_diacritics_and_tatweel_removed(self):
+        assert _translate("بَســته") == "بسته"
+
+    def test_zero_width_non_joiner_becomes_space(self):
+        assert _translate("می‌خواهم") == "می خواهم"
+
+    def test_no_duplicate_source_characters(self):
+        assert len(set(TRANSLATE_FROM)) == len(TRANSLATE_FROM)
+
+
+class TestSearchExpressions:
+    """Tests for the SQL expressions."""
+
+    def test_index_matches_query_expression(self):
+        """عبارت index و کوئری باید یکسان باشند تا planner از GIN استفاده کند."""
+        index = next(i for i in Message.__table__.indexes if i.name == "ix_message_body_search")
+        dialect = postgresql.dialect()
+
+        ddl = str(CreateIndex(index).compile(dialect=dialect))
+        expression = str(search_vector(Message.body).compile(dialect=dialect))
+
+        assert "USING gin" in ddl
+        assert expression.replace("message.body", "body") in ddl
@@ -276,6 +276,11 @@ export default function AdminAlertsPage() {
                           ایمیل شده
                         </span>
                       )}
+                      {alert.occurrences > 1 && (
+                        <span className="px-2 py-0.5 text-xs font-medium rounded-full bg-amber-100 text-amber-800">
+                          {alert.occurrences.toLocaleString('fa-IR')} بار
+                        </span>
+                      )}
                     </div>
                     
                     {/* Title & Message */}
@@ -296,6 +301,9 @@ export default function AdminAlertsPage() {
                     {/* Date */}
                     <p className="text-xs text-neutral-500">
                       {new Date(alert.created_at).toLocaleString('fa-IR')}
+                      {alert.occurrences > 1 && (
+                        <> — آخرین تکرار: {new Date(alert.last_seen_at).toLocaleString('fa-IR')}</>
+                      )}
                     </p>
                   </div>
                   
@@ -6,7 +6,7 @@ import { usePathname, useRouter } from 'next/navigation'
 import { cn } from '@/lib/utils'
 import { useAuth } from '@/contexts/AuthContext'
 import { useLanguage } from '@/contexts/LanguageContext'
-import { useUnreadCount } from '@/hooks/useMessages'
+import { useUnreadCount, useRealtimeEvents } from '@/hooks/useMessages'
 import Button from './Button'
 import LanguageSelector from './LanguageSelector'
 import Logo from './Logo'
@@ -21,6 +21,7 @@ export default function Navbar() {
   const { user, logout } = useAuth()
   const { t } = useLanguage()
   const { data: unreadCount, refetch } = useUnreadCount(!!user)
+  useRealtimeEvents(!!user)
   const [mobileMenuOpen, setMobileMenuOpen] = useState(false)
   const [profileMenuOpen, setProfileMenuOpen] = useState(false)
   const [reportModalOpen, setReportModalOpen] = useState(false)
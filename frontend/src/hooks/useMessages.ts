@@ -1,5 +1,6 @@
+import { useCallback, useEffect, useSyncExternalStore } from 'react'
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
-import { apiService } from '@/lib/api'
+import { apiService, API_URL } from '@/lib/api'
 import type { MessageCreate } from '@/types/message'
 
 /**
@@ -39,30 +40,86 @@ export function useSendMessage() {
   })
 }
 
+// مکالمه‌هایی که در این بازه باز می‌شوند با یک درخواست mark-read ارسال می‌شوند
+const MARK_READ_DEBOUNCE_MS = 500
+const pendingReads = new Set<number>()
+let markReadTimer: ReturnType<typeof setTimeout> | null = null
+
 /**
  * Hook برای علامت‌گذاری تمام پیام‌های یک مکالمه به عنوان خوانده شده
+ * (درخواست‌ها debounce و به صورت دسته‌ای ارسال می‌شوند)
  */
 export function useMarkAsRead() {
   const queryClient = useQueryClient()
   
-  return useMutation({
-    mutationFn: (userId: number) => apiService.markConversationAsRead(userId),
-    onSuccess: (_, userId) => {
-      queryClient.invalidateQueries({ queryKey: ['messages', userId] })
+  const mutation = useMutation({
+    mutationFn: (userIds: number[]) => apiService.markConversationsAsRead(userIds),
+    onSuccess: (_, userIds) => {
+      userIds.forEach((userId) => {
+        queryClient.invalidateQueries({ queryKey: ['messages', userId] })
+      })
       queryClient.invalidateQueries({ queryKey: ['conversations'] })
       queryClient.invalidateQueries({ queryKey: ['unread-count'] })
     },
   })
+  const { mutate: markMany } = mutation
+  
+  const mutate = useCallback((userId: number) => {
+    pendingReads.add(userId)
+    if (markReadTimer) return
+    markReadTimer = setTimeout(() => {
+      const userIds = Array.from(pendingReads)
+      pendingReads.clear()
+      markReadTimer = null
+      markMany(userIds)
+    }, MARK_READ_DEBOUNCE_MS)
+  }, [markMany])
+  
+  return { ...mutation, mutate }
+}
+
+// polling تعداد خوانده نشده‌ها فقط وقتی stream realtime وصل نیست
+const UNREAD_POLL_MS = 30000
+
+// backoff اتصال مجدد stream
+const RECONNECT_BASE_MS = 1000
+const RECONNECT_MAX_MS = 30000
+
+// وضعیت اتصال stream (مشترک بین همه componentها)
+let realtimeConnected = false
+const realtimeListeners = new Set<() => void>()
+
+function setRealtimeConnected(connected: boolean) {
+  if (realtimeConnected === connected) return
+  realtimeConnected = connected
+  realtimeListeners.forEach((listener) => listener())
+}
+
+function subscribeRealtime(listener: () => void) {
+  realtimeListeners.add(listener)
+  return () => {
+    realtimeListeners.delete(listener)
+  }
+}
+
+/**
+ * Hook برای وضعیت اتصال stream رویدادهای realtime
+ */
+export function useRealtimeConnected() {
+  return useSyncExternalStore(subscribeRealtime, () => realtimeConnected, () => false)
 }
 
 /**
  * Hook برای دریافت تعداد کل پیام‌های خوانده نشده
+ * (وقتی stream realtime قطع است هر 30 ثانیه refresh می‌شود)
  */
 export function useUnreadCount(enabled: boolean = true) {
+  const streaming = useRealtimeConnected()
+
   return useQuery({
     queryKey: ['unread-count'],
     queryFn: () => apiService.getUnreadMessagesCount(),
-    refetchInterval: enabled ? 30000 : false, // هر 30 ثانیه یک بار refresh (فقط اگر enabled باشد)
+    refetchInterval: enabled && !streaming ? UNREAD_POLL_MS : false,
     enabled, // فقط اگر کاربر لاگین باشد
     retry: false, // در صورت 401 دوباره تلاش نکن
     staleTime: 0, // همیشه fresh data بگیر
@@ -71,3 +128,100 @@ export function useUnreadCount(enabled: boolean = true) {
   })
 }
 
+
+/**
+ * Hook برای دریافت رویدادهای realtime (SSE) و به‌روزرسانی cacheها
+ * (تا وقتی stream وصل است جایگزین polling تعداد خوانده نشده‌ها)
+ *
+ * EventSource هدر Authorization نمی‌فرستد؛ هر اتصال با یک ticket یک‌بار مصرف
+ * از POST /realtime/ticket باز می‌شود (درخواست axios، پس access token منقضی
+ * شده پیش از آن تازه‌سازی می‌شود). در صورت قطع اتصال، EventSource بسته و با
+ * ticket جدید و backoff نمایی دوباره باز می‌شود.
+ */
+export function useRealtimeEvents(enabled: boolean = true) {
+  const queryClient = useQueryClient()
+
+  useEffect(() => {
+    if (!enabled || typeof window === 'undefined') return
+    if (!localStorage.getItem('access_token')) return
+
+    let source: EventSource | null = null
+    let timer: ReturnType<typeof setTimeout> | null = null
+    let attempt = 0
+    let stopped = false
+
+    const scheduleReconnect = () => {
+      if (stopped) return
+      const delay = Math.min(RECONNECT_MAX_MS, RECONNECT_BASE_MS * 2 ** attempt)
+      attempt += 1
+      timer = setTimeout(connect, delay * (0.5 + Math.random() / 2))
+    }
+
+    const connect = async () => {
+      timer = null
+      let ticket: string
+      try {
+        ticket = (await apiService.getRealtimeTicket()).ticket
+      } catch {
+        scheduleReconnect()
+        return
+      }
+      if (stopped) return
+
+      source = new EventSource(
+        `${API_URL}/api/v1/realtime/events?ticket=${encodeURIComponent(ticket)}`
+      )
+      source.onopen = () => {
+        if (attempt > 0) {
+          // رویدادهای زمان قطع بودن از دست رفته‌اند
+          queryClient.invalidateQueries({ queryKey: ['messages'] })
+          queryClient.invalidateQueries({ queryKey: ['conversations'] })
+        }
+        attempt = 0
+        setRealtimeConnected(true)
+      }
+      source.onmessage = handleEvent
+      source.onerror = () => {
+        // اتصال مجدد خودکار EventSource از ticket مصرف شده استفاده می‌کند
+        source?.close()
+        source = null
+        setRealtimeConnected(false)
+        scheduleReconnect()
+      }
+    }
+
+    const handleEvent = (event: MessageEvent) => {
+      const { type, data } = JSON.parse(event.data)
+      switch (type) {
+        case 'unread':
+          queryClient.setQueryData(['unread-count'], data.unread_count)
+          break
+        case 'message':
+          if (data.unread_count != null) {
+            queryClient.setQueryData(['unread-count'], data.unread_count)
+          }
+          queryClient.invalidateQueries({ queryKey: ['messages'] })
+          queryClient.invalidateQueries({ queryKey: ['conversations'] })
+          break
+        case 'read':
+          queryClient.invalidateQueries({ queryKey: ['messages', data.reader_id] })
+          queryClient.invalidateQueries({ queryKey: ['conversations'] })
+          break
+        case 'resync':
+          queryClient.invalidateQueries({ queryKey: ['messages'] })
+          queryClient.invalidateQueries({ queryKey: ['conversations'] })
+          queryClient.invalidateQueries({ queryKey: ['unread-count'] })
+          break
+      }
+    }
+
+    connect()
+
+    return () => {
+      stopped = true
+      if (timer) clearTimeout(timer)
+      source?.close()
+      setRealtimeConnected(false)
+    }
+  }, [enabled, queryClient])
+}
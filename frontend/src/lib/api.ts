@@ -2,9 +2,9 @@ import axios, { AxiosInstance } from 'axios'
 import type { SignupData, RequestOTPData, VerifyOTPData, AuthTokens, User } from '@/types/auth'
 import type { Card, CardCreate, CardUpdate, CardFilter, CardListResponse, PriceSuggestion, PriceSuggestionParams } from '@/types/card'
 import type { Community, CommunityCreate, CommunityUpdate, CommunityListResponse, JoinRequest, JoinRequestListResponse, Member, MemberListResponse, SlugCheckResponse } from '@/types/community'
-import type { Message, MessageCreate, MessageListResponse, Conversation, ConversationListResponse } from '@/types/message'
+import type { Message, MessageCreate, MessageListResponse, Conversation, ConversationListResponse, MarkReadResult, RealtimeTicket } from '@/types/message'
 
-const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
+export const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
 
 /**
  * سرویس API برای ارتباط با backend
@@ -448,8 +448,10 @@ class APIService {
   /**
    * دریافت لیست مکالمات
    */
-  async getConversations(): Promise<ConversationListResponse> {
-    const response = await this.client.get<ConversationListResponse>('/api/v1/messages/conversations')
+  async getConversations(page: number = 1, pageSize: number = 100): Promise<ConversationListResponse> {
+    const response = await this.client.get<ConversationListResponse>(
+      `/api/v1/messages/conversations?page=${page}&page_size=${pageSize}`
+    )
     return response.data
   }
 
@@ -477,6 +479,17 @@ class APIService {
     return response.data
   }
 
+  /**
+   * علامت‌گذاری دسته‌ای چند مکالمه به عنوان خوانده شده (یک درخواست)
+   */
+  async markConversationsAsRead(userIds: number[], upToId?: number): Promise<MarkReadResult> {
+    const response = await this.client.post<MarkReadResult>('/api/v1/messages/mark-read', {
+      user_ids: userIds,
+      up_to_id: upToId,
+    })
+    return response.data
+  }
+
   /**
    * دریافت تعداد کل پیام‌های خوانده نشده
    */
@@ -485,6 +498,14 @@ class APIService {
     return response.data.unread_count
   }
 
+  /**
+   * دریافت ticket یک‌بار مصرف برای اتصال stream رویدادهای realtime
+   */
+  async getRealtimeTicket(): Promise<RealtimeTicket> {
+    const response = await this.client.post<RealtimeTicket>('/api/v1/realtime/ticket')
+    return response.data
+  }
+
   // ==================== Profile & Block API ====================
 
   /**
@@ -593,8 +614,8 @@ class APIService {
   /**
    * بررسی وجود کامیونیتی مشترک با کاربر
    */
-  async checkSharedCommunities(userId: number): Promise<{ has_shared_community: boolean; user_id: number }> {
-    const response = await this.client.get<{ has_shared_community: boolean; user_id: number }>(
+  async checkSharedCommunities(userId: number): Promise<{ has_shared_community: boolean; is_blocked: boolean; user_id: number }> {
+    const response = await this.client.get<{ has_shared_community: boolean; is_blocked: boolean; user_id: number }>(
       `/api/v1/users/${userId}/shared-communities`
     )
     return response.data
@@ -1187,6 +1208,8 @@ export interface AdminAlert {
   extra_data?: Record<string, unknown>
   is_read: boolean
   email_sent: boolean
+  occurrences: number
+  last_seen_at: string
   created_at: string
 }
 
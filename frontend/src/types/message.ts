@@ -56,5 +56,17 @@ export interface Conversation {
 export interface ConversationListResponse {
   items: Conversation[]
   total: number
+  page: number
+  page_size: number
+}
+
+
+export interface RealtimeTicket {
+  ticket: string
+  expires_in: number
 }
 
+export interface MarkReadResult {
+  count: number
+  conversations: Record<string, number>
+}